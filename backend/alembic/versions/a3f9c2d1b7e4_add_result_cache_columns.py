@@ -0,0 +1,33 @@
+"""Add result cache columns to jobs table
+
+Revision ID: a3f9c2d1b7e4
+Revises: 81498b3c1928
+Create Date: 2026-10-17 10:12:41.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f9c2d1b7e4'
+down_revision = '81498b3c1928'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Use IF NOT EXISTS so this is safe to run on an already-provisioned DB.
+    op.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS input_sha256 VARCHAR")
+    op.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS cache_key VARCHAR")
+    op.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS source_job_id VARCHAR")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_jobs_input_sha256 ON jobs (input_sha256)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_jobs_cache_key ON jobs (cache_key)")
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_jobs_cache_key'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_input_sha256'), table_name='jobs')
+    op.drop_column('jobs', 'source_job_id')
+    op.drop_column('jobs', 'cache_key')
+    op.drop_column('jobs', 'input_sha256')
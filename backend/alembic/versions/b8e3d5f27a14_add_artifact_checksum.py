@@ -0,0 +1,25 @@
+"""Add checksum column to artifacts table
+
+Revision ID: b8e3d5f27a14
+Revises: e5b2f8a61c93
+Create Date: 2026-10-17 16:40:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3d5f27a14'
+down_revision = 'e5b2f8a61c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Use IF NOT EXISTS so this is safe to run on an already-provisioned DB.
+    op.execute("ALTER TABLE artifacts ADD COLUMN IF NOT EXISTS checksum VARCHAR")
+
+
+def downgrade() -> None:
+    op.drop_column('artifacts', 'checksum')
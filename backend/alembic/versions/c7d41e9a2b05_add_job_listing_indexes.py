@@ -0,0 +1,38 @@
+"""Add composite indexes for keyset job listing
+
+Revision ID: c7d41e9a2b05
+Revises: a3f9c2d1b7e4
+Create Date: 2026-10-17 14:05:17.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d41e9a2b05'
+down_revision = 'a3f9c2d1b7e4'
+branch_labels = None
+depends_on = None
+
+
+# (created_at, id) matches the keyset cursor; leading user_id/status serve the filtered listings.
+INDEXES = {
+    'ix_jobs_created_at_id': [sa.text('created_at DESC'), sa.text('id DESC')],
+    'ix_jobs_user_id_created_at_id': ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+    'ix_jobs_status_created_at_id': ['status', sa.text('created_at DESC'), sa.text('id DESC')],
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps jobs writable during the build; it cannot run inside a transaction.
+    # A failed build leaves an INVALID index that IF NOT EXISTS would keep: drop it before retrying.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'jobs', columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in reversed(list(INDEXES)):
+            op.drop_index(name, table_name='jobs', postgresql_concurrently=True, if_exists=True)
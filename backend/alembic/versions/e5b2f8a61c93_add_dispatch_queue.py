@@ -0,0 +1,37 @@
+"""Add dispatch_queue table
+
+Revision ID: e5b2f8a61c93
+Revises: c7d41e9a2b05
+Create Date: 2026-10-17 15:22:48.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2f8a61c93'
+down_revision = 'c7d41e9a2b05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Use IF NOT EXISTS so this is safe to run on an already-provisioned DB.
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS dispatch_queue (
+            job_id VARCHAR PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+            payload JSON NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            locked_until TIMESTAMP WITH TIME ZONE,
+            last_error TEXT,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_dispatch_queue_available_at ON dispatch_queue (available_at)")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dispatch_queue_available_at', table_name='dispatch_queue')
+    op.drop_table('dispatch_queue')
@@ -1,26 +1,31 @@
-from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Annotated, Optional
-from datetime import datetime, timezone
+from typing import AsyncIterator, List, Annotated, Optional
 from enum import Enum
+import asyncio
 import json
 import logging
+import uuid
 
 from app.domain.services.job_service import JobService
+from app.domain.services.result_cache import ResultCache
+from app.domain.services.dispatch_queue import DispatchQueue
 from app.infrastructure.db.session import get_db, AsyncSessionLocal
 from app.infrastructure.db.models import JobStatus
+from app.infrastructure.db.job_events import job_event, job_event_hub, RESYNC
 from app.schemas.job import (
     JobCreateRequest,
     JobCreateResponse,
+    JobStatusBatchRequest,
     JobStatusResponse,
     JobResultResponse,
     ArtifactResponse,
     MetricResponse,
 )
-from app.infrastructure.compute.runpod_runner import RunPodRunner
 from app.infrastructure.storage.s3_service import storage_service
-from app.core.validation import validate_file_extension, validate_file_content, validate_pdb_structure, get_file_info
+from app.core.validation import validate_file_extension, validate_diffab_config, PDBUploadStream, PDBValidationError
 from app.core.pdb_analyzer import PDBAnalyzer
 from app.core.config import settings
 
@@ -36,131 +41,8 @@ class PipelineType(str, Enum):
     FULL_PIPELINE = "diffab_rfdiffusion_af2"
 
 
-async def _process_job_background(
-    job_id: str,
-    file_content: bytes,
-    filename: str,
-    pipeline_type: PipelineType,
-    selected_models: str,
-    diffab_config: Optional[dict] = None,
-):
-    """Background task to analyze, upload, and dispatch the job without blocking HTTP response."""
-    async with AsyncSessionLocal() as db:
-        try:
-            # 1. Extract file metadata
-            file_info = await run_in_threadpool(get_file_info, file_content)
-            
-            # 2. Analyze PDB structure
-            pdb_analysis = await run_in_threadpool(
-                PDBAnalyzer.analyze, 
-                file_content.decode('utf-8', errors='ignore'), 
-                filename
-            )
-            logger.info(f"PDB Analysis for {job_id}: {pdb_analysis['recommended_mode']}")
-            
-            if pipeline_type == PipelineType.FULL_PIPELINE:
-                mode_to_pipeline = {
-                    'codesign_single': 'diffab_only',
-                    'codesign_multicdrs': 'diffab_rfdiffusion_af2',
-                    'fixbb': 'diffab_only',
-                    'strpred': 'af2_only'
-                }
-                recommended_pipeline = mode_to_pipeline.get(pdb_analysis['recommended_mode'], 'diffab_rfdiffusion_af2')
-            else:
-                recommended_pipeline = pipeline_type.value
-
-            # PRE-DISPATCH NOTE: We no longer hard-fail based on the antibody auto-detection.
-            # PDBAnalyzer uses chain name heuristics that can produce false negatives for
-            # valid antibody structures with non-standard chain labels (e.g. A/B instead of H/L).
-            # We log a warning and allow DiffAb itself to validate the structure.
-            if recommended_pipeline in ('diffab_only', 'diffab_rfdiffusion_af2') and not pdb_analysis.get('is_antibody'):
-                logger.warning(
-                    f"Job {job_id}: PDB may not be an antibody (heuristic check). "
-                    "Proceeding to RunPod — DiffAb will validate the structure directly."
-                )
-
-            model_list = selected_models.split(",") if selected_models else []
-            
-            # 3. Update the job configuration in DB
-            job = await JobService.get_job(db, job_id)
-            if job:
-                job.config = {
-                    "atom_count": file_info.get("atom_count", 0),
-                    "pdb_analysis": pdb_analysis,
-                    "selected_models": model_list
-                }
-                job.pipeline_type = recommended_pipeline
-                await db.commit()
-            
-            # 4. Upload to S3 — upload_input already transitions status to UPLOADED internally
-            s3_key = await JobService.upload_input(db=db, job_id=job_id, file_content=file_content, filename=filename)
-            await db.commit()
-            logger.info(f"Job {job_id}: input uploaded to S3, status=UPLOADED")
-
-            # 5. Dispatch to RunPod GPU
-            try:
-                runpod_params = {
-                    "atom_count": file_info.get("atom_count", 0),
-                    "pipeline": recommended_pipeline,
-                }
-                # Merge DiffAb UI config if provided
-                if diffab_config:
-                    runpod_params["diffab_config"] = diffab_config
-
-                runpod_job_id = await RunPodRunner.submit_job(
-                    job_id=job_id,
-                    model_name=recommended_pipeline,
-                    input_s3_key=s3_key,
-                    params=runpod_params
-                )
-                # Atomically save runpod_job_id + transition to QUEUED in one transaction.
-                # We do NOT use update_job_status() here to avoid the extra get_job() call
-                # and potential identity-map staleness after the previous commit().
-                job = await JobService.get_job(db, job_id)
-                if not job:
-                    raise RuntimeError(f"Job {job_id} disappeared from DB after upload!")
-                
-                # Hidden Bug 1 & 2: Terminal check & RunPod ID assignment
-                if job.status in {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED}:
-                    logger.info(f"Job {job_id} reached terminal state ({job.status}) during dispatch. Skipping QUEUED update.")
-                    return
-
-                job.runpod_job_id = runpod_job_id
-                job.status = JobStatus.QUEUED
-                await db.flush()
-                await db.commit()
-                await db.refresh(job)
-                logger.info(
-                    f"Job {job_id} dispatched to RunPod. "
-                    f"runpod_job_id={runpod_job_id}, status=QUEUED"
-                )
-            except Exception as runpod_err:
-                logger.error(
-                    f"RunPod dispatch failed for job {job_id}: {runpod_err}. "
-                    "Marking as FAILED."
-                )
-                job = await JobService.get_job(db, job_id)
-                if job:
-                    job.status = JobStatus.FAILED
-                    job.error_message = str(runpod_err)
-                    job.finished_at = datetime.now(timezone.utc)
-                    await db.flush()
-                    await db.commit()
-                return
-
-        except Exception as e:
-            await db.rollback()
-            logger.error(f"Background processing failed for job {job_id}: {e}", exc_info=True)
-            try:
-                await JobService.update_job_status(db, job_id, JobStatus.FAILED, str(e))
-                await db.commit()
-            except Exception as cleanup_error:
-                logger.error(f"Failed to mark background job {job_id} as FAILED: {cleanup_error}")
-
-
 @router.post("/", response_model=JobCreateResponse)
 async def create_job(
-    background_tasks: BackgroundTasks,
     file: Annotated[
         UploadFile,
         File(
@@ -178,8 +60,12 @@ async def create_job(
     ] = None,
     diffab_config: Annotated[
         Optional[str],
-        Form(description="JSON string with DiffAb config params (num_designs, sampling_temp, device, etc.)")
+        Form(description="JSON string with DiffAb config params (num_designs, sampling_temp, sample_steps, device, etc.)")
     ] = None,
+    skip_cache: Annotated[
+        bool,
+        Form(description="Always dispatch a fresh run (e.g. for a new random seed) instead of reusing cached results")
+    ] = False,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -191,33 +77,24 @@ async def create_job(
     - `job_id`: Unique identifier for tracking
     - `status`: Current job status (initially "queued")
     - `created_at`: Timestamp of job creation
+    - `cached`: True if the job reuses results of an identical earlier submission
     """
     try:
         if not file.filename:
             raise HTTPException(status_code=400, detail="No filename provided")
         
-        file_content = await file.read()
+        # Backpressure: refuse new work while the dispatchers are far behind
+        if await DispatchQueue.backlog(db) >= settings.dispatch_max_backlog:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many jobs waiting to be dispatched. Please retry shortly.",
+                headers={"Retry-After": "30"},
+            )
         
         is_valid, error = validate_file_extension(file.filename)
         if not is_valid:
             raise HTTPException(status_code=400, detail=error)
         
-        is_valid, error = validate_file_content(file_content)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error)
-        
-        # PDB parsing is fast enough for HTTP req, but full analysis is moved to BG
-        is_valid, error = validate_pdb_structure(file_content)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error)
-        
-        # Create lightweight job in CREATED state instantly
-        job = await JobService.create_job(
-            db=db,
-            pipeline_type=pipeline_type.value,
-        )
-        await db.commit()
-        
         # Parse optional DiffAb config JSON
         parsed_diffab_config = None
         if diffab_config:
@@ -225,19 +102,83 @@ async def create_job(
                 parsed_diffab_config = json.loads(diffab_config)
             except Exception:
                 logger.warning(f"Failed to parse diffab_config JSON: {diffab_config!r}")
-
-        # Offload heavy text splitting, S3 networking, and HTTP dispatch to BackgroundTasks
-        background_tasks.add_task(
-            _process_job_background,
-            job_id=job.id,
-            file_content=file_content,
-            filename=file.filename,
-            pipeline_type=pipeline_type,
-            selected_models=selected_models,
-            diffab_config=parsed_diffab_config,
+            if parsed_diffab_config is not None and not isinstance(parsed_diffab_config, dict):
+                logger.warning(f"Ignoring non-object diffab_config: {diffab_config!r}")
+                parsed_diffab_config = None
+        if parsed_diffab_config:
+            is_valid, error = validate_diffab_config(parsed_diffab_config)
+            if not is_valid:
+                raise HTTPException(status_code=400, detail=error)
+        
+        model_list = selected_models.split(",") if selected_models else []
+        
+        job_id = str(uuid.uuid4())
+        
+        # Validate, scan and hash the spooled body in a worker thread before
+        # anything is written: an invalid upload never reaches storage or the
+        # DB, and a known input is not uploaded again.
+        upload = PDBUploadStream(file.file)
+        try:
+            await run_in_threadpool(upload.scan_all)
+        except PDBValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        input_sha256 = upload.sha256.hexdigest()
+        cache_key = ResultCache.cache_key(input_sha256, pipeline_type.value, parsed_diffab_config)
+        
+        known_input = await ResultCache.find_input(db, input_sha256)
+        if known_input:
+            # Same bytes were already stored and analyzed — reuse both
+            s3_key = known_input.input_s3_key
+            file_info = {"atom_count": known_input.config.get("atom_count", 0)}
+            pdb_analysis = known_input.config["pdb_analysis"]
+            logger.info(f"Job {job_id}: reusing input {s3_key} (sha256={input_sha256[:12]})")
+        else:
+            # Stream the checked bytes to object storage in bounded parts
+            s3_key = await JobService.store_input(
+                job_id=job_id,
+                file_obj=file.file,
+                filename=file.filename,
+            )
+            # The scanner has already seen every byte — no further text passes needed
+            file_info = upload.scanner.file_info()
+            pdb_analysis = PDBAnalyzer.analyze(upload.scanner, file.filename)
+        
+        # Create lightweight job and record the stored input in one transaction
+        job = await JobService.create_job(
+            db=db,
+            pipeline_type=pipeline_type.value,
+            job_id=job_id,
+            input_sha256=input_sha256,
+            cache_key=cache_key,
         )
+        job = await JobService.attach_input(db=db, job_id=job_id, s3_key=s3_key)
+        
+        # Identical submission already completed or running — link instead of dispatching
+        source = None if skip_cache else await ResultCache.find_result(db, cache_key)
+        if source:
+            job = await ResultCache.link(db, job, source, selected_models=model_list)
+            await db.commit()
+            logger.info(f"Job {job.id} served from cache (source={source.id}, status={job.status.value})")
+            return JobCreateResponse(
+                job_id=job.id,
+                status=job.status,
+                created_at=job.created_at,
+                cached=True,
+            )
         
-        logger.info(f"Received and delegated job {job.id} to background tasks.")
+        # Durable hand-off: the queue row commits with the job, a dispatcher submits it
+        await DispatchQueue.enqueue(db, job.id, {
+            "input_s3_key": s3_key,
+            "file_info": file_info,
+            "pdb_analysis": pdb_analysis,
+            "pipeline_type": pipeline_type.value,
+            "selected_models": model_list,
+            "diffab_config": parsed_diffab_config,
+        })
+        await db.commit()
+        
+        logger.info(f"Received job {job.id} and queued it for dispatch.")
         
         return JobCreateResponse(
             job_id=job.id,
@@ -258,200 +199,158 @@ async def get_job_status(
     job_id: str,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get job status and metadata. Polls RunPod if job is actively processing."""
+    """
+    Get job status and metadata.
+    
+    Pure DB read — RunPod state and the timeout rule are applied by the
+    background reconciler (app/worker/reconciler.py) and the webhook.
+    """
     job = await JobService.get_job(db, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    # -----------------------------------------------------------------
-    # Conditions under which we skip RunPod polling:
-    #  1. Job is already terminal (COMPLETED, FAILED, CANCELLED)
-    #  2. finished_at is set (already reconciled)
-    #  3. runpod_job_id is missing (job never reached RunPod)
-    #  4. Job has been running for > 30 minutes (hard timeout safety)
-    # -----------------------------------------------------------------
-    ACTIVE_STATUSES = {JobStatus.QUEUED, JobStatus.PROVISIONING, JobStatus.RUNNING}
-    TERMINAL_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED}
-
-    needs_poll = (
-        job.status in ACTIVE_STATUSES
-        and job.runpod_job_id
-        and not job.finished_at
-    )
+    return JobStatusResponse.model_validate(job)
 
-    # 30-minute hard timeout — use timezone-aware datetime to compare with DB timestamps
-    if needs_poll and job.created_at:
-        now_utc = datetime.now(timezone.utc)
-        # Ensure comparison is timezone-aware on both sides
-        created_tz = job.created_at if job.created_at.tzinfo else job.created_at.replace(tzinfo=timezone.utc)
-        age_minutes = (now_utc - created_tz).total_seconds() / 60
-        timeout_minutes = settings.job_timeout_seconds / 60
-        if age_minutes > timeout_minutes:
-            logger.error(
-                f"Job {job_id} exceeded {timeout_minutes:.0f}-minute timeout (age={age_minutes:.1f}m). "
-                "Marking FAILED."
-            )
-            job.status = JobStatus.FAILED
-            job.finished_at = datetime.now(timezone.utc)
-            job.error_message = "Job timed out after 30 minutes."
-            await db.flush()
-            await db.commit()
-            await db.refresh(job)
-            needs_poll = False
 
-    if needs_poll:
-        try:
-            logger.info(
-                f"[POLL] Job {job_id} | DB status={job.status.value} "
-                f"| runpod_job_id={job.runpod_job_id}"
-            )
-            runpod_data = await RunPodRunner.get_job_status(
-                job.runpod_job_id, job.pipeline_type
-            )
-            # Log FULL RunPod response for debugging
-            logger.info(f"[RUNPOD RESPONSE] job={job_id}: {runpod_data}")
-
-            rp_status: str = runpod_data.get("status", "UNKNOWN")
-
-            # Normalize status text for easier comparisons
-            if isinstance(rp_status, str):
-                rp_status = rp_status.upper()
-
-            # If RunPod returns UNKNOWN with an HTTP 404 in the error message,
-            # this typically means the worker container crashed and the job
-            # record has been evicted on RunPod's side. Treat this as a hard
-            # failure instead of leaving the job stuck in RUNNING/UNKNOWN.
-            if rp_status == "UNKNOWN":
-                error_text = (runpod_data.get("error") or "").lower()
-                if "404" in error_text and "not found" in error_text:
-                    logger.error(
-                        f"[RUNPOD 404] job={job_id} | "
-                        f"runpod_job_id={job.runpod_job_id} | marking FAILED. "
-                        f"full_data={runpod_data}"
-                    )
-                    job.status = JobStatus.FAILED
-                    job.finished_at = datetime.now(timezone.utc)
-                    job.error_message = (
-                        "RunPod job not found (worker likely crashed or was evicted)."
-                    )
-                    await db.flush()
-                    await db.commit()
-                    await db.refresh(job)
-                    # After this, we can safely return the updated job response.
-                    return JobStatusResponse.model_validate(job)
-
-            if rp_status == "COMPLETED":
-                output = runpod_data.get("output") or {}
-                # Handle nested strict return schema from handler.py: {"status": "COMPLETED", "output": {"result_s3_key": ...}}
-                inner_output = output.get("output", output)
-                output_s3_key = inner_output.get("result_s3_key") or inner_output.get("output_s3_key")
-                
-                execution_ms = runpod_data.get("executionTime")
-
-                logger.info(
-                    f"[COMPLETED] job={job_id} | output_s3_key={output_s3_key} "
-                    f"| executionTime={execution_ms}ms | full_output={output}"
-                )
-
-                job.status = JobStatus.COMPLETED
-                job.finished_at = datetime.now(timezone.utc)
-                job.output_s3_key = output_s3_key
-                job.execution_time = (execution_ms / 1000.0) if execution_ms else None
-                if not job.started_at:
-                    job.started_at = datetime.now(timezone.utc)
-
-                await db.flush()
-                await db.commit()
-                await db.refresh(job)
-                logger.info(
-                    f"[DB COMMITTED] job={job_id} "
-                    f"status=COMPLETED output_s3_key={job.output_s3_key} "
-                    f"execution_time={job.execution_time}s finished_at={job.finished_at}"
-                )
-
-            elif rp_status == "FAILED":
-                error_msg = runpod_data.get("error") or "Unknown RunPod failure"
-                logger.error(f"[FAILED] job={job_id} | error={error_msg}")
-
-                job.status = JobStatus.FAILED
-                job.finished_at = datetime.now(timezone.utc)
-                job.error_message = str(error_msg)
-
-                await db.flush()
-                await db.commit()
-                await db.refresh(job)
-
-            elif rp_status == "IN_QUEUE":
-                # Job is waiting in RunPod's queue — no worker has picked it up yet.
-                # Map to PROVISIONING so the UI shows the correct state.
-                logger.info(f"[QUEUED] job={job_id} | rp_status=IN_QUEUE — waiting for worker")
-                if job.status != JobStatus.PROVISIONING:
-                    job.status = JobStatus.PROVISIONING
-                await db.flush()
-                await db.commit()
-                await db.refresh(job)
-
-            elif rp_status == "IN_PROGRESS":
-                # Worker has picked up the job and is actively executing.
-                logger.info(f"[RUNNING] job={job_id} | rp_status=IN_PROGRESS")
-                if job.status != JobStatus.RUNNING:
-                    job.status = JobStatus.RUNNING
-                if not job.started_at:
-                    job.started_at = datetime.now(timezone.utc)
-                await db.flush()
-                await db.commit()
-                await db.refresh(job)
-
-
-            elif rp_status == "CANCELLED":
-                # RunPod cancelled the job (e.g., worker was killed manually or from the UI).
-                # Mark as FAILED in our DB so the UI doesn't leave the user stuck in 'running'.
-                logger.warning(f"[CANCELLED] job={job_id} | RunPod job was cancelled. Marking FAILED.")
-                job.status = JobStatus.FAILED
-                job.finished_at = datetime.now(timezone.utc)
-                job.error_message = "RunPod job was cancelled (manually or by the system)."
-                await db.flush()
-                await db.commit()
-                await db.refresh(job)
+# =========================================================
+# LIVE STATUS (SSE / WebSocket)
+# =========================================================
 
+TERMINAL_STATUSES = {JobStatus.COMPLETED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value}
 
-            else:
-                # Truly unknown status — log it but don't fail the job, wait for next poll
-                logger.warning(
-                    f"[UNKNOWN STATUS] job={job_id} | rp_status={rp_status} "
-                    f"| full_data={runpod_data}"
-                )
-
-        except Exception as e:
-            logger.error(
-                f"[POLL ERROR] Failed to sync RunPod status for job {job_id}: {e}",
-                exc_info=True
-            )
+
+async def _read_job_event(job_id: str) -> Optional[dict]:
+    # Short-lived session: streams must not pin a DB connection while idle
+    async with AsyncSessionLocal() as db:
+        job = await JobService.get_job(db, job_id)
+        return job_event(job) if job else None
+
+
+async def _open_job_events(job_id: str):
+    """Subscribe first, then snapshot, so no transition falls between the two."""
+    queue = job_event_hub.subscribe(job_id)
+    current = await _read_job_event(job_id)
+    if current is None:
+        job_event_hub.unsubscribe(job_id, queue)
+    return queue, current
+
+
+async def _job_updates(job_id: str, queue: asyncio.Queue, current: dict) -> AsyncIterator[Optional[dict]]:
+    """
+    Yield the current status snapshot, then each transition until a terminal
+    status. None is yielded as a keep-alive while nothing changes; when the
+    listener is down the job is re-read from the DB at the same interval.
+    """
+    try:
+        yield current
+        while current["status"] not in TERMINAL_STATUSES:
             try:
-                await db.rollback()
-            except Exception:
-                pass
+                event = await asyncio.wait_for(queue.get(), timeout=settings.job_events_heartbeat)
+            except asyncio.TimeoutError:
+                event = None if job_event_hub.connected else RESYNC
+
+            if event is RESYNC:
+                event = await _read_job_event(job_id)
+                if event is None:
+                    return
+            if event is None or event == current:
+                yield None
+                continue
+
+            current = event
+            yield current
+    finally:
+        job_event_hub.unsubscribe(job_id, queue)
 
-    return JobStatusResponse.model_validate(job)
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream of job status changes.
+
+    Sends the current status immediately, then one `status` event per
+    transition, and closes after a terminal status.
+    """
+    queue, current = await _open_job_events(job_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def _sse():
+        yield "retry: 3000\n\n"
+        async for event in _job_updates(job_id, queue, current):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        _sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str):
+    """WebSocket alternative to /events: one JSON message per status change."""
+    await websocket.accept()
+    queue, current = await _open_job_events(job_id)
+    if current is None:
+        await websocket.close(code=4404, reason="Job not found")
+        return
+
+    try:
+        async for event in _job_updates(job_id, queue, current):
+            # Keep-alives double as disconnect detection for idle sockets
+            await websocket.send_json(event if event is not None else {"event": "keep-alive"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
 
 
 @router.get("/", response_model=List[JobStatusResponse])
 async def list_jobs(
+    response: Response,
     status: str = None,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """List jobs with optional status filter."""
+    """
+    List jobs, newest first, with optional status filter.
+
+    Keyset-paginated: when more jobs exist, the X-Next-Cursor response header
+    holds the cursor to pass back for the next page.
+    """
     try:
         status_filter = JobStatus(status) if status else None
-        jobs = await JobService.list_jobs(db, status=status_filter, limit=limit)
-        return [JobStatusResponse.model_validate(job) for job in jobs]
     except ValueError:
         raise HTTPException(status_code=400, detail=f"Invalid status filter: {status}")
+
+    try:
+        rows, next_cursor = await JobService.list_jobs(
+            db, status=status_filter, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
         logger.error(f"Error listing jobs: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to list jobs: {str(e)}")
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [JobStatusResponse.model_validate(row) for row in rows]
+
+
+@router.post("/status:batch", response_model=List[JobStatusResponse])
+async def get_job_statuses(
+    request: JobStatusBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Statuses of up to MAX_BATCH_JOB_IDS jobs in one query; unknown IDs are omitted."""
+    rows = await JobService.get_job_statuses(db, request.job_ids)
+    return [JobStatusResponse.model_validate(row) for row in rows]
+
 
 @router.get("/{job_id}/results", response_model=JobResultResponse)
 async def get_job_results(
@@ -469,17 +368,21 @@ async def get_job_results(
             detail=f"Job not completed. Current status: {job.status}"
         )
     
-    # Generate presigned URLs for artifacts
-    artifacts = []
-    for artifact in job.artifacts:
-        download_url = storage_service.get_presigned_url(artifact.s3_key)
-        artifacts.append(ArtifactResponse(
+    # Generate presigned URLs for artifacts (signed locally, no storage round trip)
+    download_urls = await asyncio.gather(*(
+        storage_service.get_presigned_url(artifact.s3_key) for artifact in job.artifacts
+    ))
+    artifacts = [
+        ArtifactResponse(
             id=artifact.id,
             artifact_type=artifact.artifact_type,
             s3_key=artifact.s3_key,
             size_bytes=artifact.size_bytes,
+            checksum=artifact.checksum,
             download_url=download_url
-        ))
+        )
+        for artifact, download_url in zip(job.artifacts, download_urls)
+    ]
     
     metrics = [
         MetricResponse(metric_name=m.metric_name, metric_value=m.metric_value)
@@ -511,7 +414,7 @@ async def download_job_result(
         raise HTTPException(status_code=404, detail="No output file found for this job.")
         
     try:
-        download_url = storage_service.get_presigned_url(job.output_s3_key, expires_seconds=3600)
+        download_url = await storage_service.get_presigned_url(job.output_s3_key, expires_seconds=3600)
         return {"download_url": download_url}
     except Exception as e:
         logger.error(f"Error generating presigned URL for {job_id}: {e}")
@@ -13,6 +13,7 @@ import asyncio
 from app.infrastructure.db.session import get_db
 from app.domain.services.job_service import JobService
 from app.infrastructure.db.models import JobStatus
+from app.infrastructure.storage.s3_service import storage_service
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,7 @@ class WebhookPayload(BaseModel):
     job_id: str
     status: str
     output_s3_key: Optional[str] = None
+    manifest_s3_key: Optional[str] = None
     error: Optional[str] = None
 
 
@@ -72,6 +74,14 @@ async def runpod_webhook(
         logger.info(f"Ignoring duplicate webhook for job {payload.job_id}")
         return {"status": "IGNORED"}
 
+    # Read the artifact manifest before opening the write transaction
+    manifest = None
+    if payload.status == "COMPLETED" and payload.manifest_s3_key:
+        try:
+            manifest = await storage_service.read_manifest(payload.manifest_s3_key)
+        except Exception as e:
+            logger.error(f"Could not read artifact manifest {payload.manifest_s3_key}: {e}")
+
     # Implement a retry loop for Deadlock resilience during high-concurrency DB writes
     for attempt in range(3):
         try:
@@ -82,7 +92,9 @@ async def runpod_webhook(
                     JobStatus.COMPLETED
                 )
 
-                if payload.output_s3_key:
+                if manifest:
+                    await JobService.add_artifacts(db, payload.job_id, manifest["artifacts"])
+                elif payload.output_s3_key:
                     await JobService.add_artifact(
                         db=db,
                         job_id=payload.job_id,
@@ -35,8 +35,16 @@ class Settings(BaseSettings):
     db_pool_size: int = 20
     db_max_overflow: int = 10
     
+    # Job status events (Postgres LISTEN/NOTIFY → SSE/WebSocket)
+    job_events_listen_url: Optional[str] = None  # direct DSN if database_url is a transaction pooler
+    job_events_heartbeat: float = 15.0  # seconds between keep-alives on idle event streams
+    
     # Redis (Rate Limiting + Cache)
     redis_url: str = "redis://localhost:6379/0"
+    rate_limit_enabled: bool = False
+    rate_limit_per_minute: int = 120  # cost units per client per minute (POST /jobs costs 10)
+    rate_limit_local_prefilter: bool = True  # reject obvious bursts in-process, before Redis
+    rate_limit_redis_timeout: float = 0.25  # seconds; the limiter fails open past this
     
     # Object Storage (MinIO/S3)
     s3_endpoint: str = Field(default="http://localhost:9000", validation_alias=AliasChoices("S3_ENDPOINT", "MINIO_ENDPOINT"))
@@ -45,6 +53,11 @@ class Settings(BaseSettings):
     s3_bucket_name: str = Field(default="foldexa-artifacts", validation_alias=AliasChoices("S3_BUCKET_NAME", "MINIO_BUCKET"))
     s3_region: str = "us-east-1"
     s3_use_ssl: bool = Field(default=False, validation_alias=AliasChoices("S3_USE_SSL", "MINIO_USE_SSL"))
+    s3_max_connections: int = 32  # pooled connections shared by every storage call in a process
+    s3_timeout: float = 300.0  # seconds per storage request (covers one multipart part)
+    s3_transfer_concurrency: int = 16  # files moved at once by upload/download_directory
+    s3_multipart_part_size: int = 16 * 1024 * 1024  # files above this are uploaded in parts
+    s3_multipart_parallel: int = 4  # parts of one file in flight at once
     
     # GPU / RunPod Configuration
     gpu_backend: str = "local"  # "runpod" | "docker" | "local"
@@ -53,6 +66,26 @@ class Settings(BaseSettings):
     runpod_endpoint_rfdiffusion: str = ""
     runpod_endpoint_af2: str = ""
     runpod_timeout: int = 600  # seconds to wait for RunPod response
+    runpod_api_base: str = "https://api.runpod.ai/v2"
+    runpod_max_connections: int = 20  # pooled connections shared by dispatch and polling
+    runpod_max_retries: int = 3
+    runpod_retry_backoff: float = 0.5  # base seconds for jittered exponential backoff
+    runpod_retry_backoff_max: float = 8.0
+    
+    # Durable dispatch queue (Postgres, SKIP LOCKED) and its worker pool
+    dispatcher_enabled: bool = True  # run a dispatcher inside the API process too
+    dispatch_concurrency: int = 4  # max jobs one worker submits at once
+    dispatch_poll_interval: float = 1.0  # seconds between queue checks when idle
+    dispatch_lease_seconds: float = 300.0  # a crashed worker's tasks are reclaimed after this
+    dispatch_max_attempts: int = 3
+    dispatch_max_backlog: int = 500  # POST /jobs returns 503 beyond this many queued jobs
+    dispatch_drain_timeout: float = 30.0  # seconds to finish in-flight dispatches on shutdown
+    
+    # RunPod status reconciler (one leader per deployment via advisory lock)
+    reconciler_enabled: bool = True
+    reconciler_concurrency: int = 8  # max in-flight RunPod status calls
+    reconciler_min_interval: float = 5.0  # seconds between polls right after a transition
+    reconciler_max_interval: float = 60.0  # backoff ceiling for unchanged jobs
     
     # Storage Paths (Local fallback for development)
     storage_base_path: str = "./storage"
@@ -6,23 +6,20 @@ Analyzes PDB files to determine optimal DiffAb mode based on:
 - Antibody detection
 - Structure characteristics
 """
-from typing import Dict, List, Set
+from typing import Dict, List, Union
 import re
 import logging
 
+from app.core.pdb_scanner import PDBScanner, scan_pdb, ANTIBODY_KEYWORDS
+
 logger = logging.getLogger(__name__)
 
 
 class PDBAnalyzer:
     """Analyzes PDB files to recommend optimal pipeline configuration."""
     
-    # Keywords that indicate antibody structures
-    ANTIBODY_KEYWORDS = [
-        'ANTIBODY', 'IMMUNOGLOBULIN', 'FAB', 'FV', 'VH', 'VL',
-        'HEAVY CHAIN', 'LIGHT CHAIN', 'CDR', 'ANTIGEN',
-        'SCFV', 'NANOBODY', 'CAMELID', 'IGG', 'IGA', 'IGM',
-        'VARIABLE DOMAIN', 'CONSTANT DOMAIN', 'FRAMEWORK'
-    ]
+    # Keywords that indicate antibody structures (matched by PDBScanner)
+    ANTIBODY_KEYWORDS = [keyword.decode() for keyword in ANTIBODY_KEYWORDS]
     
     # Filename patterns that indicate antibodies
     ANTIBODY_FILENAME_PATTERNS = [
@@ -33,12 +30,13 @@ class PDBAnalyzer:
     ]
     
     @staticmethod
-    def analyze(pdb_content: str, filename: str = "") -> Dict:
+    def analyze(pdb_content: Union[str, bytes, PDBScanner], filename: str = "") -> Dict:
         """
         Analyze PDB structure and recommend optimal DiffAb mode.
         
         Args:
-            pdb_content: PDB file content as string
+            pdb_content: PDB file content, or a closed PDBScanner that has
+                already consumed it (avoids another pass over the file)
             
         Returns:
             Dictionary with analysis results:
@@ -51,11 +49,18 @@ class PDBAnalyzer:
             }
         """
         try:
+            if isinstance(pdb_content, PDBScanner):
+                scan = pdb_content
+            elif isinstance(pdb_content, str):
+                scan = scan_pdb(pdb_content.encode('utf-8', errors='ignore'))
+            else:
+                scan = scan_pdb(pdb_content)
+            
             # Extract chains
-            chains = PDBAnalyzer._extract_chains(pdb_content)
+            chains = PDBAnalyzer._extract_chains(scan)
             
             # Detect antibody
-            is_antibody = PDBAnalyzer._detect_antibody(pdb_content, filename)
+            is_antibody = PDBAnalyzer._detect_antibody(scan, filename)
             
             # Recommend mode
             mode = PDBAnalyzer._recommend_mode(chains, is_antibody)
@@ -86,42 +91,30 @@ class PDBAnalyzer:
             }
     
     @staticmethod
-    def _extract_chains(pdb_content: str) -> List[str]:
+    def _extract_chains(scan: PDBScanner) -> List[str]:
         """
         Extract unique chain IDs from PDB file.
         
         Args:
-            pdb_content: PDB file content
+            scan: Closed scanner for the PDB file
             
         Returns:
             Sorted list of unique chain IDs
         """
-        chains: Set[str] = set()
-        
-        for line in pdb_content.split('\n'):
-            if line.startswith('ATOM') or line.startswith('HETATM'):
-                # Chain ID is at position 21 (0-indexed: 21)
-                if len(line) > 21:
-                    chain_id = line[21:22].strip()
-                    if chain_id and chain_id.isalnum():
-                        chains.add(chain_id)
-        
-        return sorted(list(chains))
+        return sorted(chain_id for chain_id in scan.chain_ids if chain_id.isalnum())
     
     @staticmethod
-    def _detect_antibody(pdb_content: str, filename: str = "") -> bool:
+    def _detect_antibody(scan: PDBScanner, filename: str = "") -> bool:
         """
         Detect if structure is an antibody based on keywords and filename.
         
         Args:
-            pdb_content: PDB file content
+            scan: Closed scanner for the PDB file
             filename: Optional filename to check for antibody patterns
             
         Returns:
             True if antibody detected, False otherwise
         """
-        upper_content = pdb_content.upper()
-        
         # Check filename first (most reliable for user-named files)
         if filename:
             upper_filename = filename.upper()
@@ -130,11 +123,10 @@ class PDBAnalyzer:
                     logger.info(f"Antibody detected from filename pattern: {pattern}")
                     return True
         
-        # Check for antibody keywords in header/remarks
-        for keyword in PDBAnalyzer.ANTIBODY_KEYWORDS:
-            if keyword in upper_content:
-                logger.debug(f"Antibody keyword detected: {keyword}")
-                return True
+        # Keywords in header/remarks were collected during the scan
+        if scan.antibody_keywords:
+            logger.debug(f"Antibody keywords detected: {sorted(scan.antibody_keywords)}")
+            return True
         
         return False
     
@@ -1,11 +1,13 @@
 """
 Rate limiting middleware using Redis.
 """
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+import hashlib
+import math
 import time
 import logging
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import redis.asyncio as aioredis
 
 from app.core.config import settings
@@ -13,90 +15,208 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+# GCRA (generic cell rate algorithm) in one atomic round trip. The only state
+# per client is its "theoretical arrival time", so memory is O(1) per client
+# no matter how much traffic it sends. Time comes from the Redis server so
+# API processes with skewed clocks agree.
+#   KEYS[1] = bucket key
+#   ARGV[1] = emission interval (ms per cost unit), ARGV[2] = burst tolerance (ms), ARGV[3] = cost
+# Returns {allowed (0/1), retry_after_ms}
+GCRA_SCRIPT = """
+-- Effects replication is the default from Redis 5; older servers need it for TIME
+if redis.replicate_commands then redis.replicate_commands() end
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local emission = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = math.ceil(tat + emission * cost)
+local allow_at = new_tat - tolerance
+if allow_at > now then
+    return {0, math.ceil(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, 0}
+"""
+
+# Cost weights: (method, path prefix, cost). First match wins, default cost is 1.
+ROUTE_COSTS = (
+    ("POST", "/api/v1/jobs/status:batch", 2),
+    ("POST", "/api/v1/jobs", 10),  # upload + hashing + GPU dispatch
+    ("DELETE", "/api/v1/jobs", 2),
+)
+
+# Never limited: probes, docs, metrics and signed server-to-server callbacks
+EXEMPT_PATHS = {"/health", "/", "/docs", "/openapi.json", "/metrics"}
+EXEMPT_PREFIXES = ("/api/v1/webhook/",)
+
+
+def route_cost(method: str, path: str) -> int:
+    for route_method, prefix, cost in ROUTE_COSTS:
+        if method == route_method and path.startswith(prefix):
+            return cost
+    return 1
+
+
+class LocalTokenBucket:
     """
-    Rate limiting middleware using sliding window algorithm.
+    In-process token bucket per client, refilled at the same rate as the
+    Redis limit. This process alone can never see more than the global
+    allowance, so an empty local bucket is a safe reject without asking Redis.
     """
-    
-    def __init__(self, app, redis_url: str = None, requests_per_minute: int = 60):
-        super().__init__(app)
+
+    # Idle buckets are dropped once the table grows past this many clients
+    MAX_CLIENTS = 10_000
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def try_consume(self, client_id: str, cost: float, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.get(client_id, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[client_id] = (tokens, now)
+
+        if len(self._buckets) > self.MAX_CLIENTS:
+            self._prune(now)
+        return allowed
+
+    def _prune(self, now: float) -> None:
+        full_after = self.capacity / self.refill_per_second
+        for client_id, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[client_id]
+
+
+class RateLimitMiddleware:
+    """
+    Rate limiting middleware using a GCRA token bucket in Redis.
+
+    requests_per_minute is a budget of cost units (see ROUTE_COSTS), allowed
+    to burst up to the full minute's budget. Fails open if Redis is down.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        redis_url: str = None,
+        requests_per_minute: int = None,
+        local_prefilter: bool = None
+    ):
+        self.app = app
         self.redis_url = redis_url or settings.redis_url
-        self.requests_per_minute = requests_per_minute
+        self.requests_per_minute = requests_per_minute or settings.rate_limit_per_minute
         self.window_size = 60  # seconds
         self._redis = None
-    
-    async def get_redis(self):
-        """Get or create Redis connection."""
+        self._script = None
+
+        # GCRA parameters, in milliseconds
+        self.emission_interval = self.window_size * 1000 / self.requests_per_minute
+        self.burst_tolerance = self.window_size * 1000
+
+        if local_prefilter is None:
+            local_prefilter = settings.rate_limit_local_prefilter
+        self.local_bucket = LocalTokenBucket(
+            capacity=self.requests_per_minute,
+            refill_per_second=self.requests_per_minute / self.window_size,
+        ) if local_prefilter else None
+
+    def get_redis(self):
+        """Get or create the Redis connection and the registered GCRA script."""
         if self._redis is None:
-            self._redis = await aioredis.from_url(
+            self._redis = aioredis.from_url(
                 self.redis_url,
                 encoding="utf-8",
-                decode_responses=True
+                decode_responses=True,
+                socket_timeout=settings.rate_limit_redis_timeout,
+                socket_connect_timeout=settings.rate_limit_redis_timeout,
             )
+            # EVALSHA, falling back to EVAL once per connection on NOSCRIPT
+            self._script = self._redis.register_script(GCRA_SCRIPT)
         return self._redis
-    
-    async def dispatch(self, request: Request, call_next):
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Check rate limit before processing request."""
-        # Skip rate limiting for health checks
-        if request.url.path in ["/health", "/", "/docs", "/openapi.json"]:
-            return await call_next(request)
-        
+        path = scope.get("path", "")
+        # Skip rate limiting for websockets, health checks and webhooks
+        if scope["type"] != "http" or path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
         # Get client identifier (IP or user_id from auth)
-        client_id = self._get_client_id(request)
-        
+        client_id = self._get_client_id(scope)
+        cost = route_cost(scope["method"], path)
+
         # Check rate limit
-        is_allowed = await self._check_rate_limit(client_id)
-        
+        is_allowed, retry_after = await self._check_rate_limit(client_id, cost)
+
         if not is_allowed:
-            raise HTTPException(
+            response = JSONResponse(
                 status_code=429,
-                detail="Rate limit exceeded. Please try again later."
+                content={"detail": "Rate limit exceeded. Please try again later."},
+                headers={"Retry-After": str(retry_after)},
             )
-        
-        response = await call_next(request)
-        return response
-    
-    def _get_client_id(self, request: Request) -> str:
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    def _get_client_id(self, scope: Scope) -> str:
         """Get client identifier from request."""
         # Try to get user_id from auth header
-        auth_header = request.headers.get("authorization")
+        auth_header = None
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                auth_header = value
+                break
         if auth_header:
-            # In production, decode JWT to get user_id
-            # For now, use the token itself
-            return f"user:{auth_header[:20]}"
-        
+            # In production, decode JWT to get user_id. For now hash the whole
+            # token: its first bytes are the same for every JWT.
+            return f"user:{hashlib.sha256(auth_header).hexdigest()[:32]}"
+
         # Fall back to IP address
-        client_ip = request.client.host
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
         return f"ip:{client_ip}"
-    
-    async def _check_rate_limit(self, client_id: str) -> bool:
+
+    async def _check_rate_limit(self, client_id: str, cost: int = 1) -> Tuple[bool, int]:
         """
-        Check if client is within rate limit using sliding window.
-        Returns True if allowed, False if rate limit exceeded.
+        Check if client is within rate limit.
+
+        Returns:
+            (allowed, retry_after_seconds)
         """
+        if self.local_bucket is not None and not self.local_bucket.try_consume(client_id, cost):
+            logger.warning(f"Rate limit exceeded for {client_id} (local)")
+            return False, math.ceil(cost * self.emission_interval / 1000)
+
         try:
-            redis = await self.get_redis()
-            key = f"rate_limit:{client_id}"
-            now = time.time()
-            window_start = now - self.window_size
-            
-            # Remove old entries
-            await redis.zremrangebyscore(key, 0, window_start)
-            
-            # Count requests in current window
-            request_count = await redis.zcard(key)
-            
-            if request_count >= self.requests_per_minute:
+            self.get_redis()
+            allowed, retry_after_ms = await self._script(
+                keys=[f"rate_limit:{client_id}"],
+                args=[self.emission_interval, self.burst_tolerance, cost],
+            )
+
+            if not allowed:
                 logger.warning(f"Rate limit exceeded for {client_id}")
-                return False
-            
-            # Add current request
-            await redis.zadd(key, {str(now): now})
-            await redis.expire(key, self.window_size)
-            
-            return True
-        
+                return False, max(1, math.ceil(int(retry_after_ms) / 1000))
+
+            return True, 0
+
         except Exception as e:
             logger.error(f"Rate limit check failed: {e}")
             # Fail open - allow request if Redis is down
-            return True
+            return True, 0
@@ -1,11 +1,14 @@
 """
 File validation utilities for protein structure files.
 """
+import hashlib
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import BinaryIO, Optional, Tuple
 from fastapi import UploadFile, HTTPException
 import logging
 
+from app.core.pdb_scanner import PDBScanner, scan_pdb, MIN_ATOM_COUNT
+
 logger = logging.getLogger(__name__)
 
 # Allowed file extensions - ONLY PDB format
@@ -32,6 +35,21 @@ PDB_SIGNATURES = [
     b"MODEL",
 ]
 
+# Number of leading bytes inspected for PDB signatures
+HEADER_PEEK_BYTES = 1000
+
+# Largest single read forwarded to the underlying upload stream (1 MB)
+UPLOAD_READ_CHUNK = 1024 * 1024
+
+
+# Fewest denoising steps the strided DiffAb sampler accepts
+MIN_SAMPLE_STEPS = 2
+
+
+class PDBValidationError(ValueError):
+    """Raised when an upload fails validation while it is being streamed."""
+    pass
+
 
 def validate_file_extension(filename: str) -> Tuple[bool, Optional[str]]:
     """
@@ -68,7 +86,7 @@ def validate_file_content(content: bytes) -> Tuple[bool, Optional[str]]:
         return False, f"File size exceeds maximum allowed size of {MAX_FILE_SIZE / 1024 / 1024} MB"
     
     # Check for PDB signatures in first 1000 bytes
-    header = content[:1000]
+    header = content[:HEADER_PEEK_BYTES]
     
     # Check if any PDB signature is present
     has_signature = any(sig in header for sig in PDB_SIGNATURES)
@@ -91,6 +109,27 @@ def validate_file_content(content: bytes) -> Tuple[bool, Optional[str]]:
     return True, None
 
 
+def validate_diffab_config(config: dict) -> Tuple[bool, Optional[str]]:
+    """
+    Validate the DiffAb parameters that reach the sampler unchecked.
+    
+    Returns:
+        (is_valid, error_message)
+    """
+    sample_steps = config.get("sample_steps")
+    if sample_steps is None:
+        return True, None
+    
+    # bool is an int subclass; "20" would only fail on the GPU worker
+    if isinstance(sample_steps, bool) or not isinstance(sample_steps, int):
+        return False, "diffab_config.sample_steps must be an integer"
+    
+    if sample_steps < MIN_SAMPLE_STEPS:
+        return False, f"diffab_config.sample_steps must be at least {MIN_SAMPLE_STEPS}"
+    
+    return True, None
+
+
 def validate_pdb_structure(content: bytes) -> Tuple[bool, Optional[str]]:
     """
     Perform basic structural validation of PDB file.
@@ -99,21 +138,7 @@ def validate_pdb_structure(content: bytes) -> Tuple[bool, Optional[str]]:
         (is_valid, error_message)
     """
     try:
-        text = content.decode('utf-8', errors='ignore')
-        lines = text.split('\n')
-        
-        # Check for minimum number of ATOM records
-        atom_count = sum(1 for line in lines if line.startswith(('ATOM', 'HETATM')))
-        
-        if atom_count < 10:
-            return False, f"File contains only {atom_count} atoms. Minimum 10 atoms required."
-        
-        # Check for valid PDB line format (80 characters max)
-        for i, line in enumerate(lines[:100], 1):  # Check first 100 lines
-            if len(line) > 80 and line.startswith(('ATOM', 'HETATM')):
-                logger.warning(f"Line {i} exceeds 80 characters (PDB format violation)")
-        
-        return True, None
+        return scan_pdb(content).verdict()
     
     except Exception as e:
         return False, f"Error parsing PDB structure: {str(e)}"
@@ -160,33 +185,89 @@ def get_file_info(content: bytes) -> dict:
         Dictionary with file metadata
     """
     try:
-        text = content.decode('utf-8', errors='ignore')
-        lines = text.split('\n')
-        
-        info = {
-            "atom_count": 0,
-            "residue_count": 0,
-            "chain_ids": set(),
-            "has_header": False,
-            "title": None,
-        }
-        
-        for line in lines:
-            if line.startswith("HEADER"):
-                info["has_header"] = True
-            elif line.startswith("TITLE"):
-                info["title"] = line[10:].strip()
-            elif line.startswith(("ATOM", "HETATM")):
-                info["atom_count"] += 1
-                if len(line) > 21:
-                    chain_id = line[21]
-                    if chain_id.strip():
-                        info["chain_ids"].add(chain_id)
-        
-        info["chain_ids"] = list(info["chain_ids"])
-        
-        return info
+        return scan_pdb(content).file_info()
     
     except Exception as e:
         logger.error(f"Error extracting file info: {e}")
         return {}
+
+
+class PDBUploadStream:
+    """
+    Read-only wrapper that validates a PDB upload while it is being streamed.
+
+    The wrapped stream is consumed in bounded chunks by the storage client.
+    Along the way the header is checked for PDB signatures, the running size
+    is capped at MAX_FILE_SIZE and every chunk is fed to a PDBScanner and a
+    sha256 digest, whose results (``scanner``, ``sha256``) are complete once
+    the stream reaches EOF. Any
+    violation raises PDBValidationError from read(), which aborts the upload
+    before it completes.
+    """
+
+    def __init__(self, raw: BinaryIO, max_size: int = MAX_FILE_SIZE):
+        self._raw = raw
+        self._max_size = max_size
+        self._header = b""
+        self._header_checked = False
+        self._finished = False
+        self.bytes_read = 0
+        self.scanner = PDBScanner()
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to ``size`` bytes (capped at UPLOAD_READ_CHUNK) and validate them."""
+        if self._finished:
+            return b""
+
+        if size is None or size < 0 or size > UPLOAD_READ_CHUNK:
+            size = UPLOAD_READ_CHUNK
+
+        chunk = self._raw.read(size)
+        if not chunk:
+            self._finish()
+            return b""
+
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self._max_size:
+            raise PDBValidationError(
+                f"File size exceeds maximum allowed size of {self._max_size / 1024 / 1024} MB"
+            )
+
+        if not self._header_checked:
+            self._header += chunk[:HEADER_PEEK_BYTES - len(self._header)]
+            if len(self._header) >= HEADER_PEEK_BYTES:
+                self._check_header()
+
+        self.scanner.feed(chunk)
+        self.sha256.update(chunk)
+        return chunk
+
+    def scan_all(self) -> None:
+        """
+        Validate, scan and hash the whole stream without storing it, then
+        rewind the wrapped stream so the checked bytes can be stored as is.
+        Blocking: run it in a worker thread.
+        """
+        while self.read(UPLOAD_READ_CHUNK):
+            pass
+        self._raw.seek(0)
+
+    def _check_header(self) -> None:
+        self._header_checked = True
+        is_valid, error = validate_file_content(self._header)
+        if not is_valid:
+            raise PDBValidationError(error)
+
+    def _finish(self) -> None:
+        self._finished = True
+        self.scanner.close()
+
+        if not self._header_checked:
+            self._check_header()
+
+        is_valid, error = self.scanner.verdict()
+        if not is_valid:
+            raise PDBValidationError(error)
+
+        logger.info(f"Streamed upload validated ({self.bytes_read} bytes, {self.scanner.atom_count} atoms)")
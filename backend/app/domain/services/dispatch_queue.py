@@ -0,0 +1,101 @@
+"""
+Dispatch queue - durable hand-off from the API to the dispatcher workers.
+
+The API inserts a row in the same transaction that creates the job, so a
+stored job is never lost to a process restart. Workers lease rows with
+SELECT ... FOR UPDATE SKIP LOCKED; a lease that expires (worker crashed)
+makes the row claimable again.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import JSON, Integer, Row, String, delete, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infrastructure.db.models import DispatchTask
+
+logger = logging.getLogger(__name__)
+
+UTC = timezone.utc
+
+CLAIM_SQL = text("""
+    UPDATE dispatch_queue
+    SET attempts = attempts + 1,
+        locked_until = now() + make_interval(secs => CAST(:lease_seconds AS double precision))
+    WHERE job_id IN (
+        SELECT job_id FROM dispatch_queue
+        WHERE available_at <= now()
+          AND (locked_until IS NULL OR locked_until < now())
+        ORDER BY available_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING job_id, payload, attempts
+""").columns(job_id=String, payload=JSON, attempts=Integer)
+
+
+class DispatchQueue:
+    """Postgres-backed work queue over the dispatch_queue table."""
+
+    # =========================================================
+    # PRODUCER
+    # =========================================================
+
+    @staticmethod
+    async def enqueue(
+        db: AsyncSession,
+        job_id: str,
+        payload: Dict[str, Any]
+    ) -> None:
+        """Add a job to the queue; committed together with the caller's transaction."""
+        db.add(DispatchTask(job_id=job_id, payload=payload))
+        await db.flush()
+
+    @staticmethod
+    async def backlog(db: AsyncSession) -> int:
+        """Number of jobs waiting or being dispatched."""
+        result = await db.execute(select(func.count()).select_from(DispatchTask))
+        return result.scalar_one()
+
+    # =========================================================
+    # CONSUMER
+    # =========================================================
+
+    @staticmethod
+    async def claim(
+        db: AsyncSession,
+        limit: int,
+        lease_seconds: float
+    ) -> List[Row]:
+        """
+        Lease up to `limit` due tasks; other workers skip rows being claimed.
+
+        Returns:
+            Rows with job_id, payload and attempts (including this one).
+        """
+        result = await db.execute(CLAIM_SQL, {"limit": limit, "lease_seconds": float(lease_seconds)})
+        return list(result.all())
+
+    @staticmethod
+    async def complete(db: AsyncSession, job_id: str) -> None:
+        await db.execute(delete(DispatchTask).where(DispatchTask.job_id == job_id))
+
+    @staticmethod
+    async def retry_later(
+        db: AsyncSession,
+        job_id: str,
+        delay_seconds: float,
+        error: str
+    ) -> None:
+        """Release the lease and make the task due again after delay_seconds."""
+        await db.execute(
+            update(DispatchTask)
+            .where(DispatchTask.job_id == job_id)
+            .values(
+                available_at=datetime.now(UTC) + timedelta(seconds=delay_seconds),
+                locked_until=None,
+                last_error=error[:2000],
+            )
+        )
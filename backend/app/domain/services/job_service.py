@@ -3,21 +3,22 @@ Job service - Core business logic for job lifecycle management.
 Deterministic, idempotent, race-safe implementation.
 """
 
+import base64
+import binascii
+import json
 import uuid
 import logging
-from typing import Optional, List
+from typing import Any, BinaryIO, Dict, Optional, List, Tuple
 from datetime import datetime, timezone
 
-from sqlalchemy import select
+from sqlalchemy import Row, func, insert, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.infrastructure.db.models import Job, JobStatus, Artifact, Metric
+from app.infrastructure.db.job_events import publish_job_event
 from app.infrastructure.storage.s3_service import storage_service
 
-from fastapi.concurrency import run_in_threadpool
-from io import BytesIO
-
 logger = logging.getLogger(__name__)
 
 UTC = timezone.utc
@@ -50,14 +51,19 @@ class JobService:
         db: AsyncSession,
         pipeline_type: str,
         user_id: Optional[str] = None,
-        config: Optional[dict] = None
+        config: Optional[dict] = None,
+        job_id: Optional[str] = None,
+        input_sha256: Optional[str] = None,
+        cache_key: Optional[str] = None
     ) -> Job:
         job = Job(
-            id=str(uuid.uuid4()),
+            id=job_id or str(uuid.uuid4()),
             user_id=user_id,
             pipeline_type=pipeline_type,
             status=JobStatus.CREATED,
             config=config or {},
+            input_sha256=input_sha256,
+            cache_key=cache_key,
             # created_at is omitted to allow PostgreSQL's server_default=func.now() to set it
             # This prevents offset-naive vs offset-aware datetime errors in asyncpg
         )
@@ -98,14 +104,58 @@ class JobService:
         result = await db.execute(query)
         return result.scalar_one_or_none()
 
+    # Columns the list/batch views need; config and full error text stay in the table
+    ERROR_PREVIEW_CHARS = 500
+
+    @staticmethod
+    def summary_columns() -> list:
+        return [
+            Job.id,
+            Job.status,
+            Job.created_at,
+            Job.started_at,
+            Job.finished_at,
+            Job.runpod_job_id,
+            Job.execution_time,
+            Job.output_s3_key,
+            func.substr(Job.error_message, 1, JobService.ERROR_PREVIEW_CHARS).label("error_message"),
+            Job.pipeline_type,
+        ]
+
+    @staticmethod
+    def encode_cursor(created_at: datetime, job_id: str) -> str:
+        raw = json.dumps([created_at.isoformat(), job_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Raises ValueError for cursors not produced by encode_cursor."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_at, job_id = json.loads(base64.urlsafe_b64decode(padded))
+            return datetime.fromisoformat(created_at), str(job_id)
+        except (TypeError, ValueError, binascii.Error) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
     @staticmethod
     async def list_jobs(
         db: AsyncSession,
         user_id: Optional[str] = None,
         status: Optional[JobStatus] = None,
-        limit: int = 50
-    ) -> List[Job]:
-        query = select(Job).order_by(Job.created_at.desc()).limit(limit)
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Row], Optional[str]]:
+        """
+        One page of job summaries, newest first, keyset-paginated on (created_at, id).
+
+        Returns:
+            (rows, next_cursor) — next_cursor is None on the last page.
+        """
+        query = (
+            select(*JobService.summary_columns())
+            .order_by(Job.created_at.desc(), Job.id.desc())
+            .limit(limit + 1)
+        )
 
         if user_id:
             query = query.where(Job.user_id == user_id)
@@ -113,8 +163,32 @@ class JobService:
         if status:
             query = query.where(Job.status == status)
 
+        if cursor:
+            created_at, job_id = JobService.decode_cursor(cursor)
+            query = query.where(tuple_(Job.created_at, Job.id) < (created_at, job_id))
+
         result = await db.execute(query)
-        return list(result.scalars().all())
+        rows = list(result.all())
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = JobService.encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        return rows, next_cursor
+
+    @staticmethod
+    async def get_job_statuses(
+        db: AsyncSession,
+        job_ids: List[str]
+    ) -> List[Row]:
+        """Job summaries for many IDs in one query, in request order; unknown IDs are skipped."""
+        unique_ids = list(dict.fromkeys(job_ids))
+        result = await db.execute(
+            select(*JobService.summary_columns()).where(Job.id.in_(unique_ids))
+        )
+        by_id = {row.id: row for row in result.all()}
+        return [by_id[job_id] for job_id in unique_ids if job_id in by_id]
 
     # =========================================================
     # STATE MACHINE
@@ -188,6 +262,7 @@ class JobService:
             job.error_message = error_message
 
         await db.flush()
+        await publish_job_event(db, job)
 
         logger.info(
             "job_status_changed",
@@ -205,40 +280,45 @@ class JobService:
     # =========================================================
 
     @staticmethod
-    async def upload_input(
-        db: AsyncSession,
+    def input_key(job_id: str, filename: str) -> str:
+        return f"jobs/{job_id}/inputs/{filename}"
+
+    @staticmethod
+    async def store_input(
         job_id: str,
-        file_content: bytes,
+        file_obj: BinaryIO,
         filename: str
     ) -> str:
-        result = await db.execute(
-            select(Job)
-            .where(Job.id == job_id)
-            .with_for_update()
-        )
+        """
+        Stream an input file to object storage without buffering it.
 
-        job = result.scalar_one_or_none()
+        Runs before the job row exists so that uploads rejected mid-stream
+        (PDBValidationError from the reader) leave nothing behind in the DB.
+        """
+        s3_key = JobService.input_key(job_id, filename)
 
-        if not job:
-            raise JobNotFound(f"Job {job_id} not found")
-
-        s3_key = f"jobs/{job_id}/inputs/{filename}"
-
-        await run_in_threadpool(
-            storage_service.upload_fileobj,
-            file_obj=BytesIO(file_content),
-            s3_key=s3_key,
-            length=len(file_content)
+        await storage_service.upload_stream(
+            file_obj=file_obj,
+            s3_key=s3_key
         )
 
-        job.input_s3_key = s3_key
+        return s3_key
 
-        await JobService.update_job_status(
+    @staticmethod
+    async def attach_input(
+        db: AsyncSession,
+        job_id: str,
+        s3_key: str
+    ) -> Job:
+        job = await JobService.update_job_status(
             db,
             job_id,
             JobStatus.UPLOADED
         )
 
+        job.input_s3_key = s3_key
+        await db.flush()
+
         logger.info(
             "job_input_uploaded",
             extra={
@@ -247,7 +327,7 @@ class JobService:
             }
         )
 
-        return s3_key
+        return job
 
     # =========================================================
     # ARTIFACTS
@@ -285,6 +365,44 @@ class JobService:
 
         return artifact
 
+    @staticmethod
+    async def add_artifacts(
+        db: AsyncSession,
+        job_id: str,
+        entries: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Register manifest entries (key, size, sha256, type) as Artifact rows
+        in one bulk INSERT.
+        """
+        if not entries:
+            return 0
+
+        await db.execute(
+            insert(Artifact),
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "job_id": job_id,
+                    "artifact_type": entry.get("type", "pdb"),
+                    "s3_key": entry["key"],
+                    "size_bytes": entry.get("size"),
+                    "checksum": entry.get("sha256"),
+                }
+                for entry in entries
+            ]
+        )
+
+        logger.info(
+            "artifacts_added",
+            extra={
+                "job_id": job_id,
+                "count": len(entries)
+            }
+        )
+
+        return len(entries)
+
     # =========================================================
     # METRICS
     # =========================================================
@@ -0,0 +1,185 @@
+"""
+Result cache - content-addressed reuse of inputs, analyses and GPU results.
+
+Identical submissions (same input bytes, same pipeline_type and DiffAb
+config) are linked to an existing job instead of being dispatched again,
+and repeated inputs keep pointing at the first stored copy.
+"""
+
+import hashlib
+import json
+import logging
+import uuid
+from typing import Optional
+from datetime import datetime, timezone
+
+from sqlalchemy import select, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.infrastructure.db.models import Job, JobStatus, Artifact, Metric
+
+logger = logging.getLogger(__name__)
+
+UTC = timezone.utc
+
+
+class ResultCache:
+    """
+    Content-addressed lookups over the jobs table.
+    - input_sha256 → stored input object + PDB analysis (the digest is
+      computed by PDBUploadStream before the input is stored)
+    - cache_key    → completed or in-flight job with the same input and config
+    """
+
+    # Jobs already running on RunPod that a new submission can follow
+    IN_FLIGHT = {
+        JobStatus.QUEUED,
+        JobStatus.PROVISIONING,
+        JobStatus.RUNNING,
+    }
+
+    # =========================================================
+    # KEYS
+    # =========================================================
+
+    @staticmethod
+    def cache_key(
+        input_sha256: str,
+        pipeline_type: str,
+        diffab_config: Optional[dict] = None
+    ) -> str:
+        """Hash of the input plus the normalized (sorted, None-free) run config."""
+        config = {
+            key: value
+            for key, value in (diffab_config or {}).items()
+            if value is not None
+        }
+        normalized = json.dumps(
+            {"pipeline_type": pipeline_type, "diffab_config": config},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(f"{input_sha256}:{normalized}".encode()).hexdigest()
+
+    # =========================================================
+    # LOOKUPS
+    # =========================================================
+
+    @staticmethod
+    async def find_input(
+        db: AsyncSession,
+        input_sha256: str
+    ) -> Optional[Job]:
+        """Most recent job whose input with this hash was stored and analyzed."""
+        result = await db.execute(
+            select(Job)
+            .where(
+                Job.input_sha256 == input_sha256,
+                Job.input_s3_key.is_not(None),
+            )
+            .order_by(Job.created_at.desc())
+            .limit(5)
+        )
+
+        for job in result.scalars():
+            if (job.config or {}).get("pdb_analysis"):
+                return job
+
+        return None
+
+    @staticmethod
+    async def find_result(
+        db: AsyncSession,
+        cache_key: str
+    ) -> Optional[Job]:
+        """Completed job with outputs, else an in-flight job, for this cache key."""
+        result = await db.execute(
+            select(Job)
+            .where(Job.cache_key == cache_key)
+            .where(
+                ((Job.status == JobStatus.COMPLETED) & Job.output_s3_key.is_not(None))
+                | (Job.status.in_(ResultCache.IN_FLIGHT) & Job.runpod_job_id.is_not(None))
+            )
+            .order_by(
+                case((Job.status == JobStatus.COMPLETED, 0), else_=1),
+                Job.created_at.desc()
+            )
+            .limit(1)
+        )
+
+        return result.scalar_one_or_none()
+
+    # =========================================================
+    # LINKING
+    # =========================================================
+
+    @staticmethod
+    async def link(
+        db: AsyncSession,
+        job: Job,
+        source: Job,
+        selected_models: Optional[list] = None
+    ) -> Job:
+        """
+        Point job at source's results instead of dispatching it.
+
+        A completed source is copied over (output key, artifact and metric
+        rows referencing the same objects). An in-flight source is followed:
+        job shares its runpod_job_id and is advanced by the normal polling.
+        """
+        job.source_job_id = source.id
+        job.pipeline_type = source.pipeline_type
+        job.config = {
+            **(source.config or {}),
+            "selected_models": selected_models or [],
+            "cached_from": source.id,
+        }
+
+        if source.status == JobStatus.COMPLETED:
+            result = await db.execute(
+                select(Job)
+                .where(Job.id == source.id)
+                .options(selectinload(Job.artifacts), selectinload(Job.metrics))
+            )
+            source = result.scalar_one()
+
+            now = datetime.now(UTC)
+            job.status = JobStatus.COMPLETED
+            job.output_s3_key = source.output_s3_key
+            job.execution_time = source.execution_time
+            job.started_at = now
+            job.finished_at = now
+
+            for artifact in source.artifacts:
+                db.add(Artifact(
+                    id=str(uuid.uuid4()),
+                    job_id=job.id,
+                    artifact_type=artifact.artifact_type,
+                    s3_key=artifact.s3_key,
+                    size_bytes=artifact.size_bytes,
+                    checksum=artifact.checksum,
+                ))
+            for metric in source.metrics:
+                db.add(Metric(
+                    id=str(uuid.uuid4()),
+                    job_id=job.id,
+                    metric_name=metric.metric_name,
+                    metric_value=metric.metric_value,
+                ))
+        else:
+            job.status = JobStatus.QUEUED
+            job.runpod_job_id = source.runpod_job_id
+
+        await db.flush()
+
+        logger.info(
+            "job_cache_hit",
+            extra={
+                "job_id": job.id,
+                "source_job_id": source.id,
+                "source_status": source.status.name
+            }
+        )
+
+        return job
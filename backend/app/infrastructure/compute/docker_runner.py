@@ -9,6 +9,7 @@ Backends:
 The interface (execute_diffab, execute_rfdiffusion, execute_af2_gamma)
 is consumed by app/worker/tasks.py and must not change.
 """
+import asyncio
 import logging
 import os
 import json
@@ -17,9 +18,9 @@ import tempfile
 from pathlib import Path
 from typing import Dict, Optional
 
-import requests
-
 from app.core.config import settings
+from app.infrastructure.compute.runpod_client import request_with_retry
+from app.infrastructure.compute.runpod_runner import RunPodRunner
 from app.infrastructure.storage.s3_service import storage_service
 
 logger = logging.getLogger(__name__)
@@ -33,13 +34,7 @@ class RunPodExecutor:
     """Execute ML models via RunPod serverless GPU endpoints."""
 
     def __init__(self):
-        self.api_key = settings.runpod_api_key
         self.timeout = settings.runpod_timeout
-        self.base_url = "https://api.runpod.ai/v2"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
         # MinIO config passed to the GPU worker so it can read/write files
         self.minio_config = {
             "endpoint": settings.s3_endpoint,
@@ -85,7 +80,8 @@ class RunPodExecutor:
         if not endpoint_id:
             raise RuntimeError(f"RunPod endpoint for {model} is not configured (RUNPOD_ENDPOINT_{model.upper()} is empty)")
 
-        url = f"{self.base_url}/{endpoint_id}/run"
+        url = f"/{endpoint_id}/run"
+        client = RunPodRunner.http_client()
 
         payload = {
             "input": {
@@ -99,20 +95,20 @@ class RunPodExecutor:
         logger.info(f"[RunPod] Submitting {model} job {job_id} to {endpoint_id}")
 
         # 1. Submit
-        resp = requests.post(url, json=payload, headers=self.headers, timeout=30)
-        resp.raise_for_status()
+        resp = await request_with_retry(
+            client, "POST", url, operation="run", json=payload, idempotent=False
+        )
         data = resp.json()
         runpod_id = data["id"]
         logger.info(f"[RunPod] Submitted — runpod_id={runpod_id}")
 
         # 2. Poll for completion
-        status_url = f"{self.base_url}/{endpoint_id}/status/{runpod_id}"
-        deadline = time.time() + self.timeout
+        status_url = f"/{endpoint_id}/status/{runpod_id}"
+        deadline = time.monotonic() + self.timeout
 
-        while time.time() < deadline:
-            time.sleep(5)
-            status_resp = requests.get(status_url, headers=self.headers, timeout=15)
-            status_resp.raise_for_status()
+        while time.monotonic() < deadline:
+            await asyncio.sleep(5)
+            status_resp = await request_with_retry(client, "GET", status_url, operation="status")
             status_data = status_resp.json()
             status = status_data.get("status")
 
@@ -156,7 +152,7 @@ class LocalDockerExecutor:
         job_dir.mkdir(parents=True, exist_ok=True)
 
         input_path = job_dir / "input.pdb"
-        storage_service.download_file(input_s3_key, str(input_path))
+        await storage_service.download_file(input_s3_key, str(input_path))
 
         output_dir = job_dir / "outputs"
         output_dir.mkdir(exist_ok=True)
@@ -196,16 +192,19 @@ class LocalDockerExecutor:
         if result.returncode != 0:
             raise RuntimeError(f"{model} container failed: {result.stderr}")
 
-        # Upload output PDBs to MinIO
-        artifacts = []
-        for pdb_file in output_dir.glob("*.pdb"):
-            s3_key = f"jobs/{job_id}/{model}/{pdb_file.name}"
-            storage_service.upload_file(str(pdb_file), s3_key)
-            artifacts.append({
-                "type": "pdb",
-                "s3_key": s3_key,
-                "size": pdb_file.stat().st_size,
-            })
+        # Upload output PDBs to MinIO concurrently, indexed by a manifest.json
+        prefix = f"jobs/{job_id}/{model}"
+        entries = await storage_service.upload_directory(str(output_dir), prefix, pattern="*.pdb")
+        manifest_s3_key = await storage_service.write_manifest(job_id, prefix, entries)
+        artifacts = [
+            {
+                "type": entry["type"],
+                "s3_key": entry["key"],
+                "size": entry["size"],
+                "sha256": entry["sha256"],
+            }
+            for entry in entries
+        ]
 
         metrics = {}
         metrics_file = output_dir / "metrics.json"
@@ -213,7 +212,7 @@ class LocalDockerExecutor:
             with open(metrics_file) as f:
                 metrics = json.load(f)
 
-        return {"artifacts": artifacts, "metrics": metrics, "logs": result.stdout}
+        return {"artifacts": artifacts, "manifest_s3_key": manifest_s3_key, "metrics": metrics, "logs": result.stdout}
 
 
 # ---------------------------------------------------------------------------
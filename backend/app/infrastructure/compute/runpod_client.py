@@ -0,0 +1,118 @@
+"""
+Shared HTTP client for all RunPod Serverless API traffic.
+
+One long-lived httpx.AsyncClient (keep-alive, HTTP/2 when the optional
+``h2`` package is installed, bounded connection pool) is created in the app
+lifespan and injected into the runners, so dispatches and status polls reuse
+warm TCP+TLS connections to api.runpod.ai instead of handshaking per call.
+"""
+import asyncio
+import importlib.util
+import logging
+import random
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint timeouts: /run may wait on RunPod's queueing, /status and /cancel are cheap
+RUNPOD_TIMEOUTS = {
+    "run": httpx.Timeout(20.0, connect=5.0),
+    "status": httpx.Timeout(10.0, connect=5.0),
+    "cancel": httpx.Timeout(10.0, connect=5.0),
+}
+
+# Responses worth retrying; 429/503 mean the request was not processed
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+NOT_PROCESSED_STATUS = {429, 503}
+
+# Transport errors raised before the request reached RunPod
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_runpod_client(
+    base_url: Optional[str] = None,
+    verify: bool = True,
+) -> httpx.AsyncClient:
+    """Build the pooled RunPod client. Caller owns it and must aclose() it."""
+    http2 = _http2_available()
+    if not http2:
+        logger.info("h2 not installed — RunPod client falling back to HTTP/1.1 keep-alive.")
+
+    headers = {"Content-Type": "application/json"}
+    if settings.runpod_api_key:
+        headers["Authorization"] = f"Bearer {settings.runpod_api_key}"
+
+    return httpx.AsyncClient(
+        base_url=base_url or settings.runpod_api_base,
+        http2=http2,
+        verify=verify,
+        limits=httpx.Limits(
+            max_connections=settings.runpod_max_connections,
+            max_keepalive_connections=settings.runpod_max_connections,
+            keepalive_expiry=60.0,
+        ),
+        headers=headers,
+        timeout=RUNPOD_TIMEOUTS["status"],
+    )
+
+
+def _backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when RunPod sends one."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.runpod_retry_backoff_max)
+    cap = min(settings.runpod_retry_backoff_max, settings.runpod_retry_backoff * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    operation: str,
+    json: Optional[Dict[str, Any]] = None,
+    idempotent: bool = True,
+) -> httpx.Response:
+    """
+    Send a RunPod API request with retry/backoff.
+
+    Non-idempotent requests (job submission) are only retried when RunPod
+    cannot have processed them: connection failures and 429/503 responses.
+
+    Raises:
+        httpx.TransportError / httpx.HTTPStatusError: once retries are exhausted
+    """
+    attempts = settings.runpod_max_retries + 1
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        try:
+            response = await client.request(
+                method, url, json=json, timeout=RUNPOD_TIMEOUTS[operation]
+            )
+        except httpx.TransportError as e:
+            if last or not (idempotent or isinstance(e, NOT_SENT_ERRORS)):
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(f"RunPod {operation} transport error ({e!r}); retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        retryable = response.status_code in (RETRYABLE_STATUS if idempotent else NOT_PROCESSED_STATUS)
+        if not retryable or last:
+            response.raise_for_status()
+            return response
+
+        delay = _backoff_delay(attempt, response)
+        logger.warning(f"RunPod {operation} returned {response.status_code}; retry {attempt + 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    raise RuntimeError("unreachable")  # loop always returns or raises
@@ -3,6 +3,7 @@ import httpx
 from typing import Optional, Dict, Any
 
 from app.core.config import settings
+from app.infrastructure.compute.runpod_client import create_runpod_client, request_with_retry
 
 logger = logging.getLogger(__name__)
 
@@ -10,8 +11,24 @@ class RunPodRunner:
     """
     Runner for dispatching GPU jobs over HTTP to dedicated RunPod Serverless.
     Supports asynchronous execution, status polling, and webhook callbacks.
+
+    All calls share one pooled httpx.AsyncClient, injected from the app
+    lifespan via configure(); scripts that skip that get a lazily created one.
     """
 
+    _client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def configure(client: Optional[httpx.AsyncClient]) -> None:
+        """Inject (or, with None, detach) the shared RunPod HTTP client."""
+        RunPodRunner._client = client
+
+    @staticmethod
+    def http_client() -> httpx.AsyncClient:
+        if RunPodRunner._client is None or RunPodRunner._client.is_closed:
+            RunPodRunner._client = create_runpod_client()
+        return RunPodRunner._client
+
     @staticmethod
     def _get_endpoint_id(model_name: str) -> str:
         """Map model prefixes to RunPod endpoint IDs."""
@@ -73,43 +90,37 @@ class RunPodRunner:
             payload["webhook"] = webhook_url
             logger.info(f"Using webhook for RunPod job: {webhook_url}")
 
-        url = f"https://api.runpod.ai/v2/{endpoint_id}/run"
+        url = f"/{endpoint_id}/run"
         
         logger.info(
             f"Dispatching job {job_id} ({model_name}) to RunPod endpoint: {endpoint_id}..."
         )
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=20.0  # Slightly longer timeout for initial queueing
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                runpod_job_id = data.get("id", "")
-                if not runpod_job_id:
-                    raise RuntimeError(f"Invalid response from RunPod: {data}")
-                    
-                logger.info(f"RunPod accepted job {job_id} -> RP ID: {runpod_job_id}")
-                return runpod_job_id
+        try:
+            # Submission is not idempotent: only retried when RunPod cannot have accepted it
+            response = await request_with_retry(
+                RunPodRunner.http_client(), "POST", url,
+                operation="run", json=payload, idempotent=False,
+            )
+            data = response.json()
             
-            except httpx.TimeoutException:
-                logger.error(f"RunPod submission timed out for {job_id}.")
-                raise RuntimeError("RunPod GPU server unreachable (Timeout).")
-            except httpx.HTTPStatusError as e:
-                resp_text = e.response.text if e.response else "No body"
-                logger.error(f"RunPod API error {e.response.status_code}: {resp_text}")
-                raise RuntimeError(f"RunPod GPU server rejected request: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error submitting job {job_id}: {e}")
-                raise RuntimeError(f"Unexpected error during RunPod submission: {e}")
+            runpod_job_id = data.get("id", "")
+            if not runpod_job_id:
+                raise RuntimeError(f"Invalid response from RunPod: {data}")
+                
+            logger.info(f"RunPod accepted job {job_id} -> RP ID: {runpod_job_id}")
+            return runpod_job_id
+        
+        except httpx.TimeoutException:
+            logger.error(f"RunPod submission timed out for {job_id}.")
+            raise RuntimeError("RunPod GPU server unreachable (Timeout).")
+        except httpx.HTTPStatusError as e:
+            resp_text = e.response.text if e.response else "No body"
+            logger.error(f"RunPod API error {e.response.status_code}: {resp_text}")
+            raise RuntimeError(f"RunPod GPU server rejected request: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error submitting job {job_id}: {e}")
+            raise RuntimeError(f"Unexpected error during RunPod submission: {e}")
 
     @staticmethod
     async def get_job_status(runpod_job_id: str, model_name: str) -> Dict[str, Any]:
@@ -123,43 +134,32 @@ class RunPodRunner:
             logger.error(f"RunPod settings missing for status check.")
             raise RuntimeError("RunPod credentials/endpoint not configured.")
 
-        url = f"https://api.runpod.ai/v2/{endpoint_id}/status/{runpod_job_id}"
+        url = f"/{endpoint_id}/status/{runpod_job_id}"
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                return response.json()
-            
-            except Exception as e:
-                logger.error(f"Failed to query RunPod status for {runpod_job_id}: {e}")
-                return {"status": "UNKNOWN", "error": str(e)}
+        try:
+            response = await request_with_retry(
+                RunPodRunner.http_client(), "GET", url, operation="status",
+            )
+            return response.json()
+        
+        except Exception as e:
+            logger.error(f"Failed to query RunPod status for {runpod_job_id}: {e}")
+            return {"status": "UNKNOWN", "error": str(e)}
 
     @staticmethod
     async def cancel_job(runpod_job_id: str, model_name: str) -> bool:
         """
         Cancel a running or queued job on RunPod.
         """
-        api_key = settings.runpod_api_key
         endpoint_id = RunPodRunner._get_endpoint_id(model_name)
 
-        url = f"https://api.runpod.ai/v2/{endpoint_id}/cancel/{runpod_job_id}"
+        url = f"/{endpoint_id}/cancel/{runpod_job_id}"
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    url,
-                    headers={"Authorization": f"Bearer {api_key}"},
-                    timeout=10.0
-                )
-                return response.status_code == 200
-            except Exception as e:
-                logger.error(f"Failed to cancel RunPod job {runpod_job_id}: {e}")
-                return False
+        try:
+            response = await request_with_retry(
+                RunPodRunner.http_client(), "POST", url, operation="cancel",
+            )
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"Failed to cancel RunPod job {runpod_job_id}: {e}")
+            return False
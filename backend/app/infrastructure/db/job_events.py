@@ -0,0 +1,180 @@
+"""
+Job status events over Postgres LISTEN/NOTIFY.
+
+Writers call publish_job_event() inside the transaction that changes a job,
+so the notification is delivered only if (and when) that transaction commits.
+Each API process runs one JobEventHub, which holds a single LISTEN connection
+and fans events out to the in-process SSE/WebSocket subscribers of that job.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Set
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.infrastructure.db.session import ssl_context
+
+logger = logging.getLogger(__name__)
+
+JOB_EVENTS_CHANNEL = "job_events"
+
+# NOTIFY payloads are capped at 8000 bytes; keep error text well below that
+MAX_ERROR_CHARS = 2000
+
+# Per-subscriber buffer; only the latest state matters, so old events are dropped
+SUBSCRIBER_QUEUE_SIZE = 16
+
+# Queued to subscribers when the listener (re)connects and events may have been missed
+RESYNC = {"event": "resync"}
+
+
+def job_event(job: Any) -> Dict[str, Any]:
+    """Status snapshot sent to subscribers (same fields as JobStatusResponse)."""
+    error_message = job.error_message
+    if error_message and len(error_message) > MAX_ERROR_CHARS:
+        error_message = error_message[:MAX_ERROR_CHARS] + "…"
+
+    def _iso(value):
+        return value.isoformat() if value else None
+
+    return {
+        "job_id": job.id,
+        "status": job.status.value,
+        "created_at": _iso(job.created_at),
+        "started_at": _iso(job.started_at),
+        "finished_at": _iso(job.finished_at),
+        "runpod_job_id": job.runpod_job_id,
+        "execution_time": job.execution_time,
+        "output_s3_key": job.output_s3_key,
+        "error_message": error_message,
+        "pipeline_type": job.pipeline_type,
+    }
+
+
+async def publish_job_event(db: AsyncSession, job: Any) -> None:
+    """Queue a NOTIFY for job's current state; sent by Postgres on commit."""
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": JOB_EVENTS_CHANNEL, "payload": json.dumps(job_event(job))},
+    )
+
+
+def _listen_dsn() -> str:
+    # LISTEN needs a session-level connection: point JOB_EVENTS_LISTEN_URL at
+    # Postgres directly when DATABASE_URL goes through a transaction pooler
+    url = settings.job_events_listen_url or settings.database_url
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class JobEventHub:
+    """
+    One LISTEN connection per process, fanned out to per-job subscriber queues.
+
+    While disconnected, `connected` is False and subscribers should fall back
+    to reading the job from the DB; after every (re)connect each subscriber
+    receives RESYNC so it can re-read state it may have missed.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._stopping = asyncio.Event()
+        self.connected = False
+
+    # =========================================================
+    # SUBSCRIPTIONS
+    # =========================================================
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(job_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[job_id]
+
+    def dispatch(self, payload: str) -> None:
+        """Deliver one NOTIFY payload to the subscribers of its job."""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed job event payload: {payload[:200]}")
+            return
+
+        for queue in self._subscribers.get(event.get("job_id"), ()):
+            self._offer(queue, event)
+
+    def _resync_all(self) -> None:
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, RESYNC)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    # =========================================================
+    # LISTENER
+    # =========================================================
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Keep a LISTEN connection open until stop() is called, reconnecting on loss."""
+        delay = 1.0
+        while not self._stopping.is_set():
+            conn: Optional[asyncpg.Connection] = None
+            try:
+                conn = await asyncpg.connect(_listen_dsn(), ssl=ssl_context, statement_cache_size=0)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                await conn.add_listener(
+                    JOB_EVENTS_CHANNEL,
+                    lambda _conn, _pid, _channel, payload: self.dispatch(payload),
+                )
+
+                self.connected = True
+                delay = 1.0
+                logger.info(f"Listening for job events on '{JOB_EVENTS_CHANNEL}'.")
+                self._resync_all()
+
+                waiters = [asyncio.create_task(self._stopping.wait()), asyncio.create_task(lost.wait())]
+                _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+
+                if lost.is_set():
+                    logger.warning("Job event listener connection lost; reconnecting.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job event listener error: {e}")
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+            if not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, 30.0)
+
+        logger.info("Job event listener stopped.")
+
+
+# Global instance — one listener per API process
+job_event_hub = JobEventHub()
@@ -1,7 +1,7 @@
 """
 Database models for the Foldexa platform.
 """
-from sqlalchemy import Column, String, Integer, Float, DateTime, Enum, JSON, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, Float, DateTime, Enum, JSON, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, timezone
@@ -55,10 +55,22 @@ class Job(Base):
     # Execution identifiers
     runpod_job_id = Column(String, nullable=True, index=True)
     
+    # Result cache: sha256 of the input bytes, and of input + normalized config
+    input_sha256 = Column(String, nullable=True, index=True)
+    cache_key = Column(String, nullable=True, index=True)
+    source_job_id = Column(String, nullable=True)  # job whose results this one reuses
+    
     # Relationships
     artifacts = relationship("Artifact", back_populates="job", cascade="all, delete-orphan")
     metrics = relationship("Metric", back_populates="job", cascade="all, delete-orphan")
 
+    # Keyset pagination on (created_at, id), optionally filtered by user or status
+    __table_args__ = (
+        Index("ix_jobs_created_at_id", created_at.desc(), id.desc()),
+        Index("ix_jobs_user_id_created_at_id", user_id, created_at.desc(), id.desc()),
+        Index("ix_jobs_status_created_at_id", status, created_at.desc(), id.desc()),
+    )
+
 
 class Artifact(Base):
     """Artifacts produced by jobs (PDB files, logs, plots)."""
@@ -67,9 +79,10 @@ class Artifact(Base):
     id = Column(String, primary_key=True)
     job_id = Column(String, ForeignKey("jobs.id"), nullable=False, index=True)
     
-    artifact_type = Column(String, nullable=False)  # "pdb", "log", "plot", "trajectory"
+    artifact_type = Column(String, nullable=False)  # "pdb", "reference", "metadata", "log", "plot", "trajectory"
     s3_key = Column(String, nullable=False)
     size_bytes = Column(Integer, nullable=True)
+    checksum = Column(String, nullable=True)  # sha256 hex, from the job's manifest.json
     
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
@@ -93,6 +106,22 @@ class Metric(Base):
     job = relationship("Job", back_populates="metrics")
 
 
+class DispatchTask(Base):
+    """Durable queue entry: a stored job waiting to be dispatched to the GPU backend."""
+    __tablename__ = "dispatch_queue"
+    
+    job_id = Column(String, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+    payload = Column(JSON, nullable=False)  # input key, PDB analysis, models, DiffAb config
+    
+    # Claiming: a worker leases a row until locked_until; an expired lease is reclaimable
+    attempts = Column(Integer, default=0, nullable=False)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
 class BetaAccessRequest(Base):
     """Beta access requests submitted by users."""
     __tablename__ = "beta_access_requests"
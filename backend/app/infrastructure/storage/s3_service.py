@@ -4,12 +4,23 @@ Storage service for managing artifacts in S3/MinIO.
 Supports both local docker-compose (minio:9000, HTTP) and
 Railway production (minio:9000 internal hostname, HTTP).
 SSL is controlled explicitly via MINIO_USE_SSL env var.
+
+All operations are native coroutines (miniopy-async over aiohttp) sharing
+one connection pool per process, so storage I/O never occupies a thread.
 """
-from minio import Minio
-from minio.error import S3Error
+import asyncio
+import hashlib
+import inspect
+import json
+import aiohttp
+from miniopy_async import Minio
+from miniopy_async.datatypes import Part
+from miniopy_async.error import S3Error
+from miniopy_async.helpers import get_part_info
+from datetime import timedelta
 from io import BytesIO
 from pathlib import Path
-from typing import BinaryIO, Optional
+from typing import Any, BinaryIO, Dict, List, Optional
 import logging
 from urllib.parse import urlparse
 
@@ -17,6 +28,23 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Part size for streamed uploads — the S3 minimum multipart part size (5 MB)
+STREAM_PART_SIZE = 5 * 1024 * 1024
+
+# Per-job artifact index written next to the outputs (same format as runpod_worker)
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+ARTIFACT_TYPES = {
+    ".pdb": "pdb",
+    ".log": "log",
+    ".txt": "log",
+    ".png": "plot",
+    ".svg": "plot",
+    ".dcd": "trajectory",
+    ".xtc": "trajectory",
+}
+
 
 def _parse_endpoint(raw_endpoint: str) -> str:
     """Strip http:// or https:// from endpoint, return bare host:port."""
@@ -26,12 +54,66 @@ def _parse_endpoint(raw_endpoint: str) -> str:
     return raw_endpoint       # e.g. "minio:9000" if no scheme given
 
 
+def artifact_type(filename: str) -> str:
+    return ARTIFACT_TYPES.get(Path(filename).suffix.lower(), "file")
+
+
+def build_manifest(job_id: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Manifest body: every artifact's key, size, sha256 and type."""
+    return {
+        "version": MANIFEST_VERSION,
+        "job_id": job_id,
+        "total_bytes": sum(entry["size"] for entry in entries),
+        "artifacts": entries,
+    }
+
+
+class _HashingFileReader:
+    """
+    File reader for put_object that hashes while it uploads.
+
+    Reads (and the sha256 update) run in a worker thread so large parts never
+    block the event loop, and the file is read exactly once.
+    """
+
+    def __init__(self, file_obj: BinaryIO):
+        self._file_obj = file_obj
+        self._sha256 = hashlib.sha256()
+
+    def _read(self, size: int) -> bytes:
+        chunk = self._file_obj.read(size)
+        self._sha256.update(chunk)
+        return chunk
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self._read, size)
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+
+class _ThreadedReader:
+    """
+    Async reader over a blocking file-like object.
+
+    Each read() runs in a worker thread, together with whatever the object
+    does per chunk (PDBUploadStream validates, scans and hashes it), so the
+    event loop only ever awaits.
+    """
+
+    def __init__(self, file_obj: BinaryIO):
+        self._file_obj = file_obj
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self._file_obj.read, size)
+
+
 class StorageService:
     """Abstraction for object storage operations."""
-    
+
     def __init__(self):
         endpoint_clean = _parse_endpoint(settings.s3_endpoint)
-        
+
         # SSL is ONLY enabled if explicitly set via MINIO_USE_SSL=true.
         # Internal Railway networking uses HTTP — never auto-detect from scheme.
         is_secure = settings.s3_use_ssl
@@ -41,34 +123,55 @@ class StorageService:
             f"secure={is_secure}, bucket={settings.s3_bucket_name}"
         )
 
+        # A fixed region skips the bucket-location lookup, so presigning
+        # is pure computation with no round trip to MinIO.
         self.client = Minio(
             endpoint=endpoint_clean,
             access_key=settings.s3_access_key,
             secret_key=settings.s3_secret_key,
             secure=is_secure,
+            region=settings.s3_region,
         )
         self.bucket_name = settings.s3_bucket_name
-    
-    def validate_connection(self, timeout_seconds: int = 10):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _pooled(self) -> Minio:
         """
-        Validate MinIO connection on startup.
-        Logs clear error if unreachable. Uses thread-based timeout
-        (portable — works on Linux, macOS, Docker Alpine, Windows).
+        The client, bound to this process's shared connection pool.
+
+        The aiohttp session is created on first use so it belongs to the
+        running event loop; close() releases it.
         """
-        from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.s3_max_connections),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=settings.s3_timeout),
+            )
+            self.client.set_session(self._session)
+        return self.client
+
+    async def close(self) -> None:
+        """Close the pooled connections (app shutdown)."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
-        def _check():
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
+    async def validate_connection(self, timeout_seconds: int = 10):
+        """
+        Validate MinIO connection on startup.
+        Logs clear error if unreachable; creates the bucket if it is missing.
+        """
+        async def _check():
+            client = self._pooled()
+            if not await client.bucket_exists(self.bucket_name):
+                await client.make_bucket(self.bucket_name)
                 logger.info(f"Created bucket: {self.bucket_name}")
             else:
                 logger.info(f"Bucket '{self.bucket_name}' verified and accessible.")
 
         try:
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(_check)
-                future.result(timeout=timeout_seconds)
-        except FuturesTimeout:
+            await asyncio.wait_for(_check(), timeout=timeout_seconds)
+        except asyncio.TimeoutError:
             msg = f"MinIO connection timed out after {timeout_seconds}s at {settings.s3_endpoint}"
             logger.error(f"CRITICAL: {msg}")
             raise RuntimeError(msg)
@@ -78,40 +181,58 @@ class StorageService:
         except Exception as e:
             logger.error(f"CRITICAL: Cannot reach MinIO at {settings.s3_endpoint} — {e}")
             raise RuntimeError(f"MinIO connection failed: {e}")
-    
-    def upload_file(self, file_path: str, s3_key: str) -> str:
-        """Upload a file to S3."""
+
+    async def upload_file(self, file_path: str, s3_key: str) -> str:
+        """Upload a file to S3 (multipart above s3_multipart_part_size)."""
+        await self.upload_path(Path(file_path), s3_key)
+        logger.info(f"Uploaded {file_path} to {s3_key}")
+        return s3_key
+
+    async def upload_fileobj(self, file_obj: BinaryIO, s3_key: str, length: int) -> str:
+        """Upload a file-like object to S3."""
         try:
-            self.client.fput_object(
+            await self._pooled().put_object(
                 bucket_name=self.bucket_name,
                 object_name=s3_key,
-                file_path=file_path,
+                data=file_obj,
+                length=length,
             )
-            logger.info(f"Uploaded {file_path} to {s3_key}")
+            logger.info(f"Uploaded file object to {s3_key}")
             return s3_key
         except S3Error as e:
-            logger.error(f"Error uploading file: {e}")
+            logger.error(f"Error uploading file object: {e}")
             raise
-    
-    def upload_fileobj(self, file_obj: BinaryIO, s3_key: str, length: int) -> str:
-        """Upload a file-like object to S3."""
+
+    async def upload_stream(self, file_obj: BinaryIO, s3_key: str, part_size: int = STREAM_PART_SIZE) -> str:
+        """
+        Upload a stream of unknown length to S3 in fixed-size parts.
+
+        At most one part is buffered at a time, so memory stays bounded by
+        ``part_size`` regardless of the object size. ``file_obj.read()`` may
+        be a coroutine or a plain method, which then runs in a worker thread;
+        exceptions it raises abort the multipart upload and propagate.
+        """
+        if not inspect.iscoroutinefunction(file_obj.read):
+            file_obj = _ThreadedReader(file_obj)
         try:
-            self.client.put_object(
+            await self._pooled().put_object(
                 bucket_name=self.bucket_name,
                 object_name=s3_key,
                 data=file_obj,
-                length=length,
+                length=-1,
+                part_size=part_size,
+                num_parallel_uploads=1,
             )
-            logger.info(f"Uploaded file object to {s3_key}")
+            logger.info(f"Streamed upload to {s3_key}")
             return s3_key
         except S3Error as e:
-            logger.error(f"Error uploading file object: {e}")
+            logger.error(f"Error streaming upload: {e}")
             raise
-    
-    def download_file(self, s3_key: str, local_path: str) -> str:
+
+    async def download_file(self, s3_key: str, local_path: str) -> str:
         """Download a file from S3 to local path."""
         try:
-            self.client.fget_object(
+            await self._pooled().fget_object(
                 bucket_name=self.bucket_name,
                 object_name=s3_key,
                 file_path=local_path,
@@ -121,26 +242,26 @@ class StorageService:
         except S3Error as e:
             logger.error(f"Error downloading file: {e}")
             raise
-    
-    def get_object(self, s3_key: str) -> bytes:
+
+    async def get_object(self, s3_key: str) -> bytes:
         """Get object as bytes."""
         try:
-            response = self.client.get_object(
+            response = await self._pooled().get_object(
                 bucket_name=self.bucket_name,
                 object_name=s3_key,
             )
-            data = response.read()
-            response.close()
-            response.release_conn()
-            return data
+            try:
+                return await response.read()
+            finally:
+                response.release()
         except S3Error as e:
             logger.error(f"Error getting object: {e}")
             raise
-    
-    def delete_object(self, s3_key: str):
+
+    async def delete_object(self, s3_key: str):
         """Delete an object from S3."""
         try:
-            self.client.remove_object(
+            await self._pooled().remove_object(
                 bucket_name=self.bucket_name,
                 object_name=s3_key,
             )
@@ -148,12 +269,11 @@ class StorageService:
         except S3Error as e:
             logger.error(f"Error deleting object: {e}")
             raise
-    
-    def get_presigned_url(self, s3_key: str, expires_seconds: int = 3600) -> str:
-        """Generate a presigned URL for temporary access."""
+
+    async def get_presigned_url(self, s3_key: str, expires_seconds: int = 3600) -> str:
+        """Generate a presigned URL for temporary access (signed locally, no request)."""
         try:
-            from datetime import timedelta
-            url = self.client.presigned_get_object(
+            url = await self.client.presigned_get_object(
                 bucket_name=self.bucket_name,
                 object_name=s3_key,
                 expires=timedelta(seconds=expires_seconds),
@@ -164,13 +284,165 @@ class StorageService:
             # public domain which MinIO handles natively.
             if settings.s3_endpoint in ["http://minio:9000", "minio:9000"]:
                 url = url.replace("minio:9000", "localhost:9000")
-                
+
             return url
         except S3Error as e:
             logger.error(f"Error generating presigned URL: {e}")
             raise
 
+    # =========================================================
+    # TRANSFER MANAGER
+    # =========================================================
+
+    async def upload_path(self, path: Path, s3_key: str) -> Dict[str, Any]:
+        """
+        Upload one file, in parallel multipart chunks when it is large.
+
+        Returns:
+            Manifest entry with key, size, sha256 and type.
+        """
+        size = path.stat().st_size
+        try:
+            with open(path, "rb") as file_obj:
+                reader = _HashingFileReader(file_obj)
+                if size > settings.s3_multipart_part_size:
+                    await self._upload_parts(reader, s3_key, size)
+                else:
+                    await self._pooled().put_object(
+                        bucket_name=self.bucket_name,
+                        object_name=s3_key,
+                        data=reader,
+                        length=size,
+                    )
+        except S3Error as e:
+            logger.error(f"Error uploading {path}: {e}")
+            raise
+        return {"key": s3_key, "size": size, "sha256": reader.hexdigest(), "type": artifact_type(path.name)}
+
+    async def _upload_parts(self, reader: _HashingFileReader, s3_key: str, size: int) -> None:
+        """
+        Multipart upload with at most s3_multipart_parallel parts in memory.
+
+        put_object's num_parallel_uploads only limits the requests: it reads
+        every part up front, i.e. the whole file. Here a slot is taken before
+        each part is read and given back once the part is stored.
+        """
+        client = self._pooled()
+        part_size, part_count = get_part_info(size, settings.s3_multipart_part_size)
+        slots = asyncio.Semaphore(settings.s3_multipart_parallel)
+        tasks: List[asyncio.Task] = []
+
+        async def _upload_part(part_number: int, data: bytes) -> Part:
+            try:
+                etag = await client._upload_part(
+                    self.bucket_name, s3_key, data, None, upload_id, part_number,
+                )
+                return Part(part_number, etag)
+            finally:
+                slots.release()
+
+        upload_id = await client._create_multipart_upload(
+            self.bucket_name, s3_key, {"Content-Type": "application/octet-stream"},
+        )
+        try:
+            for part_number in range(1, part_count + 1):
+                await slots.acquire()
+                if any(task.done() and task.exception() for task in tasks):
+                    break  # Raised by the gather below
+                expected = min(part_size, size - (part_number - 1) * part_size)
+                data = await reader.read(expected)
+                if len(data) != expected:
+                    raise IOError(f"{s3_key}: expected {expected} bytes for part {part_number}, got {len(data)}")
+                tasks.append(asyncio.create_task(_upload_part(part_number, data)))
+            parts = await asyncio.gather(*tasks)
+            await client._complete_multipart_upload(self.bucket_name, s3_key, upload_id, list(parts))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await client._abort_multipart_upload(self.bucket_name, s3_key, upload_id)
+            raise
+
+    async def upload_directory(
+        self,
+        local_dir: str,
+        prefix: str,
+        pattern: str = "*",
+        concurrency: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Upload every file under local_dir matching pattern to prefix/<relative path>.
+
+        Up to ``concurrency`` files are in flight at once over the shared pool.
+
+        Returns:
+            Manifest entries, sorted by key.
+        """
+        root = Path(local_dir)
+        files = sorted(path for path in root.rglob(pattern) if path.is_file())
+        semaphore = asyncio.Semaphore(concurrency or settings.s3_transfer_concurrency)
+
+        async def _upload(path: Path) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.upload_path(path, f"{prefix.rstrip('/')}/{path.relative_to(root).as_posix()}")
+
+        entries = await asyncio.gather(*(_upload(path) for path in files))
+        logger.info(f"Uploaded {len(entries)} file(s) from {local_dir} to {prefix}")
+        return list(entries)
+
+    async def download_directory(
+        self,
+        prefix: str,
+        local_dir: str,
+        concurrency: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Download every object under prefix into local_dir, keeping relative paths.
+
+        Returns:
+            Local paths of the downloaded files.
+        """
+        prefix = prefix.rstrip("/") + "/"
+        root = Path(local_dir).resolve()
+        client = self._pooled()
+        keys = [
+            obj.object_name
+            async for obj in client.list_objects(self.bucket_name, prefix=prefix, recursive=True)
+        ]
+
+        targets = []
+        for key in keys:
+            target = (root / key[len(prefix):]).resolve()
+            if root not in target.parents:
+                raise ValueError(f"Object key {key} escapes {local_dir}")
+            targets.append(target)
+
+        semaphore = asyncio.Semaphore(concurrency or settings.s3_transfer_concurrency)
+
+        async def _download(key: str, target: Path) -> str:
+            async with semaphore:
+                return await self.download_file(key, str(target))
+
+        paths = await asyncio.gather(*(_download(key, target) for key, target in zip(keys, targets)))
+        return list(paths)
+
+    async def write_manifest(self, job_id: str, prefix: str, entries: List[Dict[str, Any]]) -> str:
+        """Write prefix/manifest.json for the given entries and return its key."""
+        s3_key = f"{prefix.rstrip('/')}/{MANIFEST_NAME}"
+        body = json.dumps(build_manifest(job_id, entries)).encode()
+        await self._pooled().put_object(
+            bucket_name=self.bucket_name,
+            object_name=s3_key,
+            data=BytesIO(body),
+            length=len(body),
+            content_type="application/json",
+        )
+        return s3_key
+
+    async def read_manifest(self, s3_key: str) -> Dict[str, Any]:
+        return json.loads(await self.get_object(s3_key))
+
 
 # Global instance — created at import time, but validate_connection()
-# is called explicitly from app lifespan (main.py).
+# is called explicitly from app lifespan (main.py), which also close()s it.
 storage_service = StorageService()
@@ -4,6 +4,7 @@ Foldexa API - Main application entry point.
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 
@@ -11,6 +12,7 @@ from app.api.routes import jobs, payments, beta, webhook
 from app.core.config import settings
 from app.core.logging import setup_logging
 from app.core.metrics import metrics_endpoint
+from app.core.rate_limit import RateLimitMiddleware
 from app.infrastructure.db.session import engine
 from app.infrastructure.db.models import Base
 
@@ -41,7 +43,7 @@ async def lifespan(app: FastAPI):
     from app.infrastructure.storage.s3_service import storage_service
     logger.info("Validating MinIO connection...")
     try:
-        storage_service.validate_connection(timeout_seconds=10)
+        await storage_service.validate_connection(timeout_seconds=10)
         logger.info("Successfully connected to MinIO/S3 object storage.")
     except RuntimeError as e:
         logger.warning(
@@ -64,11 +66,49 @@ async def lifespan(app: FastAPI):
             # Fail fast as requested by user
             raise RuntimeError(error_msg)
         logger.info("RunPod configuration validated successfully.")
+
+    # One pooled HTTP client for all RunPod traffic (dispatch, polling, cancel)
+    from app.infrastructure.compute.runpod_client import create_runpod_client
+    from app.infrastructure.compute.runpod_runner import RunPodRunner
+    runpod_client = create_runpod_client()
+    RunPodRunner.configure(runpod_client)
+    
+    # One LISTEN connection per process feeds the job status SSE/WebSocket streams
+    from app.infrastructure.db.job_events import job_event_hub
+    job_events_task = asyncio.create_task(job_event_hub.run())
+    
+    # Durable dispatch queue consumer (more replicas: python -m app.worker.dispatcher)
+    dispatcher = None
+    dispatcher_task = None
+    if settings.dispatcher_enabled:
+        from app.worker.dispatcher import JobDispatcher
+        dispatcher = JobDispatcher()
+        dispatcher_task = asyncio.create_task(dispatcher.run())
+    
+    # Single background RunPod status reconciler (GET /jobs/{id} only reads the DB)
+    reconciler = None
+    reconciler_task = None
+    if settings.gpu_backend == "runpod" and settings.reconciler_enabled:
+        from app.worker.reconciler import RunPodReconciler
+        reconciler = RunPodReconciler()
+        reconciler_task = asyncio.create_task(reconciler.run())
     
     yield
     
     # Shutdown
     logger.info("Shutting down Foldexa API...")
+    if dispatcher_task:
+        # Stops claiming and drains in-flight dispatches before the client closes
+        dispatcher.stop()
+        await dispatcher_task
+    if reconciler_task:
+        reconciler.stop()
+        await reconciler_task
+    RunPodRunner.configure(None)
+    await runpod_client.aclose()
+    job_event_hub.stop()
+    await job_events_task
+    await storage_service.close()
 
 app = FastAPI(
     title=settings.app_name,
@@ -86,8 +126,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-client rate limiting (Redis GCRA with an in-process pre-filter)
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # Include routers
 app.include_router(jobs.router, prefix="/api/v1")
 app.include_router(payments.router, prefix="/api/v1/payments", tags=["payments"])
@@ -6,6 +6,9 @@ from typing import Optional, List
 from datetime import datetime
 from enum import Enum
 
+# Upper bound on job IDs per POST /jobs/status:batch request
+MAX_BATCH_JOB_IDS = 100
+
 
 class JobStatusEnum(str, Enum):
     """Job status enum for API responses."""
@@ -31,6 +34,7 @@ class JobCreateResponse(BaseModel):
     job_id: str
     status: JobStatusEnum
     created_at: datetime
+    cached: bool = False
 
 
 class JobStatusResponse(BaseModel):
@@ -50,12 +54,18 @@ class JobStatusResponse(BaseModel):
         from_attributes = True
 
 
+class JobStatusBatchRequest(BaseModel):
+    """Request for the statuses of several jobs at once."""
+    job_ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_JOB_IDS)
+
+
 class ArtifactResponse(BaseModel):
     """Artifact response."""
     id: str
     artifact_type: str
     s3_key: str
     size_bytes: Optional[int] = None
+    checksum: Optional[str] = None
     download_url: Optional[str] = None
     
     class Config:
@@ -0,0 +1,273 @@
+"""
+Job dispatcher - drains the dispatch queue into the GPU backend.
+
+Each worker leases at most `concurrency` queued jobs at a time (the rest wait
+in Postgres, which is the backpressure), configures each job from its stored
+PDB analysis and submits it to RunPod. On shutdown it stops claiming and
+waits for in-flight dispatches; anything left is released back to the queue.
+
+Runs inside the API lifespan, or standalone (as many replicas as needed):
+    python -m app.worker.dispatcher
+"""
+
+import asyncio
+import logging
+import signal
+from datetime import datetime, timezone
+from typing import Any, Dict, Set
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.domain.services.dispatch_queue import DispatchQueue
+from app.domain.services.job_service import JobService
+from app.infrastructure.compute.runpod_client import create_runpod_client
+from app.infrastructure.compute.runpod_runner import RunPodRunner
+from app.infrastructure.db.job_events import publish_job_event
+from app.infrastructure.db.models import JobStatus
+from app.infrastructure.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+UTC = timezone.utc
+
+FULL_PIPELINE = "diffab_rfdiffusion_af2"
+
+MODE_TO_PIPELINE = {
+    'codesign_single': 'diffab_only',
+    'codesign_multicdrs': 'diffab_rfdiffusion_af2',
+    'fixbb': 'diffab_only',
+    'strpred': 'af2_only'
+}
+
+
+def resolve_pipeline(pipeline_type: str, pdb_analysis: Dict[str, Any]) -> str:
+    """The full pipeline is narrowed to the model the PDB analysis recommends."""
+    if pipeline_type == FULL_PIPELINE:
+        return MODE_TO_PIPELINE.get(pdb_analysis['recommended_mode'], FULL_PIPELINE)
+    return pipeline_type
+
+
+async def dispatch_job(db: AsyncSession, job_id: str, payload: Dict[str, Any]) -> None:
+    """
+    Configure a stored job and submit it to RunPod.
+
+    A RunPod rejection marks the job FAILED (it is not retried); any other
+    exception propagates so the worker can retry the task later. The queue
+    entry is removed in the same commit as the job's final state.
+    """
+    job = await JobService.get_job(db, job_id)
+    # Cancelled, linked to a cached result, or already submitted before a crash
+    if job is None or job.status != JobStatus.UPLOADED or job.runpod_job_id:
+        logger.info(f"Job {job_id} no longer needs dispatch (status={job.status if job else 'missing'}).")
+        await DispatchQueue.complete(db, job_id)
+        await db.commit()
+        return
+
+    file_info = payload["file_info"]
+    pdb_analysis = payload["pdb_analysis"]
+    selected_models = payload.get("selected_models") or []
+    diffab_config = payload.get("diffab_config")
+
+    # 1-2. File metadata and PDB analysis come from the single scan done while streaming
+    logger.info(f"PDB Analysis for {job_id}: {pdb_analysis['recommended_mode']}")
+    recommended_pipeline = resolve_pipeline(payload["pipeline_type"], pdb_analysis)
+
+    # PRE-DISPATCH NOTE: We no longer hard-fail based on the antibody auto-detection.
+    # PDBAnalyzer uses chain name heuristics that can produce false negatives for
+    # valid antibody structures with non-standard chain labels (e.g. A/B instead of H/L).
+    # We log a warning and allow DiffAb itself to validate the structure.
+    if recommended_pipeline in ('diffab_only', 'diffab_rfdiffusion_af2') and not pdb_analysis.get('is_antibody'):
+        logger.warning(
+            f"Job {job_id}: PDB may not be an antibody (heuristic check). "
+            "Proceeding to RunPod — DiffAb will validate the structure directly."
+        )
+
+    # 3. Update the job configuration in DB
+    job.config = {
+        "atom_count": file_info.get("atom_count", 0),
+        "pdb_analysis": pdb_analysis,
+        "selected_models": selected_models
+    }
+    job.pipeline_type = recommended_pipeline
+    await db.commit()
+
+    # 4. Dispatch to RunPod GPU
+    runpod_params = {
+        "atom_count": file_info.get("atom_count", 0),
+        "pipeline": recommended_pipeline,
+    }
+    # Merge DiffAb UI config if provided
+    if diffab_config:
+        runpod_params["diffab_config"] = diffab_config
+
+    try:
+        runpod_job_id = await RunPodRunner.submit_job(
+            job_id=job_id,
+            model_name=recommended_pipeline,
+            input_s3_key=payload["input_s3_key"],
+            params=runpod_params
+        )
+    except Exception as runpod_err:
+        logger.error(
+            f"RunPod dispatch failed for job {job_id}: {runpod_err}. "
+            "Marking as FAILED."
+        )
+        await db.refresh(job, with_for_update=True)
+        if job.status not in JobService.TERMINAL:
+            job.status = JobStatus.FAILED
+            job.error_message = str(runpod_err)
+            job.finished_at = datetime.now(UTC)
+            await publish_job_event(db, job)
+        await DispatchQueue.complete(db, job_id)
+        await db.commit()
+        return
+
+    # Save runpod_job_id + transition to QUEUED in one transaction, re-reading
+    # under lock in case the job was cancelled while the request was in flight
+    await db.refresh(job, with_for_update=True)
+    if job.status in JobService.TERMINAL:
+        logger.info(f"Job {job_id} reached terminal state ({job.status}) during dispatch. Skipping QUEUED update.")
+    else:
+        job.runpod_job_id = runpod_job_id
+        job.status = JobStatus.QUEUED
+        await publish_job_event(db, job)
+        logger.info(
+            f"Job {job_id} dispatched to RunPod. "
+            f"runpod_job_id={runpod_job_id}, status=QUEUED"
+        )
+    await DispatchQueue.complete(db, job_id)
+    await db.commit()
+
+
+class JobDispatcher:
+    """
+    Bounded worker pool over the dispatch queue.
+
+    Claims only as many tasks as it has free slots, so a burst of submissions
+    queues up in Postgres instead of running concurrently in one process.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = None,
+        poll_interval: float = None,
+        lease_seconds: float = None,
+        max_attempts: int = None,
+    ):
+        self.concurrency = concurrency or settings.dispatch_concurrency
+        self.poll_interval = poll_interval or settings.dispatch_poll_interval
+        self.lease_seconds = lease_seconds or settings.dispatch_lease_seconds
+        self.max_attempts = max_attempts or settings.dispatch_max_attempts
+
+        self._in_flight: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Claim and dispatch until stop() is called, then drain."""
+        logger.info(f"Job dispatcher starting (concurrency={self.concurrency})")
+        while not self._stopping.is_set():
+            free = self.concurrency - len(self._in_flight)
+            claimed = []
+            if free > 0:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        claimed = await DispatchQueue.claim(db, free, self.lease_seconds)
+                        await db.commit()
+                except Exception as e:
+                    logger.error(f"Job dispatcher claim failed: {e}")
+
+            for task in claimed:
+                worker = asyncio.create_task(self._process(task))
+                self._in_flight.add(worker)
+                worker.add_done_callback(self._on_done)
+
+            # Woken early when a slot frees up or on stop()
+            await self._wait()
+
+        await self._drain()
+        logger.info("Job dispatcher stopped.")
+
+    def _on_done(self, worker: asyncio.Task) -> None:
+        self._in_flight.discard(worker)
+        self._wakeup.set()
+
+    async def _wait(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _drain(self) -> None:
+        if not self._in_flight:
+            return
+        logger.info(f"Job dispatcher draining {len(self._in_flight)} in-flight dispatch(es)...")
+        _, pending = await asyncio.wait(set(self._in_flight), timeout=settings.dispatch_drain_timeout)
+        for worker in pending:
+            worker.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+    async def _process(self, task: Row) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await dispatch_job(db, task.job_id, task.payload)
+        except asyncio.CancelledError:
+            # Drain timed out: hand the task straight back to the queue
+            await self._release(task, 0, "Dispatcher shut down before finishing.")
+            raise
+        except Exception as e:
+            logger.error(f"Dispatch of job {task.job_id} failed (attempt {task.attempts}): {e}", exc_info=True)
+            if task.attempts < self.max_attempts:
+                await self._release(task, min(60, 5 * 2 ** (task.attempts - 1)), str(e))
+            else:
+                await self._give_up(task, str(e))
+
+    async def _release(self, task: Row, delay: float, error: str) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await DispatchQueue.retry_later(db, task.job_id, delay, error)
+                await db.commit()
+        except Exception as e:
+            # The lease expires on its own; another worker will pick the task up
+            logger.error(f"Could not release dispatch of job {task.job_id}: {e}")
+
+    async def _give_up(self, task: Row, error: str) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await JobService.get_job(db, task.job_id)
+                if job and job.status not in JobService.TERMINAL:
+                    await JobService.update_job_status(db, task.job_id, JobStatus.FAILED, error)
+                await DispatchQueue.complete(db, task.job_id)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to mark job {task.job_id} as FAILED: {e}")
+
+
+async def _main() -> None:
+    from app.core.logging import setup_logging
+
+    setup_logging()
+    client = create_runpod_client()
+    RunPodRunner.configure(client)
+    dispatcher = JobDispatcher()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, dispatcher.stop)
+
+    try:
+        await dispatcher.run()
+    finally:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
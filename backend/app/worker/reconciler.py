@@ -0,0 +1,356 @@
+"""
+RunPod reconciler - the single place that syncs active jobs with RunPod.
+
+One loop per deployment (guarded by a Postgres advisory lock) batches every
+QUEUED/PROVISIONING/RUNNING job, polls RunPod with bounded concurrency and
+per-job adaptive intervals, applies the timeout rule and writes all
+transitions in one commit per tick. GET /jobs/{id} is then a plain DB read.
+
+Runs inside the API lifespan, or standalone:
+    python -m app.worker.reconciler
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, text
+
+from app.core.config import settings
+from app.domain.services.job_service import JobService
+from app.infrastructure.compute.runpod_client import create_runpod_client
+from app.infrastructure.compute.runpod_runner import RunPodRunner
+from app.infrastructure.db.job_events import publish_job_event
+from app.infrastructure.db.models import Job, JobStatus
+from app.infrastructure.db.session import AsyncSessionLocal, engine
+from app.infrastructure.storage.s3_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+UTC = timezone.utc
+
+# Arbitrary application-wide key for pg_try_advisory_lock
+RECONCILER_LOCK_ID = 0x466F6C64  # "Fold"
+
+ACTIVE_STATUSES = {JobStatus.QUEUED, JobStatus.PROVISIONING, JobStatus.RUNNING}
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+def is_timed_out(job: Any, now: Optional[datetime] = None) -> bool:
+    """Hard timeout rule: active for longer than settings.job_timeout_seconds since creation."""
+    if not job.created_at:
+        return False
+    now = now or datetime.now(UTC)
+    return (now - _as_utc(job.created_at)).total_seconds() > settings.job_timeout_seconds
+
+
+def runpod_output(runpod_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker output, unwrapping handler.py's strict schema {"status": ..., "output": {...}}."""
+    output = runpod_data.get("output") or {}
+    return output.get("output", output)
+
+
+def manifest_key(runpod_data: Dict[str, Any]) -> Optional[str]:
+    """S3 key of the artifact manifest of a COMPLETED RunPod job, if the worker wrote one."""
+    if str(runpod_data.get("status", "")).upper() != "COMPLETED":
+        return None
+    return runpod_output(runpod_data).get("manifest_s3_key")
+
+
+def apply_runpod_status(job: Job, runpod_data: Dict[str, Any]) -> bool:
+    """
+    Apply a RunPod /status response to a job.
+
+    Returns:
+        True if the job changed, False otherwise.
+    """
+    rp_status = runpod_data.get("status", "UNKNOWN")
+    if isinstance(rp_status, str):
+        rp_status = rp_status.upper()
+
+    now = datetime.now(UTC)
+
+    # If RunPod returns UNKNOWN with an HTTP 404 in the error message,
+    # this typically means the worker container crashed and the job
+    # record has been evicted on RunPod's side. Treat this as a hard
+    # failure instead of leaving the job stuck in RUNNING/UNKNOWN.
+    if rp_status == "UNKNOWN":
+        error_text = (runpod_data.get("error") or "").lower()
+        if "404" in error_text and "not found" in error_text:
+            logger.error(
+                f"[RUNPOD 404] job={job.id} | runpod_job_id={job.runpod_job_id} | marking FAILED. "
+                f"full_data={runpod_data}"
+            )
+            job.status = JobStatus.FAILED
+            job.finished_at = now
+            job.error_message = "RunPod job not found (worker likely crashed or was evicted)."
+            return True
+        logger.warning(f"[POLL ERROR] job={job.id} | {runpod_data.get('error')}")
+        return False
+
+    if rp_status == "COMPLETED":
+        inner_output = runpod_output(runpod_data)
+        output_s3_key = inner_output.get("result_s3_key") or inner_output.get("output_s3_key")
+        execution_ms = runpod_data.get("executionTime")
+
+        logger.info(
+            f"[COMPLETED] job={job.id} | output_s3_key={output_s3_key} | executionTime={execution_ms}ms"
+        )
+        job.status = JobStatus.COMPLETED
+        job.finished_at = now
+        job.output_s3_key = output_s3_key
+        job.execution_time = (execution_ms / 1000.0) if execution_ms else None
+        if not job.started_at:
+            job.started_at = now
+        return True
+
+    if rp_status == "FAILED":
+        error_msg = runpod_data.get("error") or "Unknown RunPod failure"
+        logger.error(f"[FAILED] job={job.id} | error={error_msg}")
+        job.status = JobStatus.FAILED
+        job.finished_at = now
+        job.error_message = str(error_msg)
+        return True
+
+    if rp_status == "CANCELLED":
+        # RunPod cancelled the job (e.g., worker was killed manually or from the UI).
+        # Mark as FAILED in our DB so the UI doesn't leave the user stuck in 'running'.
+        logger.warning(f"[CANCELLED] job={job.id} | RunPod job was cancelled. Marking FAILED.")
+        job.status = JobStatus.FAILED
+        job.finished_at = now
+        job.error_message = "RunPod job was cancelled (manually or by the system)."
+        return True
+
+    if rp_status == "IN_QUEUE":
+        # Waiting in RunPod's queue — no worker has picked it up yet.
+        if job.status != JobStatus.PROVISIONING:
+            job.status = JobStatus.PROVISIONING
+            return True
+        return False
+
+    if rp_status == "IN_PROGRESS":
+        # Worker has picked up the job and is actively executing.
+        changed = False
+        if job.status != JobStatus.RUNNING:
+            job.status = JobStatus.RUNNING
+            changed = True
+        if not job.started_at:
+            job.started_at = now
+            changed = True
+        return changed
+
+    # Truly unknown status — log it but don't fail the job, wait for next poll
+    logger.warning(f"[UNKNOWN STATUS] job={job.id} | rp_status={rp_status} | full_data={runpod_data}")
+    return False
+
+
+class RunPodReconciler:
+    """
+    Background loop that polls RunPod for all active jobs.
+
+    Each RunPod job is polled on its own schedule: the interval starts at
+    min_interval and backs off by `backoff` (up to max_interval) while the
+    status is unchanged, and resets whenever the job transitions.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = None,
+        min_interval: float = None,
+        max_interval: float = None,
+        backoff: float = 1.5,
+    ):
+        self.concurrency = concurrency or settings.reconciler_concurrency
+        self.min_interval = min_interval or settings.reconciler_min_interval
+        self.max_interval = max_interval or settings.reconciler_max_interval
+        self.backoff = backoff
+
+        self._intervals: Dict[str, float] = {}
+        self._next_poll: Dict[str, float] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Hold the advisory lock and reconcile until stop() is called."""
+        logger.info(
+            f"RunPod reconciler starting (concurrency={self.concurrency}, "
+            f"interval={self.min_interval:.0f}-{self.max_interval:.0f}s)"
+        )
+        while not self._stopping.is_set():
+            try:
+                async with engine.connect() as lock_conn:
+                    acquired = await lock_conn.scalar(
+                        text("SELECT pg_try_advisory_lock(:key)"), {"key": RECONCILER_LOCK_ID}
+                    )
+                    # Session-level lock outlives the transaction; don't sit idle in one
+                    await lock_conn.commit()
+                    if not acquired:
+                        # Another process is reconciling — check again later
+                        await self._sleep(self.max_interval)
+                        continue
+
+                    logger.info("RunPod reconciler acquired leadership.")
+                    try:
+                        while not self._stopping.is_set():
+                            delay = await self.tick()
+                            await self._sleep(delay)
+                    finally:
+                        await lock_conn.execute(
+                            text("SELECT pg_advisory_unlock(:key)"), {"key": RECONCILER_LOCK_ID}
+                        )
+                        await lock_conn.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"RunPod reconciler error: {e}", exc_info=True)
+                await self._sleep(self.max_interval)
+
+        logger.info("RunPod reconciler stopped.")
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def tick(self) -> float:
+        """
+        Run one reconciliation pass.
+
+        Returns:
+            Seconds until the next RunPod job is due for polling.
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Job.id, Job.runpod_job_id, Job.pipeline_type, Job.created_at).where(
+                    Job.status.in_(ACTIVE_STATUSES),
+                    Job.runpod_job_id.is_not(None),
+                    Job.finished_at.is_(None),
+                )
+            )
+            snapshot = result.all()
+
+            # Timeout rule, applied before spending a RunPod call on the job
+            now_utc = datetime.now(UTC)
+            timed_out = {row.id for row in snapshot if is_timed_out(row, now_utc)}
+
+            # Cache-linked jobs share a RunPod job — poll each RunPod ID once
+            by_runpod_id: Dict[str, List[Any]] = {}
+            for row in snapshot:
+                if row.id not in timed_out:
+                    by_runpod_id.setdefault(row.runpod_job_id, []).append(row)
+
+            self._forget(set(by_runpod_id))
+
+            now = time.monotonic()
+            due = [rp_id for rp_id in by_runpod_id if self._next_poll.get(rp_id, 0.0) <= now]
+
+            # Poll outside any transaction so slow RunPod calls never hold row locks
+            await db.rollback()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def _poll(rp_id: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await RunPodRunner.get_job_status(rp_id, by_runpod_id[rp_id][0].pipeline_type)
+
+            responses = dict(zip(due, await asyncio.gather(*(_poll(rp_id) for rp_id in due))))
+            # Artifact manifests of finished jobs, also fetched before taking row locks
+            manifests = await self._fetch_manifests(responses)
+
+            touched = timed_out | {row.id for rp_id in due for row in by_runpod_id[rp_id]}
+            if touched:
+                # Re-read under lock: a webhook or cancel may have finished the job meanwhile
+                result = await db.execute(
+                    select(Job)
+                    .where(Job.id.in_(touched), Job.status.in_(ACTIVE_STATUSES))
+                    .with_for_update()
+                    .execution_options(populate_existing=True)
+                )
+                changed_rp_ids = set()
+                changed_jobs = []
+                timeout_minutes = settings.job_timeout_seconds / 60
+                for job in result.scalars():
+                    if job.id in timed_out:
+                        logger.error(f"Job {job.id} exceeded {timeout_minutes:.0f}-minute timeout. Marking FAILED.")
+                        job.status = JobStatus.FAILED
+                        job.finished_at = now_utc
+                        job.error_message = f"Job timed out after {timeout_minutes:.0f} minutes."
+                        changed_jobs.append(job)
+                    elif job.runpod_job_id in responses:
+                        if apply_runpod_status(job, responses[job.runpod_job_id]):
+                            changed_rp_ids.add(job.runpod_job_id)
+                            changed_jobs.append(job)
+                            if job.status == JobStatus.COMPLETED and job.runpod_job_id in manifests:
+                                await JobService.add_artifacts(
+                                    db, job.id, manifests[job.runpod_job_id]["artifacts"]
+                                )
+                for job in changed_jobs:
+                    await publish_job_event(db, job)
+                await db.commit()
+
+                for rp_id in due:
+                    self._schedule(rp_id, rp_id in changed_rp_ids)
+
+        if not by_runpod_id:
+            return self.max_interval
+
+        next_due = min(self._next_poll[rp_id] for rp_id in by_runpod_id) - time.monotonic()
+        return min(max(next_due, 1.0), self.max_interval)
+
+    async def _fetch_manifests(self, responses: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Read the manifest.json of every completed job in responses.
+
+        A manifest that cannot be read is logged and skipped; the job still
+        completes with its output_s3_key.
+        """
+        keys = {rp_id: key for rp_id, data in responses.items() if (key := manifest_key(data))}
+        results = await asyncio.gather(
+            *(storage_service.read_manifest(key) for key in keys.values()),
+            return_exceptions=True
+        )
+        manifests = {}
+        for (rp_id, key), result in zip(keys.items(), results):
+            if isinstance(result, Exception):
+                logger.error(f"Could not read artifact manifest {key}: {result}")
+            else:
+                manifests[rp_id] = result
+        return manifests
+
+    def _schedule(self, rp_id: str, changed: bool) -> None:
+        if changed:
+            interval = self.min_interval
+        else:
+            interval = min(self._intervals.get(rp_id, self.min_interval) * self.backoff, self.max_interval)
+        self._intervals[rp_id] = interval
+        self._next_poll[rp_id] = time.monotonic() + interval
+
+    def _forget(self, active: set) -> None:
+        for rp_id in list(self._next_poll):
+            if rp_id not in active:
+                self._next_poll.pop(rp_id, None)
+                self._intervals.pop(rp_id, None)
+
+
+async def _main() -> None:
+    from app.core.logging import setup_logging
+
+    setup_logging()
+    client = create_runpod_client()
+    RunPodRunner.configure(client)
+    try:
+        await RunPodReconciler().run()
+    finally:
+        await client.aclose()
+        await storage_service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
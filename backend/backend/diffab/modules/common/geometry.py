@@ -275,14 +275,12 @@ def knn_gather(idx, value):
     """
     Args:
         idx:    (B, N, K)
-        value:  (B, M, d)
+        value:  (B, M, ...)
     Returns:
-        (B, N, K, d)
+        (B, N, K, ...)
     """
-    N, d = idx.size(1), value.size(-1)
-    idx = idx.unsqueeze(-1).repeat(1, 1, 1, d)      # (B, N, K, d)
-    value = value.unsqueeze(1).repeat(1, N, 1, 1)   # (B, N, M, d)
-    return torch.gather(value, dim=2, index=idx)
+    batch = torch.arange(idx.size(0), device=idx.device)[:, None, None]
+    return value[batch, idx]
 
 
 def knn_points(q, p, K):
@@ -348,29 +346,31 @@ def get_backbone_dihedral_angles(pos_atoms, chain_nb, res_nb, mask):
     return bb_dihedral, mask_bb_dihed
 
 
-def pairwise_dihedrals(pos_atoms):
+def pairwise_dihedrals(pos_atoms, rows=slice(None)):
     """
     Args:
         pos_atoms:  (N, L, A, 3).
+        rows:   Only compute the pairs (i, j) with i in `rows`, e.g. a slice.
     Returns:
-        Inter-residue Phi and Psi angles, (N, L, L, 2).
+        Inter-residue Phi and Psi angles, (N, L, L, 2) or (N, R, L, 2).
     """
-    N, L = pos_atoms.shape[:2]
     pos_N  = pos_atoms[:, :, BBHeavyAtom.N]   # (N, L, 3)
     pos_CA = pos_atoms[:, :, BBHeavyAtom.CA]
     pos_C  = pos_atoms[:, :, BBHeavyAtom.C]
+    N, L = pos_atoms.shape[:2]
+    R = pos_N[:, rows].size(1)
 
     ir_phi = dihedral_from_four_points(
-        pos_C[:,:,None].expand(N, L, L, 3), 
-        pos_N[:,None,:].expand(N, L, L, 3), 
-        pos_CA[:,None,:].expand(N, L, L, 3), 
-        pos_C[:,None,:].expand(N, L, L, 3)
+        pos_C[:,rows,None].expand(N, R, L, 3), 
+        pos_N[:,None,:].expand(N, R, L, 3), 
+        pos_CA[:,None,:].expand(N, R, L, 3), 
+        pos_C[:,None,:].expand(N, R, L, 3)
     )
     ir_psi = dihedral_from_four_points(
-        pos_N[:,:,None].expand(N, L, L, 3), 
-        pos_CA[:,:,None].expand(N, L, L, 3), 
-        pos_C[:,:,None].expand(N, L, L, 3), 
-        pos_N[:,None,:].expand(N, L, L, 3)
+        pos_N[:,rows,None].expand(N, R, L, 3), 
+        pos_CA[:,rows,None].expand(N, R, L, 3), 
+        pos_C[:,rows,None].expand(N, R, L, 3), 
+        pos_N[:,None,:].expand(N, R, L, 3)
     )
     ir_dihed = torch.stack([ir_phi, ir_psi], dim=-1)
     return ir_dihed
@@ -0,0 +1,74 @@
+import numpy as np
+import torch
+
+
+class BatchGenerator(object):
+    """
+    One random generator per batch item.
+
+    Each item draws its noise from its own stream, so a sample does not depend
+    on which (or how many) other samples share its batch.
+    """
+
+    def __init__(self, seeds, device='cpu'):
+        super().__init__()
+        self.generators = [
+            torch.Generator(device=device).manual_seed(int(seed))
+            for seed in seeds
+        ]
+
+    def __len__(self):
+        return len(self.generators)
+
+    @staticmethod
+    def seed_for(*keys):
+        """
+        Derives a 63-bit seed from integer keys, e.g. (seed, variant, sample).
+        """
+        state = np.random.SeedSequence([int(k) for k in keys]).generate_state(2, dtype=np.uint32)
+        return (int(state[0]) << 31) ^ int(state[1])
+
+    def _stack(self, fn, size, **kwargs):
+        assert size[0] == len(self.generators)
+        return torch.stack([fn(size[1:], generator=g, **kwargs) for g in self.generators], dim=0)
+
+
+def randn(size, device='cpu', generator=None):
+    if generator is None:
+        return torch.randn(size, device=device)
+    return generator._stack(torch.randn, list(size), device=device)
+
+
+def randn_like(x, generator=None):
+    if generator is None:
+        return torch.randn_like(x)
+    return generator._stack(torch.randn, list(x.size()), device=x.device, dtype=x.dtype)
+
+
+def rand_like(x, generator=None):
+    if generator is None:
+        return torch.rand_like(x)
+    return generator._stack(torch.rand, list(x.size()), device=x.device, dtype=x.dtype)
+
+
+def randint_like(x, low, high, generator=None):
+    if generator is None:
+        return torch.randint_like(x, low=low, high=high)
+    return generator._stack(
+        lambda size, **kwargs: torch.randint(low, high, size, **kwargs),
+        list(x.size()), device=x.device, dtype=x.dtype
+    )
+
+
+def categorical(prob, generator=None):
+    """
+    Samples one category per row with the Gumbel-max trick in its exponential
+    form, argmax(prob / E) with E ~ Exp(1): one uniform per category and no
+    per-row sampling call.
+    Args:
+        prob:   Unnormalized probabilities, (N, M, K).
+    Returns:
+        One category per row, LongTensor, (N, M).
+    """
+    E = -torch.log(rand_like(prob, generator))
+    return (prob / E).argmax(dim=-1)
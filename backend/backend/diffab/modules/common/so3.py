@@ -1,10 +1,15 @@
+import hashlib
 import math
+import os
+import tempfile
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
 from .geometry import quaternion_to_rotation_matrix
+from . import noise
+from diffab.utils.misc import get_cache_dir
 
 
 def log_rotation(R):
@@ -63,8 +68,8 @@ def rotation_to_so3vec(R):
     return w
 
 
-def random_uniform_so3(size, device='cpu'):
-    q = F.normalize(torch.randn(list(size)+[4,], device=device), dim=-1)    # (..., 4)
+def random_uniform_so3(size, device='cpu', generator=None):
+    q = F.normalize(noise.randn(list(size)+[4,], device=device, generator=generator), dim=-1)    # (..., 4)
     return rotation_to_so3vec(quaternion_to_rotation_matrix(q))
 
 
@@ -97,38 +102,96 @@ class ApproxAngularDistribution(nn.Module):
         return f
 
     def _precompute_histograms(self):
-        X, Y = [], []
-        for std in self.stddevs:
-            std = std.item()
-            x = torch.linspace(0, math.pi, self.num_bins)   # (n_bins,)
-            y = self._pdf(x, std, self.num_iters)    # (n_bins,)
-            y = torch.nan_to_num(y).clamp_min(0)
-            X.append(x)
-            Y.append(y)
-        self.register_buffer('X', torch.stack(X, dim=0))  # (n_stddevs, n_bins)
-        self.register_buffer('Y', torch.stack(Y, dim=0))  # (n_stddevs, n_bins)
-
-    def sample(self, std_idx):
+        x = torch.linspace(0, math.pi, self.num_bins)   # (n_bins,)
+        Y = self._load_histograms()
+        if Y is None:
+            Y = torch.stack([
+                torch.nan_to_num(self._pdf(x, std.item(), self.num_iters)).clamp_min(0)
+                for std in self.stddevs
+            ], dim=0)
+            self._save_histograms(Y)
+        self.register_buffer('X', x.repeat(len(self.stddevs), 1))  # (n_stddevs, n_bins)
+        self.register_buffer('Y', Y)  # (n_stddevs, n_bins)
+        self._precompute_cdf()
+
+    def _histogram_path(self):
+        key = hashlib.sha1(self.stddevs.cpu().numpy().tobytes())
+        key.update(f'{self.num_bins}:{self.num_iters}'.encode())
+        return os.path.join(get_cache_dir(), f'angular_{key.hexdigest()}.npy')
+
+    def _load_histograms(self):
+        """
+        The histograms saved by an earlier instance, memory-mapped copy-on-write
+        so processes share the pages until a checkpoint is loaded over them.
+        """
+        try:
+            Y = np.load(self._histogram_path(), mmap_mode='c')
+        except (OSError, ValueError):
+            return None
+        if Y.shape != (len(self.stddevs), self.num_bins) or Y.dtype != np.float32:
+            return None
+        return torch.from_numpy(Y)
+
+    def _save_histograms(self, Y):
+        """Saves the histograms atomically; an unwritable cache only costs the next start."""
+        path = self._histogram_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, Y.numpy())
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+
+    def _precompute_cdf(self):
+        """
+        Inverse-CDF table of the histograms (bin i has probability ~ Y[:, i]).
+        Row r holds r + CDF_r, from r + 0 to r + 1, so the flattened table is
+        sorted and one `searchsorted` of r + u serves every row. Kept in float64
+        to resolve u next to the row offset; derived from Y, so not saved.
+        """
+        Y = self.Y[:, :-1].double()
+        Y = torch.where(Y.sum(dim=1, keepdim=True) > 0, Y, torch.ones_like(Y))   # Keep the table sorted
+        cdf = torch.cumsum(Y, dim=1) / Y.sum(dim=1, keepdim=True)
+        cdf[:, -1] = 1.0
+        cdf = F.pad(cdf, (1, 0)) + torch.arange(Y.size(0), dtype=cdf.dtype, device=cdf.device)[:, None]
+        self.register_buffer('cdf', cdf.flatten(), persistent=False)  # (n_stddevs * n_bins)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        super()._load_from_state_dict(*args, **kwargs)
+        self._precompute_cdf()
+
+    def sample(self, std_idx, generator=None):
         """
         Args:
             std_idx:  Indices of standard deviation.
+            generator:  Optional per-item BatchGenerator (one per row of std_idx).
         Returns:
             samples:  Angular samples [0, PI), same size as std.
         """
         size = std_idx.size()
         std_idx = std_idx.flatten() # (N,)
+        rows = lambda x: x.view(size[0], -1)  # Noise is drawn per leading item
         
-        # Samples from histogram
-        prob = self.Y[std_idx]  # (N, n_bins)
-        bin_idx = torch.multinomial(prob[:, :-1], num_samples=1).squeeze(-1)    # (N,)
+        # Samples from histogram, by inverting its CDF
+        u = noise.rand_like(rows(std_idx.float()), generator).flatten()    # (N,)
+        v = std_idx + u.double()
+        pos = torch.searchsorted(self.cdf, v, right=True)  # First entry > v, within row std_idx
+        cdf_lo, cdf_hi = self.cdf[pos - 1], self.cdf[pos]
+        bin_idx = pos - std_idx * self.num_bins - 1    # (N,)
+        frac = ((v - cdf_lo) / (cdf_hi - cdf_lo)).float()   # u's position within the bin is uniform
         bin_start = self.X[std_idx, bin_idx]    # (N,)
         bin_width = self.X[std_idx, bin_idx+1] - self.X[std_idx, bin_idx]
-        samples_hist = bin_start + torch.rand_like(bin_start) * bin_width    # (N,)
+        samples_hist = bin_start + frac * bin_width    # (N,)
 
         # Samples from Gaussian approximation
         mean_gaussian = self.stddevs[std_idx]*2
         std_gaussian = self.stddevs[std_idx]
-        samples_gaussian = mean_gaussian + torch.randn_like(mean_gaussian) * std_gaussian
+        samples_gaussian = mean_gaussian + noise.randn_like(rows(mean_gaussian), generator).flatten() * std_gaussian
         samples_gaussian = samples_gaussian.abs() % math.pi
 
         # Choose from histogram or Gaussian
@@ -138,9 +201,9 @@ class ApproxAngularDistribution(nn.Module):
         return samples.reshape(size)
 
 
-def random_normal_so3(std_idx, angular_distrib, device='cpu'):
+def random_normal_so3(std_idx, angular_distrib, device='cpu', generator=None):
     size = std_idx.size()
-    u = F.normalize(torch.randn(list(size)+[3,], device=device), dim=-1)
-    theta = angular_distrib.sample(std_idx)
+    u = F.normalize(noise.randn(list(size)+[3,], device=device, generator=generator), dim=-1)
+    theta = angular_distrib.sample(std_idx, generator=generator)
     w = u * theta[..., None]
     return w
@@ -1,12 +1,15 @@
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import functools
 from tqdm.auto import tqdm
 
+from diffab.modules.common import noise
 from diffab.modules.common.geometry import apply_rotation_to_vector, quaternion_1ijk_to_rotation_matrix
 from diffab.modules.common.so3 import so3vec_to_rotation, rotation_to_so3vec, random_uniform_so3
 from diffab.modules.encoders.ga import GAEncoder
+from diffab.utils.data import repeat_samples
 from .transition import RotationTransition, PositionTransition, AminoacidCategoricalTransition
 
 
@@ -79,7 +82,7 @@ class EpsilonNet(nn.Module):
 
         # s_t = s_t.clamp(min=0, max=19)  # TODO: clamping is good but ugly.
         res_feat = self.res_feat_mixer(torch.cat([res_feat, self.current_sequence_embedding(s_t)], dim=-1)) # [Important] Incorporate sequence at the current step.
-        res_feat = self.encoder(R, p_t, res_feat, pair_feat, mask_res)
+        res_feat = self.encoder(R, p_t, res_feat, pair_feat, mask_res, mask_generate)
 
         t_embed = torch.stack([beta, torch.sin(beta), torch.cos(beta)], dim=-1)[:, None, :].expand(N, L, 3)
         in_feat = torch.cat([res_feat, t_embed], dim=-1)
@@ -126,6 +129,36 @@ class FullDPM(nn.Module):
         self.register_buffer('position_mean', torch.FloatTensor(position_mean).view(1, 1, -1))
         self.register_buffer('position_scale', torch.FloatTensor(position_scale).view(1, 1, -1))
         self.register_buffer('_dummy', torch.empty([0, ]))
+        self._respaced = {}     # Strided-sampler transitions, not part of the state dict
+        # Optional stand-in for eps_net when sampling, called like it (e.g. `OrtEpsilonNet`)
+        self.eps_net_backend = None
+        self._compiled_step = None  # See `compile_step`
+
+    def _timesteps(self, max_step, sample_steps):
+        """
+        Timesteps visited (increasing) and the transitions to step between them.
+        Args:
+            max_step:   Step the sampler starts from (num_steps, or opt_step).
+            sample_steps:   Number of denoising steps to run (at least 2),
+                            evenly spaced over [1, max_step]. None runs
+                            every step.
+        """
+        if sample_steps is None or sample_steps >= max_step:
+            return list(range(1, max_step+1)), (self.trans_rot, self.trans_pos, self.trans_seq)
+        # The noise is initialised for max_step, so the first step must start
+        # there. A lone max_step -> 0 jump is no use: alpha_bars[max_step] is
+        # ~0 and the first step's alpha is clamped to the next step's, which
+        # does not exist.
+        if sample_steps < 2:
+            raise ValueError('sample_steps must be at least 2, got %r' % (sample_steps, ))
+        timesteps = sorted(set(np.linspace(max_step, 1, sample_steps).round().astype(int).tolist()))
+        key = (tuple(timesteps), self._dummy.device)
+        if key not in self._respaced:
+            self._respaced[key] = tuple(
+                trans.respace(timesteps).to(self._dummy.device)
+                for trans in (self.trans_rot, self.trans_pos, self.trans_seq)
+            )
+        return timesteps, self._respaced[key]
 
     def _normalize_position(self, p):
         p_norm = (p - self.position_mean) / self.position_scale
@@ -197,61 +230,129 @@ class FullDPM(nn.Module):
         res_feat, pair_feat, 
         mask_generate, mask_res, 
         sample_structure=True, sample_sequence=True,
-        pbar=False,
+        pbar=False, generator=None, repeats=None, sample_steps=None, return_trajectory=False,
     ):
         """
         Args:
             v:  Orientations of contextual residues, (N, L, 3).
             p:  Positions of contextual residues, (N, L, 3).
             s:  Sequence of contextual residues, (N, L).
+            generator:  Optional BatchGenerator giving each item its own noise stream.
+            repeats:    Optional samples per input, (U, ). Inputs (and their
+                        features) are then given once, (U, ...), and broadcast.
+            sample_steps:   Run only this many denoising steps, evenly spaced
+                            (DDIM-style skipping). None runs all `num_steps`.
+            return_trajectory:  False keeps only the current state and returns
+                                {0: final state}. True returns every step, an
+                                integer k every k-th step (on cpu, the final
+                                state stays on the device).
         """
+        if repeats is not None:
+            v, p, s, res_feat, pair_feat, mask_generate, mask_res = (
+                repeat_samples(x, repeats) for x in (v, p, s, res_feat, pair_feat, mask_generate, mask_res)
+            )
         N, L = v.shape[:2]
         p = self._normalize_position(p)
 
         # Set the orientation and position of residues to be predicted to random values
         if sample_structure:
-            v_rand = random_uniform_so3([N, L], device=self._dummy.device)
-            p_rand = torch.randn_like(p)
+            v_rand = random_uniform_so3([N, L], device=self._dummy.device, generator=generator)
+            p_rand = noise.randn_like(p, generator)
             v_init = torch.where(mask_generate[:, :, None].expand_as(v), v_rand, v)
             p_init = torch.where(mask_generate[:, :, None].expand_as(p), p_rand, p)
         else:
             v_init, p_init = v, p
 
         if sample_sequence:
-            s_rand = torch.randint_like(s, low=0, high=19)
+            s_rand = noise.randint_like(s, low=0, high=19, generator=generator)
             s_init = torch.where(mask_generate, s_rand, s)
         else:
             s_init = s
 
-        traj = {self.num_steps: (v_init, self._unnormalize_position(p_init), s_init)}
-        if pbar:
-            pbar = functools.partial(tqdm, total=self.num_steps, desc='Sampling')
+        return self._denoise_loop(
+            (v_init, self._unnormalize_position(p_init), s_init), self.num_steps, res_feat, pair_feat, mask_generate, mask_res,
+            sample_structure, sample_sequence, pbar and 'Sampling', generator, sample_steps, return_trajectory,
+        )
+
+    def _denoise_loop(
+        self, state, max_step,
+        res_feat, pair_feat, 
+        mask_generate, mask_res, 
+        sample_structure, sample_sequence,
+        pbar_desc, generator, sample_steps, return_trajectory,
+    ):
+        N = mask_res.size(0)
+        timesteps, (trans_rot, trans_pos, trans_seq) = self._timesteps(max_step, sample_steps)
+        if pbar_desc:
+            pbar = functools.partial(tqdm, total=len(timesteps), desc=pbar_desc)
         else:
             pbar = lambda x: x
-        for t in pbar(range(self.num_steps, 0, -1)):
-            v_t, p_t, s_t = traj[t]
-            p_t = self._normalize_position(p_t)
-            
-            beta = self.trans_pos.var_sched.betas[t].expand([N, ])
-            t_tensor = torch.full([N, ], fill_value=t, dtype=torch.long, device=self._dummy.device)
 
-            v_next, R_next, eps_p, c_denoised = self.eps_net(
-                v_t, p_t, s_t, res_feat, pair_feat, beta, mask_generate, mask_res
-            )   # (N, L, 3), (N, L, 3, 3), (N, L, 3)
+        # Snapshots of every k-th intermediate state, copied into preallocated cpu buffers
+        every = int(return_trajectory or 0)
+        snapshot_steps = timesteps[::-1][::every] if every > 0 else []
+        buffers = [
+            torch.empty((len(snapshot_steps), ) + x.shape, dtype=x.dtype)
+            for x in state
+        ]
+        traj = {t: tuple(b[j] for b in buffers) for j, t in enumerate(snapshot_steps)}
+
+        eps_net = self.eps_net if self.eps_net_backend is None else self.eps_net_backend
+        step = self._step if self._compiled_step is None else self._compiled_step
+        v_t, p_t, s_t = state    # Positions are kept unnormalized between steps, as in the trajectory
+        # i indexes the (possibly respaced) transitions, t the original timesteps
+        for i in pbar(range(len(timesteps), 0, -1)):
+            t = timesteps[i-1]
+            if t in traj:
+                for buf, x in zip(traj[t], (v_t, p_t, s_t)):
+                    buf.copy_(x)
+            beta = self.trans_pos.var_sched.betas[t].expand([N, ])   # The network is conditioned on the original step
+            t_tensor = torch.full([N, ], fill_value=i, dtype=torch.long, device=self._dummy.device)
+            v_t, p_t, s_t = step(
+                eps_net, (trans_rot, trans_pos, trans_seq),
+                v_t, p_t, s_t, res_feat, pair_feat, beta, t_tensor, mask_generate, mask_res,
+                sample_structure, sample_sequence, generator,
+            )
+
+        traj[0] = (v_t, p_t, s_t)
+        return traj
 
-            v_next = self.trans_rot.denoise(v_t, v_next, mask_generate, t_tensor)
-            p_next = self.trans_pos.denoise(p_t, eps_p, mask_generate, t_tensor)
-            _, s_next = self.trans_seq.denoise(s_t, c_denoised, mask_generate, t_tensor)
+    def _step(
+        self, eps_net, transitions,
+        v_t, p_t, s_t, res_feat, pair_feat, beta, t_tensor, mask_generate, mask_res,
+        sample_structure, sample_sequence, generator,
+    ):
+        """
+        One denoising step, network and transitions. Everything that changes
+        between steps is a tensor argument, so a compiled step is reused.
+        """
+        trans_rot, trans_pos, trans_seq = transitions
+        p_t = self._normalize_position(p_t)
 
-            if not sample_structure:
-                v_next, p_next = v_t, p_t
-            if not sample_sequence:
-                s_next = s_t
+        v_next, R_next, eps_p, c_denoised = eps_net(
+            v_t, p_t, s_t, res_feat, pair_feat, beta, mask_generate, mask_res
+        )   # (N, L, 3), (N, L, 3, 3), (N, L, 3)
 
-            traj[t-1] = (v_next, self._unnormalize_position(p_next), s_next)
-            traj[t] = tuple(x.cpu() for x in traj[t])    # Move previous states to cpu memory.
+        v_next = trans_rot.denoise(v_t, v_next, mask_generate, t_tensor, generator)
+        p_next = trans_pos.denoise(p_t, eps_p, mask_generate, t_tensor, generator)
+        _, s_next = trans_seq.denoise(s_t, c_denoised, mask_generate, t_tensor, generator)
 
-        return traj
+        if sample_structure:
+            v_t, p_t = v_next, p_next
+        if sample_sequence:
+            s_t = s_next
+        return v_t, self._unnormalize_position(p_t), s_t
+
+    def compile_step(self, **compile_opt):
+        """
+        Samples with a `torch.compile`d step from now on. Shapes are static:
+        each (N, L) compiles once, so pad L to a few buckets (see
+        `PaddingCollate`). The per-item noise draws run eagerly between the
+        compiled graphs.
+        Args:
+            compile_opt:    Options of `torch.compile` (e.g. mode, backend).
+        """
+        self._compiled_step = torch.compile(self._step, dynamic=False, **compile_opt)
 
     @torch.no_grad()
     def optimize(
@@ -261,12 +362,18 @@ class FullDPM(nn.Module):
         res_feat, pair_feat, 
         mask_generate, mask_res, 
         sample_structure=True, sample_sequence=True,
-        pbar=False,
+        pbar=False, generator=None, repeats=None, sample_steps=None, return_trajectory=False,
     ):
         """
         Description:
             First adds noise to the given structure, then denoises it.
+            See `sample` for `generator`, `repeats`, `sample_steps` and
+            `return_trajectory`.
         """
+        if repeats is not None:
+            v, p, s, res_feat, pair_feat, mask_generate, mask_res = (
+                repeat_samples(x, repeats) for x in (v, p, s, res_feat, pair_feat, mask_generate, mask_res)
+            )
         N, L = v.shape[:2]
         p = self._normalize_position(p)
         t = torch.full([N, ], fill_value=opt_step, dtype=torch.long, device=self._dummy.device)
@@ -274,46 +381,21 @@ class FullDPM(nn.Module):
         # Set the orientation and position of residues to be predicted to random values
         if sample_structure:
             # Add noise to rotation
-            v_noisy, _ = self.trans_rot.add_noise(v, mask_generate, t)
+            v_noisy, _ = self.trans_rot.add_noise(v, mask_generate, t, generator)
             # Add noise to positions
-            p_noisy, _ = self.trans_pos.add_noise(p, mask_generate, t)
+            p_noisy, _ = self.trans_pos.add_noise(p, mask_generate, t, generator)
             v_init = torch.where(mask_generate[:, :, None].expand_as(v), v_noisy, v)
             p_init = torch.where(mask_generate[:, :, None].expand_as(p), p_noisy, p)
         else:
             v_init, p_init = v, p
 
         if sample_sequence:
-            _, s_noisy = self.trans_seq.add_noise(s, mask_generate, t)
+            _, s_noisy = self.trans_seq.add_noise(s, mask_generate, t, generator)
             s_init = torch.where(mask_generate, s_noisy, s)
         else:
             s_init = s
 
-        traj = {opt_step: (v_init, self._unnormalize_position(p_init), s_init)}
-        if pbar:
-            pbar = functools.partial(tqdm, total=opt_step, desc='Optimizing')
-        else:
-            pbar = lambda x: x
-        for t in pbar(range(opt_step, 0, -1)):
-            v_t, p_t, s_t = traj[t]
-            p_t = self._normalize_position(p_t)
-            
-            beta = self.trans_pos.var_sched.betas[t].expand([N, ])
-            t_tensor = torch.full([N, ], fill_value=t, dtype=torch.long, device=self._dummy.device)
-
-            v_next, R_next, eps_p, c_denoised = self.eps_net(
-                v_t, p_t, s_t, res_feat, pair_feat, beta, mask_generate, mask_res
-            )   # (N, L, 3), (N, L, 3, 3), (N, L, 3)
-
-            v_next = self.trans_rot.denoise(v_t, v_next, mask_generate, t_tensor)
-            p_next = self.trans_pos.denoise(p_t, eps_p, mask_generate, t_tensor)
-            _, s_next = self.trans_seq.denoise(s_t, c_denoised, mask_generate, t_tensor)
-
-            if not sample_structure:
-                v_next, p_next = v_t, p_t
-            if not sample_sequence:
-                s_next = s_t
-
-            traj[t-1] = (v_next, self._unnormalize_position(p_next), s_next)
-            traj[t] = tuple(x.cpu() for x in traj[t])    # Move previous states to cpu memory.
-
-        return traj
+        return self._denoise_loop(
+            (v_init, self._unnormalize_position(p_init), s_init), opt_step, res_feat, pair_feat, mask_generate, mask_res,
+            sample_structure, sample_sequence, pbar and 'Optimizing', generator, sample_steps, return_trajectory,
+        )
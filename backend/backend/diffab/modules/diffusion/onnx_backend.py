@@ -0,0 +1,148 @@
+"""
+ONNX Runtime execution of `EpsilonNet`, the per-step network of the sampler.
+
+`export_eps_net` writes the network as an ONNX graph with dynamic batch (N) and
+length (L) axes; `OrtEpsilonNet` runs such a graph on CPU with the call
+signature of `EpsilonNet`, so `FullDPM` can swap it in through
+`eps_net_backend` while the transitions keep running in torch. Selected by
+`model.backend: onnxruntime` in the test configs (see `load_model`).
+"""
+import contextlib
+import hashlib
+import inspect
+import os
+import tempfile
+import warnings
+import torch
+
+from diffab.modules.encoders.ga import GABlock
+from diffab.utils.misc import get_cache_dir
+
+
+INPUT_NAMES = ['v_t', 'p_t', 's_t', 'res_feat', 'pair_feat', 'beta', 'mask_generate', 'mask_res']
+OUTPUT_NAMES = ['v_next', 'R_next', 'eps_pos', 'c_denoised']
+OPSET_VERSION = 17
+
+# pair_feat is shared by all samples of a structure, so its batch is either 1 or N
+DYNAMIC_AXES = {
+    'v_t': {0: 'N', 1: 'L'},
+    'p_t': {0: 'N', 1: 'L'},
+    's_t': {0: 'N', 1: 'L'},
+    'res_feat': {0: 'N', 1: 'L'},
+    'pair_feat': {0: 'N_pair', 1: 'L', 2: 'L'},
+    'beta': {0: 'N'},
+    'mask_generate': {0: 'N', 1: 'L'},
+    'mask_res': {0: 'N', 1: 'L'},
+    **{name: {0: 'N', 1: 'L'} for name in OUTPUT_NAMES},
+}
+
+
+@contextlib.contextmanager
+def _export_mode(eps_net):
+    """Dense, unchunked float32 attention for the duration of the export."""
+    blocks = [m for m in eps_net.modules() if isinstance(m, GABlock)]
+    saved = [(b.chunk_size, b.autocast_dtype) for b in blocks]
+    try:
+        for b in blocks:
+            b.chunk_size, b.autocast_dtype = None, None
+        yield
+    finally:
+        for b, (chunk_size, autocast_dtype) in zip(blocks, saved):
+            b.chunk_size, b.autocast_dtype = chunk_size, autocast_dtype
+
+
+def _example_inputs(eps_net, N=2, L=32):
+    param = next(eps_net.parameters())
+    res_feat_dim = eps_net.current_sequence_embedding.embedding_dim
+    pair_feat_dim = eps_net.encoder.blocks[0].pair_feat_dim
+    kw = dict(device=param.device)
+    mask_generate = torch.zeros([N, L], dtype=torch.bool, **kw)
+    mask_generate[:, L//4:L//2] = True
+    return (
+        torch.randn([N, L, 3], **kw),
+        torch.randn([N, L, 3], **kw).cumsum(dim=1),
+        torch.randint(0, 20, [N, L], **kw),
+        torch.randn([N, L, res_feat_dim], **kw),
+        torch.randn([1, L, L, pair_feat_dim], **kw),
+        torch.full([N, ], 0.01, **kw),
+        mask_generate,
+        torch.ones([N, L], dtype=torch.bool, **kw),
+    )
+
+
+def export_eps_net(eps_net, path, opset_version=OPSET_VERSION):
+    """
+    Exports a float32 `EpsilonNet` with dense attention to an ONNX file.
+    Returns:
+        path
+    """
+    if eps_net.encoder.knn is not None:
+        raise ValueError('ONNX export supports dense attention only (encoder knn must be None)')
+    kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        kwargs['dynamo'] = False    # The TorchScript exporter handles the data-dependent masking
+    training = eps_net.training
+    eps_net.eval()
+    try:
+        with torch.no_grad(), _export_mode(eps_net), warnings.catch_warnings():
+            warnings.simplefilter('ignore', torch.jit.TracerWarning)    # Shape asserts and the shared-pair check
+            torch.onnx.export(
+                eps_net, _example_inputs(eps_net), path,
+                input_names=INPUT_NAMES, output_names=OUTPUT_NAMES,
+                dynamic_axes=DYNAMIC_AXES, opset_version=opset_version, **kwargs,
+            )
+    finally:
+        eps_net.train(training)
+    return path
+
+
+def cached_eps_net_path(eps_net, opset_version=OPSET_VERSION):
+    """
+    The exported graph of eps_net in the cache directory, exporting it on the
+    first call for these weights.
+    """
+    key = hashlib.sha1(f'{torch.__version__}:{opset_version}'.encode())
+    for name, tensor in eps_net.state_dict().items():
+        key.update(name.encode())
+        key.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    path = os.path.join(get_cache_dir(), f'eps_net_{key.hexdigest()}.onnx')
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        export_eps_net(eps_net, tmp_path, opset_version)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+class OrtEpsilonNet:
+    """
+    An exported `EpsilonNet` in an ONNX Runtime CPU session, called like the
+    module it was exported from. Inputs may live on any device; the outputs
+    are returned on the device of v_t.
+    """
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, v_t, p_t, s_t, res_feat, pair_feat, beta, mask_generate, mask_res):
+        if pair_feat.size(0) > 1 and pair_feat.stride(0) == 0:
+            pair_feat = pair_feat[:1]   # Shared by all samples (see `repeat_samples`)
+        inputs = (v_t, p_t, s_t, res_feat, pair_feat, beta, mask_generate, mask_res)
+        feed = {
+            name: x.detach().cpu().contiguous().numpy()
+            for name, x in zip(INPUT_NAMES, inputs)
+        }
+        outputs = self.session.run(OUTPUT_NAMES, feed)
+        return tuple(torch.from_numpy(y).to(v_t.device) for y in outputs)
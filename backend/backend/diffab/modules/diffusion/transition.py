@@ -3,18 +3,20 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from diffab.modules.common import noise
 from diffab.modules.common.layers import clampped_one_hot
 from diffab.modules.common.so3 import ApproxAngularDistribution, random_normal_so3, so3vec_to_rotation, rotation_to_so3vec
 
 
 class VarianceSchedule(nn.Module):
 
-    def __init__(self, num_steps=100, s=0.01):
+    def __init__(self, num_steps=100, s=0.01, alpha_bars=None):
         super().__init__()
-        T = num_steps
-        t = torch.arange(0, num_steps+1, dtype=torch.float)
-        f_t = torch.cos( (np.pi / 2) * ((t/T) + s) / (1 + s) ) ** 2
-        alpha_bars = f_t / f_t[0]
+        if alpha_bars is None:
+            T = num_steps
+            t = torch.arange(0, num_steps+1, dtype=torch.float)
+            f_t = torch.cos( (np.pi / 2) * ((t/T) + s) / (1 + s) ) ** 2
+            alpha_bars = f_t / f_t[0]
 
         betas = 1 - (alpha_bars[1:] / alpha_bars[:-1])
         betas = torch.cat([torch.zeros([1]), betas], dim=0)
@@ -30,32 +32,45 @@ class VarianceSchedule(nn.Module):
         self.register_buffer('alphas', 1 - betas)
         self.register_buffer('sigmas', sigmas)
 
+    def respace(self, timesteps):
+        """
+        Schedule over an increasing subsequence of the timesteps, for strided
+        sampling: step i jumps from timesteps[i-1] to timesteps[i-2] (0 for i=1),
+        with betas and posterior sigmas of the jump.
+        """
+        idx = torch.as_tensor([0] + list(timesteps), dtype=torch.long)
+        return VarianceSchedule(alpha_bars=self.alpha_bars.cpu()[idx])
+
 
 class PositionTransition(nn.Module):
 
-    def __init__(self, num_steps, var_sched_opt={}):
+    def __init__(self, num_steps, var_sched_opt={}, var_sched=None):
         super().__init__()
-        self.var_sched = VarianceSchedule(num_steps, **var_sched_opt)
+        self.var_sched = var_sched if var_sched is not None else VarianceSchedule(num_steps, **var_sched_opt)
 
-    def add_noise(self, p_0, mask_generate, t):
+    def respace(self, timesteps):
+        return PositionTransition(len(timesteps), var_sched=self.var_sched.respace(timesteps))
+
+    def add_noise(self, p_0, mask_generate, t, generator=None):
         """
         Args:
             p_0:    (N, L, 3).
             mask_generate:    (N, L).
             t:  (N,).
+            generator:  Optional per-item BatchGenerator.
         """
         alpha_bar = self.var_sched.alpha_bars[t]
 
         c0 = torch.sqrt(alpha_bar).view(-1, 1, 1)
         c1 = torch.sqrt(1 - alpha_bar).view(-1, 1, 1)
 
-        e_rand = torch.randn_like(p_0)
+        e_rand = noise.randn_like(p_0, generator)
         p_noisy = c0*p_0 + c1*e_rand
         p_noisy = torch.where(mask_generate[..., None].expand_as(p_0), p_noisy, p_0)
 
         return p_noisy, e_rand
 
-    def denoise(self, p_t, eps_p, mask_generate, t):
+    def denoise(self, p_t, eps_p, mask_generate, t, generator=None):
         # IMPORTANT:
         #   clampping alpha is to fix the instability issue at the first step (t=T)
         #   it seems like a problem with the ``improved ddpm''.
@@ -70,7 +85,7 @@ class PositionTransition(nn.Module):
 
         z = torch.where(
             (t > 1)[:, None, None].expand_as(p_t),
-            torch.randn_like(p_t),
+            noise.randn_like(p_t, generator),
             torch.zeros_like(p_t),
         )
 
@@ -81,13 +96,15 @@ class PositionTransition(nn.Module):
 
 class RotationTransition(nn.Module):
 
-    def __init__(self, num_steps, var_sched_opt={}, angular_distrib_fwd_opt={}, angular_distrib_inv_opt={}):
+    def __init__(self, num_steps, var_sched_opt={}, angular_distrib_fwd_opt={}, angular_distrib_inv_opt={}, var_sched=None, reverse_only=False):
         super().__init__()
-        self.var_sched = VarianceSchedule(num_steps, **var_sched_opt)
+        self.var_sched = var_sched if var_sched is not None else VarianceSchedule(num_steps, **var_sched_opt)
+        self.angular_distrib_inv_opt = angular_distrib_inv_opt
 
         # Forward (perturb)
-        c1 = torch.sqrt(1 - self.var_sched.alpha_bars) # (T,).
-        self.angular_distrib_fwd = ApproxAngularDistribution(c1.tolist(), **angular_distrib_fwd_opt)
+        if not reverse_only:
+            c1 = torch.sqrt(1 - self.var_sched.alpha_bars) # (T,).
+            self.angular_distrib_fwd = ApproxAngularDistribution(c1.tolist(), **angular_distrib_fwd_opt)
 
         # Inverse (generate)
         sigma = self.var_sched.sigmas
@@ -95,12 +112,22 @@ class RotationTransition(nn.Module):
 
         self.register_buffer('_dummy', torch.empty([0, ]))
 
-    def add_noise(self, v_0, mask_generate, t):
+    def respace(self, timesteps):
+        """Reverse process only: `add_noise` is not available on the result."""
+        return RotationTransition(
+            len(timesteps),
+            angular_distrib_inv_opt = self.angular_distrib_inv_opt,
+            var_sched = self.var_sched.respace(timesteps),
+            reverse_only = True,
+        )
+
+    def add_noise(self, v_0, mask_generate, t, generator=None):
         """
         Args:
             v_0:    (N, L, 3).
             mask_generate:    (N, L).
             t:  (N,).
+            generator:  Optional per-item BatchGenerator.
         """
         N, L = mask_generate.size()
         alpha_bar = self.var_sched.alpha_bars[t]
@@ -108,7 +135,7 @@ class RotationTransition(nn.Module):
         c1 = torch.sqrt(1 - alpha_bar).view(-1, 1, 1)
 
         # Noise rotation
-        e_scaled = random_normal_so3(t[:, None].expand(N, L), self.angular_distrib_fwd, device=self._dummy.device)    # (N, L, 3)
+        e_scaled = random_normal_so3(t[:, None].expand(N, L), self.angular_distrib_fwd, device=self._dummy.device, generator=generator)    # (N, L, 3)
         e_normal = e_scaled / (c1 + 1e-8)
         E_scaled = so3vec_to_rotation(e_scaled)   # (N, L, 3, 3)
 
@@ -121,9 +148,9 @@ class RotationTransition(nn.Module):
 
         return v_noisy, e_scaled
 
-    def denoise(self, v_t, v_next, mask_generate, t):
+    def denoise(self, v_t, v_next, mask_generate, t, generator=None):
         N, L = mask_generate.size()
-        e = random_normal_so3(t[:, None].expand(N, L), self.angular_distrib_inv, device=self._dummy.device) # (N, L, 3)
+        e = random_normal_so3(t[:, None].expand(N, L), self.angular_distrib_inv, device=self._dummy.device, generator=generator) # (N, L, 3)
         e = torch.where(
             (t > 1)[:, None, None].expand(N, L, 3),
             e, 
@@ -140,30 +167,37 @@ class RotationTransition(nn.Module):
 
 class AminoacidCategoricalTransition(nn.Module):
     
-    def __init__(self, num_steps, num_classes=20, var_sched_opt={}):
+    def __init__(self, num_steps, num_classes=20, var_sched_opt={}, var_sched=None, jump_posterior=False):
         super().__init__()
         self.num_classes = num_classes
-        self.var_sched = VarianceSchedule(num_steps, **var_sched_opt)
+        self.var_sched = var_sched if var_sched is not None else VarianceSchedule(num_steps, **var_sched_opt)
+        # See `posterior`
+        self.jump_posterior = jump_posterior
+
+    def respace(self, timesteps):
+        return AminoacidCategoricalTransition(
+            len(timesteps), self.num_classes, var_sched=self.var_sched.respace(timesteps), jump_posterior=True,
+        )
 
     @staticmethod
-    def _sample(c):
+    def _sample(c, generator=None):
         """
         Args:
             c:    (N, L, K).
+            generator:  Optional per-item BatchGenerator.
         Returns:
             x:    (N, L).
         """
-        N, L, K = c.size()
-        c = c.view(N*L, K) + 1e-8
-        x = torch.multinomial(c, 1).view(N, L)
+        x = noise.categorical(c + 1e-8, generator)
         return x
 
-    def add_noise(self, x_0, mask_generate, t):
+    def add_noise(self, x_0, mask_generate, t, generator=None):
         """
         Args:
             x_0:    (N, L)
             mask_generate:    (N, L).
             t:  (N,).
+            generator:  Optional per-item BatchGenerator.
         Returns:
             c_t:    Probability, (N, L, K).
             x_t:    Sample, LongTensor, (N, L).
@@ -174,7 +208,7 @@ class AminoacidCategoricalTransition(nn.Module):
         alpha_bar = self.var_sched.alpha_bars[t][:, None, None] # (N, 1, 1)
         c_noisy = (alpha_bar*c_0) + ( (1-alpha_bar)/K )
         c_t = torch.where(mask_generate[..., None].expand(N,L,K), c_noisy, c_0)
-        x_t = self._sample(c_t)
+        x_t = self._sample(c_t, generator)
         return c_t, x_t
 
     def posterior(self, x_t, x_0, t):
@@ -185,6 +219,15 @@ class AminoacidCategoricalTransition(nn.Module):
             t:  (N,).
         Returns:
             theta:  Posterior probability at (t-1)-th step, (N, L, K).
+
+        The full schedule evaluates both factors at alpha_bars[t], the
+        posterior the network was trained against (see `FullDPM.forward`),
+        and keeps it so full-length sampling is unchanged. A respaced
+        schedule (`jump_posterior`) jumps from t to the previous visited
+        step s instead, with q(x_s | x_t, x_0) ~ q(x_t | x_s) q(x_s | x_0):
+        alpha_bars[t] / alpha_bars[s] for the x_t factor and alpha_bars[s]
+        for the x_0 factor. Its alpha_bars hold the visited steps, so s is
+        t - 1 there.
         """
         K = self.num_classes
 
@@ -198,20 +241,25 @@ class AminoacidCategoricalTransition(nn.Module):
         else:
             c_0 = clampped_one_hot(x_0, num_classes=K).float() # (N, L, K)
 
-        alpha = self.var_sched.alpha_bars[t][:, None, None]     # (N, 1, 1)
-        alpha_bar = self.var_sched.alpha_bars[t][:, None, None] # (N, 1, 1)
+        if self.jump_posterior:
+            alpha_bar = self.var_sched.alpha_bars[t-1][:, None, None]   # (N, 1, 1)
+            alpha = self.var_sched.alpha_bars[t][:, None, None] / alpha_bar
+        else:
+            alpha = self.var_sched.alpha_bars[t][:, None, None]     # (N, 1, 1)
+            alpha_bar = self.var_sched.alpha_bars[t][:, None, None] # (N, 1, 1)
 
         theta = ((alpha*c_t) + (1-alpha)/K) * ((alpha_bar*c_0) + (1-alpha_bar)/K)   # (N, L, K)
         theta = theta / (theta.sum(dim=-1, keepdim=True) + 1e-8)
         return theta
 
-    def denoise(self, x_t, c_0_pred, mask_generate, t):
+    def denoise(self, x_t, c_0_pred, mask_generate, t, generator=None):
         """
         Args:
             x_t:        (N, L).
             c_0_pred:   Normalized probability predicted by networks, (N, L, K).
             mask_generate:    (N, L).
             t:  (N,).
+            generator:  Optional per-item BatchGenerator.
         Returns:
             post:   Posterior probability at (t-1)-th step, (N, L, K).
             x_next: Sample at (t-1)-th step, LongTensor, (N, L).
@@ -219,5 +267,5 @@ class AminoacidCategoricalTransition(nn.Module):
         c_t = clampped_one_hot(x_t, num_classes=self.num_classes).float()  # (N, L, K)
         post = self.posterior(c_t, c_0_pred, t=t)   # (N, L, K)
         post = torch.where(mask_generate[..., None].expand(post.size()), post, c_t)
-        x_next = self._sample(post)
+        x_next = self._sample(post, generator)
         return post, x_next
@@ -1,31 +1,51 @@
+import contextlib
+import functools
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
 
-from diffab.modules.common.geometry import global_to_local, local_to_global, normalize_vector, construct_3d_basis, angstrom_to_nm
+from diffab.modules.common.geometry import global_to_local, local_to_global, construct_3d_basis, angstrom_to_nm, knn_gather
 from diffab.modules.common.layers import mask_zero, LayerNorm
 from diffab.utils.protein.constants import BBHeavyAtom
 
 
-def _alpha_from_logits(logits, mask, inf=1e5):
+def _alpha_from_logits(logits, mask_row, mask_col, inf=1e5):
     """
     Args:
         logits: Logit matrices, (N, L_i, L_j, num_heads).
-        mask:   Masks, (N, L).
+        mask_row:   Masks of the query rows, (N, L_i).
+        mask_col:   Masks of the keys, (N, L_j), or of each row's keys, (N, L_i, L_j).
     Returns:
         alpha:  Attention weights.
     """
-    N, L, _, _ = logits.size()
-    mask_row = mask.view(N, L, 1, 1).expand_as(logits)  # (N, L, *, *)
-    mask_pair = mask_row * mask_row.permute(0, 2, 1, 3)  # (N, L, L, *)
+    if mask_col.dim() == 2:
+        mask_col = mask_col[:, None, :]
+    mask_row = mask_row[:, :, None, None]   # (N, L_i, 1, 1)
+    mask_pair = mask_row * mask_col[:, :, :, None]   # (N, L_i, L_j, 1)
 
     logits = torch.where(mask_pair, logits, logits - inf)
-    alpha = torch.softmax(logits, dim=2)  # (N, L, L, num_heads)
+    alpha = torch.softmax(logits, dim=2)  # (N, L_i, L_j, num_heads)
     alpha = torch.where(mask_row, alpha, torch.zeros_like(alpha))
     return alpha
 
 
+def _full_precision(fn):
+    """
+    Runs a geometric step of GABlock in full precision, with autocast off and
+    reduced-precision tensor arguments cast back to float32.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args):
+        args = [
+            a.float() if torch.is_tensor(a) and a.dtype in (torch.bfloat16, torch.float16) else a
+            for a in args
+        ]
+        with torch.autocast(self.spatial_coef.device.type, enabled=False):
+            return fn(self, *args)
+    return wrapper
+
+
 def _heads(x, n_heads, n_ch):
     """
     Args:
@@ -40,7 +60,7 @@ def _heads(x, n_heads, n_ch):
 class GABlock(nn.Module):
 
     def __init__(self, node_feat_dim, pair_feat_dim, value_dim=32, query_key_dim=32, num_query_points=8,
-                 num_value_points=8, num_heads=12, bias=False):
+                 num_value_points=8, num_heads=12, bias=False, chunk_size=None):
         super().__init__()
         self.node_feat_dim = node_feat_dim
         self.pair_feat_dim = pair_feat_dim
@@ -78,75 +98,204 @@ class GABlock(nn.Module):
                                             nn.Linear(node_feat_dim, node_feat_dim))
         self.layer_norm_2 = LayerNorm(node_feat_dim)
 
-    def _node_logits(self, x):
-        query_l = _heads(self.proj_query(x), self.num_heads, self.query_key_dim)  # (N, L, n_heads, qk_ch)
-        key_l = _heads(self.proj_key(x), self.num_heads, self.query_key_dim)  # (N, L, n_heads, qk_ch)
-        logits_node = (query_l.unsqueeze(2) * key_l.unsqueeze(1) *
-                       (1 / np.sqrt(self.query_key_dim))).sum(-1)  # (N, L, L, num_heads)
-        return logits_node
+        # Query rows attended at a time. Rows are independent, so this only bounds
+        # the (N, R, L, num_heads) logits and weights. None attends all rows at once.
+        self.chunk_size = chunk_size
+        # Autocast dtype (e.g. torch.bfloat16 on CPU) for the node and pair
+        # features: their projections, logits, aggregations and the output MLPs.
+        # Points, spatial logits and frames stay in float32. None disables it.
+        self.autocast_dtype = None
+
+    def _node_logits(self, query_l, key_l):
+        """
+        Args:
+            query_l:    (N, R, n_heads, qk_ch).
+            key_l:      (N, L, n_heads, qk_ch).
+        Returns:
+            (N, R, L, n_heads)
+        """
+        query_l = query_l * (1 / np.sqrt(self.query_key_dim))
+        logits_node = torch.matmul(query_l.transpose(1, 2), key_l.permute(0, 2, 3, 1))  # (N, n_heads, R, L)
+        return logits_node.permute(0, 2, 3, 1)
 
     def _pair_logits(self, z):
+        if z.size(0) > 1 and z.stride(0) == 0:
+            # Pair features shared by all samples: project them once
+            return self.proj_pair_bias(z[:1]).expand(z.size(0), -1, -1, -1)
         logits_pair = self.proj_pair_bias(z)
         return logits_pair
 
-    def _spatial_logits(self, R, t, x):
+    @_full_precision
+    def _points(self, proj, R, t, x, num_points):
+        """
+        Global coordinates of the points projected from x, centered on the
+        frames so the squared distances below do not lose precision.
+        Returns:
+            (N, L, n_heads, n_pnts, 3)
+        """
         N, L, _ = t.size()
+        points = _heads(proj(x), self.num_heads * num_points, 3)  # (N, L, n_heads * n_pnts, 3)
+        points = local_to_global(R, t - t.mean(dim=1, keepdim=True), points)
+        return points.reshape(N, L, self.num_heads, num_points, 3)
 
-        # Query
-        query_points = _heads(self.proj_query_point(x), self.num_heads * self.num_query_points,
-                              3)  # (N, L, n_heads * n_pnts, 3)
-        query_points = local_to_global(R, t, query_points)  # Global query coordinates, (N, L, n_heads * n_pnts, 3)
-        query_s = query_points.reshape(N, L, self.num_heads, -1)  # (N, L, n_heads, n_pnts*3)
-
-        # Key
-        key_points = _heads(self.proj_key_point(x), self.num_heads * self.num_query_points,
-                            3)  # (N, L, 3, n_heads * n_pnts)
-        key_points = local_to_global(R, t, key_points)  # Global key coordinates, (N, L, n_heads * n_pnts, 3)
-        key_s = key_points.reshape(N, L, self.num_heads, -1)  # (N, L, n_heads, n_pnts*3)
+    @_full_precision
+    def _spatial_logits(self, query_points, key_points):
+        """
+        Args:
+            query_points:   (N, R, n_heads, n_pnts, 3).
+            key_points:     (N, L, n_heads, n_pnts, 3).
+        Returns:
+            (N, R, L, n_heads)
+        """
+        N, R, L = query_points.size(0), query_points.size(1), key_points.size(1)
+        query_s = query_points.reshape(N, R, self.num_heads, -1).transpose(1, 2)  # (N, n_heads, R, n_pnts*3)
+        key_s = key_points.reshape(N, L, self.num_heads, -1).transpose(1, 2)  # (N, n_heads, L, n_pnts*3)
+
+        # |q - k|^2 = |q|^2 + |k|^2 - 2 q.k
+        sum_sq_dist = torch.matmul(query_s, key_s.transpose(-1, -2)).mul_(-2)  # (N, n_heads, R, L)
+        sum_sq_dist += query_s.square().sum(-1, keepdim=True)
+        sum_sq_dist += key_s.square().sum(-1).unsqueeze(-2)
+        sum_sq_dist = sum_sq_dist.permute(0, 2, 3, 1).clamp(min=0)  # (N, R, L, n_heads)
+        logits_spatial = sum_sq_dist * self._spatial_scale()  # (N, R, L, n_heads)
+        return logits_spatial
 
-        # Q-K Product
-        sum_sq_dist = ((query_s.unsqueeze(2) - key_s.unsqueeze(1)) ** 2).sum(-1)  # (N, L, L, n_heads)
+    def _spatial_scale(self):
         gamma = F.softplus(self.spatial_coef)
-        logits_spatial = sum_sq_dist * ((-1 * gamma * np.sqrt(2 / (9 * self.num_query_points)))
-                                        / 2)  # (N, L, L, n_heads)
-        return logits_spatial
+        return (-1 * gamma * np.sqrt(2 / (9 * self.num_query_points))) / 2
 
     def _pair_aggregation(self, alpha, z):
-        N, L = z.shape[:2]
-        feat_p2n = alpha.unsqueeze(-1) * z.unsqueeze(-2)  # (N, L, L, n_heads, C)
-        feat_p2n = feat_p2n.sum(dim=2)  # (N, L, n_heads, C)
-        return feat_p2n.reshape(N, L, -1)
+        N, R, L, H = alpha.size()
+        if N > 1 and z.stride(0) == 0:
+            # Pair features shared by all samples: contract every sample's weights with one copy
+            feat_p2n = torch.bmm(alpha.permute(1, 0, 3, 2).reshape(R, N * H, L), z[0])   # (R, N * n_heads, C)
+            feat_p2n = feat_p2n.view(R, N, H, -1).transpose(0, 1)  # (N, R, n_heads, C)
+        else:
+            feat_p2n = torch.matmul(alpha.transpose(-1, -2), z)  # (N, R, n_heads, C)
+        return feat_p2n.reshape(N, R, -1)
+
+    def _node_aggregation(self, alpha, value_l):
+        """
+        Args:
+            alpha:      (N, R, L, n_heads).
+            value_l:    (N, L, n_heads, v_ch).
+        """
+        N, R = alpha.shape[:2]
+        feat_node = torch.matmul(alpha.permute(0, 3, 1, 2), value_l.transpose(1, 2))  # (N, n_heads, R, v_ch)
+        return feat_node.transpose(1, 2).reshape(N, R, -1)
 
-    def _node_aggregation(self, alpha, x):
-        N, L = x.shape[:2]
-        value_l = _heads(self.proj_value(x), self.num_heads, self.query_key_dim)  # (N, L, n_heads, v_ch)
-        feat_node = alpha.unsqueeze(-1) * value_l.unsqueeze(1)  # (N, L, L, n_heads, *) @ (N, *, L, n_heads, v_ch)
-        feat_node = feat_node.sum(dim=2)  # (N, L, n_heads, v_ch)
-        return feat_node.reshape(N, L, -1)
+    @_full_precision
+    def _spatial_aggregation(self, alpha, value_points):
+        """
+        Args:
+            alpha:  (N, R, L, n_heads).
+            value_points:   Centered global coordinates, (N, L, n_heads, n_v_pnts, 3).
+        Returns:
+            (N, R, n_heads, n_v_pnts, 3)
+        """
+        N, L_i, L, H = alpha.size()
+        value_s = value_points.reshape(N, L, H, -1).transpose(1, 2)  # (N, n_heads, L, n_v_pnts*3)
+        aggr_points = torch.matmul(alpha.permute(0, 3, 1, 2), value_s)  # (N, n_heads, R, n_v_pnts*3)
+        return aggr_points.transpose(1, 2).reshape(N, L_i, H, self.num_value_points, 3)
 
-    def _spatial_aggregation(self, alpha, R, t, x):
-        N, L, _ = t.size()
-        value_points = _heads(self.proj_value_point(x), self.num_heads * self.num_value_points,
-                              3)  # (N, L, n_heads * n_v_pnts, 3)
-        value_points = local_to_global(R, t, value_points.reshape(N, L, self.num_heads, self.num_value_points,
-                                                                  3))  # (N, L, n_heads, n_v_pnts, 3)
-        aggr_points = alpha.reshape(N, L, L, self.num_heads, 1, 1) * \
-                      value_points.unsqueeze(1)  # (N, *, L, n_heads, n_pnts, 3)
-        aggr_points = aggr_points.sum(dim=2)  # (N, L, n_heads, n_pnts, 3)
-
-        feat_points = global_to_local(R, t, aggr_points)  # (N, L, n_heads, n_pnts, 3)
-        feat_distance = feat_points.norm(dim=-1)  # (N, L, n_heads, n_pnts)
-        feat_direction = normalize_vector(feat_points, dim=-1, eps=1e-4)  # (N, L, n_heads, n_pnts, 3)
+    @_full_precision
+    def _spatial_features(self, aggr_points, R, t):
+        """
+        Args:
+            aggr_points:    (N, R, n_heads, n_v_pnts, 3).
+            R, t:   Frames of the query rows, (N, R, 3, 3), (N, R, 3).
+        """
+        N, L_i = aggr_points.shape[:2]
+        feat_points = global_to_local(R, t, aggr_points)  # (N, R, n_heads, n_pnts, 3)
+        # Not .norm(): feat_points is a strided view, which the CPU norm kernel reduces very slowly
+        feat_distance = feat_points.square().sum(-1).sqrt()  # (N, R, n_heads, n_pnts)
+        feat_direction = feat_points / (feat_distance.unsqueeze(-1) + 1e-4)  # (N, R, n_heads, n_pnts, 3)
 
         feat_spatial = torch.cat([
-            feat_points.reshape(N, L, -1),
-            feat_distance.reshape(N, L, -1),
-            feat_direction.reshape(N, L, -1),
+            feat_points.reshape(N, L_i, -1),
+            feat_distance.reshape(N, L_i, -1),
+            feat_direction.reshape(N, L_i, -1),
         ], dim=-1)
 
         return feat_spatial
 
-    def forward(self, R, t, x, z, mask):
+    def _dense_attention(self, rows, query_l, key_l, value_l, query_points, key_points, value_points, z, mask):
+        """
+        Attention of the query `rows` over all residues.
+        Returns:
+            Pair, node and point aggregates, (N, R, n_heads * C), (N, R, n_heads * v_ch),
+            (N, R, n_heads, n_v_pnts, 3).
+        """
+        # Attention logits
+        logits_node = self._node_logits(query_l[:, rows], key_l)
+        logits_pair = self._pair_logits(z[:, rows])
+        logits_spatial = self._spatial_logits(query_points[:, rows], key_points)
+        # Summing logits up and apply `softmax`.
+        logits_sum = logits_node + logits_pair + logits_spatial
+        alpha = _alpha_from_logits(logits_sum * np.sqrt(1 / 3), mask[:, rows], mask)  # (N, R, L, n_heads)
+
+        # Aggregate features
+        feat_p2n = self._pair_aggregation(alpha, z[:, rows])
+        feat_node = self._node_aggregation(alpha, value_l)
+        aggr_points = self._spatial_aggregation(alpha, value_points)
+        return feat_p2n, feat_node, aggr_points
+
+    @_full_precision
+    def _sparse_tables(self, query_l, key_l, value_l, query_points, key_points, value_points):
+        """
+        Folds the node and spatial terms into one query/key dot product so a
+        single gather and contraction gives both logits:
+            q.k / sqrt(c) + s * |q_p - k_p|^2
+          = [q / sqrt(c), -2 s q_p, s] . [k, k_p, |k_p|^2] + s * |q_p|^2,
+        where the last term is constant along each row and cancels in the softmax.
+        Returns:
+            Queries, (N, L, n_heads, D), keys and values ([v, v_p]), (N, n_heads, L, D).
+        """
+        N, L, H = query_l.shape[:3]
+        scale = self._spatial_scale().view(1, 1, H, 1)
+        query_p, key_p = query_points.reshape(N, L, H, -1), key_points.reshape(N, L, H, -1)
+        query_ext = torch.cat([
+            query_l * (1 / np.sqrt(self.query_key_dim)), -2 * scale * query_p, scale.expand(N, L, H, 1),
+        ], dim=-1)
+        key_ext = torch.cat([key_l, key_p, key_p.square().sum(-1, keepdim=True)], dim=-1)
+        value_ext = torch.cat([value_l, value_points.reshape(N, L, H, -1)], dim=-1)
+        # Keys and values head-major, so gathering neighbours gives (N, R, n_heads, K, D) blocks
+        return query_ext, key_ext.transpose(1, 2).contiguous(), value_ext.transpose(1, 2).contiguous()
+
+    @_full_precision
+    def _sparse_attention(self, rows, idx, query_ext, key_ext, value_ext, z, mask):
+        """
+        Attention of the query `rows` over their neighbours only.
+        Args:
+            idx:    Neighbours of each query row, (N, R, K).
+            query_ext:  (N, L, n_heads, D), see `_sparse_tables`.
+            key_ext, value_ext: (N, n_heads, L, D).
+        Returns:
+            See `_dense_attention`.
+        """
+        N, R, K = idx.size()
+        H = self.num_heads
+        batch = torch.arange(N, device=idx.device)[:, None, None]
+        row_idx = torch.arange(z.size(1), device=idx.device)[rows][None, :, None]
+        z_nb = z[batch, row_idx, idx]  # (N, R, K, C), gathered without copying z
+        heads = torch.arange(H, device=idx.device)[None, None, :, None]
+        idx_h = (batch[..., None], heads, idx[:, :, None, :])   # Indexes (N, R, n_heads, K)
+
+        # Attention logits
+        logits_sum = torch.matmul(
+            query_ext[:, rows].unsqueeze(-2), key_ext[idx_h].transpose(-1, -2)
+        ).squeeze(-2)   # (N, R, n_heads, K)
+        logits_sum = logits_sum.transpose(-1, -2) + self.proj_pair_bias(z_nb)  # (N, R, K, n_heads)
+        alpha = _alpha_from_logits(logits_sum * np.sqrt(1 / 3), mask[:, rows], knn_gather(idx, mask))
+        alpha = alpha.transpose(-1, -2)   # (N, R, n_heads, K)
+
+        # Aggregate features
+        feat_p2n = torch.matmul(alpha, z_nb).reshape(N, R, -1)   # (N, R, n_heads * C)
+        aggr = torch.matmul(alpha.unsqueeze(-2), value_ext[idx_h]).squeeze(-2)   # (N, R, n_heads, D)
+        feat_node = aggr[..., :self.query_key_dim].reshape(N, R, -1)
+        aggr_points = aggr[..., self.query_key_dim:].reshape(N, R, H, self.num_value_points, 3)
+        return feat_p2n, feat_node, aggr_points
+
+    def forward(self, R, t, x, z, mask, neighbors=None):
         """
         Args:
             R:  Frame basis matrices, (N, L, 3, 3_index).
@@ -154,24 +303,45 @@ class GABlock(nn.Module):
             x:  Node-wise features, (N, L, F).
             z:  Pair-wise features, (N, L, L, C).
             mask:   Masks, (N, L).
+            neighbors:  Optional indices of the residues each residue attends
+                        to, (N, L, K). None attends to all residues.
         Returns:
             x': Updated node-wise features, (N, L, F).
         """
-        # Attention logits
-        logits_node = self._node_logits(x)
-        logits_pair = self._pair_logits(z)
-        logits_spatial = self._spatial_logits(R, t, x)
-        # Summing logits up and apply `softmax`.
-        logits_sum = logits_node + logits_pair + logits_spatial
-        alpha = _alpha_from_logits(logits_sum * np.sqrt(1 / 3), mask)  # (N, L, L, n_heads)
-
-        # Aggregate features
-        feat_p2n = self._pair_aggregation(alpha, z)
-        feat_node = self._node_aggregation(alpha, x)
-        feat_spatial = self._spatial_aggregation(alpha, R, t, x)
+        if self.autocast_dtype is None:
+            autocast = contextlib.nullcontext()
+        else:
+            autocast = torch.autocast(x.device.type, dtype=self.autocast_dtype)
+        with autocast:
+            return self._forward(R, t, x, z, mask, neighbors)
+
+    def _forward(self, R, t, x, z, mask, neighbors):
+        L = x.size(1)
+        # Per-residue projections
+        query_l = _heads(self.proj_query(x), self.num_heads, self.query_key_dim)  # (N, L, n_heads, qk_ch)
+        key_l = _heads(self.proj_key(x), self.num_heads, self.query_key_dim)  # (N, L, n_heads, qk_ch)
+        value_l = _heads(self.proj_value(x), self.num_heads, self.query_key_dim)  # (N, L, n_heads, v_ch)
+        query_points = self._points(self.proj_query_point, R, t, x, self.num_query_points)
+        key_points = self._points(self.proj_key_point, R, t, x, self.num_query_points)
+        value_points = self._points(self.proj_value_point, R, t, x, self.num_value_points)
+        t_centered = t - t.mean(dim=1, keepdim=True)
+        projected = (query_l, key_l, value_l, query_points, key_points, value_points)
+        if neighbors is not None:
+            tables = self._sparse_tables(*projected)
+
+        feat_all = []
+        chunk_size = self.chunk_size or L
+        for i in range(0, L, chunk_size):
+            rows = slice(i, i + chunk_size)
+            if neighbors is None:
+                feat_p2n, feat_node, aggr_points = self._dense_attention(rows, *projected, z, mask)
+            else:
+                feat_p2n, feat_node, aggr_points = self._sparse_attention(rows, neighbors[:, rows], *tables, z, mask)
+            feat_spatial = self._spatial_features(aggr_points, R[:, rows], t_centered[:, rows])
+            feat_all.append(torch.cat([feat_p2n, feat_node, feat_spatial], dim=-1))
 
         # Finally
-        feat_all = self.out_transform(torch.cat([feat_p2n, feat_node, feat_spatial], dim=-1))  # (N, L, F)
+        feat_all = self.out_transform(torch.cat(feat_all, dim=1))  # (N, L, F)
         feat_all = mask_zero(mask.unsqueeze(-1), feat_all)
         x_updated = self.layer_norm_1(x + feat_all)
         x_updated = self.layer_norm_2(x_updated + self.mlp_transition(x_updated))
@@ -180,14 +350,39 @@ class GABlock(nn.Module):
 
 class GAEncoder(nn.Module):
 
-    def __init__(self, node_feat_dim, pair_feat_dim, num_layers, ga_block_opt={}):
+    def __init__(self, node_feat_dim, pair_feat_dim, num_layers, ga_block_opt={}, knn=None):
         super(GAEncoder, self).__init__()
         self.blocks = nn.ModuleList([
             GABlock(node_feat_dim, pair_feat_dim, **ga_block_opt) 
             for _ in range(num_layers)
         ])
+        # Sparse attention: each residue attends to its `knn` nearest residues
+        # (by CA distance) and to every generated residue. None is dense.
+        self.knn = knn
 
-    def forward(self, R, t, res_feat, pair_feat, mask):
+    def _neighbors(self, t, mask, mask_generate=None):
+        """
+        Args:
+            t:  CA coordinates, (N, L, 3).
+            mask:   Masks, (N, L).
+            mask_generate:  Residues every residue attends to, (N, L).
+        Returns:
+            Indices of the residues each residue attends to, (N, L, K), or
+            None if that is all of them.
+        """
+        L = t.size(1)
+        dist = torch.cdist(t, t)    # (N, L, L)
+        dist = dist.masked_fill(~mask[:, None, :], float('inf'))
+        K = self.knn
+        if mask_generate is not None:
+            dist = dist.masked_fill(mask_generate[:, None, :], -1)
+            K += int(mask_generate.sum(dim=1).max())
+        if K >= L:
+            return None
+        return dist.topk(K, dim=-1, largest=False).indices
+
+    def forward(self, R, t, res_feat, pair_feat, mask, mask_generate=None):
+        neighbors = self._neighbors(t, mask, mask_generate) if self.knn is not None else None
         for i, block in enumerate(self.blocks):
-            res_feat = block(R, t, res_feat, pair_feat, mask)
+            res_feat = block(R, t, res_feat, pair_feat, mask, neighbors)
         return res_feat
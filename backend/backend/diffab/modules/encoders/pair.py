@@ -9,8 +9,9 @@ from diffab.utils.protein.constants import BBHeavyAtom, AA
 
 class PairEmbedding(nn.Module):
 
-    def __init__(self, feat_dim, max_num_atoms, max_aa_types=22, max_relpos=32):
+    def __init__(self, feat_dim, max_num_atoms, max_aa_types=22, max_relpos=32, chunk_size=32):
         super().__init__()
+        self.feat_dim = feat_dim
         self.max_num_atoms = max_num_atoms
         self.max_aa_types = max_aa_types
         self.max_relpos = max_relpos
@@ -34,6 +35,10 @@ class PairEmbedding(nn.Module):
             nn.Linear(feat_dim, feat_dim),
         )
 
+        # Rows of the (L, L) pair map embedded at a time. Pairs are independent,
+        # so this only bounds the (R, L, A*A) intermediates. None embeds all rows.
+        self.chunk_size = chunk_size
+
     def forward(self, aa, res_nb, chain_nb, pos_atoms, mask_atoms, structure_mask=None, sequence_mask=None):
         """
         Args:
@@ -54,40 +59,63 @@ class PairEmbedding(nn.Module):
         pos_atoms = pos_atoms[:, :, :self.max_num_atoms]
         mask_atoms = mask_atoms[:, :, :self.max_num_atoms]
 
-        mask_residue = mask_atoms[:, :, BBHeavyAtom.CA] # (N, L)
-        mask_pair = mask_residue[:, :, None] * mask_residue[:, None, :]
-        pair_structure_mask = structure_mask[:, :, None] * structure_mask[:, None, :] if structure_mask is not None else None
-
-        # Pair identities
         if sequence_mask is not None:
             # Avoid data leakage at training time
             aa = torch.where(sequence_mask, aa, torch.full_like(aa, fill_value=AA.UNK))
-        aa_pair = aa[:,:,None]*self.max_aa_types + aa[:,None,:]    # (N, L, L)
+
+        if self.chunk_size is None or L <= self.chunk_size:
+            return self._embed_rows(slice(None), aa, res_nb, chain_nb, pos_atoms, mask_atoms, structure_mask)
+        feat_all = pos_atoms.new_empty(N, L, L, self.feat_dim)
+        for i in range(0, L, self.chunk_size):
+            rows = slice(i, i + self.chunk_size)
+            feat_all[:, rows] = self._embed_rows(rows, aa, res_nb, chain_nb, pos_atoms, mask_atoms, structure_mask)
+        return feat_all
+
+    def _embed_rows(self, rows, aa, res_nb, chain_nb, pos_atoms, mask_atoms, structure_mask):
+        """
+        Embeds the pairs (i, j) with i in `rows`.
+        Returns:
+            (N, R, L, feat_dim)
+        """
+        N, L = aa.size()
+
+        mask_residue = mask_atoms[:, :, BBHeavyAtom.CA] # (N, L)
+        mask_pair = mask_residue[:, rows, None] * mask_residue[:, None, :]
+        pair_structure_mask = structure_mask[:, rows, None] * structure_mask[:, None, :] if structure_mask is not None else None
+
+        # Pair identities
+        aa_pair = aa[:,rows,None]*self.max_aa_types + aa[:,None,:]    # (N, R, L)
         feat_aapair = self.aa_pair_embed(aa_pair)
+        R = aa_pair.size(1)
     
         # Relative sequential positions
-        same_chain = (chain_nb[:, :, None] == chain_nb[:, None, :])
+        same_chain = (chain_nb[:, rows, None] == chain_nb[:, None, :])
         relpos = torch.clamp(
-            res_nb[:,:,None] - res_nb[:,None,:], 
+            res_nb[:,rows,None] - res_nb[:,None,:], 
             min=-self.max_relpos, max=self.max_relpos,
-        )   # (N, L, L)
+        )   # (N, R, L)
         feat_relpos = self.relpos_embed(relpos + self.max_relpos) * same_chain[:,:,:,None]
 
         # Distances
         d = angstrom_to_nm(torch.linalg.norm(
-            pos_atoms[:,:,None,:,None] - pos_atoms[:,None,:,None,:],
+            pos_atoms[:,rows,None,:,None] - pos_atoms[:,None,:,None,:],
             dim = -1, ord = 2,
-        )).reshape(N, L, L, -1) # (N, L, L, A*A)
-        c = F.softplus(self.aapair_to_distcoef(aa_pair))    # (N, L, L, A*A)
-        d_gauss = torch.exp(-1 * c * d**2)
-        mask_atom_pair = (mask_atoms[:,:,None,:,None] * mask_atoms[:,None,:,None,:]).reshape(N, L, L, -1)
-        feat_dist = self.distance_embed(d_gauss * mask_atom_pair)
+        )).reshape(N, R, L, -1) # (N, R, L, A*A)
+        c = F.softplus(self.aapair_to_distcoef(aa_pair))    # (N, R, L, A*A)
+        mask_atom_pair = (mask_atoms[:,rows,None,:,None] * mask_atoms[:,None,:,None,:]).reshape(N, R, L, -1)
+        if torch.is_grad_enabled():
+            d_gauss = torch.exp(-1 * c * d**2) * mask_atom_pair
+        else:
+            # Same values, computed in the distance buffer
+            d_gauss = d.square_().mul_(c).neg_().exp_().mul_(mask_atom_pair)
+            del c
+        feat_dist = self.distance_embed(d_gauss)
         if pair_structure_mask is not None:
             # Avoid data leakage at training time
             feat_dist = feat_dist * pair_structure_mask[:, :, :, None]
 
         # Orientations
-        dihed = pairwise_dihedrals(pos_atoms)   # (N, L, L, 2)
+        dihed = pairwise_dihedrals(pos_atoms, rows)   # (N, R, L, 2)
         feat_dihed = self.dihedral_embed(dihed)
         if pair_structure_mask is not None:
             # Avoid data leakage at training time
@@ -95,8 +123,7 @@ class PairEmbedding(nn.Module):
 
         # All
         feat_all = torch.cat([feat_aapair, feat_relpos, feat_dist, feat_dihed], dim=-1)
-        feat_all = self.out_mlp(feat_all)   # (N, L, L, F)
+        feat_all = self.out_mlp(feat_all)   # (N, R, L, F)
         feat_all = feat_all * mask_pair[:, :, :, None]
 
         return feat_all
-
@@ -0,0 +1,31 @@
+import os
+import argparse
+
+from diffab.utils.checkpoint import convert_checkpoint
+
+
+def convert(in_ckpt, out_ckpt=None):
+    """
+    Converts a training checkpoint to a safetensors inference checkpoint.
+    Returns:
+        The path written, `in_ckpt` with a .safetensors suffix by default.
+    """
+    if out_ckpt is None:
+        out_ckpt = os.path.splitext(in_ckpt)[0] + '.safetensors'
+    convert_checkpoint(in_ckpt, out_ckpt)
+    return out_ckpt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('in_ckpt', type=str, nargs='+')
+    parser.add_argument('--out', type=str, default=None, help='Output path (single input only)')
+    args = parser.parse_args()
+    if args.out is not None and len(args.in_ckpt) > 1:
+        parser.error('--out takes a single input checkpoint')
+
+    for in_ckpt in args.in_ckpt:
+        print('%s -> %s' % (in_ckpt, convert(in_ckpt, args.out)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import os
+import argparse
+
+from diffab.modules.diffusion.onnx_backend import export_eps_net
+from diffab.tools.runner.design_for_pdb import load_model
+
+
+def export(in_ckpt, out_path=None):
+    """
+    Exports the per-step network of a checkpoint to ONNX (see
+    `diffab.modules.diffusion.onnx_backend`).
+    Returns:
+        The path written, `in_ckpt` with an .eps_net.onnx suffix by default.
+    """
+    if out_path is None:
+        out_path = os.path.splitext(in_ckpt)[0] + '.eps_net.onnx'
+    model, _ = load_model(in_ckpt, 'cpu')
+    export_eps_net(model.diffusion.eps_net, out_path)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('in_ckpt', type=str, nargs='+')
+    parser.add_argument('--out', type=str, default=None, help='Output path (single input only)')
+    args = parser.parse_args()
+    if args.out is not None and len(args.in_ckpt) > 1:
+        parser.error('--out takes a single input checkpoint')
+
+    for in_ckpt in args.in_ckpt:
+        print('%s -> %s' % (in_ckpt, export(in_ckpt, args.out)))
+
+if __name__ == '__main__':
+    main()
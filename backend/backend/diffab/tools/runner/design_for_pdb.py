@@ -7,11 +7,16 @@ from torch.utils.data import DataLoader
 
 from diffab.datasets.custom import preprocess_antibody_structure
 from diffab.models import get_model
+from diffab.modules.common.noise import BatchGenerator
 from diffab.modules.common.geometry import reconstruct_backbone_partially
 from diffab.modules.common.so3 import so3vec_to_rotation
+from diffab.modules.diffusion.onnx_backend import OrtEpsilonNet, cached_eps_net_path
 from diffab.utils.inference import RemoveNative
 from diffab.utils.protein.writers import save_pdb
 from diffab.utils.train import recursive_to
+from diffab.utils.checkpoint import load_checkpoint, load_inference_weights
+from diffab.utils.compiler import compile_model, get_compile_opt
+from diffab.utils.cpu import apply_cpu_profile, get_cpu_profile
 from diffab.utils.misc import *
 from diffab.utils.data import *
 from diffab.utils.transforms import *
@@ -93,10 +98,91 @@ def create_data_variants(config, structure_factory):
     return data_variants
 
 
-def design_for_pdb(args):
+def schedule_samples(data_variants, num_samples, batch_size):
+    """
+    Packs the samples of all variants into batches of up to `batch_size`.
+    Full batches of a single variant come first (its features are then shared
+    by all samples); the remainders of all variants are packed together.
+    Variants optimized for a different number of steps never share a batch.
+    Returns:
+        List of batches, each a list of (variant index, sample index), sorted.
+    """
+    groups = {}
+    for i, variant in enumerate(data_variants):
+        groups.setdefault(variant.get('opt_step'), []).append(i)
+    schedule = []
+    for variant_idx in groups.values():
+        remainder = []
+        for i in variant_idx:
+            items = [(i, k) for k in range(num_samples)]
+            full = len(items) - len(items) % batch_size
+            schedule += [items[j:j+batch_size] for j in range(0, full, batch_size)]
+            remainder += items[full:]
+        schedule += [remainder[j:j+batch_size] for j in range(0, len(remainder), batch_size)]
+    return schedule
+
+
+def load_model(checkpoint, device, knn=None, cpu_profile=None, backend=None, compile_opt=None):
+    """
+    Build the model stored in a checkpoint, ready for sampling.
+    Args:
+        checkpoint: A `.pt` training checkpoint or a safetensors inference
+                    checkpoint (see `diffab.tools.checkpoint`).
+        knn:    Optional override of the encoder's sparse attention (see
+                `GAEncoder`); it has no weights of its own.
+        cpu_profile:    Optional CPU inference profile (see `diffab.utils.cpu`),
+                        applied when device is a CPU.
+        backend:    Execution of the per-step network when sampling: 'torch'
+                    (default) or 'onnxruntime' (dense attention; applied when
+                    device is a CPU, see `diffab.modules.diffusion.onnx_backend`).
+                    The graph is exported from the float32 weights, so the
+                    profile's bf16 and int8 conversions do not apply to it.
+        compile_opt:    Optional compiled sampling step (see
+                        `diffab.utils.compiler`), torch backend only.
+    Returns:
+        (model, load_state_dict result)
+    """
+    backend = backend or 'torch'
+    if backend not in ('torch', 'onnxruntime'):
+        raise ValueError('Unknown backend: %s' % backend)
+    if torch.device(device).type != 'cpu':
+        backend = 'torch'   # ONNX Runtime runs on CPU only
+    compile_opt = get_compile_opt(compile_opt)
+    if compile_opt is not None and backend != 'torch':
+        raise ValueError('Only the torch backend can be compiled')
+    cfg_ckpt, state_dict = load_checkpoint(checkpoint)
+    if knn is not None:
+        eps_net_opt = cfg_ckpt.model.diffusion.setdefault('eps_net_opt', EasyDict())
+        eps_net_opt.setdefault('encoder_opt', EasyDict())['knn'] = knn
+    model = get_model(cfg_ckpt.model)
+    lsd = load_inference_weights(model, state_dict)
+    model.to(device)
+    model.eval()
+    if backend == 'onnxruntime':
+        onnx_path = cached_eps_net_path(model.diffusion.eps_net)    # Before the profile converts the weights
+    profile = get_cpu_profile(cpu_profile)
+    if profile is not None and torch.device(device).type == 'cpu':
+        apply_cpu_profile(model, profile)
+    if backend == 'onnxruntime':
+        model.diffusion.eps_net_backend = OrtEpsilonNet(onnx_path)
+    if compile_opt is not None:
+        compile_model(model, compile_opt)
+    return model, lsd
+
+
+def design_for_pdb(args, model=None):
+    """
+    Args:
+        args:   Options as produced by `args_from_cmdline` or `args_factory`.
+        model:  An already loaded model (see `load_model`). If None, the
+                checkpoint in the config is loaded.
+    Returns:
+        The log directory that holds the designs.
+    """
     # Load configs
     config, config_name = load_config(args.config)
-    seed_all(args.seed if args.seed is not None else config.sampling.seed)
+    seed = args.seed if args.seed is not None else config.sampling.seed
+    seed_all(seed)
 
     # Structure loading
     data_id = os.path.basename(args.pdb_path)
@@ -137,12 +223,19 @@ def design_for_pdb(args):
     save_pdb(data_native, os.path.join(log_dir, 'reference.pdb'))
 
     # Load checkpoint and model
-    logger.info('Loading model config and checkpoints: %s' % (config.model.checkpoint))
-    ckpt = torch.load(config.model.checkpoint, map_location='cpu')
-    cfg_ckpt = ckpt['config']
-    model = get_model(cfg_ckpt.model).to(args.device)
-    lsd = model.load_state_dict(ckpt['model'])
-    logger.info(str(lsd))
+    if model is None:
+        logger.info('Loading model config and checkpoints: %s' % (config.model.checkpoint))
+        model, lsd = load_model(
+            config.model.checkpoint, args.device,
+            knn=config.model.get('knn'), cpu_profile=config.model.get('cpu_profile'),
+            backend=config.model.get('backend'), compile_opt=config.model.get('compile'),
+        )
+        logger.info(str(lsd))
+    else:
+        logger.info('Using preloaded model.')
+    # Building a model draws from the RNG; reseed so preloaded and freshly
+    # loaded models produce the same samples
+    seed_all(seed)
 
     # Make data variants
     data_variants = create_data_variants(
@@ -161,7 +254,6 @@ def design_for_pdb(args):
         json.dump(metadata, f, indent=2)
 
     # Start sampling
-    collate_fn = PaddingCollate(eight=False)
     inference_tfm = [ PatchAroundAnchor(), ]
     if 'abopt' not in config.mode:  # Don't remove native CDR in optimization mode
         inference_tfm.append(RemoveNative(
@@ -170,89 +262,107 @@ def design_for_pdb(args):
         ))
     inference_tfm = Compose(inference_tfm)
 
+    data_cropped = []
     for variant in data_variants:
         os.makedirs(os.path.join(log_dir, variant['tag']), exist_ok=True)
-        logger.info(f"Start sampling for: {variant['tag']}")
-
         save_pdb(data_native, os.path.join(log_dir, variant['tag'], 'REF1.pdb'))       # w/  OpenMM minimization
-    
-        data_cropped = inference_tfm(
+        data_cropped.append(inference_tfm(
             copy.deepcopy(variant['data'])
+        ))
+
+    # Samples of all variants share batches. Each sample draws its noise from
+    # its own generator, over the same padded length wherever it lands, so the
+    # designs don't depend on the batch size.
+    compile_opt = get_compile_opt(config.model.get('compile'))
+    collate_fn = PaddingCollate(
+        eight=False, min_length=max(d['aa'].size(0) for d in data_cropped),
+        bucket_size=compile_opt and compile_opt.bucket_size,
+    )
+    schedule = schedule_samples(data_variants, config.sampling.num_samples, args.batch_size)
+    logger.info(f'Sampling {len(data_variants)} variant(s) x {config.sampling.num_samples} in {len(schedule)} batch(es)')
+
+    torch.set_grad_enabled(False)
+    model.eval()
+    for items in tqdm(schedule, desc=data_id, dynamic_ncols=True):
+        # Each distinct input is encoded once and broadcast to its samples
+        inputs = sorted(set(i for i, _ in items))
+        repeats = [sum(1 for i, _ in items if i == u) for u in inputs]
+        batch = collate_fn([data_cropped[i] for i in inputs])
+        batch = recursive_to(batch, args.device)
+        generator = BatchGenerator(
+            [BatchGenerator.seed_for(seed, i, k) for i, k in items],
+            device = args.device,
         )
-        data_list_repeat = [ data_cropped ] * config.sampling.num_samples
-        loader = DataLoader(data_list_repeat, batch_size=args.batch_size, shuffle=False, collate_fn=collate_fn)
-        
-        count = 0
-        for batch in tqdm(loader, desc=variant['name'], dynamic_ncols=True):
-            torch.set_grad_enabled(False)
-            model.eval()
-            batch = recursive_to(batch, args.device)
-            if 'abopt' in config.mode:
-                # Antibody optimization starting from native
-                traj_batch = model.optimize(batch, opt_step=variant['opt_step'], optimize_opt={
-                    'pbar': True,
-                    'sample_structure': config.sampling.sample_structure,
-                    'sample_sequence': config.sampling.sample_sequence,
-                })
-            else:
-                # De novo design
-                traj_batch = model.sample(batch, sample_opt={
-                    'pbar': True,
-                    'sample_structure': config.sampling.sample_structure,
-                    'sample_sequence': config.sampling.sample_sequence,
-                })
+        if 'abopt' in config.mode:
+            # Antibody optimization starting from native
+            traj_batch = model.optimize(batch, opt_step=data_variants[items[0][0]]['opt_step'], optimize_opt={
+                'pbar': True,
+                'sample_structure': config.sampling.sample_structure,
+                'sample_sequence': config.sampling.sample_sequence,
+                'generator': generator,
+                'repeats': repeats,
+                'sample_steps': config.sampling.get('sample_steps'),
+            })
+        else:
+            # De novo design
+            traj_batch = model.sample(batch, sample_opt={
+                'pbar': True,
+                'sample_structure': config.sampling.sample_structure,
+                'sample_sequence': config.sampling.sample_sequence,
+                'generator': generator,
+                'repeats': repeats,
+                'sample_steps': config.sampling.get('sample_steps'),
+            })
+        batch = {k: repeat_samples(batch[k], repeats) for k in (
+            'pos_heavyatom', 'chain_nb', 'res_nb', 'mask_heavyatom', 'generate_flag', 'origin',
+        )}
 
-            aa_new = traj_batch[0][2]   # 0: Last sampling step. 2: Amino acid.
-            pos_atom_new, mask_atom_new = reconstruct_backbone_partially(
-                pos_ctx = batch['pos_heavyatom'],
-                R_new = so3vec_to_rotation(traj_batch[0][0]),
-                t_new = traj_batch[0][1],
-                aa = aa_new,
-                chain_nb = batch['chain_nb'],
-                res_nb = batch['res_nb'],
-                mask_atoms = batch['mask_heavyatom'],
-                mask_recons = batch['generate_flag'],
-            )
-            aa_new = aa_new.cpu()
-            pos_atom_new = pos_atom_new.cpu()
-            mask_atom_new = mask_atom_new.cpu()
+        aa_new = traj_batch[0][2]   # 0: Last sampling step. 2: Amino acid.
+        pos_atom_new, mask_atom_new = reconstruct_backbone_partially(
+            pos_ctx = batch['pos_heavyatom'],
+            R_new = so3vec_to_rotation(traj_batch[0][0]),
+            t_new = traj_batch[0][1],
+            aa = aa_new,
+            chain_nb = batch['chain_nb'],
+            res_nb = batch['res_nb'],
+            mask_atoms = batch['mask_heavyatom'],
+            mask_recons = batch['generate_flag'],
+        )
+        aa_new = aa_new.cpu()
+        pos_atom_new = pos_atom_new.cpu()
+        mask_atom_new = mask_atom_new.cpu()
 
-            for i in range(aa_new.size(0)):
-                data_tmpl = variant['data']
-                aa = apply_patch_to_tensor(data_tmpl['aa'], aa_new[i], data_cropped['patch_idx'])
-                mask_ha = apply_patch_to_tensor(data_tmpl['mask_heavyatom'], mask_atom_new[i], data_cropped['patch_idx'])
-                pos_ha  = (
-                    apply_patch_to_tensor(
-                        data_tmpl['pos_heavyatom'], 
-                        pos_atom_new[i] + batch['origin'][i].view(1, 1, 3).cpu(), 
-                        data_cropped['patch_idx']
-                    )
+        # Demultiplex back into each variant's directory
+        for j, (i, k) in enumerate(items):
+            variant = data_variants[i]
+            data_tmpl = variant['data']
+            patch_idx = data_cropped[i]['patch_idx']
+            n = patch_idx.size(0)   # Drop the padding
+            aa = apply_patch_to_tensor(data_tmpl['aa'], aa_new[j, :n], patch_idx)
+            mask_ha = apply_patch_to_tensor(data_tmpl['mask_heavyatom'], mask_atom_new[j, :n], patch_idx)
+            pos_ha  = (
+                apply_patch_to_tensor(
+                    data_tmpl['pos_heavyatom'], 
+                    pos_atom_new[j, :n] + batch['origin'][j].view(1, 1, 3).cpu(), 
+                    patch_idx
                 )
+            )
+
+            save_path = os.path.join(log_dir, variant['tag'], '%04d.pdb' % (k, ))
+            save_pdb({
+                'chain_nb': data_tmpl['chain_nb'],
+                'chain_id': data_tmpl['chain_id'],
+                'resseq': data_tmpl['resseq'],
+                'icode': data_tmpl['icode'],
+                # Generated
+                'aa': aa,
+                'mask_heavyatom': mask_ha,
+                'pos_heavyatom': pos_ha,
+            }, path=save_path)
 
-                save_path = os.path.join(log_dir, variant['tag'], '%04d.pdb' % (count, ))
-                save_pdb({
-                    'chain_nb': data_tmpl['chain_nb'],
-                    'chain_id': data_tmpl['chain_id'],
-                    'resseq': data_tmpl['resseq'],
-                    'icode': data_tmpl['icode'],
-                    # Generated
-                    'aa': aa,
-                    'mask_heavyatom': mask_ha,
-                    'pos_heavyatom': pos_ha,
-                }, path=save_path)
-                # save_pdb({
-                #     'chain_nb': data_cropped['chain_nb'],
-                #     'chain_id': data_cropped['chain_id'],
-                #     'resseq': data_cropped['resseq'],
-                #     'icode': data_cropped['icode'],
-                #     # Generated
-                #     'aa': aa_new[i],
-                #     'mask_heavyatom': mask_atom_new[i],
-                #     'pos_heavyatom': pos_atom_new[i] + batch['origin'][i].view(1, 1, 3).cpu(),
-                # }, path=os.path.join(log_dir, variant['tag'], '%04d_patch.pdb' % (count, )))
-                count += 1
+    logger.info('Finished.\n')
 
-        logger.info('Finished.\n')
+    return log_dir
 
 
 def args_from_cmdline():
@@ -12,6 +12,7 @@ from diffab.modules.common.so3 import so3vec_to_rotation
 from diffab.utils.inference import RemoveNative
 from diffab.utils.protein.writers import save_pdb
 from diffab.utils.train import recursive_to
+from diffab.utils.checkpoint import load_checkpoint, load_inference_weights
 from diffab.utils.misc import *
 from diffab.utils.data import *
 from diffab.utils.transforms import *
@@ -122,10 +123,10 @@ def main():
 
     # Load checkpoint and model
     logger.info('Loading model config and checkpoints: %s' % (config.model.checkpoint))
-    ckpt = torch.load(config.model.checkpoint, map_location='cpu')
-    cfg_ckpt = ckpt['config']
-    model = get_model(cfg_ckpt.model).to(args.device)
-    lsd = model.load_state_dict(ckpt['model'])
+    cfg_ckpt, state_dict = load_checkpoint(config.model.checkpoint)
+    model = get_model(cfg_ckpt.model)
+    lsd = load_inference_weights(model, state_dict)
+    model.to(args.device)
     logger.info(str(lsd))
 
     # Make data variants
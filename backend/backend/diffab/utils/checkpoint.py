@@ -0,0 +1,66 @@
+"""
+Checkpoint formats.
+
+Training writes pickled `.pt` checkpoints bundling `config`, `model`,
+`optimizer` and `scheduler`; `torch.load` reads all of it into memory. For
+inference the weights can be stored as safetensors instead, with the config as
+JSON metadata. Those are memory-mapped on load: nothing is read until used,
+and worker processes loading the same file share its pages.
+"""
+import json
+import torch
+from easydict import EasyDict
+
+
+def is_safetensors(path):
+    """safetensors files start with an 8-byte header size and the JSON header."""
+    with open(path, 'rb') as f:
+        head = f.read(9)
+    return len(head) == 9 and head[8:9] == b'{'
+
+
+def save_inference_checkpoint(path, config, state_dict):
+    """
+    Args:
+        config:     The training config (as stored in `.pt` checkpoints).
+        state_dict: Model weights.
+    """
+    from safetensors.torch import save_file
+    tensors = {k: v.detach().cpu().contiguous() for k, v in state_dict.items()}
+    save_file(tensors, path, metadata={'config': json.dumps(config)})
+
+
+def convert_checkpoint(in_path, out_path):
+    """Writes the config and model weights of a `.pt` checkpoint as safetensors."""
+    ckpt = torch.load(in_path, map_location='cpu', weights_only=False)
+    save_inference_checkpoint(out_path, ckpt['config'], ckpt['model'])
+
+
+def load_checkpoint(path, device='cpu'):
+    """
+    Loads a safetensors (memory-mapped) or `.pt` checkpoint.
+    Returns:
+        (config, model state_dict)
+    """
+    if is_safetensors(path):
+        from safetensors import safe_open
+        from safetensors.torch import load_file
+        with safe_open(path, framework='pt') as f:
+            config = EasyDict(json.loads(f.metadata()['config']))
+        return config, load_file(path, device=str(device))
+
+    # Checkpoints pickle their EasyDict config alongside the weights
+    ckpt = torch.load(path, map_location=device, weights_only=False)
+    return ckpt['config'], ckpt['model']
+
+
+def load_inference_weights(model, state_dict):
+    """
+    Takes the loaded (possibly memory-mapped) tensors as the weights of a
+    freshly built model instead of copying them over its initial ones. Call
+    before moving the model to its device. Not for training: mapped weights
+    are read-only.
+    Returns:
+        The load_state_dict result.
+    """
+    return model.load_state_dict(state_dict, assign=True)
@@ -0,0 +1,66 @@
+"""
+Compiled sampling (`model.compile` in the test configs).
+
+`compile: true` applies the defaults below. A mapping overrides some of them:
+
+    compile:
+      bucket_size: 64   # Pad patches to multiples of 64 residues
+      mode: max-autotune
+"""
+import os
+import torch
+from easydict import EasyDict
+
+from diffab.utils.misc import get_cache_dir
+
+
+COMPILE_DEFAULTS = EasyDict(
+    bucket_size = 32,   # Patch lengths are padded to a multiple of this, one compiled step per length
+    mode = None,        # torch.compile mode
+    backend = 'inductor',
+)
+
+# Compiled graphs per step function: a few lengths times the batch sizes of a run
+RECOMPILE_LIMIT = 64
+
+
+def get_compile_opt(cfg):
+    """
+    Args:
+        cfg:    None / false (off), true (defaults) or a mapping of overrides.
+    Returns:
+        The options, or None if off.
+    """
+    if not cfg:
+        return None
+    opt = EasyDict(COMPILE_DEFAULTS)
+    if isinstance(cfg, dict):
+        unknown = set(cfg) - set(opt)
+        if unknown:
+            raise ValueError('Unknown compile options: %s' % ', '.join(sorted(unknown)))
+        opt.update(cfg)
+    return opt
+
+
+def enable_compile_cache():
+    """
+    Keeps Inductor's compiled kernels in the cache directory (unless
+    TORCHINDUCTOR_CACHE_DIR is set), so later runs skip code generation.
+    """
+    os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', os.path.join(get_cache_dir(), 'inductor'))
+    import torch._dynamo
+    for name in ('recompile_limit', 'cache_size_limit'):    # Renamed in torch 2.7
+        if hasattr(torch._dynamo.config, name):
+            setattr(torch._dynamo.config, name, max(getattr(torch._dynamo.config, name), RECOMPILE_LIMIT))
+            break
+
+
+def compile_model(model, opt):
+    """
+    Compiles the sampling step of a loaded model, in place.
+    Returns:
+        model
+    """
+    enable_compile_cache()
+    model.diffusion.compile_step(mode=opt.mode, backend=opt.backend)
+    return model
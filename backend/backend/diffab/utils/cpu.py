@@ -0,0 +1,91 @@
+"""
+CPU inference profile (`model.cpu_profile` in the test configs).
+
+`cpu_profile: true` applies the defaults below. A mapping overrides some of them:
+
+    cpu_profile:
+      num_threads: 8    # Intra-op threads; null: the CPUs available to the process
+      int8: false       # Keep the MLP stacks in float32
+"""
+import math
+import os
+import torch
+import torch.nn as nn
+from easydict import EasyDict
+
+from diffab.modules.encoders.ga import GABlock
+
+
+CPU_PROFILE_DEFAULTS = EasyDict(
+    num_threads = None,
+    num_interop_threads = 1,    # Sampling is a single stream of ops
+    bf16 = True,    # bf16 autocast of the attention's node and pair features (see `GABlock`)
+    int8 = True,    # Dynamic int8 quantization of the Linear layers in the MLP stacks
+)
+
+
+def get_cpu_profile(cfg):
+    """
+    Args:
+        cfg:    None / false (off), true (defaults) or a mapping of overrides.
+    Returns:
+        The profile, or None if off.
+    """
+    if not cfg:
+        return None
+    profile = EasyDict(CPU_PROFILE_DEFAULTS)
+    if isinstance(cfg, dict):
+        unknown = set(cfg) - set(profile)
+        if unknown:
+            raise ValueError('Unknown cpu_profile options: %s' % ', '.join(sorted(unknown)))
+        profile.update(cfg)
+    return profile
+
+
+def available_cpus():
+    """CPUs this process may run on, capped by the cgroup (v2) CPU quota containers get."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def configure_threads(num_threads=None, num_interop_threads=1):
+    # torch sizes its pool by the host's cores, oversubscribing CPU-limited containers
+    torch.set_num_threads(num_threads or available_cpus())
+    try:
+        torch.set_num_interop_threads(num_interop_threads)
+    except RuntimeError:
+        pass    # Fixed once inter-op work has started in this process
+
+
+def quantize_mlps(model):
+    """Swaps the Linear layers of every nn.Sequential in model for dynamic int8 ones, in place."""
+    from torch.ao.quantization import quantize_dynamic
+    for module in list(model.modules()):
+        for child in module.children():
+            if isinstance(child, nn.Sequential) and any(isinstance(m, nn.Linear) for m in child):
+                quantize_dynamic(child, {nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def apply_cpu_profile(model, profile):
+    """
+    Configures the threads and converts a loaded model for CPU inference, in
+    place. The converted model can no longer load checkpoints.
+    Returns:
+        model
+    """
+    configure_threads(profile.num_threads, profile.num_interop_threads)
+    if profile.int8:
+        quantize_mlps(model)
+    if profile.bf16:
+        for module in model.modules():
+            if isinstance(module, GABlock):
+                module.autocast_dtype = torch.bfloat16
+    return model
@@ -15,12 +15,16 @@ DEFAULT_NO_PADDING = {
 
 class PaddingCollate(object):
 
-    def __init__(self, length_ref_key='aa', pad_values=DEFAULT_PAD_VALUES, no_padding=DEFAULT_NO_PADDING, eight=True):
+    def __init__(self, length_ref_key='aa', pad_values=DEFAULT_PAD_VALUES, no_padding=DEFAULT_NO_PADDING, eight=True, min_length=0, bucket_size=None):
         super().__init__()
         self.length_ref_key = length_ref_key
         self.pad_values = pad_values
         self.no_padding = no_padding
         self.eight = eight
+        self.min_length = min_length
+        # Pads to a multiple of bucket_size instead (overrides eight), so a
+        # compiled sampler sees a few lengths only
+        self.bucket_size = bucket_size
 
     @staticmethod
     def _pad_last(x, n, value=0):
@@ -58,10 +62,12 @@ class PaddingCollate(object):
         return self.pad_values[key]
 
     def __call__(self, data_list):
-        max_length = max([data[self.length_ref_key].size(0) for data in data_list])
+        max_length = max([data[self.length_ref_key].size(0) for data in data_list] + [self.min_length])
         keys = self._get_common_keys(data_list)
         
-        if self.eight:
+        if self.bucket_size:
+            max_length = math.ceil(max_length / self.bucket_size) * self.bucket_size
+        elif self.eight:
             max_length = math.ceil(max_length / 8) * 8
         data_list_padded = []
         for data in data_list:
@@ -75,6 +81,20 @@ class PaddingCollate(object):
         return default_collate(data_list_padded)
 
 
+def repeat_samples(x, repeats):
+    """
+    Args:
+        x:  Per-input tensor, (U, ...).
+        repeats:    Number of samples of each input, (U, ).
+    Returns:
+        (N, ...) with N = sum(repeats). A single input is expanded as a view
+        (no copy); several inputs are repeated with `repeat_interleave`.
+    """
+    if x.size(0) == 1:
+        return x.expand(int(repeats[0]), *x.shape[1:])
+    return torch.repeat_interleave(x, torch.as_tensor(repeats, device=x.device), dim=0)
+
+
 def apply_patch_to_tensor(x_full, x_patch, patch_idx):
     """
     Args:
@@ -36,6 +36,10 @@ class Counter(object):
 def get_logger(name, log_dir=None):
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
+    # Long-lived processes call this once per run; don't stack handlers
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
     formatter = logging.Formatter('[%(asctime)s::%(name)s::%(levelname)s] %(message)s')
 
     stream_handler = logging.StreamHandler()
@@ -52,6 +56,11 @@ def get_logger(name, log_dir=None):
     return logger
 
 
+def get_cache_dir():
+    """Where derived data (angular histograms, ONNX graphs) is kept, $DIFFAB_CACHE_DIR or ~/.cache/diffab."""
+    return os.environ.get('DIFFAB_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'diffab'))
+
+
 def get_new_log_dir(root='./logs', prefix='', tag=''):
     fn = time.strftime('%Y_%m_%d__%H_%M_%S', time.localtime())
     if prefix != '':
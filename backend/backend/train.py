@@ -14,6 +14,7 @@ from diffab.models import get_model
 from diffab.utils.misc import *
 from diffab.utils.data import *
 from diffab.utils.train import *
+from diffab.utils.checkpoint import is_safetensors, load_checkpoint
 
 
 if __name__ == '__main__':
@@ -80,13 +81,19 @@ if __name__ == '__main__':
     if args.resume is not None or args.finetune is not None:
         ckpt_path = args.resume if args.resume is not None else args.finetune
         logger.info('Resuming from checkpoint: %s' % ckpt_path)
-        ckpt = torch.load(ckpt_path, map_location=args.device)
-        it_first = ckpt['iteration']  # + 1
-        model.load_state_dict(ckpt['model'])
-        logger.info('Resuming optimizer states...')
-        optimizer.load_state_dict(ckpt['optimizer'])
-        logger.info('Resuming scheduler states...')
-        scheduler.load_state_dict(ckpt['scheduler'])
+        if is_safetensors(ckpt_path):
+            # Inference weights only: fine-tune from them with fresh optimizer states
+            if args.resume is not None:
+                raise ValueError('Resuming needs a .pt checkpoint with optimizer and scheduler states')
+            model.load_state_dict(load_checkpoint(ckpt_path, device=args.device)[1])
+        else:
+            ckpt = torch.load(ckpt_path, map_location=args.device)
+            it_first = ckpt['iteration']  # + 1
+            model.load_state_dict(ckpt['model'])
+            logger.info('Resuming optimizer states...')
+            optimizer.load_state_dict(ckpt['optimizer'])
+            logger.info('Resuming scheduler states...')
+            scheduler.load_state_dict(ckpt['scheduler'])
 
     # Train
     def train(it):
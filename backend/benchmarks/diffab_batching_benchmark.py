@@ -0,0 +1,121 @@
+"""
+Benchmark: DiffAb designs/second by patch length (L) and batch size.
+
+design_for_pdb now packs the samples of every CDR variant into shared padded
+batches instead of sampling one design per forward pass. This measures the
+sampling loop on its own: every H/L CDR of an antibody-antigen complex, cropped
+to a few patch sizes, sampled at a few batch sizes. With --check, designs at
+each batch size are compared against batch size 1 (they should be identical).
+
+Usage (from backend/; random weights unless --checkpoint is given):
+    python -m benchmarks.diffab_batching_benchmark --device cuda --lengths 64 128 256 --batch-sizes 1 4 16
+    python -m benchmarks.diffab_batching_benchmark --device cpu --steps 10 --check
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLE_PDB = DIFFAB_ROOT / "data" / "examples" / "7DK2_AB_C.pdb"
+CDRS = ["H_CDR1", "H_CDR2", "H_CDR3", "L_CDR1", "L_CDR2", "L_CDR3"]
+
+
+def _model(checkpoint, steps, device):
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    from diffab.tools.runner.design_for_pdb import load_model
+
+    if checkpoint:
+        return load_model(checkpoint, device)[0]
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    cfg.model.diffusion.num_steps = steps
+    torch.manual_seed(0)
+    return get_model(cfg.model).to(device).eval()
+
+
+def _variants(length):
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.tools.runner.design_for_pdb import create_data_variants
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.transforms import Compose, PatchAroundAnchor
+
+    config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=CDRS))
+    structure = lambda: preprocess_antibody_structure({
+        "id": EXAMPLE_PDB.name, "pdb_path": str(EXAMPLE_PDB), "heavy_id": "A", "light_id": "B",
+    })
+    crop = Compose([
+        PatchAroundAnchor(initial_patch_size=length // 2, antigen_size=length // 2),
+        RemoveNative(remove_structure=True, remove_sequence=True),
+    ])
+    return [crop(variant["data"]) for variant in create_data_variants(config, structure)]
+
+
+def _sample_all(model, data, num_samples, batch_size, device):
+    """Runs design_for_pdb's schedule; returns the sampled sequences per (variant, sample)."""
+    import torch
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.tools.runner.design_for_pdb import schedule_samples
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.train import recursive_to
+
+    collate = PaddingCollate(eight=False, min_length=max(d["aa"].size(0) for d in data))
+    designs = {}
+    with torch.no_grad():
+        for items in schedule_samples(data, num_samples, batch_size):
+            inputs = sorted(set(i for i, _ in items))
+            repeats = [sum(1 for i, _ in items if i == u) for u in inputs]
+            batch = recursive_to(collate([data[i] for i in inputs]), device)
+            generator = BatchGenerator([BatchGenerator.seed_for(2022, i, k) for i, k in items], device=device)
+            traj = model.sample(batch, sample_opt={"generator": generator, "repeats": repeats})
+            for j, item in enumerate(items):
+                designs[item] = (traj[0][2][j].cpu(), traj[0][1][j].cpu())
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+    return designs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--samples", type=int, default=4, help="Designs per CDR")
+    parser.add_argument("--steps", type=int, default=100, help="Diffusion steps (random weights only)")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--check", action="store_true", help="Compare designs against batch size 1")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    import torch
+
+    model = _model(args.checkpoint, args.steps, args.device)
+    print(f"{len(CDRS)} CDRs x {args.samples} designs on {args.device}")
+    for length in args.lengths:
+        data = _variants(length)
+        total = len(data) * args.samples
+        reference = None
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            designs = _sample_all(model, data, args.samples, batch_size, args.device)
+            elapsed = time.perf_counter() - start
+            line = f"L={max(d['aa'].size(0) for d in data):<4} batch={batch_size:<3}: {total / elapsed:7.2f} designs/s"
+            if args.check:
+                reference = reference or designs
+                same = all(
+                    torch.equal(designs[key][0], reference[key][0])
+                    and torch.equal(designs[key][1], reference[key][1])
+                    for key in reference
+                )
+                line += f"  identical={same}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
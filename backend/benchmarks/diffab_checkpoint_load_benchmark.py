@@ -0,0 +1,130 @@
+"""
+Benchmark: loading DiffAb checkpoints, pickled .pt vs memory-mapped safetensors.
+
+For every MODE_MAP checkpoint, `load_model` runs in a fresh process on the .pt
+file and on its safetensors conversion (`python -m diffab.tools.checkpoint`).
+Reported per load: wall time, peak RSS, and the resident memory added once
+every weight has been read, split into anonymous pages (private to the
+process) and file-backed pages (shared by every process mapping the file).
+The angular histogram cache is warmed first so model construction does not
+dominate.
+
+Without --weights-dir the .pt files are synthesised like train.py writes them:
+random weights of the matching training config, Adam states and scheduler.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_checkpoint_load_benchmark --weights-dir /workspace/weights/diffab
+    python -m benchmarks.diffab_checkpoint_load_benchmark
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(DIFFAB_ROOT))
+
+# Training configs for the synthesised checkpoints
+TRAIN_CONFIGS = {
+    "codesign_single": "codesign_single.yml",
+    "codesign_multicdrs": "codesign_multicdrs.yml",
+    "abopt_singlecdr": "codesign_multicdrs.yml",
+    "fixedbb_design": "fixbb.yml",
+    "denovo_design": "codesign_single.yml",
+}
+
+
+def _memory():
+    status = dict(line.split(":", 1) for line in Path("/proc/self/status").read_text().splitlines())
+    kb = lambda key: int(status[key].split()[0]) * 1024
+    return {"anon": kb("RssAnon"), "file": kb("RssFile")}
+
+
+def _run(checkpoint):
+    """load_model in this process; returns the time and memory it took."""
+    import torch    # noqa: F401
+    from diffab.tools.runner.design_for_pdb import load_model
+
+    before = _memory()
+    start = time.perf_counter()
+    model, _ = load_model(checkpoint, "cpu")
+    elapsed = time.perf_counter() - start
+    for tensor in model.state_dict().values():    # Read every weight, as sampling on CPU would
+        tensor.sum()
+    after = _memory()
+    return {
+        "time": elapsed,
+        "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "anon": after["anon"] - before["anon"],
+        "file": after["file"] - before["file"],
+    }
+
+
+def _synthesise(mode, path):
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    from diffab.utils.train import get_optimizer, get_scheduler
+
+    with open(DIFFAB_ROOT / "configs" / "train" / TRAIN_CONFIGS[mode]) as f:
+        config = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    model = get_model(config.model)
+    optimizer = get_optimizer(config.train.optimizer, model)
+    scheduler = get_scheduler(config.train.scheduler, optimizer)
+    for param in model.parameters():    # Populate the Adam states
+        param.grad = torch.zeros_like(param)
+    optimizer.step()
+    torch.save({
+        "config": config, "model": model.state_dict(), "optimizer": optimizer.state_dict(),
+        "scheduler": scheduler.state_dict(), "iteration": 1, "avg_val_loss": 0.0,
+    }, path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--weights-dir", default=None, help="Directory of the MODE_MAP .pt files")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_run(args.worker)))
+        return
+
+    from diffab_real_wrapper import MODE_MAP
+    from diffab.tools.checkpoint import convert
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DIFFAB_CACHE_DIR": os.environ.get("DIFFAB_CACHE_DIR", os.path.join(tmp, "cache"))}
+        os.environ.update(env)
+        print(f"load_model(..., 'cpu'), weights from {args.weights_dir or 'synthesised checkpoints'}")
+        for mode, (_, weight_file) in MODE_MAP.items():
+            legacy = Path(args.weights_dir or tmp) / weight_file
+            if args.weights_dir is None:
+                _synthesise(mode, legacy)
+            converted = convert(str(legacy), os.path.join(tmp, Path(weight_file).stem + ".safetensors"))
+            worker = lambda path: subprocess.run(
+                [sys.executable, "-m", "benchmarks.diffab_checkpoint_load_benchmark", "--worker", path],
+                cwd=BACKEND, capture_output=True, text=True, env=env,
+            ).stdout.strip().splitlines()
+            worker(converted)    # Warm up the histogram cache
+            for label, path in (("pt", str(legacy)), ("safetensors", converted)):
+                r = json.loads(worker(path)[-1])
+                print(
+                    f"{mode:<19} {label:<12} {os.path.getsize(path) / 2**20:7.1f} MB file: "
+                    f"{r['time'] * 1000:8.1f} ms  peak RSS {r['peak'] / 2**20:7.1f} MB  "
+                    f"+anon {r['anon'] / 2**20:7.1f} MB  +file-backed {r['file'] / 2**20:7.1f} MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
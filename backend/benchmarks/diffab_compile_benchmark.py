@@ -0,0 +1,121 @@
+"""
+Benchmark: compile-time amortisation of DiffAb's compiled sampling step on CPU.
+
+For each length bucket, fresh processes time the sampling step (network and
+transitions, `FullDPM._step`) of N samples of an L-residue patch:
+
+  eager:    the step as sampling runs it without `model.compile`
+  cold:     `torch.compile`d with an empty Inductor cache (first call compiles)
+  warm:     compiled again in a new process, kernels from the on-disk cache
+
+Reported per bucket: the first-call time of cold and warm (compilation),
+median steady-state step latency of eager and compiled, and the number of
+steps after which the cold and warm compilation pays for itself. The
+angular histogram cache is shared so model construction stays out of it.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_compile_benchmark
+    python -m benchmarks.diffab_compile_benchmark --lengths 96 160 --samples 8 --steps 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+
+
+def _run(length, samples, steps, compiled):
+    """Step timings in this process."""
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.modules.common.so3 import random_uniform_so3
+    from diffab.utils.compiler import compile_model, get_compile_opt
+
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    model = get_model(cfg.model).eval()
+    if compiled:
+        compile_model(model, get_compile_opt(True))
+    diffusion = model.diffusion
+    step = diffusion._compiled_step or diffusion._step
+
+    N, L = samples, length
+    mask_generate = torch.zeros(N, L, dtype=torch.bool)
+    mask_generate[:, L // 3:L // 3 + 12] = True
+    state = (
+        random_uniform_so3([N, L]), torch.randn(1, L, 3).cumsum(dim=1).expand(N, -1, -1) * 3.8,
+        torch.randint(0, 20, (N, L)),
+    )
+    context = (
+        torch.randn(1, L, cfg.model.res_feat_dim).expand(N, -1, -1),
+        torch.randn(1, L, L, cfg.model.pair_feat_dim).expand(N, -1, -1, -1),
+    )
+    timesteps, transitions = diffusion._timesteps(diffusion.num_steps, None)
+    generator = BatchGenerator(range(N))
+    times = []
+    with torch.no_grad():
+        for i in range(len(timesteps), len(timesteps) - steps - 1, -1):
+            beta = diffusion.trans_pos.var_sched.betas[timesteps[i - 1]].expand([N])
+            t_tensor = torch.full([N], i, dtype=torch.long)
+            start = time.perf_counter()
+            state = step(
+                diffusion.eps_net, transitions, *state, *context, beta, t_tensor,
+                mask_generate, torch.ones(N, L, dtype=torch.bool), True, True, generator,
+            )
+            times.append(time.perf_counter() - start)
+    return {"first": times[0], "step": statistics.median(times[1:])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[64, 128, 256], help="Bucketed patch lengths")
+    parser.add_argument("--samples", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=6, help="Timed steps after the first")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_run(args.lengths[0], args.samples, args.steps, args.worker == "compiled")))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DIFFAB_CACHE_DIR": os.environ.get("DIFFAB_CACHE_DIR", os.path.join(tmp, "cache")),
+            "TORCHINDUCTOR_CACHE_DIR": os.path.join(tmp, "inductor"),
+        }
+        worker = lambda mode, length: json.loads(subprocess.run(
+            [sys.executable, "-m", "benchmarks.diffab_compile_benchmark", "--worker", mode,
+             "--lengths", str(length), "--samples", str(args.samples), "--steps", str(args.steps)],
+            cwd=BACKEND, capture_output=True, text=True, env=env, check=True,
+        ).stdout.strip().splitlines()[-1])
+
+        print(f"FullDPM step, codesign_single, N={args.samples}, CPU ({os.cpu_count()} cores), random weights")
+        for length in args.lengths:
+            eager = worker("eager", length)
+            cold = worker("compiled", length)
+            warm = worker("compiled", length)
+            saved = eager["step"] - cold["step"]
+            break_even = lambda r: f"{(r['first'] - eager['step']) / saved:6.0f}" if saved > 0 else "   n/a"
+            print(
+                f"L={length:<4}: eager {eager['step'] * 1000:7.1f} ms/step  compiled {cold['step'] * 1000:7.1f} ms/step "
+                f"(x{eager['step'] / cold['step']:4.2f})  first call cold {cold['first']:6.1f} s, "
+                f"warm {warm['first']:5.1f} s  break-even steps cold {break_even(cold)} warm {break_even(warm)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
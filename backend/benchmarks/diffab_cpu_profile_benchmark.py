@@ -0,0 +1,127 @@
+"""
+Benchmark: accuracy and throughput of the DiffAb CPU inference profile.
+
+Designs the H_CDR3 of the example complexes on CPU with the float32 model and
+with `cpu_profile` variants, from the same seeds:
+
+  fp32:         torch defaults, no profile
+  threads:      the profile's thread settings only
+  bf16:         + bf16 autocast of the attention's node and pair features
+  int8:         + dynamic int8 MLP stacks
+  cpu_profile:  `cpu_profile: true`, all of the above
+
+Reported per variant: AAR (fraction of CDR residues designed as the native
+amino acid), CA RMSD of the CDR to the native one, sequence identity and CA
+RMSD to the fp32 designs of the same seeds, and designs/min over sampling.
+Use real weights for AAR and RMSD; with random weights (no --checkpoint) only
+the agreement with fp32 and the throughput mean anything.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_cpu_profile_benchmark --checkpoint /workspace/weights/diffab/codesign_single.pt
+    python -m benchmarks.diffab_cpu_profile_benchmark --samples 4 --sample-steps 20
+"""
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLES = {
+    "7DK2_AB_C.pdb": ("A", "B"),
+    "3QHF_Fv.pdb": ("H", "L"),
+}
+VARIANTS = {
+    "fp32": None,
+    "threads": {"bf16": False, "int8": False},
+    "bf16": {"bf16": True, "int8": False},
+    "int8": {"bf16": False, "int8": True},
+    "cpu_profile": True,
+}
+
+
+def _model(checkpoint, cpu_profile):
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    from diffab.tools.runner.design_for_pdb import load_model
+    from diffab.utils.cpu import apply_cpu_profile, get_cpu_profile
+
+    if checkpoint:
+        return load_model(checkpoint, "cpu", cpu_profile=cpu_profile)[0]
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    model = get_model(cfg.model).eval()
+    profile = get_cpu_profile(cpu_profile)
+    return apply_cpu_profile(model, profile) if profile else model
+
+
+def _examples():
+    """(name, native batch, batch with the CDR removed) of each example's H_CDR3 patch."""
+    import torch
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.tools.runner.design_for_pdb import create_data_variants
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.transforms import PatchAroundAnchor
+
+    collate = PaddingCollate(eight=False)
+    for name, (heavy, light) in EXAMPLES.items():
+        structure = lambda: preprocess_antibody_structure({
+            "id": name, "pdb_path": str(DIFFAB_ROOT / "data" / "examples" / name),
+            "heavy_id": heavy, "light_id": light,
+        })
+        config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=["H_CDR3"]))
+        native = PatchAroundAnchor()(create_data_variants(config, structure)[0]["data"])
+        torch.manual_seed(0)
+        masked = RemoveNative(remove_structure=True, remove_sequence=True)(copy.deepcopy(native))
+        yield name, collate([native]), collate([masked])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument("--sample-steps", type=int, default=None, help="Strided sampler steps (default: all)")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    import torch
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.utils.protein.constants import BBHeavyAtom
+
+    examples = list(_examples())
+    print(f"H_CDR3, {args.samples} samples, {args.sample_steps or 'all'} steps on CPU "
+          f"({'random weights' if not args.checkpoint else args.checkpoint})")
+    reference = {}
+    for variant in args.variants:
+        model = _model(args.checkpoint, VARIANTS[variant])
+        for name, native, batch in examples:
+            mask = batch["generate_flag"][0]
+            generator = BatchGenerator([BatchGenerator.seed_for(2022, 0, k) for k in range(args.samples)])
+            start = time.perf_counter()
+            with torch.no_grad():
+                _, pos, aa = model.sample(batch, sample_opt={
+                    "generator": generator, "repeats": [args.samples], "sample_steps": args.sample_steps,
+                })[0]
+            elapsed = time.perf_counter() - start
+            pos, aa = pos[:, mask], aa[:, mask]
+            reference.setdefault(name, (pos, aa))
+            rmsd = lambda a, b: ((a - b) ** 2).sum(-1).mean(-1).sqrt().mean()
+            native_ca = native["pos_heavyatom"][0, mask, BBHeavyAtom.CA]
+            pos_ref, aa_ref = reference[name]
+            print(
+                f"{variant:<12} {name:<14} L={mask.size(0):<4}: AAR {(aa == native['aa'][0, mask]).float().mean():.3f}  "
+                f"RMSD {rmsd(pos, native_ca):6.3f} A  vs fp32: identity {(aa == aa_ref).float().mean():.3f} "
+                f"RMSD {rmsd(pos, pos_ref):6.3f} A  {args.samples / elapsed * 60:7.2f} designs/min"
+            )
+
+
+if __name__ == "__main__":
+    main()
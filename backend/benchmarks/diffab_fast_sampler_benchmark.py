@@ -0,0 +1,105 @@
+"""
+Benchmark: DiffAb quality vs speed of the strided (few-step) sampler.
+
+Designs the CDRs of an example complex with every step count in --steps. Each
+design is scored against the native structure with tools/eval/similarity.py:
+CA RMSD of the CDR (Å) and amino acid recovery (AAR, % identity). Use real
+weights; with random weights (no --checkpoint) only the timings mean anything.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_fast_sampler_benchmark --checkpoint /workspace/weights/diffab/codesign_single.pt \\
+        --device cuda --steps 100 50 20 10 --samples 16
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLE_PDB = DIFFAB_ROOT / "data" / "examples" / "7DK2_AB_C.pdb"
+
+
+def _score(log_dir: Path):
+    """(rmsd, aar) of every design in log_dir against its reference.pdb."""
+    from Bio.PDB import PDBParser
+    from diffab.tools.eval.similarity import extract_reslist, reslist_rmsd, reslist_seqid
+
+    parser = PDBParser(QUIET=True)
+    native = parser.get_structure("ref", log_dir / "reference.pdb")[0]
+    rmsd, aar = [], []
+    for item in json.loads((log_dir / "metadata.json").read_text())["items"]:
+        ref = extract_reslist(native, item["residue_first"], item["residue_last"])
+        for path in sorted((log_dir / item["tag"]).glob("0*.pdb")):
+            gen = extract_reslist(parser.get_structure("gen", path)[0], item["residue_first"], item["residue_last"])
+            rmsd.append(reslist_rmsd(gen, ref))
+            aar.append(reslist_seqid(gen, ref))
+    return rmsd, aar
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--steps", type=int, nargs="+", default=[100, 50, 20, 10])
+    parser.add_argument("--samples", type=int, default=8, help="Designs per CDR")
+    parser.add_argument("--cdrs", nargs="+", default=["H_CDR1", "H_CDR2", "H_CDR3"])
+    parser.add_argument("--pdb", default=str(EXAMPLE_PDB))
+    parser.add_argument("--heavy", default="A")
+    parser.add_argument("--light", default="B")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    import torch
+    from diffab.tools.runner.design_for_pdb import args_factory, design_for_pdb, load_model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        checkpoint = args.checkpoint
+        if checkpoint is None:
+            from easydict import EasyDict
+            from diffab.models import get_model
+
+            print("No --checkpoint: random weights, RMSD/AAR are meaningless")
+            with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+                cfg = EasyDict(yaml.safe_load(f))
+            torch.manual_seed(0)
+            checkpoint = str(tmp / "random.pt")
+            torch.save({"config": cfg, "model": get_model(cfg.model).state_dict()}, checkpoint)
+        model, _ = load_model(checkpoint, args.device)
+
+        print(f"{len(args.cdrs)} CDRs x {args.samples} designs of {Path(args.pdb).name} on {args.device}")
+        for steps in args.steps:
+            config = {
+                "mode": "single_cdr",
+                "model": {"checkpoint": checkpoint},
+                "sampling": {
+                    "seed": 2022, "sample_structure": True, "sample_sequence": True,
+                    "cdrs": args.cdrs, "num_samples": args.samples, "sample_steps": steps,
+                },
+            }
+            config_path = tmp / f"steps{steps}.yml"
+            config_path.write_text(yaml.dump(config))
+
+            start = time.perf_counter()
+            log_dir = design_for_pdb(args_factory(
+                pdb_path=args.pdb, heavy=args.heavy, light=args.light, no_renumber=True,
+                config=str(config_path), out_root=str(tmp / f"out{steps}"), device=args.device,
+                batch_size=args.batch_size,
+            ), model=model)
+            elapsed = time.perf_counter() - start
+            rmsd, aar = _score(Path(log_dir))
+            print(
+                f"steps={steps:<4}: {elapsed / len(rmsd):6.2f} s/design  "
+                f"RMSD {np.mean(rmsd):5.2f} ± {np.std(rmsd):4.2f} Å  AAR {np.mean(aar):5.1f} %"
+            )
+
+
+if __name__ == "__main__":
+    main()
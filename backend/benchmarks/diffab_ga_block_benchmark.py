@@ -0,0 +1,101 @@
+"""
+Benchmark: time and peak memory of one GABlock layer by patch length (L).
+
+GABlock used to build (N, L, L, n_heads, C) products for the pair, node and
+point aggregations and (N, L, L, n_heads, P*3) query-key differences for the
+spatial logits. They are now matmul contractions, and chunk_size bounds the
+(N, R, L, n_heads) logits and weights to R query rows at a time. Each run is a
+fresh process over N samples of one input (pair features shared, as in
+sampling); peak is the CUDA peak on GPU and the max RSS on CPU. --diffab-root
+points at another checkout (e.g. a `git worktree` of an older commit) to
+compare against it.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_ga_block_benchmark --device cuda --lengths 128 256 512 --samples 16
+    python -m benchmarks.diffab_ga_block_benchmark --device cpu --lengths 64 128 256 --chunk-sizes null 32
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+
+
+def _run(length, chunk_size, samples, device, repeats=3):
+    """One GABlock layer in this process; returns the best time and the peak memory."""
+    import torch
+    from diffab.modules.common.geometry import construct_3d_basis
+    from diffab.modules.encoders.ga import GABlock
+
+    torch.manual_seed(0)
+    block = GABlock(128, 64).to(device).eval()
+    block.chunk_size = chunk_size
+    N, L = samples, length
+    t = torch.randn(N, L, 3, device=device).cumsum(dim=1) * 2
+    R = construct_3d_basis(t, t + torch.randn_like(t), t + torch.randn_like(t))
+    x = torch.randn(N, L, 128, device=device)
+    z = torch.randn(1, L, L, 64, device=device).expand(N, -1, -1, -1)
+    mask = torch.ones(N, L, dtype=torch.bool, device=device)
+
+    best = float("inf")
+    with torch.no_grad():
+        for _ in range(repeats):
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            block(R, t, x, z, mask)
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            best = min(best, time.perf_counter() - start)
+
+    if device.startswith("cuda"):
+        peak = torch.cuda.max_memory_allocated()
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {"time": best, "peak": peak}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--chunk-sizes", type=json.loads, nargs="+", default=[None, 64])
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--diffab-root", default=str(DIFFAB_ROOT))
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.diffab_root)
+    if args.worker:
+        length, chunk_size = json.loads(args.worker)
+        try:
+            print(json.dumps(_run(length, chunk_size, args.samples, args.device)))
+        except (MemoryError, RuntimeError) as e:
+            print(json.dumps({"error": str(e).splitlines()[0]}))
+        return
+
+    print(f"GABlock(128, 64), {args.samples} samples on {args.device}, diffab from {args.diffab_root}")
+    for length in args.lengths:
+        for chunk_size in args.chunk_sizes:
+            # A fresh process per run so the peak RSS is not carried over
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.diffab_ga_block_benchmark",
+                 "--samples", str(args.samples), "--device", args.device,
+                 "--diffab-root", args.diffab_root, "--worker", json.dumps([length, chunk_size])],
+                cwd=BACKEND, capture_output=True, text=True,
+            ).stdout.strip().splitlines()
+            r = json.loads(out[-1]) if out else {"error": "worker died"}
+            label = f"L={length:<4} chunk_size={json.dumps(chunk_size):<5}"
+            if "error" in r:
+                print(f"{label}: OOM ({r['error'][:60]})")
+                continue
+            print(f"{label}: {r['time'] * 1000:9.1f} ms  peak {r['peak'] / 2**20:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: dense vs k-nearest-neighbour attention in the DiffAb encoder.
+
+With encoder_opt.knn set (model config, or `knn` in the design config's model
+section), each residue attends only to its K nearest residues by CA distance
+plus every generated residue. Two parts:
+
+  accuracy:   one denoising network evaluation on the H_CDR3 patches of the
+              example complexes, kNN vs dense: relative error of the position
+              update, rotation angle between the updated orientations, and
+              total variation between the predicted sequence distributions.
+  throughput: one network evaluation on random chain-like patches of length L,
+              in designs/s.
+
+Use real weights for the accuracy part; random weights (no --checkpoint) only
+show how far the two modes drift apart.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_knn_attention_benchmark --checkpoint /workspace/weights/diffab/codesign_single.pt --device cuda
+    python -m benchmarks.diffab_knn_attention_benchmark --device cpu --knn 32 --lengths 256 512
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLES = {
+    "7DK2_AB_C.pdb": ("A", "B"),
+    "3QHF_Fv.pdb": ("H", "L"),
+}
+
+
+def _model(checkpoint, device):
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    from diffab.tools.runner.design_for_pdb import load_model
+
+    if checkpoint:
+        return load_model(checkpoint, device)[0]
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    return get_model(cfg.model).to(device).eval()
+
+
+def _eps_net_inputs(model, batch, t):
+    """Encodes a batch and noises its CDR to step t, as FullDPM.sample would see it."""
+    import torch
+
+    res_feat, pair_feat, R, p = model.encode(batch, remove_structure=True, remove_sequence=True)
+    diffusion = model.diffusion
+    mask_generate, mask_res = batch["generate_flag"], batch["mask"]
+    N = mask_res.size(0)
+    t_tensor = torch.full([N], t, dtype=torch.long, device=mask_res.device)
+    from diffab.modules.common.so3 import rotation_to_so3vec
+
+    v, _ = diffusion.trans_rot.add_noise(rotation_to_so3vec(R), mask_generate, t_tensor)
+    p, _ = diffusion.trans_pos.add_noise(diffusion._normalize_position(p), mask_generate, t_tensor)
+    _, s = diffusion.trans_seq.add_noise(batch["aa"], mask_generate, t_tensor)
+    beta = diffusion.trans_pos.var_sched.betas[t].expand([N])
+    return v, p, s, res_feat, pair_feat, beta, mask_generate, mask_res
+
+
+def _accuracy(model, knns, device, t):
+    import torch
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.modules.common.so3 import so3vec_to_rotation
+    from diffab.tools.runner.design_for_pdb import create_data_variants
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.train import recursive_to
+    from diffab.utils.transforms import Compose, PatchAroundAnchor
+
+    encoder = model.diffusion.eps_net.encoder
+    for name, (heavy, light) in EXAMPLES.items():
+        structure = lambda: preprocess_antibody_structure({
+            "id": name, "pdb_path": str(DIFFAB_ROOT / "data" / "examples" / name),
+            "heavy_id": heavy, "light_id": light,
+        })
+        config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=["H_CDR3"]))
+        torch.manual_seed(0)
+        data = Compose([PatchAroundAnchor(), RemoveNative(remove_structure=True, remove_sequence=True)])(
+            create_data_variants(config, structure)[0]["data"]
+        )
+        batch = recursive_to(PaddingCollate(eight=False)([data]), device)
+        with torch.no_grad():
+            torch.manual_seed(0)
+            inputs = _eps_net_inputs(model, batch, t)
+            mask = inputs[6]
+            encoder.knn = None
+            v_ref, _, eps_ref, c_ref = model.diffusion.eps_net(*inputs)
+            for knn in knns:
+                encoder.knn = knn
+                v, _, eps, c = model.diffusion.eps_net(*inputs)
+                rel_eps = (eps - eps_ref)[mask].norm() / eps_ref[mask].norm()
+                R_diff = so3vec_to_rotation(v[mask]).transpose(-1, -2) @ so3vec_to_rotation(v_ref[mask])
+                angle = torch.rad2deg(torch.acos(((R_diff.diagonal(dim1=-2, dim2=-1).sum(-1) - 1) / 2).clamp(-1, 1)))
+                tv = (c - c_ref)[mask].abs().sum(-1).mean() / 2
+                print(
+                    f"{name:<14} L={data['aa'].size(0):<4} knn={knn:<4}: eps_pos rel err {rel_eps:.4f}  "
+                    f"rotation {angle.mean():6.3f} deg  sequence TV {tv:.4f}"
+                )
+    encoder.knn = None
+
+
+def _throughput(model, knns, lengths, samples, device):
+    import torch
+    from diffab.modules.common.so3 import random_uniform_so3
+
+    encoder = model.diffusion.eps_net.encoder
+    res_dim = model.cfg.res_feat_dim
+    pair_dim = model.cfg.pair_feat_dim
+    for length in lengths:
+        torch.manual_seed(0)
+        N, L = samples, length
+        p = torch.randn(1, L, 3, device=device).cumsum(dim=1).expand(N, -1, -1) * 0.38 / model.diffusion.position_scale
+        mask_generate = torch.zeros(N, L, dtype=torch.bool, device=device)
+        mask_generate[:, L // 4:L // 4 + 12] = True
+        inputs = (
+            random_uniform_so3([N, L], device=device), p, torch.randint(0, 20, (N, L), device=device),
+            torch.randn(1, L, res_dim, device=device).expand(N, -1, -1),
+            torch.randn(1, L, L, pair_dim, device=device).expand(N, -1, -1, -1),
+            torch.full([N], 0.01, device=device), mask_generate, torch.ones(N, L, dtype=torch.bool, device=device),
+        )
+        for knn in [None] + knns:
+            encoder.knn = knn
+            with torch.no_grad():
+                if device.startswith("cuda"):
+                    torch.cuda.synchronize()
+                start = time.perf_counter()
+                model.diffusion.eps_net(*inputs)
+                if device.startswith("cuda"):
+                    torch.cuda.synchronize()
+                elapsed = time.perf_counter() - start
+            label = "dense" if knn is None else f"knn={knn}"
+            print(f"L={length:<5} {label:<9}: {elapsed * 1000:9.1f} ms/step  {samples / elapsed:8.2f} designs*steps/s")
+    encoder.knn = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--knn", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--samples", type=int, default=1)
+    parser.add_argument("--step", type=int, default=50, help="Diffusion step of the accuracy check")
+    parser.add_argument("--device", default="cuda")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    model = _model(args.checkpoint, args.device)
+    print(f"accuracy vs dense attention at step {args.step} ({'random weights' if not args.checkpoint else args.checkpoint})")
+    _accuracy(model, args.knn, args.device, args.step)
+    print(f"throughput, {args.samples} samples on {args.device}")
+    _throughput(model, args.knn, args.lengths, args.samples, args.device)
+
+
+if __name__ == "__main__":
+    main()
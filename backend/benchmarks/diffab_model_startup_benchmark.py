@@ -0,0 +1,72 @@
+"""
+Benchmark: time to construct the DiffAb model, cold and with saved histograms.
+
+RotationTransition builds two ApproxAngularDistributions, whose histograms are
+the pdf on 8192 bins x 1024 series terms for every stddev. They are saved under
+$DIFFAB_CACHE_DIR on the first construction and memory-mapped afterwards. Each
+run is a fresh process building `get_model(cfg.model)` from the training
+config: "cold" with an empty cache directory, "warm" reusing it. --diffab-root
+points at another checkout (e.g. a `git worktree` of an older commit) to
+compare against it.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_model_startup_benchmark
+    python -m benchmarks.diffab_model_startup_benchmark --diffab-root /tmp/diffab-old/backend/backend --warm-runs 1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+
+
+def _run():
+    """Builds the model in this process; returns the import and construction times."""
+    import yaml
+
+    start = time.perf_counter()
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    imported = time.perf_counter()
+
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    get_model(cfg.model)
+    return {"import": imported - start, "construct": time.perf_counter() - imported}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--warm-runs", type=int, default=3)
+    parser.add_argument("--diffab-root", default=str(DIFFAB_ROOT))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        sys.path.insert(0, args.diffab_root)
+        print(json.dumps(_run()))
+        return
+
+    print(f"get_model(codesign_single), diffab from {args.diffab_root}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ["cold"] + ["warm"] * args.warm_runs:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.diffab_model_startup_benchmark",
+                 "--diffab-root", args.diffab_root, "--worker"],
+                cwd=BACKEND, capture_output=True, text=True,
+                env={**os.environ, "DIFFAB_CACHE_DIR": cache_dir},
+            ).stdout.strip().splitlines()
+            r = json.loads(out[-1])
+            print(f"{label}: import {r['import'] * 1000:8.1f} ms  construct {r['construct'] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark: DiffAb's per-step network in eager torch vs ONNX Runtime on CPU.
+
+Per step: one EpsilonNet call on N samples of an L-residue patch with shared
+pair features, as in sampling, eager vs the exported graph (median of
+--repeats calls after a warm-up call). The max abs difference of the outputs
+is reported alongside.
+
+Per design: H_CDR3 designs of the example complexes with `backend: torch` and
+`backend: onnxruntime`, from the same seeds, in designs/min over sampling,
+with the CA RMSD between the two backends' designs.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_onnx_benchmark --checkpoint /workspace/weights/diffab/codesign_single.pt
+    python -m benchmarks.diffab_onnx_benchmark --samples 4 --sample-steps 20
+"""
+import argparse
+import copy
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLES = {
+    "7DK2_AB_C.pdb": ("A", "B"),
+    "3QHF_Fv.pdb": ("H", "L"),
+}
+STEP_SHAPES = [(1, 64), (8, 64), (8, 128), (8, 256), (16, 128)]
+
+
+def _model(checkpoint):
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    from diffab.tools.runner.design_for_pdb import load_model
+
+    if checkpoint:
+        return load_model(checkpoint, "cpu")[0]
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    return get_model(cfg.model).eval()
+
+
+def _step_inputs(eps_net, N, L):
+    import torch
+    from diffab.modules.common.so3 import random_uniform_so3
+
+    res_feat_dim = eps_net.current_sequence_embedding.embedding_dim
+    pair_feat_dim = eps_net.encoder.blocks[0].pair_feat_dim
+    mask_generate = torch.zeros(N, L, dtype=torch.bool)
+    mask_generate[:, L // 3:L // 3 + 12] = True
+    return (
+        random_uniform_so3([N, L]), torch.randn(1, L, 3).cumsum(dim=1).expand(N, -1, -1) * 0.38,
+        torch.randint(0, 20, (N, L)), torch.randn(1, L, res_feat_dim).expand(N, -1, -1),
+        torch.randn(1, L, L, pair_feat_dim).expand(N, -1, -1, -1), torch.full([N], 0.01),
+        mask_generate, torch.ones(N, L, dtype=torch.bool),
+    )
+
+
+def _median_ms(fn, repeats):
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def _examples():
+    """(name, native batch, batch with the CDR removed) of each example's H_CDR3 patch."""
+    import torch
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.tools.runner.design_for_pdb import create_data_variants
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.transforms import PatchAroundAnchor
+
+    collate = PaddingCollate(eight=False)
+    for name, (heavy, light) in EXAMPLES.items():
+        structure = lambda: preprocess_antibody_structure({
+            "id": name, "pdb_path": str(DIFFAB_ROOT / "data" / "examples" / name),
+            "heavy_id": heavy, "light_id": light,
+        })
+        config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=["H_CDR3"]))
+        native = PatchAroundAnchor()(create_data_variants(config, structure)[0]["data"])
+        torch.manual_seed(0)
+        masked = RemoveNative(remove_structure=True, remove_sequence=True)(copy.deepcopy(native))
+        yield name, collate([masked])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument("--sample-steps", type=int, default=None, help="Strided sampler steps (default: all)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    import torch
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.modules.diffusion.onnx_backend import OrtEpsilonNet, export_eps_net
+
+    model = _model(args.checkpoint)
+    eps_net = model.diffusion.eps_net
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ort_net = OrtEpsilonNet(export_eps_net(eps_net, os.path.join(tmp, "eps_net.onnx")))
+        print(f"Export and session: {time.perf_counter() - start:.1f} s, "
+              f"{torch.get_num_threads()} threads ({'random weights' if not args.checkpoint else args.checkpoint})")
+
+        for N, L in STEP_SHAPES:
+            inputs = _step_inputs(eps_net, N, L)
+            with torch.no_grad():
+                eager_ms = _median_ms(lambda: eps_net(*inputs), args.repeats)
+                ort_ms = _median_ms(lambda: ort_net(*inputs), args.repeats)
+                diff = max((a - b).abs().max().item() for a, b in zip(eps_net(*inputs), ort_net(*inputs)))
+            print(f"step N={N:<3} L={L:<4}: eager {eager_ms:8.1f} ms  onnxruntime {ort_ms:8.1f} ms  "
+                  f"x{eager_ms / ort_ms:4.2f}  max |diff| {diff:.1e}")
+
+        ort_model = copy.copy(model)
+        ort_model.diffusion = copy.copy(model.diffusion)
+        ort_model.diffusion.eps_net_backend = ort_net
+        for name, batch in _examples():
+            mask = batch["generate_flag"][0]
+            results = {}
+            for label, m in (("torch", model), ("onnxruntime", ort_model)):
+                generator = BatchGenerator([BatchGenerator.seed_for(2022, 0, k) for k in range(args.samples)])
+                start = time.perf_counter()
+                with torch.no_grad():
+                    _, pos, _ = m.sample(batch, sample_opt={
+                        "generator": generator, "repeats": [args.samples], "sample_steps": args.sample_steps,
+                    })[0]
+                results[label] = (time.perf_counter() - start, pos[:, mask])
+            rmsd = ((results["torch"][1] - results["onnxruntime"][1]) ** 2).sum(-1).mean(-1).sqrt().mean()
+            print(f"design {name:<14} L={mask.size(0):<4}: " + "  ".join(
+                f"{label} {args.samples / elapsed * 60:7.2f} designs/min" for label, (elapsed, _) in results.items()
+            ) + f"  CA RMSD between backends {rmsd:.3f} A")
+
+
+if __name__ == "__main__":
+    main()
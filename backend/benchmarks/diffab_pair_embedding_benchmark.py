@@ -0,0 +1,94 @@
+"""
+Benchmark: peak memory of PairEmbedding, full vs row-chunked.
+
+PairEmbedding used to materialise every (L, L, A, A) atom-pair intermediate of
+the patch at once (coordinate differences, distances, Gaussian coefficients).
+It now embeds chunk_size rows of the pair map at a time, so those are bounded
+by chunk_size * L and only the (L, L, C) output grows with L^2. For each chunk
+size this embeds random patches of growing L in a fresh process capped at
+--budget-gb of data memory and reports the peak RSS, or OOM, and then the
+largest L that fits.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_pair_embedding_benchmark --budget-gb 4
+    python -m benchmarks.diffab_pair_embedding_benchmark --lengths 256 512 1024 2048 --chunk-sizes null 64 16
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+
+
+def _run(length, chunk_size, feat_dim, samples):
+    """Embeds one random patch in this process; returns time and peak memory."""
+    import torch
+    from diffab.modules.encoders.pair import PairEmbedding
+    from diffab.utils.protein.constants import max_num_heavyatoms
+
+    torch.manual_seed(0)
+    embed = PairEmbedding(feat_dim, max_num_heavyatoms, chunk_size=chunk_size).eval()
+    N, L, A = samples, length, max_num_heavyatoms
+    inputs = dict(
+        aa=torch.randint(0, 20, (N, L)),
+        res_nb=torch.arange(L).expand(N, L),
+        chain_nb=(torch.arange(L) >= L // 2).long().expand(N, L),
+        pos_atoms=torch.randn(N, L, A, 3) * 20,
+        mask_atoms=torch.ones(N, L, A, dtype=torch.bool),
+    )
+    with torch.no_grad():
+        start = time.perf_counter()
+        embed(**inputs)
+        elapsed = time.perf_counter() - start
+    return {"time": elapsed, "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[128, 256, 384, 512, 768, 1024, 1536, 2048])
+    parser.add_argument("--chunk-sizes", type=json.loads, nargs="+", default=[None, 32])
+    parser.add_argument("--feat-dim", type=int, default=64)
+    parser.add_argument("--samples", type=int, default=1)
+    parser.add_argument("--budget-gb", type=float, default=4.0)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    if args.worker:
+        length, chunk_size = json.loads(args.worker)
+        budget = int(args.budget_gb * 2**30)
+        resource.setrlimit(resource.RLIMIT_DATA, (budget, budget))
+        try:
+            print(json.dumps(_run(length, chunk_size, args.feat_dim, args.samples)))
+        except (MemoryError, RuntimeError) as e:
+            print(json.dumps({"error": str(e).splitlines()[0]}))
+        return
+
+    print(f"PairEmbedding(feat_dim={args.feat_dim}), N={args.samples}, budget {args.budget_gb} GB")
+    for chunk_size in args.chunk_sizes:
+        largest = None
+        for length in args.lengths:
+            # A fresh process per run so the peak RSS is not carried over
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.diffab_pair_embedding_benchmark",
+                 "--feat-dim", str(args.feat_dim), "--samples", str(args.samples),
+                 "--budget-gb", str(args.budget_gb), "--worker", json.dumps([length, chunk_size])],
+                cwd=BACKEND, capture_output=True, text=True,
+            ).stdout.strip().splitlines()
+            r = json.loads(out[-1]) if out else {"error": "worker died"}
+            label = f"L={length:<5} chunk_size={json.dumps(chunk_size):<5}"
+            if "error" in r:
+                print(f"{label}: OOM ({r['error'][:60]})")
+                break
+            largest = length
+            print(f"{label}: peak {r['peak'] / 2**20:8.1f} MB  {r['time']:7.2f} s")
+        print(f"chunk_size={json.dumps(chunk_size)}: largest L within budget: {largest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: encoding each input once and broadcasting it across samples.
+
+Before, a batch of N samples of one CDR held N identical copies of the input:
+ResidueEmbedding/PairEmbedding ran N times and N (L, L, C) pair tensors stayed
+alive for the whole diffusion loop. Now the input is encoded once and expanded
+(a stride-0 view) inside FullDPM.sample. For each N this reports the encode
+time, the pair-feature bytes and the peak memory of one sampling batch (CUDA
+peak on GPU, max RSS of a fresh process on CPU), copied vs shared.
+
+Usage (from backend/; random weights):
+    python -m benchmarks.diffab_shared_encoding_benchmark --device cuda --samples 1 4 16 32
+    python -m benchmarks.diffab_shared_encoding_benchmark --device cpu --steps 5 --samples 1 4 8
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLE_PDB = DIFFAB_ROOT / "data" / "examples" / "7DK2_AB_C.pdb"
+
+
+def _setup(steps, device):
+    import torch
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.models import get_model
+    from diffab.tools.runner.design_for_pdb import create_data_variants
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.transforms import Compose, PatchAroundAnchor
+
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    cfg.model.diffusion.num_steps = steps
+    torch.manual_seed(0)
+    model = get_model(cfg.model).to(device).eval()
+
+    config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=["H_CDR3"]))
+    structure = lambda: preprocess_antibody_structure({
+        "id": EXAMPLE_PDB.name, "pdb_path": str(EXAMPLE_PDB), "heavy_id": "A", "light_id": "B",
+    })
+    crop = Compose([PatchAroundAnchor(), RemoveNative(remove_structure=True, remove_sequence=True)])
+    data = crop(create_data_variants(config, structure)[0]["data"])
+    return model, data
+
+
+def _run(num_samples, shared, steps, device):
+    """One sampling batch in this process; returns timings and memory."""
+    import torch
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.train import recursive_to
+
+    model, data = _setup(steps, device)
+    inputs = [data] if shared else [data] * num_samples
+    batch = recursive_to(PaddingCollate(eight=False)(inputs), device)
+    sample_opt = {"generator": BatchGenerator(range(num_samples), device=device)}
+    if shared:
+        sample_opt["repeats"] = [num_samples]
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+
+    with torch.no_grad():
+        start = time.perf_counter()
+        _, pair_feat, _, _ = model.encode(batch, remove_structure=True, remove_sequence=True)
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        encode = time.perf_counter() - start
+        pair_bytes = pair_feat.untyped_storage().nbytes()
+        del pair_feat
+
+        start = time.perf_counter()
+        model.sample(batch, sample_opt=sample_opt)
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        sample = time.perf_counter() - start
+
+    if device.startswith("cuda"):
+        peak = torch.cuda.max_memory_allocated()
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {
+        "L": data["aa"].size(0), "encode": encode, "sample": sample,
+        "pair_bytes": pair_bytes, "peak": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    if args.worker:
+        num_samples, shared = json.loads(args.worker)
+        print(json.dumps(_run(num_samples, shared, args.steps, args.device)))
+        return
+
+    print(f"H_CDR3 of {EXAMPLE_PDB.name}, {args.steps} steps on {args.device}")
+    for num_samples in args.samples:
+        for shared in (False, True):
+            # A fresh process per run so the CPU peak RSS is not carried over
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.diffab_shared_encoding_benchmark",
+                 "--steps", str(args.steps), "--device", args.device,
+                 "--worker", json.dumps([num_samples, shared])],
+                cwd=BACKEND, check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            label = "shared" if shared else "copied"
+            print(
+                f"L={r['L']:<4} N={num_samples:<3} {label}: encode {r['encode'] * 1000:8.1f} ms  "
+                f"pair_feat {r['pair_bytes'] / 2**20:7.1f} MB  peak {r['peak'] / 2**20:8.1f} MB  "
+                f"sample {r['sample']:6.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
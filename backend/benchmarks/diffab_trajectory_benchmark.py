@@ -0,0 +1,127 @@
+"""
+Benchmark: keeping the whole diffusion trajectory vs the final state only.
+
+FullDPM.sample used to keep every step of the reverse process, moving each
+previous state to the host with .cpu() inside the loop. design_for_pdb only
+reads the final state, so by default only that is kept now, and
+return_trajectory=k snapshots every k-th step into preallocated host buffers.
+For each mode this reports the time per step, the host bytes held by the
+trajectory and the peak host memory (max RSS of a fresh process) of one
+sampling batch on a long CDR-H3 + antigen patch.
+
+Usage (from backend/; random weights):
+    python -m benchmarks.diffab_trajectory_benchmark --device cuda --samples 16 --modes true 10 false
+    python -m benchmarks.diffab_trajectory_benchmark --device cpu --steps 20 --samples 4
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLE_PDB = DIFFAB_ROOT / "data" / "examples" / "7DK2_AB_C.pdb"
+
+
+def _setup(steps, length, device):
+    import torch
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.models import get_model
+    from diffab.tools.runner.design_for_pdb import create_data_variants
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.transforms import Compose, PatchAroundAnchor
+
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    cfg.model.diffusion.num_steps = steps
+    torch.manual_seed(0)
+    model = get_model(cfg.model).to(device).eval()
+
+    config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=["H_CDR3"]))
+    structure = lambda: preprocess_antibody_structure({
+        "id": EXAMPLE_PDB.name, "pdb_path": str(EXAMPLE_PDB), "heavy_id": "A", "light_id": "B",
+    })
+    crop = Compose([
+        PatchAroundAnchor(initial_patch_size=length // 2, antigen_size=length // 2),
+        RemoveNative(remove_structure=True, remove_sequence=True),
+    ])
+    data = crop(create_data_variants(config, structure)[0]["data"])
+    return model, data
+
+
+def _run(return_trajectory, num_samples, steps, length, device):
+    """One sampling batch in this process; returns timings and memory."""
+    import torch
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.train import recursive_to
+
+    model, data = _setup(steps, length, device)
+    batch = recursive_to(PaddingCollate(eight=False)([data]), device)
+    sample_opt = {
+        "generator": BatchGenerator(range(num_samples), device=device),
+        "repeats": [num_samples],
+        "return_trajectory": return_trajectory,
+    }
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+    with torch.no_grad():
+        start = time.perf_counter()
+        traj = model.sample(batch, sample_opt=sample_opt)
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+
+    # Snapshots are views of shared buffers: count each storage once
+    storages = {
+        x.untyped_storage().data_ptr(): x.untyped_storage().nbytes()
+        for t, state in traj.items() if t != 0 for x in state
+    }
+    return {
+        "L": data["aa"].size(0), "step": elapsed / steps, "snapshots": len(traj) - 1,
+        "host_bytes": sum(storages.values()), "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", type=json.loads, nargs="+", default=[True, 10, False],
+                        help="return_trajectory values (true, false or k)")
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--length", type=int, default=256, help="Patch size, half antibody half antigen")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    if args.worker:
+        print(json.dumps(_run(json.loads(args.worker), args.samples, args.steps, args.length, args.device)))
+        return
+
+    print(f"H_CDR3 of {EXAMPLE_PDB.name}, {args.samples} samples, {args.steps} steps on {args.device}")
+    for mode in args.modes:
+        # A fresh process per run so the peak RSS is not carried over
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.diffab_trajectory_benchmark",
+             "--samples", str(args.samples), "--steps", str(args.steps), "--length", str(args.length),
+             "--device", args.device, "--worker", json.dumps(mode)],
+            cwd=BACKEND, check=True, capture_output=True, text=True,
+        ).stdout.strip().splitlines()[-1]
+        r = json.loads(out)
+        print(
+            f"L={r['L']:<4} return_trajectory={json.dumps(mode):<6}: {r['step'] * 1000:8.1f} ms/step  "
+            f"{r['snapshots']:>3} snapshots  trajectory {r['host_bytes'] / 2**20:7.1f} MB  "
+            f"peak host {r['peak'] / 2**20:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
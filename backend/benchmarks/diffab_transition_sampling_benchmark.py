@@ -0,0 +1,94 @@
+"""
+Benchmark: random sampling cost of one denoising step vs the EpsilonNet call.
+
+Each reverse step draws rotation angles from ApproxAngularDistribution and
+amino acids from the sequence posterior. Both used torch.multinomial, the
+angles over an (N*L, 8192) histogram row gathered per residue. They now invert
+a precomputed CDF table with searchsorted and use the Gumbel-max trick. For a
+batch of N patches of length L this times the rotation and sequence sampling
+of one step, with the global RNG and with per-sample BatchGenerator streams,
+next to one EpsilonNet evaluation. --diffab-root points at another checkout
+(e.g. a `git worktree` of an older commit) to compare against it.
+
+Usage (from backend/):
+    python -m benchmarks.diffab_transition_sampling_benchmark --device cuda --samples 16 --length 256
+    python -m benchmarks.diffab_transition_sampling_benchmark --device cpu --samples 8 --length 128
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+
+
+def _timed(fn, device, repeats):
+    import torch
+
+    fn()    # Warm up
+    best = float("inf")
+    for _ in range(repeats):
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument("--length", type=int, default=128)
+    parser.add_argument("--step", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--diffab-root", default=str(DIFFAB_ROOT))
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.diffab_root)
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.modules.common.so3 import random_uniform_so3
+
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    model = get_model(cfg.model).to(args.device).eval()
+    diffusion = model.diffusion
+
+    N, L, device = args.samples, args.length, args.device
+    v = random_uniform_so3([N, L], device=device)
+    p = torch.randn(N, L, 3, device=device)
+    s = torch.randint(0, 20, (N, L), device=device)
+    mask_generate = torch.ones(N, L, dtype=torch.bool, device=device)
+    t = torch.full([N], args.step, dtype=torch.long, device=device)
+    inputs = (
+        v, p, s, torch.randn(1, L, cfg.model.res_feat_dim, device=device).expand(N, -1, -1),
+        torch.randn(1, L, L, cfg.model.pair_feat_dim, device=device).expand(N, -1, -1, -1),
+        diffusion.trans_pos.var_sched.betas[args.step].expand([N]), mask_generate,
+        torch.ones(N, L, dtype=torch.bool, device=device),
+    )
+    with torch.no_grad():
+        v_next, _, eps_p, c_denoised = diffusion.eps_net(*inputs)
+        eps_net = _timed(lambda: diffusion.eps_net(*inputs), device, args.repeats)
+        print(f"N={N} L={L} step={args.step} on {device}, diffab from {args.diffab_root}")
+        print(f"EpsilonNet               : {eps_net * 1000:9.2f} ms")
+        for label, generator in (("global RNG", None), ("BatchGenerator", BatchGenerator(range(N), device=device))):
+            rot = _timed(lambda: diffusion.trans_rot.denoise(v, v_next, mask_generate, t, generator), device, args.repeats)
+            seq = _timed(lambda: diffusion.trans_seq.denoise(s, c_denoised, mask_generate, t, generator), device, args.repeats)
+            print(
+                f"{label:<15} rotation : {rot * 1000:9.2f} ms ({rot / eps_net:6.1%})  "
+                f"sequence {seq * 1000:9.2f} ms ({seq / eps_net:6.1%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: per-job latency of DiffAb run cold (a fresh process per job, as the
+worker used to do) versus warm (one DiffAbEngine that keeps the model loaded).
+
+Cold jobs pay interpreter start-up, torch/diffab imports, model construction
+and checkpoint loading every time; warm jobs pay them once, on the first job.
+Without --checkpoint, randomly initialised weights with the production
+codesign_single architecture are used (load cost is realistic, designs are not).
+
+Usage (from backend/):
+    python -m benchmarks.diffab_warm_executor_benchmark --jobs 3 --device cpu
+    python -m benchmarks.diffab_warm_executor_benchmark --checkpoint /workspace/weights/diffab/codesign_single.pt
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLE_PDB = DIFFAB_ROOT / "data" / "examples" / "3QHF_Fv.pdb"
+
+
+def _random_checkpoint(path: Path) -> None:
+    import torch
+    from easydict import EasyDict
+    from diffab.models import get_model
+
+    with open(DIFFAB_ROOT / "configs" / "train" / "codesign_single.yml") as f:
+        cfg = EasyDict(yaml.safe_load(f))
+    torch.manual_seed(0)
+    torch.save({"config": cfg, "model": get_model(cfg.model).state_dict()}, path)
+
+
+def _write_config(root: Path, cdrs, num_samples: int) -> None:
+    (root / "configs" / "test").mkdir(parents=True)
+    config = {
+        "mode": "single_cdr",
+        "model": {"checkpoint": "unused.pt"},
+        "sampling": {
+            "seed": 2022,
+            "sample_structure": True,
+            "sample_sequence": True,
+            "cdrs": cdrs,
+            "num_samples": num_samples,
+        },
+    }
+    with open(root / "configs" / "test" / "codesign_single.yml", "w") as f:
+        yaml.dump(config, f)
+
+
+def _cold_job(wrapper, pdb: Path, output: Path, designs: int, device: str) -> None:
+    config_path = output.parent / f"{output.name}.yml"
+    config = wrapper.build_config("codesign_single", designs, 0.5, relax=False)
+    with open(config_path, "w") as f:
+        yaml.dump(config, f)
+    subprocess.run(
+        [
+            sys.executable, str(DIFFAB_ROOT / "diffab" / "tools" / "runner" / "design_for_pdb.py"),
+            str(pdb), "--heavy", "H", "--light", "L", "--no_renumber",
+            "--config", str(config_path), "--out_root", str(output),
+            "--device", device, "--tag", "diffab_run", "--batch_size", "1",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONPATH": str(DIFFAB_ROOT)},
+    )
+    wrapper.flatten_outputs(str(output))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=3)
+    parser.add_argument("--designs", type=int, default=2)
+    parser.add_argument("--cdrs", nargs="+", default=["H_CDR3"])
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--checkpoint", default=None, help="Real weights (default: random weights)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(DIFFAB_ROOT))
+    sys.path.insert(0, str(BACKEND))
+    import diffab_real_wrapper as wrapper
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        root = tmp / "diffab"
+        _write_config(root, args.cdrs, args.designs)
+        weights = tmp / "weights"
+        weights.mkdir()
+        if args.checkpoint:
+            os.symlink(os.path.abspath(args.checkpoint), weights / "codesign_single.pt")
+        else:
+            _random_checkpoint(weights / "codesign_single.pt")
+        wrapper.DIFFAB_ROOT = root
+        wrapper.WEIGHTS_DIR = weights
+
+        pdb = tmp / "input.pdb"
+        pdb.write_bytes(EXAMPLE_PDB.read_bytes())
+        print(f"{args.jobs} jobs x {args.designs} designs of {' '.join(args.cdrs)} on {args.device}")
+
+        cold = []
+        for job in range(args.jobs):
+            start = time.perf_counter()
+            _cold_job(wrapper, pdb, tmp / f"cold{job}", args.designs, args.device)
+            cold.append(time.perf_counter() - start)
+
+        warm = []
+        engine = wrapper.DiffAbEngine(device=args.device)
+        for job in range(args.jobs):
+            start = time.perf_counter()
+            engine.run(pdb, str(tmp / f"warm{job}"), num_designs=args.designs,
+                       relax=False, renumber=False, heavy="H", light="L")
+            warm.append(time.perf_counter() - start)
+
+        same = all(
+            (tmp / f"cold{job}" / "diffab_0000.pdb").read_text()
+            == (tmp / f"warm{job}" / "diffab_0000.pdb").read_text()
+            for job in range(args.jobs)
+        )
+
+    print(f"{'cold (process per job)':<26}: " + "  ".join(f"{t:6.2f}s" for t in cold))
+    print(f"{'warm (DiffAbEngine)':<26}: " + "  ".join(f"{t:6.2f}s" for t in warm))
+    print(f"steady-state speedup      : {sum(cold[1:]) / max(sum(warm[1:]), 1e-9):6.1f}x")
+    print(f"identical designs         : {same}")
+
+
+if __name__ == "__main__":
+    main()
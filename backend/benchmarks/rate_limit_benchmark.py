@@ -0,0 +1,107 @@
+"""
+Micro-benchmark: latency the rate limiter adds to each request.
+
+Compares the legacy sliding window (ZREMRANGEBYSCORE, ZCARD, ZADD, EXPIRE
+as four sequential round trips, one sorted-set member per request) with
+the single-round-trip GCRA script, and with the in-process pre-filter
+rejecting a client that is over its limit.
+
+Only the benchmark's own keys (BENCH_KEYS) are written, and they are
+deleted before and after the run; the rest of the database is untouched.
+
+Usage (from backend/):
+    python -m benchmarks.rate_limit_benchmark --redis-url redis://localhost:6379/15 --requests 5000
+"""
+import argparse
+import asyncio
+import time
+
+import redis.asyncio as aioredis
+
+from app.core.rate_limit import RateLimitMiddleware
+
+# Every client id is bench:<n>, so the limiter's keys share these prefixes
+BENCH_KEYS = ("rate_limit:bench:*", "rate_limit_legacy:bench:*")
+
+
+async def legacy_check(redis, client_id: str, limit: int, window: int = 60) -> bool:
+    """Replica of the pre-GCRA _check_rate_limit."""
+    key = f"rate_limit_legacy:{client_id}"
+    now = time.time()
+    await redis.zremrangebyscore(key, 0, now - window)
+    if await redis.zcard(key) >= limit:
+        return False
+    await redis.zadd(key, {str(now): now})
+    await redis.expire(key, window)
+    return True
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return (
+        samples[len(samples) // 2] * 1e6,
+        samples[int(len(samples) * 0.99)] * 1e6,
+    )
+
+
+async def _delete_bench_keys(redis) -> None:
+    """SCAN + DEL the benchmark's keys only (never FLUSHDB a shared Redis)."""
+    for pattern in BENCH_KEYS:
+        batch = []
+        async for key in redis.scan_iter(pattern, count=1000):
+            batch.append(key)
+            if len(batch) >= 1000:
+                await redis.delete(*batch)
+                batch = []
+        if batch:
+            await redis.delete(*batch)
+
+
+async def _time(check, requests: int, clients: int):
+    samples = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await check(f"bench:{i % clients}")
+        samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+
+async def _bench(redis_url: str, requests: int, clients: int) -> None:
+    redis = aioredis.from_url(redis_url, decode_responses=True)
+    await _delete_bench_keys(redis)
+    # Generous limit so every request takes the full "allowed" path
+    limit = requests * 2
+
+    limiter = RateLimitMiddleware(app=None, redis_url=redis_url, requests_per_minute=limit, local_prefilter=False)
+    over_limit = RateLimitMiddleware(app=None, redis_url=redis_url, requests_per_minute=1, local_prefilter=True)
+    await over_limit._check_rate_limit("bench:hot")
+
+    legacy = await _time(lambda c: legacy_check(redis, c, limit), requests, clients)
+    gcra = await _time(lambda c: limiter._check_rate_limit(c), requests, clients)
+    local = await _time(lambda c: over_limit._check_rate_limit("bench:hot"), requests, clients)
+
+    legacy_members = sum([await redis.zcard(key) async for key in redis.scan_iter("rate_limit_legacy:bench:*")])
+    gcra_keys = len([key async for key in redis.scan_iter("rate_limit:bench:*")])
+
+    print(f"legacy 4-call sliding window : p50 {legacy[0]:7.1f}us  p99 {legacy[1]:7.1f}us  ({legacy_members} zset members)")
+    print(f"GCRA script (1 round trip)   : p50 {gcra[0]:7.1f}us  p99 {gcra[1]:7.1f}us  ({gcra_keys} keys)")
+    print(f"local pre-filter reject      : p50 {local[0]:7.1f}us  p99 {local[1]:7.1f}us  (no Redis call)")
+
+    await _delete_bench_keys(redis)
+    await redis.aclose()
+    await limiter._redis.aclose()
+    await over_limit._redis.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(_bench(args.redis_url, args.requests, args.clients))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Micro-benchmark: latency of RunPod dispatch/status calls, per-call client vs pooled client.
+
+Starts a fake RunPod API (/run, /status) on localhost over TLS with a
+throwaway self-signed certificate, then times N sequential and N concurrent
+status polls plus dispatches, first opening a new httpx.AsyncClient per
+call (the old behaviour) and then through the shared pooled client.
+
+Usage (from backend/, needs the openssl CLI for the certificate):
+    python -m benchmarks.runpod_client_benchmark --calls 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.infrastructure.compute.runpod_client import create_runpod_client, request_with_retry
+
+
+async def _run(request):
+    return JSONResponse({"id": "rp-bench", "status": "IN_QUEUE"})
+
+
+async def _status(request):
+    return JSONResponse({"id": request.path_params["rp_id"], "status": "IN_PROGRESS"})
+
+
+fake_runpod = Starlette(routes=[
+    Route("/v2/{endpoint}/run", _run, methods=["POST"]),
+    Route("/v2/{endpoint}/status/{rp_id}", _status, methods=["GET"]),
+])
+
+
+def _self_signed_cert(directory: str):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def _start_server(cert: str, key: str) -> tuple:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    config = uvicorn.Config(
+        fake_runpod, host="127.0.0.1", port=port, log_level="warning",
+        ssl_certfile=cert, ssl_keyfile=key,
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"https://127.0.0.1:{port}/v2"
+
+
+async def _per_call(base_url: str, method: str, url: str, operation: str) -> None:
+    # Pre-change behaviour: fresh client, fresh TCP+TLS handshake
+    async with create_runpod_client(base_url=base_url, verify=False) as client:
+        await request_with_retry(client, method, url, operation=operation, json={} if method == "POST" else None)
+
+
+async def _pooled(client: httpx.AsyncClient, method: str, url: str, operation: str) -> None:
+    await request_with_retry(client, method, url, operation=operation, json={} if method == "POST" else None)
+
+
+async def _measure(call, calls: int, concurrency: int) -> tuple:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(calls)))
+    wall = time.perf_counter() - wall
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], calls / wall
+
+
+async def _bench(base_url: str, calls: int, concurrency: int) -> None:
+    operations = [
+        ("dispatch", "POST", "/ep/run", "run"),
+        ("poll", "GET", "/ep/status/rp-bench", "status"),
+    ]
+    pooled_client = create_runpod_client(base_url=base_url, verify=False)
+    try:
+        for label, method, url, operation in operations:
+            for parallel in (1, concurrency):
+                fresh = await _measure(lambda: _per_call(base_url, method, url, operation), calls, parallel)
+                pooled = await _measure(lambda: _pooled(pooled_client, method, url, operation), calls, parallel)
+                print(
+                    f"{label:8s} x{parallel:<3d} per-call p50={fresh[0] * 1000:6.2f}ms p95={fresh[1] * 1000:6.2f}ms "
+                    f"{fresh[2]:7.0f}/s | pooled p50={pooled[0] * 1000:6.2f}ms p95={pooled[1] * 1000:6.2f}ms "
+                    f"{pooled[2]:7.0f}/s"
+                )
+    finally:
+        await pooled_client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server, base_url = _start_server(*_self_signed_cert(tmp))
+        try:
+            asyncio.run(_bench(base_url, args.calls, args.concurrency))
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
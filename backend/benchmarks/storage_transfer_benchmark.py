@@ -0,0 +1,153 @@
+"""
+Benchmark: moving a job's design PDBs to and from object storage.
+
+Compares uploading one file at a time (what the worker and DockerExecutor
+did before) with StorageService.upload_directory at a few concurrency
+levels, plus download_directory. Each design gets a manifest.json entry
+(key, size, sha256) computed in the same pass as its upload.
+
+One large file (--large-mb) is then uploaded in multipart chunks with
+miniopy-async's own put_object(num_parallel_uploads=...), which reads every
+part before the uploads drain, and with upload_path, which reads at most
+s3_multipart_parallel parts ahead; each is reported with its peak RSS growth.
+
+Usage (from backend/, against a local MinIO and a scratch bucket):
+    python -m benchmarks.storage_transfer_benchmark --endpoint http://localhost:9000 --designs 120
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+
+def _write_designs(root: Path, designs: int, size_kb: int) -> int:
+    line = b"ATOM      1  CA  ALA H   1      11.104  13.207   9.404  1.00 20.00           C\n"
+    body = line * (size_kb * 1024 // len(line))
+    for i in range(designs):
+        (root / f"design_{i:04d}.pdb").write_bytes(body)
+    return len(body) * designs
+
+
+def _report(label: str, elapsed: float, mb: float, rss_mb: Optional[float] = None) -> None:
+    rss = f"  peak RSS +{rss_mb:6.1f} MB" if rss_mb is not None else ""
+    print(f"{label:<26}: {elapsed:6.2f}s  {mb / elapsed:7.1f} MB/s{rss}")
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+async def _peak_rss_growth(coro) -> float:
+    """Run coro while sampling this process's RSS; the peak growth over the start, in MB."""
+    start = peak = _rss_mb()
+    task = asyncio.ensure_future(coro)
+    while not task.done():
+        peak = max(peak, _rss_mb())
+        await asyncio.sleep(0.005)
+    await task
+    return peak - start
+
+
+async def _bench(designs: int, size_kb: int, concurrency_levels, large_mb: int) -> None:
+    from app.infrastructure.storage.s3_service import StorageService, _HashingFileReader
+
+    storage = StorageService()
+    await storage.validate_connection()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "outputs"
+        root.mkdir()
+        total = _write_designs(root, designs, size_kb)
+        mb = total / 1024 / 1024
+        print(f"{designs} designs x {size_kb} KB = {mb:.1f} MB")
+
+        start = time.perf_counter()
+        for path in sorted(root.iterdir()):
+            await storage.upload_path(path, f"bench/sequential/{path.name}")
+        elapsed = time.perf_counter() - start
+        _report("sequential upload", elapsed, mb)
+
+        for concurrency in concurrency_levels:
+            prefix = f"bench/concurrent-{concurrency}"
+            start = time.perf_counter()
+            entries = await storage.upload_directory(str(root), prefix, concurrency=concurrency)
+            await storage.write_manifest("bench", prefix, entries)
+            elapsed = time.perf_counter() - start
+            _report(f"upload_directory (x{concurrency})", elapsed, mb)
+
+        prefix = f"bench/concurrent-{concurrency_levels[-1]}"
+        start = time.perf_counter()
+        await storage.download_directory(prefix, str(Path(tmp) / "download"))
+        elapsed = time.perf_counter() - start
+        _report(f"download_directory (x{settings.s3_transfer_concurrency})", elapsed, mb)
+
+        large = Path(tmp) / "trajectory.dcd"
+        with open(large, "wb") as f:
+            for _ in range(large_mb):
+                f.write(os.urandom(1024 * 1024))
+        part_mb = settings.s3_multipart_part_size / 1024 / 1024
+        print(f"1 file x {large_mb} MB, {part_mb:.0f} MB parts, {settings.s3_multipart_parallel} in flight")
+
+        async def _put_object():
+            with open(large, "rb") as file_obj:
+                await storage._pooled().put_object(
+                    bucket_name=storage.bucket_name,
+                    object_name="bench/large/put_object.dcd",
+                    data=_HashingFileReader(file_obj),
+                    length=large_mb * 1024 * 1024,
+                    part_size=settings.s3_multipart_part_size,
+                    num_parallel_uploads=settings.s3_multipart_parallel,
+                )
+
+        for label, upload in (
+            ("put_object (parallel)", _put_object()),
+            ("upload_path", storage.upload_path(large, "bench/large/upload_path.dcd")),
+        ):
+            start = time.perf_counter()
+            rss = await _peak_rss_growth(upload)
+            _report(label, time.perf_counter() - start, large_mb, rss)
+
+        # Leave the scratch bucket as we found it
+        keys = ["bench/large/put_object.dcd", "bench/large/upload_path.dcd"]
+        keys += [f"bench/sequential/{p.name}" for p in root.iterdir()]
+        for concurrency in concurrency_levels:
+            keys += [f"bench/concurrent-{concurrency}/{p.name}" for p in root.iterdir()]
+            keys.append(f"bench/concurrent-{concurrency}/manifest.json")
+        semaphore = asyncio.Semaphore(32)
+
+        async def _delete(key):
+            async with semaphore:
+                await storage.delete_object(key)
+
+        await asyncio.gather(*(_delete(key) for key in keys))
+
+    await storage.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoint", default="http://localhost:9000")
+    parser.add_argument("--bucket", default="foldexa-benchmark")
+    parser.add_argument("--designs", type=int, default=120)
+    parser.add_argument("--size-kb", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 32])
+    parser.add_argument("--large-mb", type=int, default=256, help="Size of the multipart upload")
+    args = parser.parse_args()
+
+    # StorageService reads its endpoint from settings when constructed
+    settings.s3_endpoint = args.endpoint
+    settings.s3_bucket_name = args.bucket
+    settings.s3_access_key = os.environ.get("S3_ACCESS_KEY", settings.s3_access_key)
+    settings.s3_secret_key = os.environ.get("S3_SECRET_KEY", settings.s3_secret_key)
+
+    asyncio.run(_bench(args.designs, args.size_kb, args.concurrency, args.large_mb))
+
+
+if __name__ == "__main__":
+    main()
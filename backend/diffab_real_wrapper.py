@@ -5,11 +5,21 @@ import os
 import sys
 import shutil
 import random
+import tempfile
+import threading
 import yaml
 from pathlib import Path
 
 DIFFAB_ROOT = Path(os.environ.get("DIFFAB_ROOT", "/workspace/code/diffab"))
+# Designs sampled per forward pass (samples of all CDRs are packed together)
+DEFAULT_BATCH_SIZE = int(os.environ.get("DIFFAB_BATCH_SIZE", "16"))
 WEIGHTS_DIR = Path(os.environ.get("WEIGHTS_DIR", "/workspace/weights/diffab"))
+# CPU jobs: tune threads, bf16 attention features and int8 MLPs (see diffab/utils/cpu.py)
+CPU_PROFILE = os.environ.get("DIFFAB_CPU_PROFILE", "false").lower() == "true"
+# CPU jobs: run the per-step network in ONNX Runtime ("onnxruntime") instead of torch
+BACKEND = os.environ.get("DIFFAB_BACKEND", "torch")
+# torch.compile the sampling step, patches padded to length buckets (see diffab/utils/compiler.py)
+COMPILE = os.environ.get("DIFFAB_COMPILE", "false").lower() == "true"
 
 # Map UI design_mode → config filename + weight filename
 MODE_MAP = {
@@ -37,6 +47,129 @@ def validate_gpu():
         print(f"[Wrapper] WARNING: Failed to validate GPU: {e}", flush=True)
 
 
+def build_config(design_mode, num_designs, temperature, relax=True, save_pdb=True, show_tqdm=False, sample_steps=None):
+    """Test config for design_mode with the UI parameters patched in."""
+    config_file, weight_file_name = MODE_MAP.get(design_mode, MODE_MAP["codesign_single"])
+
+    # 1. Load the base config
+    base_config_path = DIFFAB_ROOT / "configs" / "test" / config_file
+    print(f"[Wrapper] Loading config: {base_config_path}", flush=True)
+    with open(base_config_path, "r") as f:
+        config = yaml.safe_load(f)
+
+    # 2. Apply UI params to config
+    weight_file = WEIGHTS_DIR / weight_file_name
+    if weight_file.with_suffix(".safetensors").exists():
+        # Converted with `python -m diffab.tools.checkpoint`: memory-mapped, shared between workers
+        weight_file = weight_file.with_suffix(".safetensors")
+    if weight_file.exists():
+        print(f"[Wrapper] Using weights: {weight_file}", flush=True)
+        config["model"]["checkpoint"] = str(weight_file)
+    else:
+        print(f"[Wrapper] WARNING: Weight file not found at {weight_file}, using default", flush=True)
+
+    # Patch sampling params into config
+    if "sampling" not in config:
+        config["sampling"] = {}
+    config["sampling"]["num_samples"]   = num_designs
+    config["sampling"]["temperature"]   = temperature
+    if sample_steps:
+        # Strided sampler: fewer denoising steps, faster and somewhat rougher
+        config["sampling"]["sample_steps"] = sample_steps
+    if "relax" not in config:
+        config["relax"] = {}
+    config["relax"]["enabled"]   = relax
+    config["save_pdb"]           = save_pdb
+    config["tqdm"]               = show_tqdm
+    if CPU_PROFILE:
+        config["model"]["cpu_profile"] = True    # Only applied on CPU devices
+    config["model"]["backend"] = BACKEND
+    if COMPILE:
+        config["model"]["compile"] = True
+    return config
+
+
+def flatten_outputs(output):
+    """Copy the designed PDBs up to the output root as diffab_<name>.pdb."""
+    print("[Wrapper] Flattening output structure...", flush=True)
+    try:
+        for root, dirs, files in os.walk(output):
+            for file in files:
+                if file.endswith(".pdb") and "reference" not in file and root != output:
+                    src = os.path.join(root, file)
+                    dst = os.path.join(output, f"diffab_{file}")
+                    shutil.copy(src, dst)
+                    print(f"[Wrapper] Copied: {file}", flush=True)
+    except Exception as e:
+        print(f"[Wrapper] WARNING: output flattening failed: {e}", flush=True)
+
+
+class DiffAbEngine:
+    """
+    Warm, in-process DiffAb executor.
+
+    Each MODE_MAP entry's model is loaded once, on first use, and reused for
+    every later job on the same device, so a warm worker pays only for
+    sampling. Outputs are the same as the ``python wrapper.py`` path.
+    """
+
+    def __init__(self, device="cuda"):
+        self.device = device
+        self._models = {}
+        self._lock = threading.Lock()
+
+        # The container sets PYTHONPATH; make `import diffab` work elsewhere too
+        if str(DIFFAB_ROOT) not in sys.path:
+            sys.path.insert(0, str(DIFFAB_ROOT))
+        from diffab.tools.runner import design_for_pdb as runner
+        self._runner = runner
+
+    def model_for(self, design_mode, checkpoint=None):
+        """The loaded model for design_mode's MODE_MAP entry (loaded on first call)."""
+        if checkpoint is None:
+            checkpoint = build_config(design_mode, 1, 1.0)["model"]["checkpoint"]
+        key = (MODE_MAP.get(design_mode, MODE_MAP["codesign_single"]), checkpoint)
+        with self._lock:
+            if key not in self._models:
+                print(f"[Wrapper] Loading model for {design_mode}: {checkpoint}", flush=True)
+                model, lsd = self._runner.load_model(
+                    checkpoint, self.device, cpu_profile=CPU_PROFILE, backend=BACKEND, compile_opt=COMPILE,
+                )
+                print(f"[Wrapper] {lsd}", flush=True)
+                self._models[key] = model
+            return self._models[key]
+
+    def run(self, input, output, design_mode="codesign_single", num_designs=5, temperature=0.5,
+            relax=True, renumber=True, heavy=None, light=None, seed=None, batch_size=DEFAULT_BATCH_SIZE,
+            sample_steps=None):
+        """Design num_designs variants of input into output (flattened like main())."""
+        config = build_config(design_mode, num_designs, temperature, relax=relax, sample_steps=sample_steps)
+        model = self.model_for(design_mode, config["model"]["checkpoint"])
+
+        os.makedirs(output, exist_ok=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            # Same name as main()'s temp config, so the log dirs match too
+            config_path = os.path.join(tmp, "run_config.yml")
+            with open(config_path, "w") as f:
+                yaml.dump(config, f)
+            args = self._runner.args_factory(
+                pdb_path=str(input),
+                heavy=heavy,
+                light=light,
+                no_renumber=not renumber,
+                config=config_path,
+                out_root=str(output),
+                tag="diffab_run",
+                seed=seed,
+                device=self.device,
+                batch_size=batch_size,
+            )
+            log_dir = self._runner.design_for_pdb(args, model=model)
+
+        flatten_outputs(output)
+        return log_dir
+
+
 def main():
     parser = argparse.ArgumentParser(description="Foldexa DiffAb Wrapper")
     parser.add_argument("--input",       required=True,  help="Input PDB path")
@@ -49,6 +182,8 @@ def main():
     parser.add_argument("--no_save_pdb", action="store_true",       help="Skip saving PDB to disk")
     parser.add_argument("--tqdm",        action="store_true",       help="Show tqdm progress bar")
     parser.add_argument("--fix_seed",    action="store_true",       help="Fix random seed for reproducibility")
+    parser.add_argument("--batch_size",  type=int, default=DEFAULT_BATCH_SIZE, help="Designs sampled per forward pass")
+    parser.add_argument("--sample_steps", type=int, default=None,   help="Denoising steps (default: all, e.g. 100)")
     args, unknown = parser.parse_known_args()
 
     config_file, weight_file_name = MODE_MAP.get(args.design_mode, MODE_MAP["codesign_single"])
@@ -63,6 +198,8 @@ def main():
     print(f"[Wrapper] Temperature: {args.temperature}", flush=True)
     print(f"[Wrapper] Device:      {args.device}", flush=True)
     print(f"[Wrapper] Relax:       {not args.no_relax}", flush=True)
+    print(f"[Wrapper] Batch size:  {args.batch_size}", flush=True)
+    print(f"[Wrapper] Steps:       {args.sample_steps or 'all'}", flush=True)
 
     if args.fix_seed:
         random.seed(42)
@@ -72,30 +209,16 @@ def main():
 
     os.makedirs(args.output, exist_ok=True)
 
-    # 1. Load the base config
-    base_config_path = DIFFAB_ROOT / "configs" / "test" / config_file
-    print(f"[Wrapper] Loading config: {base_config_path}", flush=True)
-    with open(base_config_path, "r") as f:
-        config = yaml.safe_load(f)
-
-    # 2. Apply UI params to config
-    weight_file = WEIGHTS_DIR / weight_file_name
-    if weight_file.exists():
-        print(f"[Wrapper] Using weights: {weight_file}", flush=True)
-        config["model"]["checkpoint"] = str(weight_file)
-    else:
-        print(f"[Wrapper] WARNING: Weight file not found at {weight_file}, using default", flush=True)
-
-    # Patch sampling params into config
-    if "sampling" not in config:
-        config["sampling"] = {}
-    config["sampling"]["num_samples"]   = args.num_designs
-    config["sampling"]["temperature"]   = args.temperature
-    if "relax" not in config:
-        config["relax"] = {}
-    config["relax"]["enabled"]   = not args.no_relax
-    config["save_pdb"]           = not args.no_save_pdb
-    config["tqdm"]               = args.tqdm
+    # 1-2. Base config with UI params applied
+    config = build_config(
+        args.design_mode,
+        args.num_designs,
+        args.temperature,
+        relax=not args.no_relax,
+        save_pdb=not args.no_save_pdb,
+        show_tqdm=args.tqdm,
+        sample_steps=args.sample_steps,
+    )
 
     # 3. Write temp config
     temp_config_path = "/tmp/run_config.yml"
@@ -111,7 +234,7 @@ def main():
         "--out_root",   args.output,
         "--device",     args.device,
         "--tag",        "diffab_run",
-        "--batch_size", "1",
+        "--batch_size", str(args.batch_size),
     ]
 
     print(f"[Wrapper] Executing: {' '.join(cmd)}", flush=True)
@@ -142,17 +265,7 @@ def main():
         sys.exit(1)
 
     # 5. Flatten output — copy PDBs up to output root
-    print("[Wrapper] Flattening output structure...", flush=True)
-    try:
-        for root, dirs, files in os.walk(args.output):
-            for file in files:
-                if file.endswith(".pdb") and "reference" not in file and root != args.output:
-                    src = os.path.join(root, file)
-                    dst = os.path.join(args.output, f"diffab_{file}")
-                    shutil.copy(src, dst)
-                    print(f"[Wrapper] Copied: {file}", flush=True)
-    except Exception as e:
-        print(f"[Wrapper] WARNING: output flattening failed: {e}", flush=True)
+    flatten_outputs(args.output)
 
     print("[Wrapper] Done.", flush=True)
 
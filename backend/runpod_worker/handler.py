@@ -1,14 +1,22 @@
 import os
 import ssl
+import importlib.util
+import json
+import hashlib
 import uuid
 import logging
 import subprocess
 import time
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
 
 import runpod
 from minio import Minio
+from minio.datatypes import Part
+from minio.helpers import get_part_info
 import urllib3
 
 # Disable noisy SSL warnings when using CERT_NONE
@@ -57,6 +65,30 @@ MINIO_BUCKET = os.environ.get(
 
 MINIO_SECURE = os.environ.get("S3_USE_SSL", "True").lower() == "true"
 
+# Output transfer: files uploaded at once, and multipart chunking of large files
+UPLOAD_CONCURRENCY = int(os.environ.get("S3_TRANSFER_CONCURRENCY", "16"))
+MULTIPART_PART_SIZE = int(os.environ.get("S3_MULTIPART_PART_SIZE", str(16 * 1024 * 1024)))
+MULTIPART_PARALLEL = int(os.environ.get("S3_MULTIPART_PARALLEL", "4"))
+
+# Same manifest format as the API's StorageService.write_manifest
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+ARTIFACT_TYPES = {
+    ".pdb": "pdb",
+    ".log": "log",
+    ".txt": "log",
+    ".png": "plot",
+    ".svg": "plot",
+    ".dcd": "trajectory",
+    ".xtc": "trajectory",
+}
+# DiffAb run files that are not designs: the input structure (whole, and per
+# CDR tag) and the run's metadata
+REFERENCE_FILES = {"reference.pdb", "REF1.pdb"}
+METADATA_FILES = {"metadata.json"}
+# wrapper.py copies every per-tag PDB up to the output root as diffab_<name>.pdb
+FLATTENED_PREFIX = "diffab_"
+
 
 # ---------------- LOGGING ----------------
 
@@ -104,7 +136,9 @@ def get_minio_client(s3_config=None):
 
         # Use urllib3 with explicit timeouts to prevent infinite RunPod execution
         # if the MinIO connection hangs or Railway drops connections.
+        # Sized for UPLOAD_CONCURRENCY files x MULTIPART_PARALLEL parts in flight
         http_client = urllib3.PoolManager(
+            maxsize=UPLOAD_CONCURRENCY * MULTIPART_PARALLEL,
             timeout=urllib3.Timeout(connect=15.0, read=60.0),
             retries=urllib3.Retry(
                 total=4,
@@ -133,14 +167,207 @@ def get_minio_client(s3_config=None):
         raise
 
 
+# ---------------- TRANSFERS ----------------
+
+class HashingReader:
+    """File wrapper that computes the sha256 of everything put_object reads."""
+
+    def __init__(self, file_obj):
+        self._file_obj = file_obj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        chunk = self._file_obj.read(size)
+        self.sha256.update(chunk)
+        return chunk
+
+
+def upload_parts(minio, bucket_name, reader, s3_key, size):
+    """
+    Multipart upload with at most MULTIPART_PARALLEL parts in memory.
+
+    A slot is taken before each part is read and given back once the part is
+    stored, so the file is never read further ahead than the uploads.
+    """
+
+    part_size, part_count = get_part_info(size, MULTIPART_PART_SIZE)
+    slots = threading.BoundedSemaphore(MULTIPART_PARALLEL)
+    futures = []
+
+    def store(part_number, data):
+        try:
+            return Part(part_number, minio._upload_part(bucket_name, s3_key, data, None, upload_id, part_number))
+        finally:
+            slots.release()
+
+    upload_id = minio._create_multipart_upload(bucket_name, s3_key, {"Content-Type": "application/octet-stream"})
+
+    try:
+        with ThreadPoolExecutor(max_workers=MULTIPART_PARALLEL) as pool:
+            for part_number in range(1, part_count + 1):
+                slots.acquire()
+                if any(future.done() and future.exception() for future in futures):
+                    break  # Raised by result() below
+                expected = min(part_size, size - (part_number - 1) * part_size)
+                data = reader.read(expected)
+                if len(data) != expected:
+                    raise IOError(f"{s3_key}: expected {expected} bytes for part {part_number}, got {len(data)}")
+                futures.append(pool.submit(store, part_number, data))
+            parts = [future.result() for future in futures]
+        minio._complete_multipart_upload(bucket_name, s3_key, upload_id, parts)
+    except BaseException:
+        minio._abort_multipart_upload(bucket_name, s3_key, upload_id)
+        raise
+
+
+def upload_path(minio, bucket_name, path, s3_key, kind=None):
+    """Upload one file (multipart above MULTIPART_PART_SIZE); returns its manifest entry, typed kind if given."""
+
+    size = path.stat().st_size
+
+    with open(path, "rb") as f:
+        reader = HashingReader(f)
+        if size > MULTIPART_PART_SIZE:
+            upload_parts(minio, bucket_name, reader, s3_key, size)
+        else:
+            minio.put_object(bucket_name, s3_key, reader, size)
+
+    return {
+        "key": s3_key,
+        "size": size,
+        "sha256": reader.sha256.hexdigest(),
+        "type": kind or ARTIFACT_TYPES.get(path.suffix.lower(), "file"),
+    }
+
+
+def artifact_type(output_dir, path):
+    """
+    Manifest type of an output file, or None to leave it out.
+
+    Designs are the PDBs under the per-CDR tag directories ("pdb"); the
+    flattened diffab_*.pdb copies at the root are not uploaded again, and the
+    reference structures and metadata get types of their own.
+    """
+
+    relative = path.relative_to(output_dir)
+
+    if len(relative.parts) == 1 and path.suffix.lower() == ".pdb" and path.name.startswith(FLATTENED_PREFIX):
+        return None
+    if path.name in REFERENCE_FILES:
+        return "reference"
+    if path.name in METADATA_FILES:
+        return "metadata"
+
+    return ARTIFACT_TYPES.get(path.suffix.lower(), "file")
+
+
+def collect_outputs(output_dir):
+    """(path, type) of every output file to upload, in path order."""
+
+    files = sorted(p for p in output_dir.rglob("*") if p.is_file())
+
+    return [(p, t) for p in files if (t := artifact_type(output_dir, p)) is not None]
+
+
+def upload_outputs(minio, bucket_name, output_dir, prefix, job_id, outputs=None):
+    """
+    Upload the outputs of collect_outputs concurrently, then write
+    prefix/manifest.json listing each artifact's key, size, sha256 and type.
+
+    Returns (entries, manifest_s3_key).
+    """
+
+    if outputs is None:
+        outputs = collect_outputs(output_dir)
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as pool:
+        entries = list(pool.map(
+            lambda output: upload_path(
+                minio, bucket_name, output[0], f"{prefix}/{output[0].relative_to(output_dir).as_posix()}", output[1]
+            ),
+            outputs
+        ))
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "job_id": job_id,
+        "total_bytes": sum(e["size"] for e in entries),
+        "artifacts": entries,
+    }
+    body = json.dumps(manifest).encode()
+    manifest_s3_key = f"{prefix}/{MANIFEST_NAME}"
+
+    minio.put_object(
+        bucket_name,
+        manifest_s3_key,
+        BytesIO(body),
+        len(body),
+        content_type="application/json",
+    )
+
+    return entries, manifest_s3_key
+
+
 # ---------------- DIRECTORIES ----------------
 
+def parse_sample_steps(value):
+    """None for the full schedule, else an integer of at least 2 (the strided sampler's minimum)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+        raise ValueError(f"sample_steps must be an integer, got {value!r}")
+    steps = int(value)
+    if steps < 2:
+        raise ValueError(f"sample_steps must be at least 2, got {steps}")
+    return steps
+
+
 def ensure_directories():
 
     for d in [MODEL_DIR, JOB_DIR, LOG_DIR, CACHE_DIR]:
         d.mkdir(parents=True, exist_ok=True)
 
 
+# ---------------- DIFFAB ENGINE ----------------
+
+# Run DiffAb inside this process so its models stay loaded between jobs.
+# Set DIFFAB_IN_PROCESS=false to go back to one `python wrapper.py` per job.
+DIFFAB_IN_PROCESS = os.environ.get("DIFFAB_IN_PROCESS", "True").lower() == "true"
+
+# Angular histograms the model computes at construction are saved here and
+# reused by later model builds (in-process or subprocess) on this volume.
+os.environ.setdefault("DIFFAB_CACHE_DIR", str(CACHE_DIR / "diffab"))
+
+_diffab_engines = {}
+
+
+def get_diffab_engine(device):
+    """
+    The warm DiffAbEngine for `device`, created on first use.
+
+    Returns None when DiffAb can't be imported in-process; callers then
+    fall back to the subprocess wrapper.
+    """
+    if not DIFFAB_IN_PROCESS:
+        return None
+
+    if device not in _diffab_engines:
+        try:
+            spec = importlib.util.spec_from_file_location(
+                "foldexa_diffab_wrapper",
+                CODE_DIR / "diffab" / "wrapper.py"
+            )
+            wrapper = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(wrapper)
+            _diffab_engines[device] = wrapper.DiffAbEngine(device=device)
+            logger.info(f"DiffAb engine ready on {device}")
+        except Exception:
+            logger.exception("Could not start in-process DiffAb; using subprocess wrapper")
+            _diffab_engines[device] = None
+
+    return _diffab_engines[device]
+
+
 # ---------------- SUBPROCESS ----------------
 
 def run_subprocess(cmd, timeout=10800):
@@ -237,6 +464,9 @@ def handler(event):
             temperature = float(diffab_cfg.get("sampling_temp", 0.5))
             device = diffab_cfg.get("device", "cuda")
             design_mode = diffab_cfg.get("design_mode", "codesign_single")
+            batch_size = int(diffab_cfg.get("batch_size", 16))
+            # "fast" tier: strided sampler with fewer denoising steps
+            sample_steps = parse_sample_steps(diffab_cfg.get("sample_steps"))
 
             cmd = [
                 "python",
@@ -247,7 +477,12 @@ def handler(event):
                 "--temperature", str(temperature),
                 "--device", device,
                 "--design_mode", design_mode,
+                "--batch_size", str(batch_size),
             ]
+            if sample_steps:
+                cmd += ["--sample_steps", str(sample_steps)]
+
+            engine = get_diffab_engine(device)
 
         else:
 
@@ -255,30 +490,59 @@ def handler(event):
 
         # ---------- RUN MODEL ----------
 
-        run_subprocess(cmd)
+        if engine is not None:
+            try:
+                engine.model_for(design_mode)
+            except Exception:
+                # Weights that don't load in-process still get the old path
+                logger.exception(f"Could not load DiffAb model for {design_mode}; using subprocess wrapper")
+                engine = None
+
+        if engine is not None:
+            start = time.perf_counter()
+            engine.run(
+                input_file,
+                output_dir,
+                design_mode=design_mode,
+                num_designs=num_designs,
+                temperature=temperature,
+                batch_size=batch_size,
+                sample_steps=sample_steps
+            )
+            logger.info(f"DiffAb (in-process) finished in {time.perf_counter() - start:.1f}s")
+        else:
+            run_subprocess(cmd)
 
         # ---------- FIND OUTPUT ----------
 
-        pdb_files = list(output_dir.glob("*.pdb"))
+        outputs = collect_outputs(output_dir)
+        designs = [path for path, kind in outputs if kind == "pdb"]
 
-        if not pdb_files:
+        if not designs:
             raise RuntimeError("No PDB output")
 
-        result_file = pdb_files[0]
+        results_prefix = f"jobs/{job_id}/results"
 
-        output_s3_key = f"jobs/{job_id}/results/{result_file.name}"
+        # The first design stays the job's main output for the download endpoint
+        output_s3_key = f"{results_prefix}/{designs[0].relative_to(output_dir).as_posix()}"
 
-        # ---------- UPLOAD RESULT ----------
+        # ---------- UPLOAD RESULTS ----------
 
-        logger.info(f"Uploading result to s3://{bucket_name}/{output_s3_key}")
+        logger.info(
+            f"Uploading {len(designs)} design(s) and {len(outputs) - len(designs)} other file(s) "
+            f"to s3://{bucket_name}/{results_prefix}"
+        )
 
-        minio.fput_object(
+        entries, manifest_s3_key = upload_outputs(
+            minio,
             bucket_name,
-            output_s3_key,
-            str(result_file)
+            output_dir,
+            results_prefix,
+            job_id,
+            outputs
         )
 
-        logger.info("Upload complete. Job finished successfully")
+        logger.info(f"Uploaded {len(entries)} artifact(s). Job finished successfully")
 
         # Structured payload that matches backend expectations:
         # jobs.py can read output["result_s3_key"] or output["output_s3_key"]
@@ -287,6 +551,8 @@ def handler(event):
             "output": {
                 "job_id": job_id,
                 "output_s3_key": output_s3_key,
+                "manifest_s3_key": manifest_s3_key,
+                "artifact_count": len(entries),
                 "model_name": model_name
             }
         }
@@ -0,0 +1,200 @@
+"""
+Tests for DiffAb inference (warm executor, batched sampling) on a tiny randomly initialised model.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("Bio")
+
+BACKEND = Path(__file__).resolve().parents[1]
+DIFFAB_ROOT = BACKEND / "backend"
+EXAMPLE_PDB = DIFFAB_ROOT / "data" / "examples" / "3QHF_Fv.pdb"
+
+sys.path.insert(0, str(DIFFAB_ROOT))
+
+import diffab_real_wrapper as wrapper  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def diffab_root(tmp_path_factory):
+    """A DiffAb root whose codesign_single config designs H_CDR3 twice with tiny weights."""
+    from easydict import EasyDict
+    from diffab.models import get_model
+
+    root = tmp_path_factory.mktemp("diffab")
+    (root / "configs" / "test").mkdir(parents=True)
+    (root / "configs" / "test" / "codesign_single.yml").write_text(
+        "mode: single_cdr\n"
+        "model:\n"
+        "  checkpoint: ./trained_models/codesign_single.pt\n"
+        "sampling:\n"
+        "  seed: 2022\n"
+        "  sample_structure: true\n"
+        "  sample_sequence: true\n"
+        "  cdrs:\n"
+        "    - H_CDR3\n"
+        "  num_samples: 2\n"
+    )
+
+    cfg = EasyDict(model=EasyDict(
+        type="diffab",
+        res_feat_dim=32,
+        pair_feat_dim=16,
+        diffusion=EasyDict(num_steps=5, eps_net_opt=EasyDict(num_layers=1)),
+        train_structure=True,
+        train_sequence=True,
+    ))
+    torch.manual_seed(0)
+    weights = root / "weights"
+    weights.mkdir()
+    torch.save({"config": cfg, "model": get_model(cfg.model).state_dict()}, weights / "codesign_single.pt")
+    return root
+
+
+@pytest.fixture
+def engine(monkeypatch, diffab_root):
+    monkeypatch.setattr(wrapper, "DIFFAB_ROOT", diffab_root)
+    monkeypatch.setattr(wrapper, "WEIGHTS_DIR", diffab_root / "weights")
+    return wrapper.DiffAbEngine(device="cpu")
+
+
+def _designs(output):
+    return {p.name: p.read_text() for p in Path(output).glob("diffab_*.pdb")}
+
+
+def test_warm_runs_match_a_cold_run(engine, diffab_root, tmp_path):
+    """Test the cached model produces the same designs as loading it per job."""
+    from diffab.tools.runner.design_for_pdb import args_factory, design_for_pdb
+
+    pdb = tmp_path / "input.pdb"
+    pdb.write_bytes(EXAMPLE_PDB.read_bytes())
+
+    # Cold: what one `python wrapper.py` run does, checkpoint loaded from the config
+    config = wrapper.build_config("codesign_single", 2, 0.5, relax=False)
+    config_path = tmp_path / "run_config.yml"
+    config_path.write_text(wrapper.yaml.dump(config))
+    cold = tmp_path / "cold"
+    design_for_pdb(args_factory(
+        pdb_path=str(pdb), heavy="H", light="L", no_renumber=True, config=str(config_path),
+        out_root=str(cold), tag="diffab_run", device="cpu", batch_size=1,
+    ))
+    wrapper.flatten_outputs(str(cold))
+
+    warm = []
+    for run in range(2):
+        output = tmp_path / f"warm{run}"
+        engine.run(pdb, str(output), num_designs=2, relax=False, renumber=False, heavy="H", light="L")
+        warm.append(_designs(output))
+
+    assert len(engine._models) == 1
+    assert {"diffab_0000.pdb", "diffab_0001.pdb"} <= set(warm[0])
+    assert warm[0] == warm[1] == _designs(cold)
+
+
+def test_designs_do_not_depend_on_batch_size(diffab_root, tmp_path):
+    """Test packing samples of several CDRs into shared batches gives the same designs."""
+    from diffab.tools.runner.design_for_pdb import args_factory, design_for_pdb, load_model
+
+    config = wrapper.yaml.safe_load((diffab_root / "configs" / "test" / "codesign_single.yml").read_text())
+    config["model"]["checkpoint"] = str(diffab_root / "weights" / "codesign_single.pt")
+    config["sampling"]["cdrs"] = ["H_CDR3", "L_CDR1", "L_CDR3"]
+    config_path = tmp_path / "run_config.yml"
+    config_path.write_text(wrapper.yaml.dump(config))
+    model, _ = load_model(config["model"]["checkpoint"], "cpu")
+
+    designs = {}
+    for batch_size in (1, 4):
+        log_dir = Path(design_for_pdb(args_factory(
+            pdb_path=str(EXAMPLE_PDB), heavy="H", light="L", no_renumber=True, config=str(config_path),
+            out_root=str(tmp_path / f"bs{batch_size}"), device="cpu", batch_size=batch_size,
+        ), model=model))
+        designs[batch_size] = {
+            str(p.relative_to(log_dir)): p.read_text() for p in log_dir.glob("*/0*.pdb")
+        }
+
+    assert sorted(designs[1]) == [f"{cdr}/{k:04d}.pdb" for cdr in ("H_CDR3", "L_CDR1", "L_CDR3") for k in range(2)]
+    assert designs[4] == designs[1]
+
+
+def test_shared_encoding_matches_copies(diffab_root):
+    """Test broadcasting each input's features across its samples matches encoding every copy."""
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.tools.runner.design_for_pdb import create_data_variants, load_model
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.transforms import Compose, PatchAroundAnchor
+
+    model, _ = load_model(str(diffab_root / "weights" / "codesign_single.pt"), "cpu")
+    structure = lambda: preprocess_antibody_structure({
+        "id": EXAMPLE_PDB.name, "pdb_path": str(EXAMPLE_PDB), "heavy_id": "H", "light_id": "L",
+    })
+    config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=["H_CDR3", "L_CDR3"]))
+    crop = Compose([PatchAroundAnchor(), RemoveNative(remove_structure=True, remove_sequence=True)])
+    data = [crop(v["data"]) for v in create_data_variants(config, structure)]
+    collate = PaddingCollate(eight=False)
+
+    # One input (an expanded view), then two inputs sharing a batch
+    for items in ([(0, 0), (0, 1), (0, 2)], [(0, 0), (1, 0), (1, 1)]):
+        generator = lambda: BatchGenerator([BatchGenerator.seed_for(7, i, k) for i, k in items])
+        copied = model.sample(collate([data[i] for i, _ in items]), sample_opt={"generator": generator()})
+        shared = model.sample(collate([data[i] for i in sorted({i for i, _ in items})]), sample_opt={
+            "generator": generator(),
+            "repeats": [sum(1 for i, _ in items if i == u) for u in sorted({i for i, _ in items})],
+        })
+        for a, b in zip(copied[0], shared[0]):
+            assert torch.equal(a, b)
+
+
+def test_safetensors_checkpoint_loads_the_same_model(diffab_root, tmp_path):
+    """Test a converted safetensors checkpoint gives the same config, weights and designs."""
+    pytest.importorskip("safetensors")
+    from diffab.tools.checkpoint import convert
+    from diffab.tools.runner.design_for_pdb import args_factory, design_for_pdb, load_model
+    from diffab.utils.checkpoint import is_safetensors, load_checkpoint
+
+    legacy = diffab_root / "weights" / "codesign_single.pt"
+    converted = convert(str(legacy), str(tmp_path / "codesign_single.safetensors"))
+    assert is_safetensors(converted) and not is_safetensors(legacy)
+    cfg_legacy, _ = load_checkpoint(str(legacy))
+    cfg_converted, _ = load_checkpoint(converted)
+    assert cfg_converted == cfg_legacy
+
+    config = wrapper.yaml.safe_load((diffab_root / "configs" / "test" / "codesign_single.yml").read_text())
+    config_path = tmp_path / "run_config.yml"
+    config_path.write_text(wrapper.yaml.dump(config))
+    designs = []
+    for checkpoint in (str(legacy), converted):
+        model, lsd = load_model(checkpoint, "cpu")
+        assert not lsd.missing_keys and not lsd.unexpected_keys
+        designs.append((model.state_dict(), Path(design_for_pdb(args_factory(
+            pdb_path=str(EXAMPLE_PDB), heavy="H", light="L", no_renumber=True, config=str(config_path),
+            out_root=str(tmp_path / Path(checkpoint).suffix[1:]), device="cpu",
+        ), model=model))))
+
+    (weights_legacy, log_legacy), (weights_converted, log_converted) = designs
+    assert weights_converted.keys() == weights_legacy.keys()
+    assert all(torch.equal(weights_converted[k], v) for k, v in weights_legacy.items())
+    assert (log_converted / "H_CDR3" / "0000.pdb").read_text() == (log_legacy / "H_CDR3" / "0000.pdb").read_text()
+
+
+def test_inference_weights_are_the_loaded_tensors(diffab_root, tmp_path):
+    """Test the runners take the memory-mapped safetensors as the weights rather than copies."""
+    pytest.importorskip("safetensors")
+    from diffab.models import get_model
+    from diffab.tools.checkpoint import convert
+    from diffab.utils.checkpoint import load_checkpoint, load_inference_weights
+
+    converted = convert(str(diffab_root / "weights" / "codesign_single.pt"), str(tmp_path / "w.safetensors"))
+    cfg, state_dict = load_checkpoint(converted)
+    model = get_model(cfg.model)
+
+    lsd = load_inference_weights(model, state_dict)
+
+    assert not lsd.missing_keys and not lsd.unexpected_keys
+    loaded = model.state_dict()
+    assert all(loaded[k].data_ptr() == v.data_ptr() for k, v in state_dict.items())
@@ -0,0 +1,370 @@
+"""
+Tests for the DiffAb diffusion sampler on a tiny randomly initialised model.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("Bio")
+
+DIFFAB_ROOT = Path(__file__).resolve().parents[1] / "backend"
+EXAMPLE_PDB = DIFFAB_ROOT / "data" / "examples" / "3QHF_Fv.pdb"
+
+sys.path.insert(0, str(DIFFAB_ROOT))
+
+
+@pytest.fixture(scope="module")
+def model():
+    from easydict import EasyDict
+    from diffab.models import get_model
+
+    torch.manual_seed(0)
+    return get_model(EasyDict(
+        type="diffab",
+        res_feat_dim=32,
+        pair_feat_dim=16,
+        diffusion=EasyDict(num_steps=10, eps_net_opt=EasyDict(num_layers=1)),
+    )).eval()
+
+
+@pytest.fixture(scope="module")
+def batch():
+    from easydict import EasyDict
+    from diffab.datasets.custom import preprocess_antibody_structure
+    from diffab.tools.runner.design_for_pdb import create_data_variants
+    from diffab.utils.data import PaddingCollate
+    from diffab.utils.inference import RemoveNative
+    from diffab.utils.transforms import Compose, PatchAroundAnchor
+
+    structure = lambda: preprocess_antibody_structure({
+        "id": EXAMPLE_PDB.name, "pdb_path": str(EXAMPLE_PDB), "heavy_id": "H", "light_id": "L",
+    })
+    config = EasyDict(mode="single_cdr", sampling=EasyDict(cdrs=["H_CDR3"]))
+    torch.manual_seed(0)
+    data = Compose([PatchAroundAnchor(), RemoveNative(remove_structure=True, remove_sequence=True)])(
+        create_data_variants(config, structure)[0]["data"]
+    )
+    return PaddingCollate(eight=False)([data])
+
+
+def test_respacing_every_step_keeps_the_schedule():
+    """Test a 'strided' schedule that visits every step is the original schedule."""
+    from diffab.modules.diffusion.transition import VarianceSchedule
+
+    sched = VarianceSchedule(100)
+    respaced = sched.respace(range(1, 101))
+
+    for name in ("alpha_bars", "betas", "alphas", "sigmas"):
+        assert torch.equal(getattr(respaced, name), getattr(sched, name))
+
+
+def test_strided_schedule_jumps_between_visited_steps():
+    """Test each strided step is the forward jump between its two visited timesteps."""
+    from diffab.modules.diffusion.transition import VarianceSchedule
+
+    sched = VarianceSchedule(100)
+    timesteps = [1, 12, 23, 34, 45, 56, 67, 78, 89, 100]
+    respaced = sched.respace(timesteps)
+
+    assert torch.allclose(respaced.alpha_bars[1:], sched.alpha_bars[timesteps])
+    # DDPM posterior variance of the jump t -> s
+    t, s = 56, 45
+    beta = 1 - sched.alpha_bars[t] / sched.alpha_bars[s]
+    sigma = ((1 - sched.alpha_bars[s]) / (1 - sched.alpha_bars[t]) * beta).sqrt()
+    assert torch.allclose(respaced.betas[6], beta)
+    assert torch.allclose(respaced.sigmas[6], sigma)
+
+
+def test_strided_sequence_posterior_is_the_jump_posterior():
+    """Test a respaced sequence step uses Bayes' rule over the jump between visited steps."""
+    from diffab.modules.diffusion.transition import AminoacidCategoricalTransition
+
+    K = 20
+    trans = AminoacidCategoricalTransition(100)
+    timesteps = [1, 34, 67, 100]
+    respaced = trans.respace(timesteps)
+    assert not trans.jump_posterior and respaced.jump_posterior
+
+    def forward(alpha):     # q(x_b | x_a) of a step that keeps the class with weight alpha
+        return alpha * torch.eye(K) + (1 - alpha) / K
+
+    alpha_bars = trans.var_sched.alpha_bars
+    for i in (1, 2, 3):     # Jumps 34 -> 1, 67 -> 34, 100 -> 67
+        t = timesteps[i]
+        s = timesteps[i - 1]
+        x_t = torch.randint(0, K, (1, 5))
+        x_0 = torch.randint(0, K, (1, 5))
+        expected = forward(alpha_bars[t] / alpha_bars[s])[:, x_t[0]].T * forward(alpha_bars[s])[x_0[0]]
+        expected = expected / expected.sum(dim=-1, keepdim=True)
+        actual = respaced.posterior(x_t, x_0, torch.tensor([i + 1]))
+        assert torch.allclose(actual[0], expected, atol=1e-5)
+
+    # The last jump lands on x_0
+    x_0 = torch.randint(0, K, (1, 5))
+    post = respaced.posterior(torch.randint(0, K, (1, 5)), x_0, torch.tensor([1]))
+    assert torch.equal(post.argmax(dim=-1), x_0)
+
+
+def test_strided_sampler_runs_only_the_requested_steps(model, batch):
+    """Test sample_steps runs that many network evaluations, conditioned on the original steps."""
+    from diffab.modules.common.noise import BatchGenerator
+
+    betas = []
+    hook = model.diffusion.eps_net.register_forward_hook(lambda m, args, out: betas.append(args[5][0].item()))
+    try:
+        traj = model.sample(batch, sample_opt={
+            "generator": BatchGenerator([0, 1]), "repeats": [2], "sample_steps": 4, "return_trajectory": True,
+        })
+    finally:
+        hook.remove()
+
+    schedule = model.diffusion.trans_pos.var_sched
+    assert sorted(traj) == [0, 1, 4, 7, 10]
+    assert betas == pytest.approx([schedule.betas[t].item() for t in (10, 7, 4, 1)])
+    mask = batch["generate_flag"][0]
+    assert torch.isfinite(traj[0][1][:, mask]).all()
+    # The context is never touched
+    assert torch.equal(traj[0][2][:, ~mask], traj[10][2][:, ~mask])
+
+
+@pytest.mark.parametrize("sample_steps, visited", [(2, [10, 1]), (3, [10, 6, 1])])
+def test_strided_sampler_always_starts_from_the_last_step(model, batch, sample_steps, visited):
+    """Test very few steps still start from the step the noise is initialised for."""
+    from diffab.modules.common.noise import BatchGenerator
+
+    betas = []
+    hook = model.diffusion.eps_net.register_forward_hook(lambda m, args, out: betas.append(args[5][0].item()))
+    try:
+        traj = model.sample(batch, sample_opt={
+            "generator": BatchGenerator([0]), "repeats": [1], "sample_steps": sample_steps, "return_trajectory": True,
+        })
+    finally:
+        hook.remove()
+
+    schedule = model.diffusion.trans_pos.var_sched
+    assert sorted(traj) == sorted([0] + visited)
+    assert betas == pytest.approx([schedule.betas[t].item() for t in visited])
+    mask = batch["generate_flag"][0]
+    assert torch.isfinite(traj[0][1][:, mask]).all()
+    # The final step denoises away from the initial noise
+    assert not torch.allclose(traj[0][1][:, mask], traj[10][1][:, mask])
+
+
+@pytest.mark.parametrize("sample_steps", [1, 0, -5])
+def test_strided_sampler_rejects_fewer_than_two_steps(model, batch, sample_steps):
+    """Test a single step, which would return the initial noise nearly unchanged, is refused."""
+    from diffab.modules.common.noise import BatchGenerator
+
+    with pytest.raises(ValueError):
+        model.sample(batch, sample_opt={"generator": BatchGenerator([0]), "repeats": [1], "sample_steps": sample_steps})
+
+
+@pytest.mark.parametrize("return_trajectory, steps", [(False, [0]), (True, list(range(11))), (4, [0, 2, 6, 10])])
+def test_trajectory_snapshots_do_not_change_the_design(model, batch, return_trajectory, steps):
+    """Test the final state does not depend on how much of the trajectory is kept."""
+    from diffab.modules.common.noise import BatchGenerator
+
+    def sample(**opt):
+        return model.sample(batch, sample_opt={"generator": BatchGenerator([0, 1]), "repeats": [2], **opt})
+
+    full = sample(return_trajectory=True)
+    traj = sample(return_trajectory=return_trajectory)
+
+    assert sorted(traj) == steps
+    for t in steps:
+        assert all(torch.equal(a, b) for a, b in zip(traj[t], full[t]))
+
+
+def test_inverse_cdf_angular_sampler_matches_histogram():
+    """Test the inverse-CDF sampler draws from the histogram the multinomial sampler used."""
+    import math
+    from diffab.modules.common.so3 import ApproxAngularDistribution
+    from diffab.modules.diffusion.transition import VarianceSchedule
+
+    distrib = ApproxAngularDistribution(VarianceSchedule(100).sigmas.tolist())
+    torch.manual_seed(0)
+    M = 200000
+    for step in (30, 60, 100):
+        assert not distrib.approx_flag[step]
+        new = distrib.sample(torch.full((4, M // 4), step))
+        # Reference: pick a bin proportional to Y, then a uniform point within it
+        bin_idx = torch.multinomial(distrib.Y[step, :-1], M, replacement=True)
+        X = distrib.X[step]
+        ref = X[bin_idx] + torch.rand(M) * (X[bin_idx + 1] - X[bin_idx])
+
+        h_new = torch.histc(new.flatten(), 32, 0, math.pi) / M
+        h_ref = torch.histc(ref, 32, 0, math.pi) / M
+        assert 0.5 * (h_new - h_ref).abs().sum() < 0.02    # ~0.007 expected from sampling noise
+        assert abs(new.mean() - ref.mean()) < 0.01
+
+
+def test_gumbel_max_categorical_matches_probabilities():
+    """Test the Gumbel-max sampler draws categories in proportion to their probabilities."""
+    from diffab.modules.common import noise
+
+    torch.manual_seed(0)
+    prob = torch.rand(3, 1, 20) ** 4 + 1e-8    # Unnormalized, some near zero
+    M = 50000
+    for generator in (None, noise.BatchGenerator([0, 1, 2])):
+        x = noise.categorical(prob.expand(3, M, 20), generator)    # (3, M)
+        freq = torch.stack([torch.bincount(row, minlength=20) for row in x]).float() / M
+        expected = prob[:, 0] / prob[:, 0].sum(dim=-1, keepdim=True)
+        assert (0.5 * (freq - expected).abs().sum(dim=-1) < 0.015).all()
+
+
+def test_angular_histograms_are_saved_and_reloaded(tmp_path, monkeypatch):
+    """Test a second construction loads the saved histograms instead of recomputing them."""
+    from diffab.modules.common.so3 import ApproxAngularDistribution
+
+    monkeypatch.setenv("DIFFAB_CACHE_DIR", str(tmp_path))
+    stddevs = [0.05, 0.3, 0.8, 1.5]
+    first = ApproxAngularDistribution(stddevs, num_bins=256, num_iters=64)
+    assert len(list(tmp_path.glob("angular_*.npy"))) == 1
+
+    monkeypatch.setattr(ApproxAngularDistribution, "_pdf", staticmethod(lambda *args: pytest.fail("recomputed")))
+    second = ApproxAngularDistribution(stddevs, num_bins=256, num_iters=64)
+    assert second.state_dict().keys() == first.state_dict().keys()
+    for name, buffer in first.state_dict().items():
+        assert torch.equal(second.state_dict()[name], buffer)
+    assert torch.equal(second.cdf, first.cdf)
+    second.load_state_dict(first.state_dict())    # The mapped buffers accept a checkpoint
+    monkeypatch.undo()
+
+    monkeypatch.setenv("DIFFAB_CACHE_DIR", str(tmp_path))
+    other = ApproxAngularDistribution(stddevs, num_bins=128, num_iters=64)    # Different key
+    assert other.Y.shape == (4, 128)
+    assert len(list(tmp_path.glob("angular_*.npy"))) == 2
+
+
+def test_cpu_profile_converts_the_mlps_and_attention(model, batch):
+    """Test the CPU profile quantizes the MLP stacks, autocasts the attention and still samples."""
+    import copy
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.modules.encoders.ga import GABlock
+    from diffab.utils.cpu import apply_cpu_profile, get_cpu_profile
+
+    assert get_cpu_profile(False) is None
+    with pytest.raises(ValueError):
+        get_cpu_profile({"threads": 4})
+    profile = get_cpu_profile({"num_threads": torch.get_num_threads()})
+    converted = apply_cpu_profile(copy.deepcopy(model), profile)
+
+    mlps = [m for m in converted.modules() if isinstance(m, torch.nn.Sequential)]
+    assert mlps and all(not isinstance(layer, torch.nn.Linear) for mlp in mlps for layer in mlp)
+    assert any(isinstance(layer, DynamicLinear) for mlp in mlps for layer in mlp)
+    blocks = [m for m in converted.modules() if isinstance(m, GABlock)]
+    assert blocks and all(b.autocast_dtype == torch.bfloat16 for b in blocks)
+    assert all(type(b.proj_query) is torch.nn.Linear for b in blocks)   # Attention projections stay float
+
+    with torch.no_grad():
+        traj = converted.sample(batch, sample_opt={"generator": BatchGenerator([0]), "repeats": [1]})
+    mask = batch["generate_flag"][0]
+    assert traj[0][1].dtype == torch.float32
+    assert torch.isfinite(traj[0][1][:, mask]).all()
+
+
+def test_onnx_eps_net_matches_eager(model, tmp_path):
+    """Test the exported network matches eager mode at other sizes, with shared and per-sample pair features."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    from diffab.modules.common.so3 import random_uniform_so3, so3vec_to_rotation
+    from diffab.modules.diffusion.onnx_backend import OrtEpsilonNet, export_eps_net
+
+    eps_net = model.diffusion.eps_net
+    ort_net = OrtEpsilonNet(export_eps_net(eps_net, str(tmp_path / "eps_net.onnx")))
+    torch.manual_seed(0)
+    for N, L, shared in ((3, 45, True), (2, 20, False)):
+        mask_res = torch.ones(N, L, dtype=torch.bool)
+        mask_res[1:, L - 5:] = False    # Padding
+        mask_generate = torch.zeros(N, L, dtype=torch.bool)
+        mask_generate[:, 5:15] = True
+        pair_feat = torch.randn(1, L, L, 16).expand(N, -1, -1, -1) if shared else torch.randn(N, L, L, 16)
+        inputs = (
+            random_uniform_so3([N, L]), torch.randn(N, L, 3).cumsum(dim=1), torch.randint(0, 20, (N, L)),
+            torch.randn(N, L, 32), pair_feat, torch.full([N], 0.05),
+            mask_generate, mask_res,
+        )
+        with torch.no_grad():
+            expected = list(eps_net(*inputs))
+        actual = list(ort_net(*inputs))
+        for x, ref in zip(actual, expected):
+            assert x.shape == ref.shape
+        # v_next is the log of R_next, whose acos turns round-off near angle pi into ~sqrt(eps)
+        assert torch.allclose(so3vec_to_rotation(actual[0]), so3vec_to_rotation(expected[0]), atol=2e-3)
+        for x, ref in zip(actual[1:], expected[1:]):
+            assert torch.allclose(x, ref, atol=1e-4)
+
+
+def test_load_model_with_onnxruntime_backend_samples(model, batch, tmp_path, monkeypatch):
+    """Test `backend: onnxruntime` swaps in the exported network and samples like eager mode."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    from easydict import EasyDict
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.modules.diffusion.onnx_backend import OrtEpsilonNet
+    from diffab.tools.runner.design_for_pdb import load_model
+    from diffab.utils.checkpoint import save_inference_checkpoint
+
+    config = EasyDict(model=EasyDict(
+        type="diffab", res_feat_dim=32, pair_feat_dim=16,
+        diffusion=EasyDict(num_steps=10, eps_net_opt=EasyDict(num_layers=1)),
+    ))
+    checkpoint = str(tmp_path / "tiny.safetensors")
+    save_inference_checkpoint(checkpoint, config, model.state_dict())
+    monkeypatch.setenv("DIFFAB_CACHE_DIR", str(tmp_path / "cache"))
+    with pytest.raises(ValueError):
+        load_model(checkpoint, "cpu", backend="tensorrt")
+
+    ort_model, _ = load_model(checkpoint, "cpu", backend="onnxruntime")
+    assert isinstance(ort_model.diffusion.eps_net_backend, OrtEpsilonNet)
+    assert len(list((tmp_path / "cache").glob("eps_net_*.onnx"))) == 1
+    load_model(checkpoint, "cpu", backend="onnxruntime")    # Reuses the exported graph
+    assert len(list((tmp_path / "cache").glob("eps_net_*.onnx"))) == 1
+
+    sample_opt = {"generator": BatchGenerator([0, 1]), "repeats": [2]}
+    with torch.no_grad():
+        _, pos, aa = ort_model.sample(batch, sample_opt=dict(sample_opt))[0]
+        sample_opt["generator"] = BatchGenerator([0, 1])
+        _, pos_ref, aa_ref = model.sample(batch, sample_opt=sample_opt)[0]
+    mask = batch["generate_flag"][0]
+    assert torch.isfinite(pos[:, mask]).all()
+    assert (pos - pos_ref).abs().max() < 1e-3 * pos_ref.abs().max()    # float32 round-off, relative
+    assert (aa == aa_ref).float().mean() > 0.9
+
+
+def test_compiled_step_samples_like_eager_mode(model, batch):
+    """Test the compiled sampling step reproduces eager sampling, also when optimizing."""
+    import copy
+    from diffab.modules.common.noise import BatchGenerator
+    from diffab.utils.compiler import compile_model, get_compile_opt
+
+    assert get_compile_opt(None) is None
+    with pytest.raises(ValueError):
+        get_compile_opt({"buckets": 32})
+    compiled = compile_model(copy.deepcopy(model), get_compile_opt({"backend": "eager"}))  # Tracing only, quick
+
+    sample_opt = lambda: {"generator": BatchGenerator([0, 1]), "repeats": [2], "sample_steps": 5}
+    with torch.no_grad():
+        expected = model.sample(batch, sample_opt=sample_opt())[0]
+        actual = compiled.sample(batch, sample_opt=sample_opt())[0]
+        for x, ref in zip(actual, expected):
+            assert torch.equal(x, ref)
+        expected = model.optimize(batch, opt_step=4, optimize_opt=sample_opt())[0]
+        actual = compiled.optimize(batch, opt_step=4, optimize_opt=sample_opt())[0]
+        for x, ref in zip(actual, expected):
+            assert torch.equal(x, ref)
+
+
+def test_padding_collate_pads_to_buckets():
+    """Test bucketed collation pads to the next multiple of the bucket size."""
+    from diffab.utils.data import PaddingCollate
+
+    data = [{"aa": torch.zeros(33, dtype=torch.long)}, {"aa": torch.zeros(40, dtype=torch.long)}]
+    batch = PaddingCollate(bucket_size=32)(data)
+    assert batch["aa"].shape == (2, 64)
+    assert batch["mask"].sum(dim=1).tolist() == [33, 40]
+    assert PaddingCollate(bucket_size=32, min_length=64)(data)["aa"].size(1) == 64
+    assert PaddingCollate()(data)["aa"].size(1) == 40
@@ -0,0 +1,100 @@
+"""
+Unit tests for the dispatch worker pool: bounded concurrency, retries and drain.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.domain.services.dispatch_queue import DispatchQueue
+from app.worker import dispatcher as dispatcher_module
+from app.worker.dispatcher import JobDispatcher, resolve_pipeline
+
+
+class _FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+def _install_queue(monkeypatch, tasks, calls):
+    """Serve `tasks` from a fake queue and record retry/complete calls."""
+    async def claim(db, limit, lease_seconds):
+        claimed, tasks[:] = tasks[:limit], tasks[limit:]
+        return claimed
+
+    async def retry_later(db, job_id, delay_seconds, error):
+        calls.append(("retry", job_id, delay_seconds))
+
+    async def complete(db, job_id):
+        calls.append(("complete", job_id))
+
+    monkeypatch.setattr(dispatcher_module, "AsyncSessionLocal", _FakeSession)
+    monkeypatch.setattr(DispatchQueue, "claim", staticmethod(claim))
+    monkeypatch.setattr(DispatchQueue, "retry_later", staticmethod(retry_later))
+    monkeypatch.setattr(DispatchQueue, "complete", staticmethod(complete))
+
+
+def test_resolve_pipeline_narrows_full_pipeline():
+    """Test the full pipeline follows the analysis; explicit pipelines are kept."""
+    assert resolve_pipeline("diffab_rfdiffusion_af2", {"recommended_mode": "fixbb"}) == "diffab_only"
+    assert resolve_pipeline("diffab_rfdiffusion_af2", {"recommended_mode": "unknown"}) == "diffab_rfdiffusion_af2"
+    assert resolve_pipeline("af2_only", {"recommended_mode": "fixbb"}) == "af2_only"
+
+
+def test_pool_never_exceeds_concurrency(monkeypatch):
+    """Test a burst of queued jobs is dispatched at most `concurrency` at a time."""
+    tasks = [SimpleNamespace(job_id=f"job-{i}", payload={}, attempts=1) for i in range(10)]
+    _install_queue(monkeypatch, tasks, [])
+
+    running, peak, done = 0, 0, []
+
+    async def fake_dispatch(db, job_id, payload):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        done.append(job_id)
+
+    monkeypatch.setattr(dispatcher_module, "dispatch_job", fake_dispatch)
+
+    async def scenario():
+        pool = JobDispatcher(concurrency=3, poll_interval=0.01)
+        runner = asyncio.create_task(pool.run())
+        while len(done) < 10:
+            await asyncio.sleep(0.01)
+        pool.stop()
+        await runner
+
+    asyncio.run(scenario())
+
+    assert peak == 3
+    assert sorted(done) == sorted(f"job-{i}" for i in range(10))
+
+
+def test_failures_are_retried_with_backoff_then_given_up(monkeypatch):
+    """Test unexpected errors release the task with backoff until max_attempts."""
+    calls = []
+    _install_queue(monkeypatch, [], calls)
+
+    async def boom(db, job_id, payload):
+        raise RuntimeError("db down")
+
+    given_up = []
+
+    async def give_up(self, task, error):
+        given_up.append((task.job_id, error))
+
+    monkeypatch.setattr(dispatcher_module, "dispatch_job", boom)
+    monkeypatch.setattr(JobDispatcher, "_give_up", give_up)
+
+    pool = JobDispatcher(concurrency=1, max_attempts=3)
+    asyncio.run(pool._process(SimpleNamespace(job_id="job-1", payload={}, attempts=2)))
+    asyncio.run(pool._process(SimpleNamespace(job_id="job-1", payload={}, attempts=3)))
+
+    assert calls == [("retry", "job-1", 10)]
+    assert given_up == [("job-1", "db down")]
@@ -0,0 +1,77 @@
+"""
+Unit tests for job status events: payloads, hub fan-out and the stream generator.
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from app.api.routes import jobs as jobs_routes
+from app.infrastructure.db.job_events import JobEventHub, MAX_ERROR_CHARS, RESYNC, job_event
+from app.infrastructure.db.models import Job, JobStatus
+
+
+def _event(status, job_id="job-1"):
+    return {"job_id": job_id, "status": status}
+
+
+def test_job_event_snapshot_fits_notify_limit():
+    """Test the event mirrors the status response and truncates long errors."""
+    job = Job(
+        id="job-1",
+        status=JobStatus.FAILED,
+        pipeline_type="diffab_only",
+        created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        error_message="x" * 20000,
+    )
+
+    event = job_event(job)
+
+    assert event["status"] == "failed"
+    assert event["created_at"] == "2024-01-01T00:00:00+00:00"
+    assert len(event["error_message"]) == MAX_ERROR_CHARS + 1
+    assert len(json.dumps(event).encode()) < 8000
+
+
+def test_hub_fans_out_per_job_and_drops_oldest():
+    """Test events reach only that job's subscribers and full queues keep the newest."""
+    async def scenario():
+        hub = JobEventHub()
+        first, second = hub.subscribe("job-1"), hub.subscribe("job-1")
+        other = hub.subscribe("job-2")
+
+        for i in range(20):
+            hub.dispatch(json.dumps({"job_id": "job-1", "status": "running", "seq": i}))
+        hub.dispatch("not json")
+
+        assert other.empty()
+        assert first.qsize() == second.qsize() == 16
+        assert first.get_nowait()["seq"] == 4
+
+        hub.unsubscribe("job-1", first)
+        hub.unsubscribe("job-1", second)
+        assert "job-1" not in hub._subscribers
+
+    asyncio.run(scenario())
+
+
+def test_updates_stop_at_terminal_and_resync_from_db(monkeypatch):
+    """Test the stream skips duplicates, re-reads on resync and ends on a terminal status."""
+    async def scenario():
+        hub = JobEventHub()
+        hub.connected = True
+        monkeypatch.setattr(jobs_routes, "job_event_hub", hub)
+
+        async def _read(job_id):
+            return _event("running")
+        monkeypatch.setattr(jobs_routes, "_read_job_event", _read)
+
+        queue = hub.subscribe("job-1")
+        for event in (_event("provisioning"), RESYNC, _event("running"), _event("completed")):
+            queue.put_nowait(event)
+
+        seen = [e async for e in jobs_routes._job_updates("job-1", queue, _event("queued"))]
+
+        assert [e and e["status"] for e in seen] == ["queued", "provisioning", "running", None, "completed"]
+        assert "job-1" not in hub._subscribers
+
+    asyncio.run(scenario())
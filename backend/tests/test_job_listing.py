@@ -0,0 +1,63 @@
+"""
+Unit tests for keyset job listing and the batch status request.
+"""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+
+from app.domain.services.job_service import JobService
+from app.schemas.job import MAX_BATCH_JOB_IDS, JobStatusBatchRequest
+
+
+class _CapturingSession:
+    """Stands in for AsyncSession: records the statement, returns no rows."""
+
+    def __init__(self):
+        self.statement = None
+
+    async def execute(self, statement):
+        self.statement = statement
+        return self
+
+    def all(self):
+        return []
+
+
+def test_cursor_round_trips():
+    """Test cursors decode back to the exact (created_at, id) they encode."""
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+    cursor = JobService.encode_cursor(created_at, "job-42")
+
+    assert "=" not in cursor
+    assert JobService.decode_cursor(cursor) == (created_at, "job-42")
+    with pytest.raises(ValueError):
+        JobService.decode_cursor("not-a-cursor")
+
+
+def test_list_query_is_keyset_and_skips_heavy_columns():
+    """Test the page query seeks past the cursor and loads neither config nor full errors."""
+    db = _CapturingSession()
+    cursor = JobService.encode_cursor(datetime(2024, 5, 1, tzinfo=timezone.utc), "job-42")
+
+    rows, next_cursor = asyncio.run(JobService.list_jobs(db, limit=20, cursor=cursor))
+    sql = str(db.statement.compile(dialect=postgresql.dialect()))
+
+    assert rows == [] and next_cursor is None
+    assert "(jobs.created_at, jobs.id) < (" in sql
+    assert "ORDER BY jobs.created_at DESC, jobs.id DESC" in sql
+    assert "jobs.config" not in sql
+    assert "substr(jobs.error_message" in sql
+
+
+def test_batch_request_is_bounded():
+    """Test the batch endpoint rejects empty and oversized ID lists."""
+    assert JobStatusBatchRequest(job_ids=["a", "b"]).job_ids == ["a", "b"]
+
+    with pytest.raises(ValidationError):
+        JobStatusBatchRequest(job_ids=[])
+    with pytest.raises(ValidationError):
+        JobStatusBatchRequest(job_ids=[str(i) for i in range(MAX_BATCH_JOB_IDS + 1)])
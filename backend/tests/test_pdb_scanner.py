@@ -0,0 +1,102 @@
+"""
+Unit tests for the single-pass PDB scanner.
+"""
+from app.core.pdb_scanner import PDBScanner, scan_pdb
+from app.core.pdb_analyzer import PDBAnalyzer
+
+
+PDB_CONTENT = b"""HEADER    IMMUNE SYSTEM                           01-JAN-20   1ABC
+TITLE     CRYSTAL STRUCTURE OF A TEST
+TITLE    2 COMPLEX
+COMPND    MOL_ID: 1;
+COMPND   2 MOLECULE: FAB HEAVY CHAIN;
+REMARK   2 RESOLUTION. 2.00 ANGSTROMS.
+ATOM      1  N   GLU H   1       0.000   0.000   0.000  1.00  0.00           N
+ATOM      2  CA  GLU H   1       1.458   0.000   0.000  1.00  0.00           C
+ATOM      3  N   VAL H   2       3.331   1.549   0.000  1.00  0.00           N
+ATOM      4  CA  VAL H   2       3.982   2.851   0.000  1.00  0.00           C
+ATOM      5  N   GLN H   2A      5.331   1.549   0.000  1.00  0.00           N
+TER
+ATOM      6  N   ASP L   1       6.141   3.894   0.000  1.00  0.00           N
+ATOM      7  CA  ASP L   1       7.141   3.894   0.000  1.00  0.00           C
+ATOM      8  N   ILE L   2       8.141   3.894   0.000  1.00  0.00           N
+HETATM    9  O   HOH L 101       9.141   3.894   0.000  1.00  0.00           O
+ATOM     10  N   GLY A   1      10.141   3.894   0.000  1.00  0.00           N
+ATOM     11  N   UNK A   2      11.141   3.894   0.000  1.00  0.00           N
+END
+"""
+
+
+def test_scan_collects_counts_chains_and_sequences():
+    """Test a single scan returns counts, chains, sequences and header text."""
+    scan = scan_pdb(PDB_CONTENT)
+
+    assert scan.atom_count == 11
+    assert scan.residue_count == 8
+    assert scan.chain_ids == ["H", "L", "A"]
+    assert scan.sequences == {"H": "EVQ", "L": "DI", "A": "GX"}
+    assert scan.header.startswith("IMMUNE SYSTEM")
+    assert scan.title == "CRYSTAL STRUCTURE OF A TEST COMPLEX"
+    assert "FAB HEAVY CHAIN" in scan.compnd
+    assert {"FAB", "HEAVY CHAIN"} <= scan.antibody_keywords
+    assert scan.verdict() == (True, None)
+
+
+def test_scan_is_independent_of_chunk_boundaries():
+    """Test feeding in tiny chunks gives the same result as one chunk."""
+    whole = scan_pdb(PDB_CONTENT)
+
+    scanner = PDBScanner()
+    for i in range(0, len(PDB_CONTENT), 3):
+        scanner.feed(PDB_CONTENT[i:i + 3])
+    scanner.close()
+
+    assert scanner.file_info() == whole.file_info()
+    assert scanner.sequences == whole.sequences
+    assert scanner.antibody_keywords == whole.antibody_keywords
+
+
+def test_scan_ignores_later_models_for_residues():
+    """Test residues and sequences are taken from the first MODEL only, chains from every model."""
+    atom = b"ATOM      1  CA  ALA %s   1       0.000   0.000   0.000  1.00  0.00           C\n"
+    content = (
+        b"MODEL        1\n" + atom % b"A" + b"ENDMDL\n"
+        + b"MODEL        2\n" + atom % b"A" + atom.replace(b"ALA", b"GLY") % b"B" + b"ENDMDL\n"
+    )
+
+    scan = scan_pdb(content)
+
+    assert scan.atom_count == 3
+    assert scan.residue_count == 1
+    assert scan.sequences == {"A": "A"}
+    assert scan.chain_ids == ["A", "B"]
+    assert PDBAnalyzer.analyze(scan)["chains"] == ["A", "B"]
+    assert scan.verdict()[0] is False
+
+
+def test_scan_skips_keywords_in_coordinate_records():
+    """Test keywords in ATOM/HETATM lines (here a "VH" segment ID) are not antibody evidence."""
+    atoms = b"".join(
+        b"ATOM  %5d  CA  ALA A%4d       0.000   0.000   0.000  1.00  0.00      VH   C\n" % (i, i)
+        for i in range(1, 11)
+    )
+    content = b"HEADER    HYDROLASE\n" + atoms + b"HETATM   11  C1  FAB A 101       0.000   0.000   0.000  1.00  0.00           C\n"
+
+    scan = scan_pdb(content)
+
+    assert scan.antibody_keywords == set()
+    assert PDBAnalyzer.analyze(scan)["is_antibody"] is False
+    assert scan_pdb(b"REMARK   1 VH DOMAIN\n" + atoms).antibody_keywords == {"VH"}
+
+
+def test_analyzer_accepts_scanner():
+    """Test PDBAnalyzer reuses a scan instead of re-reading the file."""
+    scan = scan_pdb(PDB_CONTENT)
+
+    from_scan = PDBAnalyzer.analyze(scan)
+    from_text = PDBAnalyzer.analyze(PDB_CONTENT.decode())
+
+    assert from_scan == from_text
+    assert from_scan["chains"] == ["A", "H", "L"]
+    assert from_scan["is_antibody"] is True
+    assert from_scan["recommended_mode"] == "codesign_multicdrs"
@@ -0,0 +1,112 @@
+"""
+Unit tests for the rate limiter's cost weights, GCRA script, local pre-filter and 429 response.
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.rate_limit import LocalTokenBucket, RateLimitMiddleware, route_cost
+
+
+def test_route_costs():
+    """Test job submission costs more than reads and batch lookups."""
+    assert route_cost("POST", "/api/v1/jobs/") == 10
+    assert route_cost("POST", "/api/v1/jobs/status:batch") == 2
+    assert route_cost("GET", "/api/v1/jobs/abc") == 1
+
+
+def test_local_bucket_refills_at_limit_rate():
+    """Test the local bucket allows a full burst, then refills proportionally."""
+    bucket = LocalTokenBucket(capacity=60, refill_per_second=1.0)
+
+    assert bucket.try_consume("c", 50, now=0.0)
+    assert not bucket.try_consume("c", 20, now=0.0)
+    assert bucket.try_consume("c", 20, now=10.0)
+    assert bucket.try_consume("other", 60, now=10.0)
+
+
+def test_middleware_rejects_bursts_locally(monkeypatch):
+    """Test an over-limit client gets 429 with Retry-After even when Redis is unreachable."""
+    monkeypatch.setattr(settings, "rate_limit_redis_timeout", 0.05)
+
+    app = FastAPI()
+
+    @app.get("/api/v1/jobs/{job_id}")
+    async def get_job(job_id: str):
+        return {"job_id": job_id}
+
+    # Redis is down (fails open); only the local bucket can reject
+    app.add_middleware(
+        RateLimitMiddleware,
+        redis_url="redis://127.0.0.1:1/0",
+        requests_per_minute=3,
+        local_prefilter=True,
+    )
+    client = TestClient(app)
+
+    statuses = [client.get("/api/v1/jobs/a").status_code for _ in range(4)]
+    rejected = client.get("/api/v1/jobs/a")
+
+    assert statuses == [200, 200, 200, 429]
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+
+def _gcra_limiter(redis, requests_per_minute):
+    """A limiter running the GCRA script on the given (fake) Redis, without the local pre-filter."""
+    from app.core.rate_limit import GCRA_SCRIPT
+
+    limiter = RateLimitMiddleware(
+        app=None, redis_url="redis://unused", requests_per_minute=requests_per_minute, local_prefilter=False
+    )
+    limiter._redis = redis
+    limiter._script = redis.register_script(GCRA_SCRIPT)
+    return limiter
+
+
+def test_gcra_script_weights_route_costs():
+    """Test the Lua script spends the minute's budget by route cost and reports when it refills."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        limiter = _gcra_limiter(redis, requests_per_minute=60)
+        submits = [await limiter._check_rate_limit("ip:a", route_cost("POST", "/api/v1/jobs/")) for _ in range(7)]
+        read = await limiter._check_rate_limit("ip:a", route_cost("GET", "/api/v1/jobs/x"))
+        other = await limiter._check_rate_limit("ip:b", route_cost("POST", "/api/v1/jobs/"))
+        ttl_ms = await redis.pttl("rate_limit:ip:a")
+        await redis.aclose()
+        return submits, read, other, ttl_ms
+
+    submits, read, other, ttl_ms = asyncio.run(scenario())
+
+    # 60 units per minute: six submissions (cost 10) fit, the seventh waits for 10 units
+    assert submits == [(True, 0)] * 6 + [(False, 10)]
+    # A read (cost 1) is denied too until one unit has refilled
+    assert read == (False, 1)
+    # Other clients have their own budget
+    assert other == (True, 0)
+    # The state expires once the bucket would be full again
+    assert 59_000 < ttl_ms <= 60_000
+
+
+def test_rate_limit_benchmark_deletes_only_its_own_keys():
+    """Test the benchmark's cleanup leaves every key outside its namespace alone."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from benchmarks.rate_limit_benchmark import _delete_bench_keys
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await redis.mset({f"rate_limit:bench:{i}": 1 for i in range(1500)})
+        await redis.zadd("rate_limit_legacy:bench:0", {"1": 1})
+        await redis.mset({"rate_limit:ip:10.0.0.1": 1, "jobs:queue": 1, "rate_limit:benchmark": 1})
+        await _delete_bench_keys(redis)
+        keys = sorted(await redis.keys("*"))
+        await redis.aclose()
+        return keys
+
+    assert asyncio.run(scenario()) == ["jobs:queue", "rate_limit:benchmark", "rate_limit:ip:10.0.0.1"]
@@ -0,0 +1,106 @@
+"""
+Unit tests for the RunPod reconciler's status mapping and timeout rule.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.infrastructure.db.models import Job, JobStatus
+from app.infrastructure.storage.s3_service import storage_service
+from app.worker.reconciler import RunPodReconciler, apply_runpod_status, is_timed_out
+
+
+def _job(status=JobStatus.QUEUED, **kwargs):
+    return Job(id="job-1", status=status, runpod_job_id="rp-1", pipeline_type="diffab_only", **kwargs)
+
+
+def test_apply_completed_sets_output_and_timing():
+    """Test a COMPLETED response finishes the job with its output key."""
+    job = _job(JobStatus.RUNNING)
+
+    changed = apply_runpod_status(job, {
+        "status": "COMPLETED",
+        "executionTime": 2500,
+        "output": {"status": "COMPLETED", "output": {"output_s3_key": "jobs/job-1/results/a.pdb"}},
+    })
+
+    assert changed is True
+    assert job.status == JobStatus.COMPLETED
+    assert job.output_s3_key == "jobs/job-1/results/a.pdb"
+    assert job.execution_time == 2.5
+    assert job.finished_at is not None
+
+
+def test_apply_progress_states_are_idempotent():
+    """Test repeated IN_QUEUE / IN_PROGRESS responses only change the job once."""
+    job = _job()
+
+    assert apply_runpod_status(job, {"status": "IN_QUEUE"}) is True
+    assert apply_runpod_status(job, {"status": "IN_QUEUE"}) is False
+    assert job.status == JobStatus.PROVISIONING
+
+    assert apply_runpod_status(job, {"status": "IN_PROGRESS"}) is True
+    assert apply_runpod_status(job, {"status": "IN_PROGRESS"}) is False
+    assert job.status == JobStatus.RUNNING
+    assert job.started_at is not None
+
+
+def test_apply_unknown_fails_only_on_evicted_job():
+    """Test transient poll errors are ignored but RunPod 404s fail the job."""
+    job = _job(JobStatus.RUNNING)
+
+    assert apply_runpod_status(job, {"status": "UNKNOWN", "error": "timeout"}) is False
+    assert job.status == JobStatus.RUNNING
+
+    assert apply_runpod_status(job, {"status": "UNKNOWN", "error": "404 Not Found"}) is True
+    assert job.status == JobStatus.FAILED
+
+
+def test_is_timed_out_uses_configured_timeout():
+    """Test the timeout rule compares job age against job_timeout_seconds."""
+    now = datetime.now(timezone.utc)
+    limit = timedelta(seconds=settings.job_timeout_seconds)
+
+    assert is_timed_out(_job(created_at=now - limit - timedelta(minutes=1)), now) is True
+    assert is_timed_out(_job(created_at=now - limit + timedelta(minutes=1)), now) is False
+    # Naive timestamps are treated as UTC
+    assert is_timed_out(_job(created_at=(now - 2 * limit).replace(tzinfo=None)), now) is True
+
+
+def test_schedule_backs_off_until_transition():
+    """Test unchanged jobs back off to max_interval and reset on change."""
+    reconciler = RunPodReconciler(concurrency=2, min_interval=5, max_interval=20, backoff=2)
+
+    reconciler._schedule("rp-1", changed=False)
+    assert reconciler._intervals["rp-1"] == 10
+    reconciler._schedule("rp-1", changed=False)
+    reconciler._schedule("rp-1", changed=False)
+    assert reconciler._intervals["rp-1"] == 20
+
+    reconciler._schedule("rp-1", changed=True)
+    assert reconciler._intervals["rp-1"] == 5
+
+
+def test_fetch_manifests_only_for_completed_jobs(monkeypatch):
+    """Test manifests are read for COMPLETED outputs and unreadable ones are skipped."""
+    read = []
+
+    async def read_manifest(s3_key):
+        read.append(s3_key)
+        if "broken" in s3_key:
+            raise OSError("connection reset")
+        return {"artifacts": [{"key": s3_key.replace("manifest.json", "a.pdb")}]}
+
+    monkeypatch.setattr(storage_service, "read_manifest", read_manifest)
+
+    def completed(prefix):
+        return {"status": "COMPLETED", "output": {"output": {"manifest_s3_key": f"{prefix}/manifest.json"}}}
+
+    manifests = asyncio.run(RunPodReconciler()._fetch_manifests({
+        "rp-1": completed("jobs/j1/results"),
+        "rp-2": completed("jobs/broken/results"),
+        "rp-3": {"status": "IN_PROGRESS", "output": {"manifest_s3_key": "jobs/j3/results/manifest.json"}},
+    }))
+
+    assert sorted(read) == ["jobs/broken/results/manifest.json", "jobs/j1/results/manifest.json"]
+    assert manifests == {"rp-1": {"artifacts": [{"key": "jobs/j1/results/a.pdb"}]}}
@@ -0,0 +1,263 @@
+"""
+Unit tests for result cache keys, lookups and linking.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+import hashlib
+
+import pytest
+from sqlalchemy import select
+
+from app.domain.services.result_cache import ResultCache
+from app.infrastructure.db.models import Artifact, DispatchTask, Job, JobStatus, Metric
+from app.infrastructure.db.session import Base
+
+T0 = datetime(2024, 5, 1, tzinfo=timezone.utc)
+PDB = b"HEADER    TEST\n" + b"".join(
+    b"ATOM  %5d  CA  ALA H%4d      11.104  13.207   9.404  1.00 20.00           C\n" % (i, i)
+    for i in range(1, 13)
+) + b"END\n"
+
+
+def _run(scenario):
+    """Run scenario(db) against a fresh in-memory SQLite database."""
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                return await scenario(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def _job(job_id, status, minutes=0, **fields):
+    return Job(
+        id=job_id,
+        status=status,
+        pipeline_type="diffab_only",
+        created_at=T0 + timedelta(minutes=minutes),
+        **fields,
+    )
+
+
+def _patch_create_job(monkeypatch, stored):
+    """Record stored inputs instead of uploading them and skip NOTIFY (no SQLite counterpart)."""
+    from app.api.routes import jobs as jobs_route
+    from app.domain.services import job_service
+    from app.domain.services.job_service import JobService
+
+    async def store_input(job_id, file_obj, filename):
+        stored.append(file_obj.read())
+        return JobService.input_key(job_id, filename)
+
+    async def publish_job_event(db, job):
+        pass
+
+    monkeypatch.setattr(JobService, "store_input", staticmethod(store_input))
+    monkeypatch.setattr(job_service, "publish_job_event", publish_job_event)
+    return jobs_route
+
+
+def _create_job(jobs_route, db, content, skip_cache=False):
+    from fastapi import UploadFile
+
+    return jobs_route.create_job(
+        file=UploadFile(BytesIO(content), filename="in.pdb"),
+        pipeline_type=jobs_route.PipelineType.DIFFAB_ONLY,
+        selected_models=None,
+        diffab_config=None,
+        skip_cache=skip_cache,
+        db=db,
+    )
+
+
+def test_cache_key_normalizes_config():
+    """Test key order and None values do not change the cache key."""
+    a = ResultCache.cache_key("abc", "diffab_only", {"num_designs": 5, "sampling_temp": 0.5})
+    b = ResultCache.cache_key("abc", "diffab_only", {"sampling_temp": 0.5, "num_designs": 5, "device": None})
+
+    assert a == b
+    assert ResultCache.cache_key("abc", "diffab_only", None) == ResultCache.cache_key("abc", "diffab_only", {})
+
+
+def test_cache_key_separates_inputs_and_configs():
+    """Test different inputs, pipelines or params never share a key."""
+    base = ResultCache.cache_key("abc", "diffab_only", {"num_designs": 5})
+
+    assert base != ResultCache.cache_key("abd", "diffab_only", {"num_designs": 5})
+    assert base != ResultCache.cache_key("abc", "af2_only", {"num_designs": 5})
+    assert base != ResultCache.cache_key("abc", "diffab_only", {"num_designs": 6})
+
+
+def test_find_input_ignores_jobs_without_pdb_analysis():
+    """Test only a stored and analyzed input is reused, even if a newer job has the same bytes."""
+    async def scenario(db):
+        db.add_all([
+            _job("analyzed", JobStatus.COMPLETED, 0, input_sha256="abc", input_s3_key="jobs/analyzed/in.pdb",
+                 config={"pdb_analysis": {"recommended_mode": "fixbb"}}),
+            _job("rejected", JobStatus.FAILED, 5, input_sha256="abc", input_s3_key="jobs/rejected/in.pdb",
+                 config={}),
+            _job("unstored", JobStatus.CREATED, 10, input_sha256="abc",
+                 config={"pdb_analysis": {"recommended_mode": "fixbb"}}),
+            _job("other", JobStatus.COMPLETED, 15, input_sha256="xyz", input_s3_key="jobs/other/in.pdb",
+                 config={}),
+        ])
+        await db.flush()
+        return await ResultCache.find_input(db, "abc"), await ResultCache.find_input(db, "xyz")
+
+    found, unanalyzed = _run(scenario)
+
+    assert found.id == "analyzed"
+    assert unanalyzed is None
+
+
+def test_find_result_prefers_completed_over_in_flight():
+    """Test a completed job wins over a newer in-flight one, and unusable jobs are skipped."""
+    async def scenario(db):
+        db.add_all([
+            _job("completed", JobStatus.COMPLETED, 0, cache_key="k", output_s3_key="jobs/completed/results/0000.pdb"),
+            _job("running", JobStatus.RUNNING, 5, cache_key="k", runpod_job_id="rp-1"),
+            _job("no-output", JobStatus.COMPLETED, 10, cache_key="k"),
+            _job("undispatched", JobStatus.QUEUED, 15, cache_key="k"),
+            _job("failed", JobStatus.FAILED, 20, cache_key="k", runpod_job_id="rp-2"),
+        ])
+        await db.flush()
+        completed = await ResultCache.find_result(db, "k")
+        await db.delete(completed)
+        await db.flush()
+        return completed, await ResultCache.find_result(db, "k"), await ResultCache.find_result(db, "other")
+
+    completed, in_flight, missing = _run(scenario)
+
+    assert completed.id == "completed"
+    assert in_flight.id == "running"
+    assert missing is None
+
+
+def test_link_completed_source_copies_results():
+    """Test linking to a completed job copies its output key, artifacts and metrics."""
+    async def scenario(db):
+        source = _job("source", JobStatus.COMPLETED, 0, output_s3_key="jobs/source/results/0000.pdb",
+                      execution_time=42.0, config={"pdb_analysis": {"recommended_mode": "fixbb"}})
+        db.add_all([
+            source,
+            Artifact(id="a1", job_id="source", artifact_type="pdb", s3_key="jobs/source/results/0000.pdb",
+                     size_bytes=100, checksum="c1"),
+            Artifact(id="a2", job_id="source", artifact_type="metadata", s3_key="jobs/source/results/metadata.json",
+                     size_bytes=2, checksum="c2"),
+            Metric(id="m1", job_id="source", metric_name="plddt", metric_value=0.9),
+            _job("new", JobStatus.UPLOADED, 5),
+        ])
+        await db.flush()
+        job = await db.get(Job, "new")
+        await ResultCache.link(db, job, source, selected_models=["diffab"])
+        artifacts = (await db.execute(select(Artifact).where(Artifact.job_id == "new"))).scalars().all()
+        metrics = (await db.execute(select(Metric).where(Metric.job_id == "new"))).scalars().all()
+        return job, artifacts, metrics
+
+    job, artifacts, metrics = _run(scenario)
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.output_s3_key == "jobs/source/results/0000.pdb"
+    assert job.execution_time == 42.0
+    assert job.source_job_id == "source"
+    assert job.config["cached_from"] == "source"
+    assert job.config["selected_models"] == ["diffab"]
+    assert job.config["pdb_analysis"] == {"recommended_mode": "fixbb"}
+    assert sorted((a.artifact_type, a.s3_key, a.size_bytes, a.checksum) for a in artifacts) == [
+        ("metadata", "jobs/source/results/metadata.json", 2, "c2"),
+        ("pdb", "jobs/source/results/0000.pdb", 100, "c1"),
+    ]
+    assert [(m.metric_name, m.metric_value) for m in metrics] == [("plddt", 0.9)]
+
+
+def test_link_in_flight_source_follows_its_run():
+    """Test linking to an in-flight job shares its RunPod run and leaves the job QUEUED."""
+    async def scenario(db):
+        source = _job("source", JobStatus.RUNNING, 0, runpod_job_id="rp-1")
+        db.add_all([source, _job("new", JobStatus.UPLOADED, 5)])
+        await db.flush()
+        job = await ResultCache.link(db, await db.get(Job, "new"), source)
+        artifacts = (await db.execute(select(Artifact).where(Artifact.job_id == "new"))).scalars().all()
+        return job, artifacts
+
+    job, artifacts = _run(scenario)
+
+    assert job.status == JobStatus.QUEUED
+    assert job.runpod_job_id == "rp-1"
+    assert job.output_s3_key is None
+    assert job.source_job_id == "source"
+    assert artifacts == []
+
+
+@pytest.mark.parametrize("skip_cache, cached", [(False, True), (True, False)])
+def test_create_job_skip_cache_bypasses_result_lookup(monkeypatch, skip_cache, cached):
+    """Test skip_cache dispatches a fresh run even though an identical job has completed."""
+    jobs_route = _patch_create_job(monkeypatch, [])
+    input_sha256 = hashlib.sha256(PDB).hexdigest()
+    cache_key = ResultCache.cache_key(input_sha256, "diffab_only", None)
+
+    async def scenario(db):
+        db.add(_job("source", JobStatus.COMPLETED, 0, cache_key=cache_key, input_sha256=input_sha256,
+                    output_s3_key="jobs/source/results/0000.pdb"))
+        await db.flush()
+        response = await _create_job(jobs_route, db, PDB, skip_cache=skip_cache)
+        queued = (await db.execute(select(DispatchTask.job_id))).scalars().all()
+        return response, queued
+
+    response, queued = _run(scenario)
+
+    assert response.cached is cached
+    assert queued == ([] if cached else [response.job_id])
+
+
+def test_create_job_does_not_upload_a_known_input(monkeypatch):
+    """Test a repeated input is hashed before storing and never uploaded again."""
+    stored = []
+    jobs_route = _patch_create_job(monkeypatch, stored)
+    analysis = {"recommended_mode": "fixbb"}
+
+    async def scenario(db):
+        db.add(_job("first", JobStatus.FAILED, 0, input_sha256=hashlib.sha256(PDB).hexdigest(),
+                    input_s3_key="jobs/first/inputs/in.pdb", config={"pdb_analysis": analysis, "atom_count": 12}))
+        await db.flush()
+        response = await _create_job(jobs_route, db, PDB)
+        payload = (await db.get(DispatchTask, response.job_id)).payload
+        return await db.get(Job, response.job_id), payload
+
+    job, payload = _run(scenario)
+
+    assert stored == []
+    assert job.input_sha256 == hashlib.sha256(PDB).hexdigest()
+    assert job.input_s3_key == "jobs/first/inputs/in.pdb"
+    assert payload["pdb_analysis"] == analysis
+    assert payload["file_info"] == {"atom_count": 12}
+
+
+def test_create_job_stores_a_new_input_once_validated(monkeypatch):
+    """Test a new input is stored whole after the scan, and an invalid one is never stored."""
+    from fastapi import HTTPException
+
+    stored = []
+    jobs_route = _patch_create_job(monkeypatch, stored)
+
+    async def scenario(db):
+        response = await _create_job(jobs_route, db, PDB)
+        with pytest.raises(HTTPException) as rejected:
+            await _create_job(jobs_route, db, b"HEADER    TEST\nEND\n")
+        return await db.get(Job, response.job_id), rejected.value
+
+    job, rejected = _run(scenario)
+
+    assert stored == [PDB]
+    assert job.input_sha256 == hashlib.sha256(PDB).hexdigest()
+    assert job.input_s3_key == f"jobs/{job.id}/inputs/in.pdb"
+    assert rejected.status_code == 400
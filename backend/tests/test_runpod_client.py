@@ -0,0 +1,65 @@
+"""
+Unit tests for the shared RunPod HTTP client's retry policy.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.infrastructure.compute.runpod_client import request_with_retry
+
+
+def _client(responses, calls):
+    def handler(request):
+        calls.append(request)
+        result = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return httpx.Response(result, json={"id": "rp-1", "status": "IN_QUEUE"})
+
+    return httpx.AsyncClient(base_url="https://runpod.test/v2", transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "runpod_retry_backoff", 0.0)
+    monkeypatch.setattr(settings, "runpod_max_retries", 2)
+
+
+def test_status_retries_server_errors():
+    """Test idempotent calls retry 5xx responses until one succeeds."""
+    calls = []
+    client = _client([502, 500, 200], calls)
+
+    response = asyncio.run(request_with_retry(client, "GET", "/ep/status/rp-1", operation="status"))
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_submit_does_not_retry_ambiguous_failures():
+    """Test job submission is not resent after a 500, which RunPod may have processed."""
+    calls = []
+    client = _client([500, 200], calls)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(request_with_retry(
+            client, "POST", "/ep/run", operation="run", json={}, idempotent=False
+        ))
+
+    assert len(calls) == 1
+
+
+def test_submit_retries_when_not_processed():
+    """Test job submission is retried after 429 and connection failures."""
+    calls = []
+    request = httpx.Request("POST", "https://runpod.test/v2/ep/run")
+    client = _client([429, httpx.ConnectError("refused", request=request), 200], calls)
+
+    response = asyncio.run(request_with_retry(
+        client, "POST", "/ep/run", operation="run", json={}, idempotent=False
+    ))
+
+    assert response.json()["id"] == "rp-1"
+    assert len(calls) == 3
@@ -0,0 +1,202 @@
+"""
+Tests for the async StorageService against a local S3 stand-in (moto server).
+"""
+import asyncio
+import hashlib
+import io
+import json
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.infrastructure.storage.s3_service import StorageService
+
+moto_server = pytest.importorskip("moto.server")
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def storage(monkeypatch, s3_endpoint):
+    monkeypatch.setattr(settings, "s3_endpoint", s3_endpoint)
+    monkeypatch.setattr(settings, "s3_access_key", "testing")
+    monkeypatch.setattr(settings, "s3_secret_key", "testing")
+    monkeypatch.setattr(settings, "s3_bucket_name", "foldexa-test")
+    return StorageService()
+
+
+def test_stream_upload_roundtrip(storage):
+    """Test a multi-part stream upload, read back, and delete over one pooled session."""
+    data = b"ATOM  " * (2 * 1024 * 1024)  # 12 MB -> three 5 MB parts
+
+    async def scenario():
+        try:
+            await storage.validate_connection(timeout_seconds=5)
+            await storage.upload_stream(io.BytesIO(data), "jobs/j1/inputs/in.pdb")
+            body = await storage.get_object("jobs/j1/inputs/in.pdb")
+            await storage.delete_object("jobs/j1/inputs/in.pdb")
+            return body
+        finally:
+            await storage.close()
+
+    assert asyncio.run(scenario()) == data
+
+
+def test_stream_upload_accepts_async_reader(storage):
+    """Test upload_stream awaits read() when it is a coroutine."""
+    class AsyncReader:
+        def __init__(self, payload):
+            self._raw = io.BytesIO(payload)
+
+        async def read(self, size=-1):
+            await asyncio.sleep(0)
+            return self._raw.read(size)
+
+    async def scenario():
+        try:
+            await storage.validate_connection(timeout_seconds=5)
+            await storage.upload_stream(AsyncReader(b"HEADER x\nEND\n"), "jobs/j2/a.pdb")
+            return await storage.get_object("jobs/j2/a.pdb")
+        finally:
+            await storage.close()
+
+    assert asyncio.run(scenario()) == b"HEADER x\nEND\n"
+
+
+def test_multipart_upload_bounds_parts_in_memory(monkeypatch, storage, tmp_path):
+    """Test a large file is read at most s3_multipart_parallel parts ahead of the stored parts."""
+    from app.infrastructure.storage import s3_service
+
+    monkeypatch.setattr(settings, "s3_multipart_part_size", 5 * 1024 * 1024)
+    monkeypatch.setattr(settings, "s3_multipart_parallel", 2)
+    data = bytes(range(256)) * (23 * 1024 * 1024 // 256)  # 23 MB -> five parts
+    path = tmp_path / "traj.dcd"
+    path.write_bytes(data)
+
+    buffered = {"now": 0, "peak": 0}
+    read = s3_service._HashingFileReader._read
+    upload_part = storage.client._upload_part
+
+    def counting_read(self, size):
+        buffered["now"] += 1
+        buffered["peak"] = max(buffered["peak"], buffered["now"])
+        return read(self, size)
+
+    async def slow_upload_part(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        try:
+            return await upload_part(*args, **kwargs)
+        finally:
+            buffered["now"] -= 1
+
+    monkeypatch.setattr(s3_service._HashingFileReader, "_read", counting_read)
+    monkeypatch.setattr(storage.client, "_upload_part", slow_upload_part)
+
+    async def scenario():
+        try:
+            await storage.validate_connection(timeout_seconds=5)
+            entry = await storage.upload_path(path, "jobs/j4/results/traj.dcd")
+            return entry, await storage.get_object("jobs/j4/results/traj.dcd")
+        finally:
+            await storage.close()
+
+    entry, body = asyncio.run(scenario())
+
+    assert body == data
+    assert entry["sha256"] == hashlib.sha256(data).hexdigest()
+    assert entry["type"] == "trajectory"
+    assert buffered["peak"] == 2
+
+
+def test_stream_upload_keeps_event_loop_responsive(storage):
+    """Test a blocking reader (PDB validation per chunk) runs off the loop during a large upload."""
+    from app.core.validation import PDBUploadStream
+
+    class SlowDiskUpload(PDBUploadStream):
+        """Each chunk also waits 30 ms, as on a slow spooled file."""
+        def read(self, size=-1):
+            time.sleep(0.03)
+            return super().read(size)
+
+    line = b"ATOM      1  CA  ALA H   1      11.104  13.207   9.404  1.00 20.00           C\n"
+    data = b"HEADER    TEST\n" + line * (12 * 1024 * 1024 // len(line))  # 12 MB -> three parts
+
+    async def scenario():
+        gaps = []
+
+        async def ticker():
+            while True:
+                start = time.perf_counter()
+                await asyncio.sleep(0.005)
+                gaps.append(time.perf_counter() - start)
+
+        try:
+            await storage.validate_connection(timeout_seconds=5)
+            tick = asyncio.create_task(ticker())
+            upload = SlowDiskUpload(io.BytesIO(data))
+            await storage.upload_stream(upload, "jobs/j5/inputs/big.pdb")
+            tick.cancel()
+            await storage.delete_object("jobs/j5/inputs/big.pdb")
+            return upload, gaps
+        finally:
+            await storage.close()
+
+    upload, gaps = asyncio.run(scenario())
+
+    assert upload.sha256.hexdigest() == hashlib.sha256(data).hexdigest()
+    # On the loop, each 5 MB part would stall it for five reads (over 150 ms)
+    assert max(gaps) < 0.08, f"event loop stalled for {max(gaps) * 1000:.0f} ms"
+
+
+def test_presigned_url_needs_no_connection(storage):
+    """Test presigning is local: it works without ever opening the pool."""
+    url = asyncio.run(storage.get_presigned_url("jobs/j1/out.pdb", expires_seconds=60))
+
+    assert "/foldexa-test/jobs/j1/out.pdb?" in url
+    assert "X-Amz-Expires=60" in url
+    assert storage._session is None
+
+
+def test_directory_transfer_with_manifest(monkeypatch, storage, tmp_path):
+    """Test a design directory round-trips with a manifest of keys, sizes and checksums."""
+    monkeypatch.setattr(settings, "s3_multipart_part_size", 5 * 1024 * 1024)
+    outputs = tmp_path / "outputs"
+    (outputs / "sub").mkdir(parents=True)
+    files = {f"design_{i:03d}.pdb": f"ATOM {i}\n".encode() * 50 for i in range(20)}
+    files["sub/large.pdb"] = b"A" * (11 * 1024 * 1024)  # three multipart parts
+    for name, body in files.items():
+        (outputs / name).write_bytes(body)
+
+    async def scenario():
+        try:
+            await storage.validate_connection(timeout_seconds=5)
+            entries = await storage.upload_directory(str(outputs), "jobs/j3/results", concurrency=4)
+            manifest_key = await storage.write_manifest("j3", "jobs/j3/results", entries)
+            manifest = await storage.read_manifest(manifest_key)
+            paths = await storage.download_directory("jobs/j3/results", str(tmp_path / "copy"))
+            return entries, manifest, paths
+        finally:
+            await storage.close()
+
+    entries, manifest, paths = asyncio.run(scenario())
+
+    assert [e["key"] for e in entries] == sorted(f"jobs/j3/results/{name}" for name in files)
+    by_key = {e["key"]: e for e in manifest["artifacts"]}
+    for name, body in files.items():
+        entry = by_key[f"jobs/j3/results/{name}"]
+        assert entry["size"] == len(body)
+        assert entry["sha256"] == hashlib.sha256(body).hexdigest()
+        assert entry["type"] == "pdb"
+        assert (tmp_path / "copy" / name).read_bytes() == body
+    assert manifest["total_bytes"] == sum(len(body) for body in files.values())
+    # Downloads include the manifest itself
+    assert len(paths) == len(files) + 1
+    assert json.loads((tmp_path / "copy" / "manifest.json").read_text())["job_id"] == "j3"
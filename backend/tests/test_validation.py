@@ -1,6 +1,7 @@
 """
 Unit tests for file validation.
 """
+import hashlib
 import pytest
 from io import BytesIO
 from fastapi import UploadFile, HTTPException
@@ -11,6 +12,9 @@ from app.core.validation import (
     validate_pdb_structure,
     validate_upload_file,
     get_file_info,
+    validate_diffab_config,
+    PDBUploadStream,
+    PDBValidationError,
 )
 
 
@@ -151,3 +155,73 @@ ATOM      3  C   ALA B   1       2.009   1.420   0.000  1.00  0.00           C
     assert "TEST STRUCTURE" in info["title"]
     assert info["atom_count"] == 3
     assert set(info["chain_ids"]) == {"A", "B"}
+
+
+VALID_PDB = b"""HEADER    TEST PROTEIN
+""" + b"".join(
+    b"ATOM  %5d  CA  ALA A%4d       0.000   0.000   0.000  1.00  0.00           C\n" % (i, i)
+    for i in range(1, 21)
+)
+
+
+def _drain(stream, size=7):
+    """Read a stream to EOF in small chunks, as the storage client would."""
+    out = b""
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return out
+        out += chunk
+
+
+def test_upload_stream_passes_through_valid_pdb():
+    """Test streamed validation returns the bytes unchanged, counts atoms across chunks and hashes them."""
+    stream = PDBUploadStream(BytesIO(VALID_PDB))
+
+    assert _drain(stream) == VALID_PDB
+    assert stream.scanner.atom_count == 20
+    assert stream.bytes_read == len(VALID_PDB)
+    assert stream.sha256.hexdigest() == hashlib.sha256(VALID_PDB).hexdigest()
+
+
+def test_upload_stream_rejects_bad_header():
+    """Test streamed validation rejects content without PDB signatures."""
+    stream = PDBUploadStream(BytesIO(b"This is just plain text without any PDB records"))
+
+    with pytest.raises(PDBValidationError, match="does not appear to be"):
+        _drain(stream)
+
+
+def test_upload_stream_rejects_oversized_upload():
+    """Test streamed validation aborts once the size limit is crossed."""
+    stream = PDBUploadStream(BytesIO(VALID_PDB), max_size=100)
+
+    with pytest.raises(PDBValidationError, match="exceeds maximum"):
+        _drain(stream)
+
+
+def test_upload_stream_rejects_too_few_atoms():
+    """Test streamed validation enforces the minimum atom count at EOF."""
+    pdb_content = b"""HEADER    TEST
+ATOM      1  N   ALA A   1       0.000   0.000   0.000  1.00  0.00           N"""
+    stream = PDBUploadStream(BytesIO(pdb_content))
+
+    with pytest.raises(PDBValidationError, match="Minimum 10 atoms required"):
+        _drain(stream)
+
+
+@pytest.mark.parametrize("config", [{}, {"sample_steps": None}, {"sample_steps": 2}, {"sample_steps": 20}])
+def test_validate_diffab_config_accepts(config):
+    """Test absent or integer sample_steps of at least 2 pass."""
+    assert validate_diffab_config(config) == (True, None)
+
+
+@pytest.mark.parametrize("sample_steps, message", [
+    (1, "at least 2"), (0, "at least 2"), (-5, "at least 2"),
+    ("20", "integer"), ("fast", "integer"), (2.5, "integer"), (True, "integer"),
+])
+def test_validate_diffab_config_rejects_bad_sample_steps(sample_steps, message):
+    """Test sample_steps the sampler would refuse or the worker could not parse are rejected up front."""
+    is_valid, error = validate_diffab_config({"sample_steps": sample_steps})
+    assert is_valid is False
+    assert message in error
@@ -0,0 +1,136 @@
+"""
+Tests for the RunPod worker's input parsing and output upload.
+"""
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("runpod")
+pytest.importorskip("minio")
+
+HANDLER_PATH = Path(__file__).resolve().parents[1] / "runpod_worker" / "handler.py"
+
+
+@pytest.fixture(scope="module")
+def handler():
+    spec = importlib.util.spec_from_file_location("runpod_worker_handler", HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize("value, expected", [(None, None), ("", None), (2, 2), (20, 20), ("20", 20)])
+def test_parse_sample_steps_accepts(handler, value, expected):
+    assert handler.parse_sample_steps(value) == expected
+
+
+@pytest.mark.parametrize("value", [1, 0, -5, "-5", "fast", 2.5, True])
+def test_parse_sample_steps_rejects(handler, value):
+    """Test values the strided sampler would refuse fail the job with a clear error."""
+    with pytest.raises(ValueError, match="sample_steps"):
+        handler.parse_sample_steps(value)
+
+
+@pytest.fixture
+def s3(tmp_path):
+    """A Minio client on a local S3 stand-in (moto server), with one bucket."""
+    moto_server = pytest.importorskip("moto.server")
+    from minio import Minio
+
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    client = Minio(f"{host}:{port}", access_key="testing", secret_key="testing", secure=False)
+    client.make_bucket("foldexa-test")
+    yield client
+    server.stop()
+
+
+def _diffab_output_tree(output_dir):
+    """The tree design_for_pdb writes for two CDRs x two designs, flattened as wrapper.py does."""
+    import diffab_real_wrapper as wrapper
+
+    log_dir = output_dir / "input.pdb_2026_10_17__04_00_00"
+    for tag in ("H_CDR3", "L_CDR3"):
+        (log_dir / tag).mkdir(parents=True)
+        for name in ("REF1.pdb", "0000.pdb", "0001.pdb"):
+            (log_dir / tag / name).write_text(f"ATOM {tag} {name}\n")
+    (log_dir / "reference.pdb").write_text("ATOM reference\n")
+    (log_dir / "metadata.json").write_text("{}")
+    (log_dir / "log.txt").write_text("sampling\n")
+    wrapper.flatten_outputs(str(output_dir))
+    return log_dir
+
+
+def test_upload_outputs_registers_each_design_once(handler, s3, tmp_path):
+    """Test the manifest of a DiffAb run lists every design once and types the run's other files apart."""
+    import json
+
+    output_dir = tmp_path / "output"
+    log_dir = _diffab_output_tree(output_dir)
+    assert (output_dir / "diffab_0000.pdb").exists() and (output_dir / "diffab_REF1.pdb").exists()
+
+    outputs = handler.collect_outputs(output_dir)
+    entries, manifest_key = handler.upload_outputs(s3, "foldexa-test", output_dir, "jobs/j1/results", "j1", outputs)
+
+    run = f"jobs/j1/results/{log_dir.name}"
+    by_type = {}
+    for entry in entries:
+        by_type.setdefault(entry["type"], []).append(entry["key"])
+    assert sorted(by_type["pdb"]) == [
+        f"{run}/{tag}/{name}" for tag in ("H_CDR3", "L_CDR3") for name in ("0000.pdb", "0001.pdb")
+    ]
+    assert sorted(by_type["reference"]) == [f"{run}/H_CDR3/REF1.pdb", f"{run}/L_CDR3/REF1.pdb", f"{run}/reference.pdb"]
+    assert by_type["metadata"] == [f"{run}/metadata.json"]
+    assert by_type["log"] == [f"{run}/log.txt"]
+    assert set(by_type) == {"pdb", "reference", "metadata", "log"}
+    assert not any("diffab_" in key for key in sum(by_type.values(), []))
+
+    manifest = json.loads(s3.get_object("foldexa-test", manifest_key).read())
+    assert manifest["artifacts"] == entries
+    assert manifest["total_bytes"] == sum(e["size"] for e in entries)
+    body = s3.get_object("foldexa-test", f"{run}/L_CDR3/0001.pdb").read()
+    assert body == b"ATOM L_CDR3 0001.pdb\n"
+
+
+def test_upload_path_bounds_parts_in_memory(handler, s3, tmp_path, monkeypatch):
+    """Test a large output is read at most MULTIPART_PARALLEL parts ahead of the stored parts."""
+    import hashlib
+    import threading
+    import time
+
+    monkeypatch.setattr(handler, "MULTIPART_PART_SIZE", 5 * 1024 * 1024)
+    monkeypatch.setattr(handler, "MULTIPART_PARALLEL", 2)
+    data = bytes(range(256)) * (23 * 1024 * 1024 // 256)  # 23 MB -> five parts
+    path = tmp_path / "traj.dcd"
+    path.write_bytes(data)
+
+    buffered = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+    read = handler.HashingReader.read
+    upload_part = s3._upload_part
+
+    def counting_read(self, size=-1):
+        with lock:
+            buffered["now"] += 1
+            buffered["peak"] = max(buffered["peak"], buffered["now"])
+        return read(self, size)
+
+    def slow_upload_part(*args):
+        time.sleep(0.05)
+        try:
+            return upload_part(*args)
+        finally:
+            with lock:
+                buffered["now"] -= 1
+
+    monkeypatch.setattr(handler.HashingReader, "read", counting_read)
+    monkeypatch.setattr(s3, "_upload_part", slow_upload_part)
+
+    entry = handler.upload_path(s3, "foldexa-test", path, "jobs/j1/results/traj.dcd")
+
+    assert s3.get_object("foldexa-test", "jobs/j1/results/traj.dcd").read() == data
+    assert entry["sha256"] == hashlib.sha256(data).hexdigest()
+    assert entry["type"] == "trajectory"
+    assert buffered["peak"] == 2
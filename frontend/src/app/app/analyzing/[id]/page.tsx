@@ -15,7 +15,7 @@ import {
 import { useRouter } from "next/navigation";
 import { Navbar } from "@/components/ui/Navbar";
 import { Button } from "@/components/ui/Button";
-import { api, Job } from "@/lib/api";
+import { api, Job, TERMINAL_STATUSES } from "@/lib/api";
 import { cn } from "@/lib/utils";
 
 // --- CONFIG & CONSTANTS ---
@@ -105,58 +105,65 @@ export default function AnalyzingPage({ params }: { params: { id: string } }) {
         return () => clearInterval(timer);
     }, []);
 
-    // Polling Logic
+    // Live status: SSE stream, falling back to polling if the stream fails
     useEffect(() => {
         if (!jobId) return;
 
+        const handleUpdate = (data: Job) => {
+            setJob(data);
+
+            // Inline logical assignments to avoid cascading render effects
+            if (data.status === "queued" || data.status === "provisioning") {
+                setActiveSubStage(1);
+                setStatusText("PREPARING STRUCTURE");
+                setLogs(prev => {
+                    const newLogs = ["Resource allocated on execution cluster.", "Scaling container environment...", "Uploading structure to storage..."];
+                    return prev.includes(newLogs[0]) ? prev : [...prev, ...newLogs];
+                });
+            }
+            else if (data.status === "running") {
+                setActiveSubStage(2);
+                setStatusText("DIFFUSION SAMPLING");
+                setLogs(prev => {
+                    const newLogs = ["Loading model weights into VRAM...", "Diffusion step 1 initialized.", "Batch sampling started..."];
+                    return prev.includes(newLogs[0]) ? prev : [...prev, ...newLogs];
+                });
+            }
+            else if (data.status === "completed") {
+                setActiveSubStage(4);
+                setStatusText("PROCESSING COMPLETE");
+                setProgress(100);
+                setLogs(prev => {
+                    const newLogs = ["Validation metrics passed.", "Result artifact uploaded successfully.", "Synthesized PDB ready for download."];
+                    return prev.includes(newLogs[0]) ? prev : [...prev, ...newLogs];
+                });
+                setTimeout(() => router.push(`/app/results/${jobId}`), 2000);
+            } else if (data.status === "failed") {
+                // Handled inside component
+            }
+        };
+
+        let intervalId: ReturnType<typeof setInterval> | undefined;
         const poll = async () => {
             try {
                 const data = await api.getJob(jobId);
-                setJob(data);
-
-                // Inline logical assignments to avoid cascading render effects
-                if (data.status === "queued" || data.status === "provisioning") {
-                    setActiveSubStage(1);
-                    setStatusText("PREPARING STRUCTURE");
-                    setLogs(prev => {
-                        const newLogs = ["Resource allocated on execution cluster.", "Scaling container environment...", "Uploading structure to storage..."];
-                        return prev.includes(newLogs[0]) ? prev : [...prev, ...newLogs];
-                    });
-                }
-                else if (data.status === "running") {
-                    setActiveSubStage(2);
-                    setStatusText("DIFFUSION SAMPLING");
-                    setLogs(prev => {
-                        const newLogs = ["Loading model weights into VRAM...", "Diffusion step 1 initialized.", "Batch sampling started..."];
-                        return prev.includes(newLogs[0]) ? prev : [...prev, ...newLogs];
-                    });
-                }
-                else if (data.status === "completed") {
-                    setActiveSubStage(4);
-                    setStatusText("PROCESSING COMPLETE");
-                    setProgress(100);
-                    setLogs(prev => {
-                        const newLogs = ["Validation metrics passed.", "Result artifact uploaded successfully.", "Synthesized PDB ready for download."];
-                        return prev.includes(newLogs[0]) ? prev : [...prev, ...newLogs];
-                    });
-                    setTimeout(() => router.push(`/app/results/${jobId}`), 2000);
-                } else if (data.status === "failed") {
-                    // Handled inside component
-                }
+                handleUpdate(data);
+                if (TERMINAL_STATUSES.has(data.status)) clearInterval(intervalId);
             } catch (err) {
                 console.error("Poll error:", err);
             }
         };
 
-        poll();
-        const intervalId = setInterval(poll, 4000);
+        const unsubscribe = api.subscribeJob(jobId, handleUpdate, () => {
+            poll();
+            intervalId = setInterval(poll, 4000);
+        });
 
-        if (job?.status === "completed" || job?.status === "failed") {
+        return () => {
+            unsubscribe();
             clearInterval(intervalId);
-        }
-
-        return () => clearInterval(intervalId);
-    }, [jobId, router, job?.status]);
+        };
+    }, [jobId, router]);
 
     // Smoother progress bar
     useEffect(() => {
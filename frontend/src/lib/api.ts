@@ -90,6 +90,32 @@ export const api = {
     return response.data;
   },
 
+  /**
+   * Subscribe to live status changes over Server-Sent Events.
+   * Calls onUpdate with the current status right away and on every transition;
+   * the stream is closed after a terminal status. onError fires if the stream
+   * fails so callers can fall back to polling getJob. Returns an unsubscribe fn.
+   */
+  subscribeJob: (
+    jobId: string,
+    onUpdate: (job: Job) => void,
+    onError?: () => void,
+  ): (() => void) => {
+    const source = new EventSource(`${API_BASE}/api/v1/jobs/${jobId}/events`);
+
+    source.addEventListener("status", (event) => {
+      const job: Job = JSON.parse((event as MessageEvent).data);
+      onUpdate(job);
+      if (TERMINAL_STATUSES.has(job.status)) source.close();
+    });
+    source.onerror = () => {
+      source.close();
+      onError?.();
+    };
+
+    return () => source.close();
+  },
+
   /** Get job results (artifacts & metrics) */
   getJobResults: async (jobId: string, signal?: AbortSignal): Promise<JobResult> => {
     const response = await axios.get(